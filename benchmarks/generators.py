@@ -0,0 +1,210 @@
+"""
+Seeded synthetic corridors and trajectories in the upload file formats.
+
+make_corridor draws a meandering corridor of evenly spaced points with
+per-point deviation and speed limits. make_trajectory flies it: the track
+follows the centerline at 80 % of the allowed speed with Gaussian noise.
+Runs of points, a violation_rate fraction of the track in total, leave the
+corridor sideways or speed through it. The same seed always gives the same
+arrays.
+
+write_corridor and write_trajectory save them as corridor.txt
+("lon lat alt allowed_deviation allowed_speed") and trajectory.txt
+("lat lon alt hh:mm:ss.ffffff") files.
+"""
+from typing import Dict
+
+import numpy as np
+
+EARTH_RADIUS = 6371000.0
+
+# Mean duration of one violating run in seconds
+VIOLATION_SECONDS = 120.0
+
+# Sideways speed (m/s) at which the track leaves and rejoins the corridor
+LATERAL_SPEED = 20.0
+
+# Interval of the position noise in seconds. White noise between points a
+# second apart would read as wild speeds.
+NOISE_SECONDS = 60.0
+
+# The flight must end before midnight (times are hh:mm:ss)
+START_SECONDS = 6 * 3600.0
+MAX_DURATION = 17 * 3600.0
+
+
+def make_corridor(points: int, seed: int = 0, spacing: float = 2000.0,
+                  deviation=(300.0, 800.0), speed=(250.0, 350.0)) -> Dict[str, np.ndarray]:
+    """
+    A meandering corridor starting at (50N, 10E).
+
+    Args:
+        points: Number of corridor points (at least 2)
+        seed: Random seed
+        spacing: Distance between corridor points in meters
+        deviation: Range of allowed deviations in meters
+        speed: Range of allowed speeds in km/h
+
+    Returns:
+        Columns 'latitude', 'longitude', 'altitude', 'allowed_deviation',
+        'allowed_speed'
+    """
+    rng = np.random.default_rng(seed)
+    heading = 0.6 + np.cumsum(rng.normal(0, 0.15, points))
+    step = np.degrees(spacing / EARTH_RADIUS)
+    latitude = 50.0 + np.concatenate(([0.0], np.cumsum(step * np.cos(heading[:-1]))))
+    longitude = 10.0 + np.concatenate(
+        ([0.0], np.cumsum(step * np.sin(heading[:-1]) / np.cos(np.radians(latitude[:-1]))))
+    )
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': 3000.0 + np.cumsum(rng.normal(0, 20, points)),
+        'allowed_deviation': rng.uniform(*deviation, points),
+        'allowed_speed': rng.uniform(*speed, points),
+    }
+
+
+def make_trajectory(corridor: Dict[str, np.ndarray], points: int, seed: int = 0,
+                    noise: float = 50.0, violation_rate: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    A flight along the corridor.
+
+    Args:
+        corridor: make_corridor output
+        points: Number of trajectory points
+        seed: Random seed
+        noise: Standard deviation of the lateral and vertical noise in meters
+            (varying smoothly over NOISE_SECONDS)
+        violation_rate: Fraction of points in violating runs (0..1)
+
+    Returns:
+        Columns 'latitude', 'longitude', 'altitude', 'time_seconds', and
+        'violation' (True for points generated to violate the corridor)
+    """
+    if not 0.0 <= violation_rate <= 1.0:
+        raise ValueError(f"violation_rate must be between 0 and 1, got {violation_rate}")
+    rng = np.random.default_rng(seed)
+    lat, lon, alt = corridor['latitude'], corridor['longitude'], corridor['altitude']
+    north = np.radians(np.diff(lat)) * EARTH_RADIUS
+    east = np.radians(np.diff(lon)) * EARTH_RADIUS * np.cos(np.radians(lat[:-1]))
+    lengths = np.hypot(north, east)
+    cruise = 0.8 * np.minimum(corridor['allowed_speed'][:-1], corridor['allowed_speed'][1:]) / 3.6
+
+    # Distance flown, capped so that the flight ends the same day
+    along = np.concatenate(([0.0], np.cumsum(lengths)))
+    flight_time = np.concatenate(([0.0], np.cumsum(lengths / cruise)))
+    distance = np.interp(min(flight_time[-1], MAX_DURATION), flight_time, along)
+    s = np.linspace(0.0, distance, points)
+    seg = np.clip(np.searchsorted(along, s, side='right') - 1, 0, len(lengths) - 1)
+    t = (s - along[seg]) / lengths[seg]
+
+    step_time = np.diff(s, prepend=0.0) / cruise[seg]
+    cruise_time = np.cumsum(step_time)
+    interval = cruise_time[-1] / max(points - 1, 1)
+    violation = _violation_runs(points, violation_rate, VIOLATION_SECONDS / interval, rng)
+    # Half of the runs leave the corridor, the other half fly too fast
+    run_id = np.cumsum(np.diff(np.concatenate(([False], violation)).astype(np.int8)) == 1)
+    sideways = violation & (run_id % 2 == 1)
+    too_fast = violation & ~sideways
+
+    limit = np.minimum(corridor['allowed_deviation'][seg], corridor['allowed_deviation'][seg + 1])
+    offset = _smooth_noise(noise, cruise_time, rng) + _excursions(sideways, limit, cruise_time, rng)
+    # Points of an excursion count as violating only once outside the limit
+    violation = too_fast | (np.abs(offset) > limit)
+    # Offsets along a normal turning smoothly through each corner, so that
+    # the track does not jump sideways at the corridor's vertices
+    normal = np.stack((-east / lengths, north / lengths), axis=1)
+    vertex = np.concatenate((normal[:1], normal[:-1] + normal[1:], normal[-1:]))
+    vertex /= np.linalg.norm(vertex, axis=1, keepdims=True)
+    direction = (1 - t)[:, None] * vertex[seg] + t[:, None] * vertex[seg + 1]
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    d_north = offset * direction[:, 0]
+    d_east = offset * direction[:, 1]
+
+    latitude = lat[seg] + t * (lat[seg + 1] - lat[seg]) + np.degrees(d_north / EARTH_RADIUS)
+    longitude = (lon[seg] + t * (lon[seg + 1] - lon[seg])
+                 + np.degrees(d_east / (EARTH_RADIUS * np.cos(np.radians(lat[seg])))))
+    altitude = (alt[seg] + t * (alt[seg + 1] - alt[seg])
+                + _smooth_noise(noise / 2, cruise_time, rng))
+
+    # Steps are flown at cruise speed; fast runs fly at 1.5-2x the limit
+    step_time[too_fast] *= 0.8 / rng.uniform(1.5, 2.0)
+    time_seconds = START_SECONDS + np.cumsum(step_time)
+
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'altitude': altitude,
+        'time_seconds': time_seconds,
+        'violation': violation,
+    }
+
+
+def write_corridor(path, corridor: Dict[str, np.ndarray]) -> None:
+    columns = ('longitude', 'latitude', 'altitude', 'allowed_deviation', 'allowed_speed')
+    rows = zip(*(corridor[name].tolist() for name in columns))
+    with open(path, 'w') as f:
+        f.writelines(f"{lon!r} {lat!r} {alt!r} {dev!r} {speed!r}\n"
+                     for lon, lat, alt, dev, speed in rows)
+
+
+def write_trajectory(path, trajectory: Dict[str, np.ndarray]) -> None:
+    rows = zip(*(trajectory[name].tolist()
+                 for name in ('latitude', 'longitude', 'altitude', 'time_seconds')))
+    with open(path, 'w') as f:
+        f.writelines(f"{lat!r} {lon!r} {alt!r} {format_time(seconds)}\n"
+                     for lat, lon, alt, seconds in rows)
+
+
+def format_time(seconds: float) -> str:
+    """hh:mm:ss.ffffff"""
+    micros = int(round(seconds * 1e6))
+    whole, micros = divmod(micros, 1000000)
+    return f"{whole // 3600:02d}:{whole // 60 % 60:02d}:{whole % 60:02d}.{micros:06d}"
+
+
+def _smooth_noise(sigma: float, time_seconds: np.ndarray, rng) -> np.ndarray:
+    """Gaussian noise drawn every NOISE_SECONDS and interpolated in between."""
+    knots = np.arange(0.0, time_seconds[-1] + 2 * NOISE_SECONDS, NOISE_SECONDS)
+    return np.interp(time_seconds, knots, rng.normal(0, sigma, len(knots)))
+
+
+def _excursions(runs: np.ndarray, limit: np.ndarray, time_seconds: np.ndarray,
+                rng) -> np.ndarray:
+    """
+    Lateral offsets taking the track up to 1.3-2x the allowed deviation to
+    one side. The track drifts at LATERAL_SPEED and crosses the limit at
+    the first and last point of each run.
+    """
+    offset = np.zeros(len(runs))
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], runs, [False])).astype(np.int8)))
+    for start, end in zip(edges[::2], edges[1::2]):
+        edge = limit[start:end].max()
+        peak = edge * rng.uniform(1.3, 2.0)
+        t0 = time_seconds[start] - edge / LATERAL_SPEED
+        t1 = time_seconds[end - 1] + edge / LATERAL_SPEED
+        lo, hi = np.searchsorted(time_seconds, (t0, t1))
+        t = time_seconds[lo:hi]
+        drift = np.clip(LATERAL_SPEED * np.minimum(t - t0, t1 - t), 0.0, peak)
+        offset[lo:hi] += rng.choice((-1.0, 1.0)) * drift
+    return offset
+
+
+def _violation_runs(points: int, rate: float, run_points: float, rng) -> np.ndarray:
+    """Mask with runs of about run_points points covering rate of the track."""
+    mask = np.zeros(points, dtype=bool)
+    target = int(round(rate * points))
+    run_points = max(run_points, 3.0)
+    covered = 0
+    # Runs land on each other more and more often as the track fills up;
+    # after a few times the expected number of runs, the rest is filled in
+    for _ in range(int(4 * target / run_points) + 10):
+        if covered >= target:
+            break
+        length = min(int(rng.uniform(0.5, 1.5) * run_points) + 1, target - covered)
+        start = int(rng.integers(0, points - length + 1))
+        covered += length - int(mask[start:start + length].sum())
+        mask[start:start + length] = True
+    mask[np.flatnonzero(~mask)[:max(target - covered, 0)]] = True
+    return mask
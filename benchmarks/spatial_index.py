@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Benchmark nearest-segment lookup: full scan vs. CorridorIndex grid.
+
+Corridor length grows while segment spacing (~2 km) and trajectory size stay
+fixed, so the full scan grows linearly with corridor length and the grid
+lookup stays roughly flat.
+
+Usage:
+    python -m benchmarks.spatial_index [--points 20000] [--sizes 50 200 1000 5000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from monitoring.spatial_index import CorridorIndex
+from monitoring.vectorized import CorridorGeometry
+
+
+def make_corridor(size, rng):
+    """Meandering corridor with ~2 km segments starting at (50N, 10E)."""
+    heading = np.cumsum(rng.normal(0, 0.15, size)) + 0.6
+    step = 0.018  # degrees, ~2 km
+    lat = 50.0 + np.cumsum(step * np.cos(heading))
+    lon = 10.0 + np.cumsum(step * np.sin(heading) / np.cos(np.radians(50.0)))
+    alt = 3000.0 + np.cumsum(rng.normal(0, 20, size))
+    return CorridorGeometry(lat, lon, alt,
+                            rng.uniform(300, 800, size), rng.uniform(250, 350, size))
+
+
+def make_trajectory(corridor, points, rng):
+    """Points along the corridor with ~500 m of lateral noise."""
+    seg = rng.integers(0, corridor.segment_count, points)
+    t = rng.uniform(0, 1, points)
+    lat = corridor.seg_lat[seg] + t * corridor.ab_lat[seg] + rng.normal(0, 0.005, points)
+    lon = corridor.seg_lon[seg] + t * corridor.ab_lon[seg] + rng.normal(0, 0.007, points)
+    alt = corridor.seg_alt[seg] + t * corridor.ab_alt[seg] + rng.normal(0, 100, points)
+    return lat, lon, alt
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000, 5000])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'corridor':>9} {'scan s':>9} {'build s':>9} {'index s':>9} {'speedup':>8}  identical")
+    for size in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        corridor = make_corridor(size, rng)
+        lat, lon, alt = make_trajectory(corridor, args.points, rng)
+
+        scan_time, (scan_dist, scan_idx) = timed(corridor.nearest_segments, lat, lon, alt)
+        build_time, index = timed(CorridorIndex, corridor)
+        index_time, (index_dist, index_idx) = timed(index.nearest_segments, lat, lon, alt)
+
+        identical = bool(np.array_equal(scan_idx, index_idx) and
+                         np.array_equal(scan_dist, index_dist))
+        print(f"{size:>9} {scan_time:>9.3f} {build_time:>9.3f} {index_time:>9.3f} "
+              f"{scan_time / index_time:>7.1f}x  {identical}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+"""
+Load test for the live telemetry streams.
+
+Opens many concurrent Server-Sent Events subscribers on one flight case of a
+running ASGI server, then appends points to it at a fixed rate and reports:
+
+- append latency (the ingestion path; it must not grow with the number or
+  the slowness of the subscribers);
+- delivery latency from publish to receipt, for the normal subscribers;
+- events received and dropped by the slow subscribers, which read with a
+  tiny socket buffer and sleep between reads.
+
+Only the standard library is used; HTTP is spoken over asyncio streams.
+The flight case must be processed, and its last point must leave room in
+the day for the appended points (times are hh:mm:ss). The points are
+really appended to it, so use a scratch case.
+
+Usage:
+    uvicorn fofis_project.asgi:application --port 8000
+    python -m benchmarks.sse_load --flight-case 1 [--subscribers 500 --slow 50]
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def open_stream(host, port, path, rcvbuf=None):
+    """GET an SSE stream; returns (reader, writer) positioned at the body."""
+    if rcvbuf:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        reader, writer = await asyncio.open_connection(sock=sock, limit=rcvbuf)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status, headers = await read_head(reader)
+    if status != 200:
+        raise RuntimeError(f"GET {path}: HTTP {status}")
+    if headers.get('transfer-encoding') != 'chunked':
+        raise RuntimeError('Expected a chunked stream')
+    return reader, writer
+
+
+async def read_head(reader):
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin1').strip()
+        if not line:
+            return status, headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def read_events(reader):
+    """Yield (event, data) from a chunked SSE body; comments are skipped."""
+    buffer = b''
+    while True:
+        size = int((await reader.readline()).strip() or b'0', 16)
+        if size == 0:
+            return
+        buffer += await reader.readexactly(size)
+        await reader.readexactly(2)
+        while b'\n\n' in buffer:
+            frame, buffer = buffer.split(b'\n\n', 1)
+            event, data = 'message', []
+            for line in frame.decode('utf-8').split('\n'):
+                if line.startswith('event:'):
+                    event = line[6:].strip()
+                elif line.startswith('data:'):
+                    data.append(line[5:].strip())
+            if data:
+                yield event, json.loads('\n'.join(data))
+
+
+async def post_json(host, port, path, body):
+    """POST a JSON body on a fresh connection; returns (status, parsed body)."""
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode()
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Accept: application/json\r\nContent-Length: {len(payload)}\r\n"
+        f"Connection: close\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status, headers = await read_head(reader)
+    if 'content-length' in headers:
+        data = await reader.readexactly(int(headers['content-length']))
+    else:
+        data = await reader.read()
+    writer.close()
+    return status, json.loads(data) if data else None
+
+
+class Subscriber:
+    def __init__(self, slow_delay=0.0):
+        self.slow_delay = slow_delay
+        self.hello = None
+        self.events = 0
+        self.points = 0
+        self.dropped = 0
+        self.latencies = []
+
+    async def run(self, host, port, path, connected):
+        rcvbuf = 4096 if self.slow_delay else None
+        reader, writer = await open_stream(host, port, path, rcvbuf)
+        try:
+            async for event, data in read_events(reader):
+                if event == 'hello':
+                    self.hello = data
+                    connected()
+                elif event == 'points':
+                    self.latencies.append(time.time() - data['published_at'])
+                    self.events += 1
+                    self.points += data['points']['rows']
+                elif event == 'dropped':
+                    self.dropped += data['dropped']
+                if self.slow_delay:
+                    await asyncio.sleep(self.slow_delay)
+        finally:
+            writer.close()
+
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    base = f"{url.path.rstrip('/')}/api/flight-cases/{args.flight_case}"
+
+    subscribers = [Subscriber(args.slow_delay if i < args.slow else 0.0)
+                   for i in range(args.subscribers)]
+    all_connected = asyncio.Event()
+    pending = [len(subscribers)]
+
+    def connected():
+        pending[0] -= 1
+        if pending[0] == 0:
+            all_connected.set()
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(s.run(host, port, f"{base}/stream/", connected))
+             for s in subscribers]
+    await asyncio.wait_for(all_connected.wait(), args.connect_timeout)
+    connect_seconds = time.perf_counter() - started
+
+    last = subscribers[0].hello['last_point']
+    if not last:
+        raise SystemExit('Flight case has no stored points (process it first)')
+    next_time = int(last['time_seconds']) + 1
+    if next_time + args.appends * args.points >= 24 * 3600:
+        raise SystemExit('Not enough time left in the day after the last point; '
+                         'use fewer appends or points')
+
+    append_latencies = []
+    interval = 1.0 / args.rate
+    publish_started = time.perf_counter()
+    for n in range(args.appends):
+        points = []
+        for i in range(args.points):
+            step = n * args.points + i + 1
+            points.append({
+                'latitude': last['latitude'] + step * 1e-4,
+                'longitude': last['longitude'] + step * 1e-4,
+                'altitude': last['altitude'],
+                'time': format_time(next_time),
+            })
+            next_time += 1
+        t0 = time.perf_counter()
+        status, body = await post_json(host, port, f"{base}/append/", {'points': points})
+        append_latencies.append(time.perf_counter() - t0)
+        if status != 200:
+            raise SystemExit(f"Append failed: HTTP {status} {body}")
+        delay = publish_started + (n + 1) * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    publish_seconds = time.perf_counter() - publish_started
+
+    await asyncio.sleep(args.drain)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    fast = [s for s in subscribers if not s.slow_delay]
+    slow = [s for s in subscribers if s.slow_delay]
+    latencies = [x for s in fast for x in s.latencies]
+    return {
+        'subscribers': len(subscribers),
+        'slow_subscribers': len(slow),
+        'connect_seconds': connect_seconds,
+        'appends': args.appends,
+        'points_per_append': args.points,
+        'append_rate': args.appends / publish_seconds,
+        'append_latency_p50': percentile(append_latencies, 0.5),
+        'append_latency_p99': percentile(append_latencies, 0.99),
+        'append_latency_max': max(append_latencies),
+        'fast_events_received_min': min((s.events for s in fast), default=0),
+        'fast_dropped': sum(s.dropped for s in fast),
+        'delivery_latency_p50': percentile(latencies, 0.5),
+        'delivery_latency_p99': percentile(latencies, 0.99),
+        'delivery_latency_max': max(latencies, default=float('nan')),
+        'slow_events_received_mean': statistics.mean(s.events for s in slow) if slow else 0,
+        'slow_dropped_mean': statistics.mean(s.dropped for s in slow) if slow else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--flight-case', type=int, required=True)
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--slow', type=int, default=20,
+                        help='how many of the subscribers read slowly')
+    parser.add_argument('--slow-delay', type=float, default=0.5,
+                        help='seconds a slow subscriber sleeps after each event')
+    parser.add_argument('--appends', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=20.0, help='appends per second')
+    parser.add_argument('--points', type=int, default=10, help='points per append')
+    parser.add_argument('--connect-timeout', type=float, default=60.0)
+    parser.add_argument('--drain', type=float, default=2.0,
+                        help='seconds to keep reading after the last append')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = f"{value * 1000:.1f} ms" if 'latency' in key else f"{value:.2f}"
+        print(f"{key:28s} {value}")
+
+
+if __name__ == '__main__':
+    main()
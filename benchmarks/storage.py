@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Benchmark point storage: JSON list of dicts vs. columnar blob.
+
+Builds processed trajectories of increasing length with the real geometry
+pipeline, then compares stored size and decode time for the JSON text the
+old trajectory_data field held and the columnar blob that replaced it.
+
+Usage:
+    python -m benchmarks.storage [--sizes 10000 100000] [--corridor 500]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.spatial_index import make_corridor, make_trajectory
+from monitoring import columnar, vectorized
+from monitoring.parsers import format_time_for_display
+from monitoring.spatial_index import CorridorIndex
+
+
+def make_points(size, corridor, rng):
+    """Processed trajectory point dicts, as process_flight_case stores them."""
+    lat, lon, alt = make_trajectory(corridor, size, rng)
+    time_seconds = 36000.0 + np.arange(size) * 0.5
+    columns = {'latitude': lat, 'longitude': lon, 'altitude': alt, 'time_seconds': time_seconds}
+    results = vectorized.evaluate_trajectory(columns, CorridorIndex(corridor))
+
+    points = [
+        {
+            'latitude': la, 'longitude': lo, 'altitude': al,
+            'time': format_time_for_display(t), 'time_seconds': t, 'index': i,
+        }
+        for i, (la, lo, al, t) in enumerate(zip(lat.tolist(), lon.tolist(),
+                                                alt.tolist(), time_seconds.tolist()))
+    ]
+    vectorized.apply_results(points, results)
+    for point in points:
+        point['cpp_deviation'] = round(point['deviation'], 2)
+        point['cpp_speed_violation'] = 0.0
+        point['cpp_compliant'] = point['compliant']
+    return points
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--corridor', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'points':>8} {'json MB':>8} {'blob MB':>8} {'ratio':>6} "
+          f"{'json.loads s':>12} {'blob->dicts s':>13} {'blob all cols s':>15} "
+          f"{'blob 2 cols s':>13}  identical")
+    for size in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        corridor = make_corridor(args.corridor, rng)
+        points = make_points(size, corridor, rng)
+
+        text = json.dumps(points)
+        blob = columnar.encode_points(points, columnar.TRAJECTORY_SCHEMA)
+
+        json_time, _ = timed(json.loads, text)
+        dicts_time, decoded = timed(columnar.decode_points, blob, columnar.TRAJECTORY_SCHEMA)
+        columns_time, _ = timed(columnar.decode_columns, blob)
+        two_time, _ = timed(columnar.decode_columns, blob, ['latitude', 'longitude'])
+
+        json_mb = len(text.encode()) / 1e6
+        blob_mb = len(blob) / 1e6
+        print(f"{size:>8} {json_mb:>8.2f} {blob_mb:>8.2f} {json_mb / blob_mb:>5.1f}x "
+              f"{json_time:>12.3f} {dicts_time:>13.3f} {columns_time:>15.4f} "
+              f"{two_time:>13.4f}  {decoded == points}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+"""
+Benchmark suite: processing stages and API endpoints across size sweeps.
+
+For every (corridor size, trajectory size) pair a synthetic corridor and
+trajectory are generated (benchmarks/generators.py, seeded) and written in
+the upload formats. Each case is then timed --repeat times:
+
+- parsers: parse_corridor_file, parse_trajectory_file
+- geometry (pure Python) and vectorized: compute_trajectory_speeds,
+  compute_deviations (the O(n*m) Python scan is skipped above
+  --max-python-pairs trajectory point x corridor segment pairs)
+- processing: run_cpp_validation (executable), run_cpp_library_validation
+  (shared library), process_flight_case
+- api: upload (create, processed inline), retrieve, trajectory_data (JSON
+  and ?format=bin), trajectory_window, geometry. Cached responses are
+  dropped before every request, so the server does the full work.
+
+One untimed warm-up call precedes the timed ones (--warmup).
+Database work runs in a throwaway test database with a temporary
+MEDIA_ROOT. Results are written as JSON: run metadata (git commit,
+versions, platform, settings) and, per case and parameters, every timing
+with min/median/mean and points per second. Cases that cannot run here
+(e.g. no validator binary for this platform) are listed with the reason.
+
+"compare" matches the results of two runs by case and parameters and
+reports the ratios of their fastest (or median) times; it can exit
+non-zero on a regression.
+
+Usage:
+    python -m benchmarks.suite run [--sizes 1000 10000 100000] [--corridor-sizes 500]
+        [--noise 50] [--violation-rate 0.05] [--repeat 3] [--only 'api.*']
+        [--output results.json]
+    python -m benchmarks.suite compare base.json new.json [--threshold 0.1]
+        [--fail-on-regression]
+"""
+import argparse
+import copy
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fofis_project.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.files import File  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from benchmarks import generators  # noqa: E402
+from monitoring import corridors, geometry, response_cache, vectorized  # noqa: E402
+from monitoring.cpp_validator import (  # noqa: E402
+    CppValidatorError,
+    CppValidatorProcess,
+    load_validator_library,
+)
+from monitoring.models import FlightCase  # noqa: E402
+from monitoring.parsers import parse_corridor_file, parse_trajectory_file  # noqa: E402
+from monitoring.processing import (  # noqa: E402
+    process_flight_case,
+    run_cpp_library_validation,
+    run_cpp_validation,
+)
+
+RESULT_VERSION = 1
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class Skipped(Exception):
+    """The case cannot run here; the message says why."""
+
+
+class Workload:
+    """Generated files of one (corridor size, trajectory size) pair and data derived from them."""
+
+    def __init__(self, directory, corridor_size, size, args):
+        self.args = args
+        self.params = {
+            'corridor_points': corridor_size,
+            'points': size,
+            'noise': args.noise,
+            'violation_rate': args.violation_rate,
+            'seed': args.seed,
+        }
+        corridor = generators.make_corridor(corridor_size, seed=args.seed)
+        trajectory = generators.make_trajectory(
+            corridor, size, seed=args.seed + 1, noise=args.noise,
+            violation_rate=args.violation_rate,
+        )
+        self.corridor_path = Path(directory) / f'corridor_{corridor_size}.txt'
+        self.trajectory_path = Path(directory) / f'trajectory_{corridor_size}_{size}.txt'
+        if not self.corridor_path.exists():
+            generators.write_corridor(self.corridor_path, corridor)
+        generators.write_trajectory(self.trajectory_path, trajectory)
+        self.size = size
+        self._cache = {}
+
+    def once(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def corridor_points(self):
+        return self.once('corridor', lambda: parse_corridor_file(str(self.corridor_path)))
+
+    def trajectory_points(self):
+        """Freshly parsed point dicts (copied, since the cases modify them)."""
+        points = self.once('trajectory', lambda: parse_trajectory_file(str(self.trajectory_path)))
+        return copy.deepcopy(points)
+
+    def evaluated_points(self):
+        """Point dicts with speed, deviation and nearest segment, as the validators get them."""
+        def build():
+            points = self.trajectory_points()
+            columns = vectorized.trajectory_arrays(points)
+            geometry_ = vectorized.CorridorGeometry.from_points(self.corridor_points())
+            vectorized.apply_results(points, vectorized.evaluate_trajectory(columns, geometry_))
+            return points
+        return copy.deepcopy(self.once('evaluated', build))
+
+    def flight_case(self):
+        """A processed FlightCase of this workload (created once)."""
+        def build():
+            with open(self.corridor_path, 'rb') as c, open(self.trajectory_path, 'rb') as t:
+                flight_case = FlightCase.objects.create(
+                    corridor_file=File(c, name='corridor.txt'),
+                    trajectory_file=File(t, name='trajectory.txt'),
+                )
+            corridors.ingest(flight_case)
+            if not process_flight_case(flight_case):
+                raise Skipped(f'processing failed: {flight_case.processing_error}')
+            return flight_case
+        return self.once('flight_case', build)
+
+
+CASES = []
+
+
+def case(name):
+    """
+    Register a benchmark case.
+
+    The decorated function receives the Workload and returns the callable to
+    time (called once per repeat with no arguments), or raises Skipped.
+    """
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+@case('parsers.parse_corridor_file')
+def _parse_corridor(work):
+    return lambda: parse_corridor_file(str(work.corridor_path))
+
+
+@case('parsers.parse_trajectory_file')
+def _parse_trajectory(work):
+    return lambda: parse_trajectory_file(str(work.trajectory_path))
+
+
+@case('geometry.compute_trajectory_speeds')
+def _python_speeds(work):
+    points = work.trajectory_points()
+    return lambda: geometry.compute_trajectory_speeds(points)
+
+
+@case('geometry.compute_deviations')
+def _python_deviations(work):
+    corridor_points = work.corridor_points()
+    pairs = work.size * (len(corridor_points) - 1)
+    if pairs > work.args.max_python_pairs:
+        raise Skipped(f'{pairs} point x segment pairs is above --max-python-pairs')
+    points = geometry.compute_trajectory_speeds(work.trajectory_points())
+    return lambda: geometry.compute_deviations(points, corridor_points)
+
+
+@case('vectorized.compute_trajectory_speeds')
+def _vectorized_speeds(work):
+    points = work.trajectory_points()
+    return lambda: vectorized.compute_trajectory_speeds(points)
+
+
+@case('vectorized.compute_deviations')
+def _vectorized_deviations(work):
+    corridor_points = work.corridor_points()
+    points = vectorized.compute_trajectory_speeds(work.trajectory_points())
+    return lambda: vectorized.compute_deviations(points, corridor_points)
+
+
+@case('processing.run_cpp_validation')
+def _cpp_validation(work):
+    executable = work.args.cpp_executable
+    corridor_points = work.corridor_points()
+    # run_cpp_validation quietly returns the points unvalidated when the
+    # executable cannot run, which would time nothing
+    if not os.path.exists(executable):
+        raise Skipped(f'{executable} does not exist')
+    try:
+        with CppValidatorProcess(executable, corridor_points[:2], settings.CPP_VALIDATOR_TIMEOUT):
+            pass
+    except OSError as e:
+        raise Skipped(f'validator cannot be started: {e}')
+    except CppValidatorError as e:
+        raise Skipped(f'validator has no streaming mode: {e}')
+    points = work.evaluated_points()
+    return lambda: run_cpp_validation(points, corridor_points, executable)
+
+
+@case('processing.run_cpp_library_validation')
+def _cpp_library_validation(work):
+    library = load_validator_library(work.args.cpp_library)
+    if library is None:
+        raise Skipped(f'{work.args.cpp_library} cannot be loaded')
+    corridor_points = work.corridor_points()
+    points = work.evaluated_points()
+    return lambda: run_cpp_library_validation(points, corridor_points, library)
+
+
+@case('processing.process_flight_case')
+def _process(work):
+    flight_case = work.flight_case()
+    return lambda: process_flight_case(flight_case)
+
+
+@case('api.create')
+def _api_create(work):
+    client = Client()
+
+    def upload():
+        with open(work.corridor_path, 'rb') as c, open(work.trajectory_path, 'rb') as t:
+            response = client.post('/api/flight-cases/', {'corridor_file': c, 'trajectory_file': t},
+                                   HTTP_ACCEPT='application/json')
+        _check(response, 202)
+    return upload
+
+
+def _api_get(path, query='', accept='application/json'):
+    def setup(work):
+        client = Client()
+        flight_case = work.flight_case()
+        url = f'/api/flight-cases/{flight_case.pk}/{path}{query}'
+
+        def get():
+            response_cache.invalidate(flight_case.pk)
+            response = client.get(url, HTTP_ACCEPT=accept)
+            _check(response, 200)
+            # Streamed bodies are only produced when read
+            b''.join(response) if response.streaming else response.content
+        return get
+    return setup
+
+
+case('api.retrieve')(_api_get(''))
+case('api.trajectory_data')(_api_get('trajectory_data/'))
+case('api.trajectory_data?format=bin')(
+    _api_get('trajectory_data/', '?format=bin', 'application/octet-stream')
+)
+case('api.trajectory_window')(_api_get('trajectory_window/', '?page_size=1000'))
+case('api.geometry')(_api_get('geometry/', '?zoom=8'))
+
+
+def _check(response, expected):
+    if response.status_code != expected:
+        raise RuntimeError(f'HTTP {response.status_code}: {response.content[:200]!r}')
+
+
+def measure(func, repeat, warmup):
+    """Wall clock seconds of repeat calls, after warmup untimed ones."""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def run_cases(args, directory):
+    results = []
+    for corridor_size in args.corridor_sizes:
+        for size in args.sizes:
+            work = Workload(directory, corridor_size, size, args)
+            for name, setup in CASES:
+                if args.only and not any(fnmatch.fnmatchcase(name, p) for p in args.only):
+                    continue
+                result = {'name': name, 'params': work.params}
+                try:
+                    times = measure(setup(work), args.repeat, args.warmup)
+                except Skipped as e:
+                    result['skipped'] = str(e)
+                    print(f"{name:40s} {corridor_size:>7d} {size:>8d}  skipped: {e}", file=sys.stderr)
+                    results.append(result)
+                    continue
+                median = statistics.median(times)
+                result.update({
+                    'times': times,
+                    'min': min(times),
+                    'median': median,
+                    'mean': statistics.mean(times),
+                    'points_per_second': size / median if median > 0 else None,
+                })
+                print(f"{name:40s} {corridor_size:>7d} {size:>8d}  {median:9.4f} s", file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix='fofis-bench-')
+    media_root = os.path.join(directory, 'media')
+    overrides = override_settings(
+        MEDIA_ROOT=media_root,
+        PROCESSING_ASYNC=False,
+        CPP_VALIDATOR_PATH=Path(args.cpp_executable),
+        CPP_VALIDATOR_LIBRARY_PATH=Path(args.cpp_library),
+    )
+    setup_test_environment()
+    overrides.enable()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        started = time.perf_counter()
+        results = run_cases(args, directory)
+        seconds = time.perf_counter() - started
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        overrides.disable()
+        teardown_test_environment()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {'version': RESULT_VERSION, 'meta': metadata(args, seconds), 'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    else:
+        print(text)
+
+
+def metadata(args, seconds):
+    """Where and how the results were measured."""
+    def git(*command):
+        try:
+            return subprocess.run(['git', *command], cwd=ROOT, capture_output=True,
+                                  text=True, timeout=30).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seconds': seconds,
+        'git_commit': git('rev-parse', 'HEAD'),
+        'git_dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'settings': {
+            'GEOMETRY_ENGINE': settings.GEOMETRY_ENGINE,
+            'GEOMETRY_WORKERS': settings.GEOMETRY_WORKERS,
+            'PARALLEL_MIN_POINTS': settings.PARALLEL_MIN_POINTS,
+            'CPP_VALIDATOR_BATCH_SIZE': settings.CPP_VALIDATOR_BATCH_SIZE,
+            'DATABASE': connection.vendor,
+        },
+        'args': {key: value for key, value in vars(args).items() if key != 'func'},
+    }
+
+
+def compare(args):
+    """
+    Ratios (new / base) of the chosen statistic for the results both runs have.
+
+    Changes smaller than --min-seconds are reported as unchanged whatever
+    the ratio, so that sub-millisecond cases do not flap.
+    """
+    base, new = (json.loads(Path(path).read_text()) for path in (args.base, args.new))
+
+    def key(result):
+        return result['name'], json.dumps(result['params'], sort_keys=True)
+
+    statistic = args.statistic
+    base_results = {key(r): r for r in base['results'] if statistic in r}
+    rows = []
+    for result in new['results']:
+        old = base_results.get(key(result))
+        if old is None or statistic not in result:
+            continue
+        ratio = result[statistic] / old[statistic] if old[statistic] > 0 else float('inf')
+        if abs(result[statistic] - old[statistic]) < args.min_seconds:
+            verdict = 'unchanged'
+        elif ratio > 1 + args.threshold:
+            verdict = 'regression'
+        elif ratio < 1 / (1 + args.threshold):
+            verdict = 'improvement'
+        else:
+            verdict = 'unchanged'
+        rows.append({
+            'name': result['name'],
+            'params': result['params'],
+            'base': old[statistic],
+            'new': result[statistic],
+            'ratio': ratio,
+            'verdict': verdict,
+        })
+
+    regressions = sum(row['verdict'] == 'regression' for row in rows)
+    if args.json:
+        print(json.dumps({
+            'base': base['meta'].get('git_commit'),
+            'new': new['meta'].get('git_commit'),
+            'statistic': statistic,
+            'threshold': args.threshold,
+            'regressions': regressions,
+            'results': rows,
+        }, indent=2))
+    else:
+        print(f"{'case':40s} {'corridor':>8s} {'points':>8s} {'base':>10s} {'new':>10s} {'ratio':>7s}")
+        for row in rows:
+            params = row['params']
+            print(f"{row['name']:40s} {params['corridor_points']:>8d} {params['points']:>8d} "
+                  f"{row['base']:9.4f}s {row['new']:9.4f}s {row['ratio']:6.2f}x  {row['verdict']}")
+        print(f"{len(rows)} compared, {regressions} regressions (threshold {args.threshold:.0%})")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+def _rate(value: str) -> float:
+    rate = float(value)
+    if not 0.0 <= rate <= 1.0:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1, got {value}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='trajectory points')
+    run_parser.add_argument('--corridor-sizes', type=int, nargs='+', default=[500],
+                            help='corridor points')
+    run_parser.add_argument('--noise', type=float, default=50.0,
+                            help='lateral noise of the trajectory in meters')
+    run_parser.add_argument('--violation-rate', type=_rate, default=0.05,
+                            help='fraction of trajectory points in violating runs')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--warmup', type=int, default=1, help='untimed calls per case')
+    run_parser.add_argument('--only', nargs='+', metavar='PATTERN',
+                            help="case name patterns, e.g. 'api.*'")
+    run_parser.add_argument('--max-python-pairs', type=int, default=5_000_000,
+                            help='largest point x segment count for geometry.compute_deviations')
+    run_parser.add_argument('--cpp-executable', default=str(settings.CPP_VALIDATOR_PATH))
+    run_parser.add_argument('--cpp-library', default=str(settings.CPP_VALIDATOR_LIBRARY_PATH))
+    run_parser.add_argument('--output', help='JSON file (default: stdout)')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative change reported as a regression')
+    compare_parser.add_argument('--statistic', choices=['min', 'median', 'mean'], default='min')
+    compare_parser.add_argument('--min-seconds', type=float, default=0.001,
+                                help='smaller absolute changes are ignored')
+    compare_parser.add_argument('--json', action='store_true')
+    compare_parser.add_argument('--fail-on-regression', action='store_true')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+Benchmark trajectory payloads: JSON point dicts vs. the compact renderers.
+
+The sample trajectory (sample_data/trajectory.txt) is resampled to the
+requested number of points along its own path, evaluated against the
+sample corridor, and rendered as the trajectory_data response in each
+format. Reports body size (raw and gzip), server render time, and parse
+time. When node is installed, parse time is also measured in JavaScript
+with the decoders from templates/index.html.
+
+Usage:
+    python -m benchmarks.wire_format [--sizes 10000 100000]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import django
+import numpy as np
+
+# DRF renderers read the project settings when imported
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fofis_project.settings')
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from monitoring import vectorized  # noqa: E402
+from monitoring.parsers import (  # noqa: E402
+    format_time_for_display,
+    parse_corridor_columns,
+    parse_trajectory_columns,
+)
+from monitoring.renderers import (  # noqa: E402
+    ColumnarJSONRenderer,
+    TypedArrayRenderer,
+    _as_table,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_DATA = ROOT / 'sample_data'
+
+NODE_SCRIPT = '''
+const fs = require('fs');
+%(decoders)s
+function best(func) {
+    let min = Infinity;
+    for (let i = 0; i < 5; i++) {
+        const start = process.hrtime.bigint();
+        func();
+        min = Math.min(min, Number(process.hrtime.bigint() - start) / 1e9);
+    }
+    return min;
+}
+const dir = process.argv[2];
+const text = fs.readFileSync(dir + '/dicts.json', 'utf8');
+const columnar = fs.readFileSync(dir + '/columnar.json', 'utf8');
+const file = fs.readFileSync(dir + '/typed.bin');
+const binary = file.buffer.slice(file.byteOffset, file.byteOffset + file.length);
+console.log(JSON.stringify({
+    json: best(() => JSON.parse(text)),
+    columnar: best(() => decodeColumnarJSON(JSON.parse(columnar))),
+    binary: best(() => decodeTypedArrays(binary)),
+}));
+'''
+
+
+def make_points(size, rng):
+    """Sample trajectory resampled to size points, processed like process_flight_case."""
+    corridor = parse_corridor_columns(str(SAMPLE_DATA / 'corridor.txt'))
+    sample = parse_trajectory_columns(str(SAMPLE_DATA / 'trajectory.txt'))
+
+    # One point every ~0.5 s along the sample path, with a little noise
+    time_seconds = np.linspace(sample['time_seconds'][0], sample['time_seconds'][-1], size)
+    columns = {
+        'time_seconds': time_seconds,
+        'latitude': np.interp(time_seconds, sample['time_seconds'], sample['latitude'])
+        + rng.normal(0, 2e-4, size),
+        'longitude': np.interp(time_seconds, sample['time_seconds'], sample['longitude'])
+        + rng.normal(0, 3e-4, size),
+        'altitude': np.interp(time_seconds, sample['time_seconds'], sample['altitude'])
+        + rng.normal(0, 10, size),
+    }
+    geometry = vectorized.CorridorGeometry(
+        corridor['latitude'], corridor['longitude'], corridor['altitude'],
+        corridor['allowed_deviation'], corridor['allowed_speed'],
+    )
+    results = vectorized.evaluate_trajectory(columns, geometry)
+
+    points = [
+        {
+            'latitude': la, 'longitude': lo, 'altitude': al,
+            'time': format_time_for_display(t), 'time_seconds': t, 'index': i,
+        }
+        for i, (la, lo, al, t) in enumerate(zip(
+            columns['latitude'].tolist(), columns['longitude'].tolist(),
+            columns['altitude'].tolist(), time_seconds.tolist()
+        ))
+    ]
+    vectorized.apply_results(points, results)
+    return points
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def node_parse_times(bodies):
+    """Parse times in node, or None if node is not installed."""
+    node = shutil.which('node')
+    if node is None:
+        return None
+    html = (ROOT / 'templates' / 'index.html').read_text(encoding='utf-8')
+    section = re.search(r'// Wire Format\s*\n\s*// =+\n(.*?)// =+\n', html, re.S)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, body in zip(('dicts.json', 'columnar.json', 'typed.bin'), bodies):
+            Path(directory, name).write_bytes(body)
+        script = Path(directory, 'parse.js')
+        script.write_text(NODE_SCRIPT % {'decoders': section.group(1)})
+        output = subprocess.run([node, str(script), directory],
+                                capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def _seconds(value):
+    return f"{value:>10.4f}" if value is not None else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    renderers = [
+        ('json', JSONRenderer(), json.loads),
+        ('columnar', ColumnarJSONRenderer(), json.loads),
+        ('binary', TypedArrayRenderer(), None),
+    ]
+
+    print(f"{'points':>8} {'format':>9} {'MB':>7} {'gzip MB':>8} "
+          f"{'render s':>9} {'py parse s':>10} {'js parse s':>10}")
+    for size in args.sizes:
+        rng = np.random.default_rng(args.seed)
+        points = make_points(size, rng)
+        # Views hand the compact renderers blob columns, not dicts
+        table = _as_table(points)
+
+        bodies, rows = [], []
+        for name, renderer, parse in renderers:
+            data = {'trajectory': points if name == 'json' else table}
+            render_time, body = timed(renderer.render, data)
+            parse_time = timed(parse, body)[0] if parse else None
+            bodies.append(body)
+            rows.append((name, len(body) / 1e6, len(gzip.compress(body, 6)) / 1e6,
+                         render_time, parse_time))
+
+        js_times = node_parse_times(bodies) or {}
+        for name, megabytes, gzip_megabytes, render_time, parse_time in rows:
+            print(f"{size:>8} {name:>9} {megabytes:>7.2f} {gzip_megabytes:>8.2f} "
+                  f"{render_time:>9.3f} {_seconds(parse_time)} {_seconds(js_times.get(name))}")
+
+
+if __name__ == '__main__':
+    main()
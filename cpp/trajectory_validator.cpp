@@ -25,12 +25,32 @@
  * 
  * Example usage:
  *   ./trajectory_validator 50.0 10.0 1000.0 250.0 50.1 10.1 1000.0 50.2 10.2 1000.0 500.0 300.0
+ *
+ * Streaming mode (./trajectory_validator --stream):
+ *   Validates many points with one process. Line records on stdin:
+ *     CORRIDOR <n>                                 followed by n lines:
+ *     lat lon alt allowed_deviation allowed_speed
+ *   The program answers "READY <segments>". Then, any number of times:
+ *     BATCH <k>                                    followed by k lines:
+ *     traj_lat traj_lon traj_alt traj_speed segment_index
+ *   For each record one line is written, in order:
+ *     deviation speed_violation is_compliant       (same as above), or
+ *     ERR <message>                                for a bad record
+ *   and stdout is flushed at the end of every batch. Segment i joins
+ *   corridor points i and i + 1; its limits are the endpoint averages.
+ *
+ * Shared library (make libtrajectory_validator.so):
+ *   Built from this file with -DTRAJECTORY_VALIDATOR_LIBRARY (no main).
+ *   Exposes tv_validate_points(), which validates whole arrays of points
+ *   in-process; see its comment below.
  */
 
 #include <iostream>
 #include <cmath>
 #include <iomanip>
 #include <string>
+#include <sstream>
+#include <vector>
 #include <stdexcept>
 
 using namespace std;
@@ -125,7 +145,179 @@ double pointToSegmentDistance3D(
     return distance3D(lat_p, lon_p, alt_p, closest_lat, closest_lon, closest_alt);
 }
 
+/*
+ * Validate n trajectory points against their corridor segments in-process.
+ *
+ *   trajectory: n x 4 row-major doubles (lat, lon, alt, speed)
+ *   segments:   n segment indices (segment i joins corridor points i, i + 1)
+ *   corridor:   m x 5 row-major doubles (lat, lon, alt, allowed_deviation, allowed_speed)
+ *   deviation, speed_violation, compliant: n-element output arrays
+ *
+ * compliant is 1/0, or -1 for points whose segment index is out of range
+ * (their deviation and speed_violation are left untouched).
+ * Returns the number of such invalid points.
+ */
+extern "C" long tv_validate_points(
+    const double* trajectory, long n,
+    const long long* segments,
+    const double* corridor, long m,
+    double* deviation, double* speed_violation, signed char* compliant) {
+    
+    long invalid = 0;
+    
+    for (long i = 0; i < n; i++) {
+        const double* p = trajectory + 4 * i;
+        long long segment = segments[i];
+        
+        if (segment < 0 || segment >= m - 1) {
+            compliant[i] = -1;
+            invalid++;
+            continue;
+        }
+        
+        const double* a = corridor + 5 * segment;
+        const double* b = a + 5;
+        double allowed_deviation = (a[3] + b[3]) / 2;
+        double allowed_speed = (a[4] + b[4]) / 2;
+        
+        deviation[i] = pointToSegmentDistance3D(
+            p[0], p[1], p[2],
+            a[0], a[1], a[2],
+            b[0], b[1], b[2]
+        );
+        speed_violation[i] = p[3] > allowed_speed ? p[3] - allowed_speed : 0.0;
+        compliant[i] = (deviation[i] <= allowed_deviation && p[3] <= allowed_speed) ? 1 : 0;
+    }
+    
+    return invalid;
+}
+
+#ifndef TRAJECTORY_VALIDATOR_LIBRARY
+
+struct CorridorPoint {
+    double lat;
+    double lon;
+    double alt;
+    double allowed_deviation;
+    double allowed_speed;
+};
+
+// Validate one point against corridor segment [i, i + 1] and print the result line
+void validateAgainstSegment(const vector<CorridorPoint>& corridor, size_t segment,
+                            double traj_lat, double traj_lon, double traj_alt,
+                            double traj_speed) {
+    const CorridorPoint& a = corridor[segment];
+    const CorridorPoint& b = corridor[segment + 1];
+    
+    double allowed_deviation = (a.allowed_deviation + b.allowed_deviation) / 2;
+    double allowed_speed = (a.allowed_speed + b.allowed_speed) / 2;
+    
+    double deviation = pointToSegmentDistance3D(
+        traj_lat, traj_lon, traj_alt,
+        a.lat, a.lon, a.alt,
+        b.lat, b.lon, b.alt
+    );
+    
+    double speed_violation = 0.0;
+    if (traj_speed > allowed_speed) {
+        speed_violation = traj_speed - allowed_speed;
+    }
+    
+    int is_compliant = 0;
+    if (deviation <= allowed_deviation && traj_speed <= allowed_speed) {
+        is_compliant = 1;
+    }
+    
+    cout << deviation << " " << speed_violation << " " << is_compliant << "\n";
+}
+
+// Read "<keyword> <count>" header line; returns false on EOF
+bool readHeader(const string& keyword, long& count) {
+    string line;
+    while (getline(cin, line)) {
+        if (line.empty()) {
+            continue;
+        }
+        istringstream in(line);
+        string word;
+        if (!(in >> word >> count) || word != keyword || count < 0) {
+            throw runtime_error("Expected '" + keyword + " <count>', got '" + line + "'");
+        }
+        return true;
+    }
+    return false;
+}
+
+int runStream() {
+    ios::sync_with_stdio(false);
+    cout << fixed << setprecision(2);
+    
+    long corridor_size = 0;
+    vector<CorridorPoint> corridor;
+    
+    try {
+        if (!readHeader("CORRIDOR", corridor_size)) {
+            throw runtime_error("Missing CORRIDOR header");
+        }
+        
+        string line;
+        for (long i = 0; i < corridor_size; i++) {
+            if (!getline(cin, line)) {
+                throw runtime_error("Unexpected end of corridor data");
+            }
+            istringstream in(line);
+            CorridorPoint p;
+            if (!(in >> p.lat >> p.lon >> p.alt >> p.allowed_deviation >> p.allowed_speed)) {
+                throw runtime_error("Invalid corridor line " + to_string(i + 1) + ": '" + line + "'");
+            }
+            corridor.push_back(p);
+        }
+    } catch (const exception& e) {
+        cerr << "Error: " << e.what() << endl;
+        return 1;
+    }
+    
+    size_t segments = corridor.size() > 1 ? corridor.size() - 1 : 0;
+    cout << "READY " << segments << endl;
+    
+    try {
+        long batch_size = 0;
+        string line;
+        
+        while (readHeader("BATCH", batch_size)) {
+            for (long i = 0; i < batch_size; i++) {
+                if (!getline(cin, line)) {
+                    throw runtime_error("Unexpected end of batch");
+                }
+                istringstream in(line);
+                double lat, lon, alt, speed;
+                long segment;
+                
+                if (!(in >> lat >> lon >> alt >> speed >> segment)) {
+                    cout << "ERR invalid record '" << line << "'\n";
+                } else if (segment < 0 || static_cast<size_t>(segment) >= segments) {
+                    cout << "ERR segment index " << segment << " out of range\n";
+                } else {
+                    validateAgainstSegment(corridor, static_cast<size_t>(segment),
+                                           lat, lon, alt, speed);
+                }
+            }
+            cout.flush();
+        }
+    } catch (const exception& e) {
+        cout.flush();
+        cerr << "Error: " << e.what() << endl;
+        return 1;
+    }
+    
+    return 0;
+}
+
 int main(int argc, char* argv[]) {
+    if (argc == 2 && string(argv[1]) == "--stream") {
+        return runStream();
+    }
+    
     // Check number of arguments
     if (argc != 13) {
         cerr << "Error: Expected 12 arguments, got " << (argc - 1) << endl;
@@ -133,6 +325,7 @@ int main(int argc, char* argv[]) {
              << "seg_start_lat seg_start_lon seg_start_alt "
              << "seg_end_lat seg_end_lon seg_end_alt "
              << "allowed_deviation allowed_speed" << endl;
+        cerr << "       " << argv[0] << " --stream" << endl;
         return 1;
     }
     
@@ -185,3 +378,4 @@ int main(int argc, char* argv[]) {
     }
 }
 
+#endif  // TRAJECTORY_VALIDATOR_LIBRARY
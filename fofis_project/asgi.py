@@ -1,5 +1,8 @@
 """
 ASGI config for fofis_project project.
+
+Serves the live telemetry streams (/api/flight-cases/{id}/stream/) in
+addition to everything the WSGI application serves.
 """
 
 import os
@@ -8,5 +11,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fofis_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from monitoring.telemetry import watch_disconnect  # noqa: E402
 
+application = watch_disconnect(django_application)
@@ -3,6 +3,7 @@ Django settings for FOFIS project.
 """
 
 import os
+import tempfile
 from pathlib import Path
 import dj_database_url
 
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.timing.server_timing_middleware',
 ]
 
 ROOT_URLCONF = 'fofis_project.urls'
@@ -165,6 +167,88 @@ REST_FRAMEWORK = {
 # C++ executable path
 CPP_VALIDATOR_PATH = BASE_DIR / 'cpp' / 'trajectory_validator'
 
+# In-process C++ validator (preferred over the executable when built)
+CPP_VALIDATOR_LIBRARY_PATH = BASE_DIR / 'cpp' / 'libtrajectory_validator.so'
+
+# Points sent to the streaming C++ validator per batch, and seconds allowed per batch
+CPP_VALIDATOR_BATCH_SIZE = int(os.environ.get('CPP_VALIDATOR_BATCH_SIZE', '5000'))
+CPP_VALIDATOR_TIMEOUT = float(os.environ.get('CPP_VALIDATOR_TIMEOUT', '10.0'))
+
+# Geometry engine used by process_flight_case: 'numpy' (vectorized) or 'python'
+GEOMETRY_ENGINE = os.environ.get('GEOMETRY_ENGINE', 'numpy')
+
+# Worker processes for the numpy engine; trajectories shorter than
+# PARALLEL_MIN_POINTS are always evaluated in-process
+GEOMETRY_WORKERS = int(os.environ.get('GEOMETRY_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_MIN_POINTS = int(os.environ.get('PARALLEL_MIN_POINTS', '100000'))
+
+# Processing runs taking at least this many seconds are logged as warnings
+# with their per-stage timings (shorter ones at INFO)
+PROCESSING_SLOW_SECONDS = float(os.environ.get('PROCESSING_SLOW_SECONDS', '10'))
+
+# Send Server-Timing headers (request total, SQL time, and the stored
+# processing stages on flight case responses). They tell every client how
+# long queries take, so they are off by default outside DEBUG.
+SERVER_TIMING = os.environ.get('SERVER_TIMING', str(DEBUG)) == 'True'
+
+# Prometheus metrics at /metrics. Each process (web workers, job workers)
+# writes its samples to its own file in METRICS_DIR, which all processes of
+# a deployment must share; /metrics adds them up. METRICS_TOKEN, if set, is
+# required as "Authorization: Bearer <token>" to read them. They reveal upload
+# sizes, latencies and worker names, so they are off by default outside DEBUG.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', str(DEBUG)) == 'True'
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'fofis-metrics'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Processing job queue: uploads return 202 and the job runs inside the request.
+# Set PROCESSING_ASYNC=True where `manage.py process_jobs` runs (Procfile,
+# render.yaml) to leave the work to it; without a worker, jobs stay queued.
+PROCESSING_ASYNC = os.environ.get('PROCESSING_ASYNC', 'False') == 'True'
+PROCESSING_WORKERS = int(os.environ.get('PROCESSING_WORKERS', '2'))
+PROCESSING_JOB_STALE_SECONDS = float(os.environ.get('PROCESSING_JOB_STALE_SECONDS', '600'))
+
+# Shared corridors with parsed geometry kept in memory per process (monitoring/corridors.py)
+CORRIDOR_CACHE_SIZE = int(os.environ.get('CORRIDOR_CACHE_SIZE', '32'))
+
+# Bulk upload (monitoring/bulk.py): worker processes, trajectories per worker needed
+# before a pool is spawned, most trajectories per upload, and most bytes an archive
+# may extract to. A multipart list of trajectories counts against Django's
+# DATA_UPLOAD_MAX_NUMBER_FILES; larger batches should come as an archive.
+BULK_UPLOAD_WORKERS = int(os.environ.get('BULK_UPLOAD_WORKERS', str(os.cpu_count() or 1)))
+BULK_UPLOAD_FILES_PER_WORKER = int(os.environ.get('BULK_UPLOAD_FILES_PER_WORKER', '8'))
+BULK_UPLOAD_MAX_FILES = int(os.environ.get('BULK_UPLOAD_MAX_FILES', '10000'))
+BULK_UPLOAD_MAX_BYTES = int(os.environ.get('BULK_UPLOAD_MAX_BYTES', str(2 * 1024 ** 3)))
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.environ.get('DATA_UPLOAD_MAX_NUMBER_FILES', '1001'))
+
+# Live telemetry streams (monitoring/telemetry.py): events queued per client before
+# the oldest are dropped, streams per process, idle heartbeat interval, stream
+# lifetime before the client reconnects, and the reconnect delay sent to clients
+TELEMETRY_QUEUE_SIZE = int(os.environ.get('TELEMETRY_QUEUE_SIZE', '256'))
+TELEMETRY_MAX_SUBSCRIBERS = int(os.environ.get('TELEMETRY_MAX_SUBSCRIBERS', '1000'))
+TELEMETRY_HEARTBEAT_SECONDS = float(os.environ.get('TELEMETRY_HEARTBEAT_SECONDS', '15'))
+TELEMETRY_STREAM_SECONDS = float(os.environ.get('TELEMETRY_STREAM_SECONDS', '3600'))
+TELEMETRY_RETRY_MS = int(os.environ.get('TELEMETRY_RETRY_MS', '3000'))
+
+# Cache backend; the response cache below stores serialized flight case bodies in it
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'fofis'),
+    }
+}
+
+# Serialized detail/trajectory_data bodies: cache alias, total size bound (LRU),
+# and seconds an entry may live
+RESPONSE_CACHE_ALIAS = os.environ.get('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '86400'))
+
+# Map tiles (monitoring/tiles.py): directory of the per flight case tile cache
+# (shared by the web processes; removed per case when it changes), and the most
+# flight cases drawn in one tile, newest first
+TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'fofis-tiles'))
+TILE_MAX_CASES = int(os.environ.get('TILE_MAX_CASES', '500'))
+
 # Security settings for production
 if not DEBUG:
     SECURE_SSL_REDIRECT = True
@@ -5,10 +5,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from monitoring.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('monitoring.urls')),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape target
     path('', include('monitoring.urls_views')),
 ]
 
@@ -2,7 +2,35 @@
 Admin interface for monitoring app.
 """
 from django.contrib import admin
-from .models import FlightCase
+from django.db.models import FloatField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from .models import Corridor, FlightCase, ProcessingJob, SlowFlightCase, ViolationInterval
+
+# Stages shown as columns of the slowest cases view (wall seconds)
+TIMING_COLUMNS = (
+    'parse_trajectory', 'geometry', 'speeds', 'deviations', 'cpp_validation',
+    'simplify', 'encode', 'save',
+)
+
+
+@admin.register(Corridor)
+class CorridorAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'content_hash',
+        'point_count',
+        'geometry_version',
+        'created_at',
+    ]
+    readonly_fields = [
+        'content_hash',
+        'file',
+        'point_count',
+        'geometry_version',
+        'created_at',
+    ]
+    exclude = ['points_blob', 'geometry_blob']
 
 
 @admin.register(FlightCase)
@@ -11,12 +39,14 @@ class FlightCaseAdmin(admin.ModelAdmin):
         'id',
         'created_at',
         'is_processed',
+        'processing_state',
         'mean_deviation',
         'mean_speed',
         'compliance_percentage',
     ]
-    list_filter = ['is_processed', 'created_at']
+    list_filter = ['is_processed', 'processing_state', 'created_at']
     readonly_fields = [
+        'corridor',
         'created_at',
         'updated_at',
         'mean_deviation',
@@ -26,17 +56,21 @@ class FlightCaseAdmin(admin.ModelAdmin):
         'trajectory_data',
         'is_processed',
         'processing_error',
+        'processing_state',
+        'processing_seconds',
+        'processing_stats',
     ]
     
     fieldsets = (
         ('Files', {
-            'fields': ('corridor_file', 'trajectory_file')
+            'fields': ('corridor_file', 'trajectory_file', 'corridor')
         }),
         ('Computed Metrics', {
             'fields': ('mean_deviation', 'mean_speed', 'max_speed')
         }),
         ('Processing Status', {
-            'fields': ('is_processed', 'processing_error')
+            'fields': ('is_processed', 'processing_state', 'processing_error',
+                       'processing_seconds', 'processing_stats')
         }),
         ('Parsed Data', {
             'fields': ('corridor_data', 'trajectory_data'),
@@ -47,3 +81,103 @@ class FlightCaseAdmin(admin.ModelAdmin):
         }),
     )
 
+
+def _stage_column(stage):
+    """Changelist column with the wall seconds of one stage, sortable."""
+    def column(obj):
+        value = getattr(obj, f'{stage}_seconds', None)
+        return None if value is None else round(value, 3)
+    column.__name__ = f'{stage}_seconds'
+    return admin.display(description=stage.replace('_', ' '), ordering=f'{stage}_seconds')(column)
+
+
+@admin.register(SlowFlightCase)
+class SlowFlightCaseAdmin(admin.ModelAdmin):
+    """
+    Flight cases with timings, slowest first. Every column sorts; stage
+    columns are read from processing_stats in the database.
+    """
+    list_display = [
+        'id',
+        'processing_seconds',
+        'point_count',
+        'segment_count',
+        *(_stage_column(stage) for stage in TIMING_COLUMNS),
+        'processing_state',
+        'created_at',
+    ]
+    list_display_links = ['id']
+    list_filter = ['processing_state', 'created_at']
+    ordering = ['-processing_seconds']
+    readonly_fields = ['processing_seconds', 'processing_stats', 'point_count']
+    fields = readonly_fields
+    
+    def get_queryset(self, request):
+        annotations = {
+            f'{stage}_seconds': Cast(KT(f'processing_stats__stages__{stage}__wall'), FloatField())
+            for stage in TIMING_COLUMNS
+        }
+        annotations['segments'] = Cast(KT('processing_stats__segments'), FloatField())
+        return (
+            super().get_queryset(request)
+            .filter(processing_seconds__isnull=False)
+            .defer('corridor_blob', 'trajectory_blob')
+            .annotate(**annotations)
+        )
+    
+    @admin.display(ordering='segments', description='segments')
+    def segment_count(self, obj):
+        return None if obj.segments is None else int(obj.segments)
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'flight_case',
+        'status',
+        'progress',
+        'stage',
+        'worker',
+        'created_at',
+        'finished_at',
+    ]
+    list_filter = ['status', 'created_at']
+    readonly_fields = [
+        'flight_case',
+        'progress',
+        'stage',
+        'error',
+        'worker',
+        'created_at',
+        'updated_at',
+        'started_at',
+        'finished_at',
+    ]
+
+
+@admin.register(ViolationInterval)
+class ViolationIntervalAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'flight_case',
+        'kind',
+        'start_time_seconds',
+        'duration_seconds',
+        'point_count',
+        'deviation_excess',
+        'speed_excess',
+        'severity',
+    ]
+    list_filter = ['kind']
+    list_select_related = ['flight_case']
+    ordering = ['-severity']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
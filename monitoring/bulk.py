@@ -0,0 +1,251 @@
+"""
+Bulk upload: many trajectories flown in one corridor.
+
+One request carries a corridor file and the trajectories, either as a
+list of files or as one zip/tar archive. Instead of one upload, one job and
+one corridor parse per trajectory:
+
+- the corridor is ingested once (corridors.ingest_file) and loaded once
+  per process, with its geometry and grid index;
+- trajectories are stored and evaluated in chunks. With more than one
+  worker the chunks go to a process pool (spawned once per request). Each
+  worker loads the corridor in its initializer, so tasks carry only a file
+  path;
+- the flight cases of a chunk are written with one bulk_create, results
+  included. No processing jobs are queued.
+
+bulk_upload returns a manifest with the outcome for every file.
+"""
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+# Project modules are imported where used: spawned workers import this
+# module (for _init_worker) before Django is set up
+
+logger = logging.getLogger(__name__)
+
+# Trajectory files stored and evaluated per batch
+CHUNK_SIZE = 200
+
+# Summary fields of the flight case reported per file
+MANIFEST_FIELDS = (
+    'point_count', 'mean_deviation', 'mean_speed', 'max_speed', 'compliance_percentage',
+)
+
+# Loaded corridor of a pool worker (set by _init_worker)
+_worker_corridor = None
+
+
+class BulkUploadError(ValueError):
+    """The upload cannot be processed (bad corridor, archive or file list)."""
+
+
+def bulk_upload(corridor_upload, trajectories: List[Tuple[str, object]],
+                workers: Optional[int] = None) -> Dict:
+    """
+    Create and process one flight case per trajectory file, all in one corridor.
+
+    Args:
+        corridor_upload: Uploaded corridor file
+        trajectories: (name, file object) pairs, e.g. from trajectory_files
+        workers: Worker processes (default settings.BULK_UPLOAD_WORKERS);
+            small uploads are evaluated in-process
+
+    Returns:
+        Manifest dict: 'corridor' id, counts of 'files', 'processed' and
+        'failed', 'seconds', and 'results' with one entry per file
+
+    Raises:
+        BulkUploadError: If there are no trajectories or the corridor is invalid
+    """
+    from . import corridors
+    from .models import Corridor
+
+    if not trajectories:
+        raise BulkUploadError('No trajectory files')
+    if len(trajectories) > settings.BULK_UPLOAD_MAX_FILES:
+        raise BulkUploadError(f'At most {settings.BULK_UPLOAD_MAX_FILES} trajectory files per upload')
+    started = time.perf_counter()
+
+    name = default_storage.save(f'corridors/{_base_name(corridor_upload.name)}', corridor_upload)
+    try:
+        corridor = corridors.ingest_file(default_storage, name)
+    except (OSError, ValueError) as e:
+        default_storage.delete(name)
+        raise BulkUploadError(f'Invalid corridor file: {e}')
+    blobs = Corridor.objects.values_list(
+        'content_hash', 'points_blob', 'geometry_blob', 'geometry_version'
+    ).get(pk=corridor.pk)
+
+    if workers is None:
+        workers = settings.BULK_UPLOAD_WORKERS
+    # Spawning a worker costs about a second; only worth it for enough files
+    workers = min(workers, len(trajectories) // settings.BULK_UPLOAD_FILES_PER_WORKER)
+
+    results = []
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers, mp_context=get_context('spawn'),
+                                   initializer=_init_worker, initargs=(blobs,))
+    else:
+        _set_corridor(blobs)
+    try:
+        for start in range(0, len(trajectories), CHUNK_SIZE):
+            chunk = trajectories[start:start + CHUNK_SIZE]
+            stored = [_store(file_name, f) for file_name, f in chunk]
+            paths = [default_storage.path(stored_name) for stored_name in stored]
+            evaluated = pool.map(_evaluate, paths) if pool else map(_evaluate, paths)
+            results += _create(corridor, chunk, stored, evaluated)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    failed = sum(result['status'] == 'failed' for result in results)
+    seconds = time.perf_counter() - started
+    logger.info("Bulk upload: %d trajectories in corridor %s (%d failed) in %.1fs",
+                len(results), corridor.pk, failed, seconds)
+    return {
+        'corridor': corridor.pk,
+        'files': len(results),
+        'processed': len(results) - failed,
+        'failed': failed,
+        'seconds': seconds,
+        'results': results,
+    }
+
+
+def read_archive(upload) -> List[Tuple[str, object]]:
+    """
+    Trajectory files of a zip or tar (optionally compressed) archive.
+
+    Directories, links and hidden files (such as __MACOSX/ entries) are
+    skipped. Members are read lazily from the open archive.
+
+    Raises:
+        BulkUploadError: If the archive is unreadable, has too many files
+            or is too large once extracted
+    """
+    upload.seek(0)
+    if zipfile.is_zipfile(upload):
+        upload.seek(0)
+        archive = zipfile.ZipFile(upload)
+        members = [(info.filename, info.file_size, info) for info in archive.infolist()
+                   if not info.is_dir()]
+        opener = archive.open
+    else:
+        upload.seek(0)
+        try:
+            archive = tarfile.open(fileobj=upload, mode='r:*')
+            members = [(info.name, info.size, info) for info in archive.getmembers()
+                       if info.isfile()]
+        except tarfile.TarError:
+            raise BulkUploadError('Archive must be a zip or tar file')
+        opener = archive.extractfile
+
+    members = [m for m in members if not _hidden(m[0])]
+    if len(members) > settings.BULK_UPLOAD_MAX_FILES:
+        raise BulkUploadError(f'At most {settings.BULK_UPLOAD_MAX_FILES} trajectory files per upload')
+    if sum(size for _, size, _ in members) > settings.BULK_UPLOAD_MAX_BYTES:
+        raise BulkUploadError('Archive is too large once extracted')
+    return [(name, _LazyMember(opener, info)) for name, _, info in members]
+
+
+def _create(corridor, chunk, stored: List[str], evaluated) -> List[Dict]:
+    """bulk_create the flight cases of one chunk; manifest entries."""
+    from . import violations
+    from .models import FlightCase
+
+    evaluated = list(evaluated)
+    cases = []
+    for stored_name, values in zip(stored, evaluated):
+        case = FlightCase(corridor=corridor, corridor_file=corridor.file.name,
+                          trajectory_file=stored_name)
+        for field, value in values.items():
+            if field != violations.RESULTS_KEY:
+                setattr(case, field, value)
+        cases.append(case)
+    FlightCase.objects.bulk_create(cases)
+    violations.store(
+        (case.pk, values.get(violations.RESULTS_KEY)) for case, values in zip(cases, evaluated)
+    )
+
+    results = []
+    for (file_name, _), case in zip(chunk, cases):
+        result = {
+            'file': file_name,
+            'id': case.pk,
+            'status': case.processing_state,
+            'error': case.processing_error,
+        }
+        result.update({field: getattr(case, field) for field in MANIFEST_FIELDS})
+        results.append(result)
+    return results
+
+
+def _store(file_name: str, f) -> str:
+    """Save a trajectory file to storage; returns its stored name."""
+    content = File(f)
+    try:
+        return default_storage.save(f'trajectories/{_base_name(file_name)}', content)
+    finally:
+        content.close()
+
+
+def _init_worker(corridor_blobs):
+    """Set up Django in a spawned worker and load the corridor once."""
+    import django
+    django.setup()
+    settings.GEOMETRY_WORKERS = 1
+    _set_corridor(corridor_blobs)
+
+
+def _set_corridor(corridor_blobs) -> None:
+    global _worker_corridor
+    from . import corridors
+
+    _worker_corridor = corridors.load_blobs(*corridor_blobs)
+
+
+def _evaluate(trajectory_path: str) -> Dict:
+    """compute_flight_case against the loaded corridor, or failure_results."""
+    from .processing import compute_flight_case, failure_results
+
+    try:
+        return compute_flight_case(None, trajectory_path, corridor=_worker_corridor)
+    except Exception as e:
+        return failure_results(e)
+
+
+class _LazyMember:
+    """Archive member opened when storage first reads it."""
+
+    def __init__(self, opener, info):
+        self._opener = opener
+        self._info = info
+        self._file = None
+
+    def __getattr__(self, name):
+        if self._file is None:
+            self._file = self._opener(self._info)
+        return getattr(self._file, name)
+
+
+def _base_name(name: str) -> str:
+    return os.path.basename(name.replace('\\', '/')) or 'trajectory.txt'
+
+
+def _hidden(name: str) -> bool:
+    return any(
+        (part.startswith('.') and part not in ('.', '..')) or part == '__MACOSX'
+        for part in name.split('/')
+    )
@@ -0,0 +1,374 @@
+"""
+Compact binary columnar storage for parsed corridor and trajectory points.
+
+A blob holds one typed array per column, each compressed separately, so a
+reader can decode only the columns it needs:
+
+    header   magic b'FCOL', schema version (uint16), rows (uint32),
+             column count (uint16)
+    entries  per column: name, dtype code, payload offset and length
+    payloads zlib-compressed column data
+
+Numeric payloads are byte-shuffled before compression (all first bytes,
+then all second bytes, ...), which groups the slowly varying high bytes of
+floats and roughly halves the compressed size. String columns store uint32
+byte lengths followed by the UTF-8 data.
+
+Points are dicts whose keys are not all present on every point (e.g. the
+cpp_* keys) and may be None. A column whose values are not all present
+gets a companion '<name>#state' int8 column (0 = value, 1 = None,
+2 = key absent), so columns_to_points reproduces the original dicts
+exactly. Keys outside the schema are kept per point in an '_extra' JSON
+string column.
+"""
+import json
+import struct
+import zlib
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+MAGIC = b'FCOL'
+SCHEMA_VERSION = 1
+
+_HEADER = struct.Struct('<4sHIH')
+_ENTRY = struct.Struct('<QQ')
+
+# Column state codes
+VALUE, NULL, ABSENT = 0, 1, 2
+
+STATE_SUFFIX = '#state'
+EXTRA_COLUMN = '_extra'
+STRING = 'str'
+
+Column = namedtuple('Column', 'name dtype')
+
+TRAJECTORY_SCHEMA = (
+    Column('latitude', '<f8'),
+    Column('longitude', '<f8'),
+    Column('altitude', '<f8'),
+    Column('time', STRING),
+    Column('time_seconds', '<f8'),
+    Column('speed', '<f8'),
+    Column('deviation', '<f8'),
+    Column('nearest_segment', '<i4'),
+    Column('allowed_deviation', '<f8'),
+    Column('allowed_speed', '<f8'),
+    Column('compliant', '|b1'),
+    Column('cpp_deviation', '<f8'),
+    Column('cpp_speed_violation', '<f8'),
+    Column('cpp_compliant', '|b1'),
+    Column('cpp_error', STRING),
+)
+
+CORRIDOR_SCHEMA = (
+    Column('longitude', '<f8'),
+    Column('latitude', '<f8'),
+    Column('altitude', '<f8'),
+    Column('allowed_deviation', '<f8'),
+    Column('allowed_speed', '<f8'),
+)
+
+# 'index' is the row number and is not stored
+IMPLICIT_KEYS = ('index',)
+
+
+class ColumnarFormatError(ValueError):
+    """The blob is not in a format this version can read."""
+
+
+def _fill_value(dtype: str):
+    if dtype == STRING:
+        return ''
+    kind = np.dtype(dtype).kind
+    if kind == 'f':
+        return np.nan
+    if kind == 'b':
+        return False
+    return -1
+
+
+def encode_columns(columns: Dict[str, np.ndarray], rows: int) -> bytes:
+    """
+    Pack arrays (or lists of str) into a blob.
+
+    Args:
+        columns: Column name -> array of length rows
+        rows: Number of rows
+
+    Returns:
+        The encoded blob
+    """
+    entries = []
+    payloads = []
+
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype.kind not in 'OUS':
+            array = np.ascontiguousarray(values)
+            dtype = array.dtype.str
+            if len(array) != rows:
+                raise ValueError(f"Column {name} has {len(array)} rows, expected {rows}")
+            raw = array.view(np.uint8).reshape(rows, array.dtype.itemsize).T.tobytes()
+        else:
+            dtype = STRING
+            encoded = [str(v).encode('utf-8') for v in values]
+            if len(encoded) != rows:
+                raise ValueError(f"Column {name} has {len(encoded)} rows, expected {rows}")
+            lengths = np.fromiter(map(len, encoded), dtype='<u4', count=rows)
+            raw = lengths.tobytes() + b''.join(encoded)
+
+        entries.append((name.encode('utf-8'), dtype.encode('ascii')))
+        payloads.append(zlib.compress(raw, 6))
+
+    header = [_HEADER.pack(MAGIC, SCHEMA_VERSION, rows, len(entries))]
+    entry_size = sum(2 + len(name) + len(dtype) + _ENTRY.size for name, dtype in entries)
+    offset = _HEADER.size + entry_size
+
+    for (name, dtype), payload in zip(entries, payloads):
+        header.append(struct.pack('<B', len(name)) + name)
+        header.append(struct.pack('<B', len(dtype)) + dtype)
+        header.append(_ENTRY.pack(offset, len(payload)))
+        offset += len(payload)
+
+    return b''.join(header + payloads)
+
+
+def read_header(blob):
+    """
+    Parse the header of a blob.
+
+    Returns:
+        Tuple (version, rows, {name: (dtype, offset, length)})
+
+    Raises:
+        ColumnarFormatError: If the blob is not a supported columnar blob
+    """
+    blob = memoryview(blob)
+    if len(blob) < _HEADER.size:
+        raise ColumnarFormatError("Blob is too short")
+
+    magic, version, rows, count = _HEADER.unpack_from(blob, 0)
+    if magic != MAGIC:
+        raise ColumnarFormatError("Not a columnar blob")
+    if version > SCHEMA_VERSION:
+        raise ColumnarFormatError(f"Unsupported schema version {version}")
+
+    position = _HEADER.size
+    entries = {}
+    for _ in range(count):
+        size = blob[position]
+        name = bytes(blob[position + 1:position + 1 + size]).decode('utf-8')
+        position += 1 + size
+        size = blob[position]
+        dtype = bytes(blob[position + 1:position + 1 + size]).decode('ascii')
+        position += 1 + size
+        offset, length = _ENTRY.unpack_from(blob, position)
+        position += _ENTRY.size
+        entries[name] = (dtype, offset, length)
+
+    return version, rows, entries
+
+
+def decode_columns(blob, names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Decode some or all columns of a blob.
+
+    Args:
+        blob: Encoded blob (bytes or memoryview)
+        names: Columns to decode (all stored columns if omitted); names that
+            are not stored are skipped
+
+    Returns:
+        Column name -> array (str columns are arrays of Python str)
+    """
+    _, rows, entries = read_header(blob)
+    blob = memoryview(blob)
+    if names is None:
+        names = entries.keys()
+
+    columns = {}
+    for name in names:
+        if name not in entries:
+            continue
+        dtype, offset, length = entries[name]
+        raw = zlib.decompress(blob[offset:offset + length])
+
+        if dtype == STRING:
+            lengths = np.frombuffer(raw, dtype='<u4', count=rows)
+            data = raw[4 * rows:]
+            ends = np.cumsum(lengths).tolist()
+            starts = [0] + ends[:-1]
+            columns[name] = np.array(
+                [data[s:e].decode('utf-8') for s, e in zip(starts, ends)], dtype=object
+            )
+        else:
+            itemsize = np.dtype(dtype).itemsize
+            shuffled = np.frombuffer(raw, dtype=np.uint8).reshape(itemsize, rows)
+            columns[name] = shuffled.T.copy().view(dtype).reshape(rows)
+
+    return columns
+
+
+def row_count(blob) -> int:
+    """Number of rows stored in a blob (header only)."""
+    return read_header(blob)[1]
+
+
+def points_to_columns(points: List[Dict], schema) -> Dict[str, np.ndarray]:
+    """
+    Convert point dicts to columns (plus state and extra columns as needed).
+
+    Schema columns missing from every point are not stored.
+    """
+    rows = len(points)
+    columns = {}
+    known = {column.name for column in schema}
+    known.update(IMPLICIT_KEYS)
+
+    for column in schema:
+        name = column.name
+        fill = _fill_value(column.dtype)
+        state = np.fromiter(
+            (VALUE if p.get(name) is not None else (NULL if name in p else ABSENT)
+             for p in points),
+            dtype=np.int8, count=rows
+        )
+        if rows and (state == ABSENT).all():
+            continue
+
+        values = [p.get(name) for p in points]
+        if state.any():
+            values = [fill if v is None else v for v in values]
+
+        if column.dtype == STRING:
+            columns[name] = values
+        else:
+            columns[name] = np.array(values, dtype=column.dtype).reshape(rows)
+        if state.any():
+            columns[name + STATE_SUFFIX] = state
+
+    extra = [
+        {k: v for k, v in p.items() if k not in known}
+        for p in points
+    ]
+    if any(extra):
+        columns[EXTRA_COLUMN] = [json.dumps(e) if e else '' for e in extra]
+
+    return columns
+
+
+def columns_to_points(columns: Dict[str, np.ndarray], schema, rows: int,
+                      start: int = 0) -> List[Dict]:
+    """
+    Rebuild point dicts (the inverse of points_to_columns).
+
+    Args:
+        columns: Decoded columns, or a slice of them
+        schema: Column schema
+        rows: Number of rows in columns
+        start: Row number of the first row (its 'index')
+    """
+    points = [{} for _ in range(rows)]
+
+    for column in schema:
+        name = column.name
+        if name not in columns:
+            continue
+        values = columns[name]
+        values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+        state = columns.get(name + STATE_SUFFIX)
+
+        if state is None:
+            for point, value in zip(points, values):
+                point[name] = value
+        else:
+            for point, value, code in zip(points, values, state.tolist()):
+                if code == VALUE:
+                    point[name] = value
+                elif code == NULL:
+                    point[name] = None
+
+    for i, point in enumerate(points, start):
+        point['index'] = i
+
+    if EXTRA_COLUMN in columns:
+        for point, extra in zip(points, columns[EXTRA_COLUMN]):
+            if extra:
+                point.update(json.loads(extra))
+
+    return points
+
+
+def concat_columns(parts, schema) -> Dict[str, np.ndarray]:
+    """
+    Concatenate decoded column sets row-wise.
+
+    Schema columns missing from a part are filled and marked ABSENT in
+    their state column, as points_to_columns would; other columns (derived
+    and extra columns) are filled with their fill value.
+
+    Args:
+        parts: Sequence of (columns, rows)
+        schema: Column schema
+
+    Returns:
+        Column name -> concatenated array (str columns as object arrays)
+    """
+    dtypes = {column.name: column.dtype for column in schema}
+    names = []
+    for columns, _ in parts:
+        for name, values in columns.items():
+            if name.endswith(STATE_SUFFIX) or name in dtypes or name in names:
+                continue
+            names.append(name)
+            dtypes[name] = STRING if name == EXTRA_COLUMN else values.dtype.str
+    names = [c.name for c in schema if any(c.name in columns for columns, _ in parts)] + names
+
+    result = {}
+    for name in names:
+        dtype = dtypes[name]
+        pieces, states = [], []
+        for columns, rows in parts:
+            if name in columns:
+                pieces.append(columns[name])
+                state = columns.get(name + STATE_SUFFIX)
+                states.append(np.zeros(rows, dtype=np.int8) if state is None else state)
+            else:
+                fill = _fill_value(dtype)
+                pieces.append(np.full(rows, fill, dtype=object if dtype == STRING else dtype))
+                states.append(np.full(rows, ABSENT, dtype=np.int8))
+
+        if dtype == STRING:
+            result[name] = np.concatenate([np.asarray(p, dtype=object) for p in pieces])
+        else:
+            result[name] = np.concatenate(pieces).astype(dtype, copy=False)
+        state = np.concatenate(states)
+        if name in {c.name for c in schema} and state.any():
+            result[name + STATE_SUFFIX] = state
+
+    return result
+
+
+def encode_points(points: List[Dict], schema,
+                  extra_columns: Optional[Dict[str, np.ndarray]] = None) -> bytes:
+    """
+    Encode point dicts as a blob.
+
+    Args:
+        points: Point dicts
+        schema: Column schema
+        extra_columns: Derived per-point arrays stored alongside the schema
+            columns; decode_columns returns them, columns_to_points ignores them
+    """
+    columns = points_to_columns(points, schema)
+    if extra_columns:
+        columns.update(extra_columns)
+    return encode_columns(columns, len(points))
+
+
+def decode_points(blob, schema) -> List[Dict]:
+    """Decode a whole blob back into point dicts."""
+    _, rows, _ = read_header(blob)
+    return columns_to_points(decode_columns(blob), schema, rows)
@@ -0,0 +1,211 @@
+"""
+Shared, content-addressed corridors.
+
+Many flight cases fly the same few corridors. A corridor file is parsed
+once when it is first uploaded. Its identity is the SHA-256 of the parsed
+columns, so files that differ only in whitespace or number formatting are
+still the same corridor. Ingestion stores two columnar blobs on a Corridor
+row:
+
+    points_blob    the corridor points (CORRIDOR_SCHEMA) plus their
+                   simplify.TOLERANCE_COLUMN, as stored on a FlightCase
+    geometry_blob  one row per segment: CorridorGeometry.DERIVED_COLUMNS
+                   (AB vectors, cos^2(latitude), lengths, limits) and the
+                   padded bounding boxes of spatial_index.BOUNDS_COLUMNS
+
+Later uploads of the same corridor reuse the row and its stored file.
+Processing loads the geometry from the blobs instead of parsing the file
+and deriving it again. Loaded corridors, including their CorridorIndex,
+are also kept in a small per-process LRU keyed by content hash.
+"""
+import hashlib
+import logging
+from collections import OrderedDict, namedtuple
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import simplify
+from .columnar import CORRIDOR_SCHEMA, decode_columns, decode_points, encode_columns, encode_points
+from .parsers import CORRIDOR_COLUMNS, corridor_points_from_columns, parse_corridor_columns
+from .spatial_index import BOUNDS_COLUMNS, CorridorIndex, segment_bounds
+from .vectorized import CorridorGeometry
+
+logger = logging.getLogger(__name__)
+
+# Bump when the persisted geometry columns change; rows written by another
+# version are rebuilt from points_blob when loaded
+GEOMETRY_VERSION = 1
+
+LoadedCorridor = namedtuple('LoadedCorridor', 'content_hash points points_blob geometry index')
+
+_cache: 'OrderedDict[str, LoadedCorridor]' = OrderedDict()
+
+
+def content_hash(columns: Dict[str, np.ndarray]) -> str:
+    """SHA-256 of parsed corridor columns (hex)."""
+    digest = hashlib.sha256()
+    for key in CORRIDOR_COLUMNS:
+        digest.update(np.ascontiguousarray(columns[key], dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def build_blobs(columns: Dict[str, np.ndarray]) -> Tuple[bytes, bytes]:
+    """
+    Precompute the stored form of a corridor.
+
+    Args:
+        columns: parse_corridor_columns output
+
+    Returns:
+        Tuple (points_blob, geometry_blob)
+    """
+    points = corridor_points_from_columns(columns)
+    lod = simplify.corridor_tolerances(
+        columns['latitude'], columns['longitude'],
+        columns['allowed_deviation'], columns['allowed_speed'],
+    )
+    points_blob = encode_points(points, CORRIDOR_SCHEMA, {simplify.TOLERANCE_COLUMN: lod})
+
+    geometry = _geometry(columns)
+    segments = geometry.derived_columns()
+    segments.update(segment_bounds(geometry))
+    return points_blob, encode_columns(segments, geometry.segment_count)
+
+
+def ingest(flight_case):
+    """
+    Link a freshly uploaded flight case to its shared Corridor.
+
+    The uploaded corridor file is parsed and hashed. A known corridor is
+    reused: the case points at its stored file and the duplicate upload is
+    deleted. Otherwise a new Corridor is created around the uploaded file.
+    Files that do not parse are left alone; processing reports the error.
+
+    Args:
+        flight_case: Saved FlightCase with a corridor_file
+
+    Returns:
+        The Corridor, or None if the file could not be parsed
+    """
+    try:
+        corridor = ingest_file(flight_case.corridor_file.storage, flight_case.corridor_file.name)
+    except (OSError, ValueError) as e:
+        logger.info("Corridor of flight case %s not ingested: %s", flight_case.pk, e)
+        return None
+
+    flight_case.corridor_file = corridor.file.name
+    flight_case.corridor = corridor
+    flight_case.save(update_fields=['corridor', 'corridor_file'])
+    return corridor
+
+
+def ingest_file(storage, name: str):
+    """
+    The shared Corridor of a stored corridor file, created if new.
+
+    When the corridor is already known the file is a duplicate and is
+    deleted from storage; use the returned corridor's file instead.
+
+    Args:
+        storage: Storage holding the file
+        name: Name of the file in storage
+
+    Returns:
+        The Corridor
+
+    Raises:
+        OSError, ValueError: If the file cannot be read or parsed
+    """
+    from .models import Corridor
+
+    columns = parse_corridor_columns(storage.path(name))
+    digest = content_hash(columns)
+    corridor = Corridor.objects.filter(content_hash=digest).only('id', 'file').first()
+    if corridor is None:
+        points_blob, geometry_blob = build_blobs(columns)
+        try:
+            with transaction.atomic():
+                corridor = Corridor.objects.create(
+                    content_hash=digest,
+                    file=name,
+                    point_count=len(columns['latitude']),
+                    points_blob=points_blob,
+                    geometry_blob=geometry_blob,
+                    geometry_version=GEOMETRY_VERSION,
+                )
+        except IntegrityError:
+            # Created concurrently by another upload
+            corridor = Corridor.objects.only('id', 'file').get(content_hash=digest)
+
+    if corridor.file.name != name:
+        storage.delete(name)
+    return corridor
+
+
+def load(corridor_id: int) -> LoadedCorridor:
+    """
+    Loaded form of a stored Corridor, from the per-process cache if possible.
+    """
+    from .models import Corridor
+
+    digest = Corridor.objects.values_list('content_hash', flat=True).get(pk=corridor_id)
+    cached = _cached(digest)
+    if cached is not None:
+        return cached
+    row = Corridor.objects.values_list(
+        'points_blob', 'geometry_blob', 'geometry_version'
+    ).get(pk=corridor_id)
+    return load_blobs(digest, *row)
+
+
+def load_blobs(digest: str, points_blob, geometry_blob, geometry_version) -> LoadedCorridor:
+    """
+    Build a LoadedCorridor from stored blobs (no database access, so worker
+    processes can call it with blobs read by their parent).
+    """
+    cached = _cached(digest)
+    if cached is not None:
+        return cached
+
+    points_blob = bytes(points_blob)
+    columns = decode_columns(points_blob, CORRIDOR_COLUMNS)
+
+    segments = None
+    if geometry_blob is not None and geometry_version == GEOMETRY_VERSION:
+        segments = decode_columns(geometry_blob)
+    geometry = _geometry(columns, segments)
+    bounds = None if segments is None else {name: segments[name] for name in BOUNDS_COLUMNS}
+
+    loaded = LoadedCorridor(
+        content_hash=digest,
+        points=decode_points(points_blob, CORRIDOR_SCHEMA),
+        points_blob=points_blob,
+        geometry=geometry,
+        index=CorridorIndex(geometry, bounds=bounds),
+    )
+    _cache[digest] = loaded
+    while len(_cache) > settings.CORRIDOR_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return loaded
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def _cached(digest: str) -> Optional[LoadedCorridor]:
+    loaded = _cache.get(digest)
+    if loaded is not None:
+        _cache.move_to_end(digest)
+    return loaded
+
+
+def _geometry(columns, segments=None) -> CorridorGeometry:
+    return CorridorGeometry(
+        columns['latitude'], columns['longitude'], columns['altitude'],
+        columns['allowed_deviation'], columns['allowed_speed'],
+        derived=segments,
+    )
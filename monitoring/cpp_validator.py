@@ -0,0 +1,291 @@
+"""
+Drivers for the C++ trajectory validator.
+
+CppValidatorLibrary calls libtrajectory_validator.so in-process over
+contiguous NumPy buffers. CppValidatorProcess drives the executable's
+streaming mode: one process per validation job, with the corridor sent once
+and trajectory points validated in batches of line records. The header of
+cpp/trajectory_validator.cpp describes both interfaces.
+"""
+import ctypes
+import functools
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (deviation, speed_violation, is_compliant) or an error message
+ValidationResult = Union[Tuple[float, float, bool], str]
+
+
+class CppValidatorError(Exception):
+    """The validator process failed, timed out or broke the protocol."""
+
+
+class CppValidatorLibrary:
+    """
+    In-process binding to tv_validate_points() in libtrajectory_validator.so.
+
+    Inputs are passed as pointers to C-contiguous arrays and results are
+    written by the library straight into preallocated NumPy arrays.
+    """
+
+    def __init__(self, library_path):
+        """
+        Raises:
+            OSError: If the library cannot be loaded or lacks the entry point
+        """
+        self._lib = ctypes.CDLL(str(library_path))
+        func = self._lib.tv_validate_points
+        func.restype = ctypes.c_long
+        func.argtypes = [
+            np.ctypeslib.ndpointer(np.float64, ndim=2, flags='C_CONTIGUOUS'),
+            ctypes.c_long,
+            np.ctypeslib.ndpointer(np.int64, ndim=1, flags='C_CONTIGUOUS'),
+            np.ctypeslib.ndpointer(np.float64, ndim=2, flags='C_CONTIGUOUS'),
+            ctypes.c_long,
+            np.ctypeslib.ndpointer(np.float64, ndim=1, flags='C_CONTIGUOUS'),
+            np.ctypeslib.ndpointer(np.float64, ndim=1, flags='C_CONTIGUOUS'),
+            np.ctypeslib.ndpointer(np.int8, ndim=1, flags='C_CONTIGUOUS'),
+        ]
+        self._validate = func
+
+    def validate(self, trajectory: np.ndarray, segments: np.ndarray, corridor: np.ndarray):
+        """
+        Validate points against their corridor segments.
+
+        Args:
+            trajectory: (n, 4) float64 array of lat, lon, alt, speed
+            segments: (n,) int64 nearest segment indices
+            corridor: (m, 5) float64 array of lat, lon, alt, allowed_deviation, allowed_speed
+
+        Returns:
+            Tuple of (deviation, speed_violation, compliant) arrays; compliant
+            is int8 with -1 for points whose segment index is out of range
+        """
+        trajectory = np.ascontiguousarray(trajectory, dtype=np.float64)
+        segments = np.ascontiguousarray(segments, dtype=np.int64)
+        corridor = np.ascontiguousarray(corridor, dtype=np.float64)
+        n = len(trajectory)
+
+        deviation = np.full(n, np.nan)
+        speed_violation = np.full(n, np.nan)
+        compliant = np.empty(n, dtype=np.int8)
+
+        if n:
+            self._validate(trajectory, n, segments, corridor, len(corridor),
+                           deviation, speed_violation, compliant)
+        return deviation, speed_violation, compliant
+
+
+@functools.lru_cache(maxsize=None)
+def _load_library(library_path: str, mtime: float) -> Optional[CppValidatorLibrary]:
+    try:
+        return CppValidatorLibrary(library_path)
+    except (OSError, AttributeError) as e:
+        logger.warning("C++ validator library %s cannot be loaded: %s", library_path, e)
+        return None
+
+
+def load_validator_library(library_path) -> Optional[CppValidatorLibrary]:
+    """
+    Load the shared library once per process, or None if it is unavailable.
+    """
+    try:
+        mtime = os.path.getmtime(library_path)
+    except OSError:
+        return None
+    return _load_library(str(library_path), mtime)
+
+
+class CppValidatorProcess:
+    """
+    A trajectory_validator --stream process bound to one corridor.
+
+    Usage:
+        with CppValidatorProcess(path, corridor_points, timeout=10) as validator:
+            results = validator.validate_batch(records)
+    """
+
+    def __init__(self, executable_path, corridor_points: List[Dict], timeout: float):
+        """
+        Start the process and send the corridor.
+
+        Args:
+            executable_path: Path to compiled trajectory_validator
+            corridor_points: List of corridor point dicts
+            timeout: Seconds allowed for the handshake and for each batch
+
+        Raises:
+            OSError: If the executable cannot be started
+            CppValidatorError: If the process does not accept the corridor
+        """
+        self.timeout = timeout
+        self._lines = queue.Queue()
+        self._stderr = []
+
+        self._process = subprocess.Popen(
+            [str(executable_path), '--stream'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        threading.Thread(target=self._pump, args=(self._process.stdout, self._lines.put),
+                         daemon=True).start()
+        threading.Thread(target=self._pump, args=(self._process.stderr, self._stderr.append),
+                         daemon=True).start()
+
+        header = [f"CORRIDOR {len(corridor_points)}"]
+        header.extend(
+            f"{p['latitude']!r} {p['longitude']!r} {p['altitude']!r} "
+            f"{p['allowed_deviation']!r} {p['allowed_speed']!r}"
+            for p in corridor_points
+        )
+        self._write(header)
+
+        ready = self._read_lines(1, time.monotonic() + timeout)[0]
+        if not ready.startswith('READY'):
+            self.close()
+            raise CppValidatorError(f"Unexpected handshake from validator: {ready!r}")
+
+    @staticmethod
+    def _pump(stream, sink):
+        for line in stream:
+            sink(line.rstrip('\n'))
+        sink(None)
+
+    def _write(self, lines: List[str]):
+        """Write lines from a helper thread so a stuck child cannot block us."""
+        def writer():
+            try:
+                self._process.stdin.write('\n'.join(lines) + '\n')
+                self._process.stdin.flush()
+            except (BrokenPipeError, ValueError, OSError):
+                pass  # Reported by the reader as an early EOF
+
+        threading.Thread(target=writer, daemon=True).start()
+
+    def _read_lines(self, count: int, deadline: float) -> List[str]:
+        lines = []
+        while len(lines) < count:
+            try:
+                line = self._lines.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self.close()
+                raise CppValidatorError(
+                    f"Validator timed out after {self.timeout}s "
+                    f"({len(lines)}/{count} results received)"
+                )
+            if line is None:
+                self._lines.put(None)
+                self.close()
+                detail = ' '.join(filter(None, self._stderr)) or 'no error output'
+                raise CppValidatorError(
+                    f"Validator exited with code {self._process.returncode}: {detail}"
+                )
+            lines.append(line)
+        return lines
+
+    @property
+    def alive(self) -> bool:
+        return self._process.poll() is None
+
+    def validate_batch(self, records: Sequence[Tuple[float, float, float, float, int]]
+                       ) -> List[ValidationResult]:
+        """
+        Validate one batch of points.
+
+        Args:
+            records: (lat, lon, alt, speed, segment_index) per point
+
+        Returns:
+            One result per record, in order
+
+        Raises:
+            CppValidatorError: On timeout, process exit or malformed output
+        """
+        if not records:
+            return []
+
+        lines = [f"BATCH {len(records)}"]
+        lines.extend(f"{lat!r} {lon!r} {alt!r} {speed!r} {segment}"
+                     for lat, lon, alt, speed, segment in records)
+        self._write(lines)
+
+        results = []
+        for line in self._read_lines(len(records), time.monotonic() + self.timeout):
+            if line.startswith('ERR'):
+                results.append(line[4:])
+                continue
+            parts = line.split()
+            try:
+                results.append((float(parts[0]), float(parts[1]), int(parts[2]) == 1))
+            except (IndexError, ValueError):
+                self.close()
+                raise CppValidatorError(f"Malformed validator output: {line!r}")
+        return results
+
+    def close(self):
+        """Stop the process (closing stdin lets it exit normally)."""
+        if self._process.poll() is None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self._process.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def validate_points(
+    executable_path,
+    corridor_points: List[Dict],
+    records: Sequence[Tuple[float, float, float, float, int]],
+    batch_size: int,
+    timeout: float,
+    validator: Optional[CppValidatorProcess] = None,
+) -> List[ValidationResult]:
+    """
+    Validate records through one streaming process, batch by batch.
+
+    A batch that fails (timeout, crash) yields an error result for each of
+    its records; a fresh process is started for the following batch.
+
+    Raises:
+        OSError, CppValidatorError: If the first process cannot be started
+    """
+    results: List[ValidationResult] = []
+    if validator is None:
+        validator = CppValidatorProcess(executable_path, corridor_points, timeout)
+
+    try:
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            try:
+                if not validator.alive:
+                    validator = CppValidatorProcess(executable_path, corridor_points, timeout)
+                results.extend(validator.validate_batch(batch))
+            except (OSError, CppValidatorError) as e:
+                logger.warning("C++ validation failed for points %d-%d: %s",
+                               start, start + len(batch) - 1, e)
+                results.extend([str(e)] * len(batch))
+    finally:
+        validator.close()
+
+    return results
@@ -0,0 +1,249 @@
+"""
+DB-backed processing job queue.
+
+Uploads and reprocessing requests enqueue a ProcessingJob instead of
+running process_flight_case inside the request. Jobs are executed by the
+`process_jobs` management command; no external broker is required. A job
+is claimed with a conditional UPDATE, so several worker processes can share
+one queue on SQLite as well as PostgreSQL.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import response_cache
+from .models import FlightCase, ProcessingJob, ProcessingState
+from .processing import StaleResultsError, process_flight_case
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress writes for one job
+PROGRESS_INTERVAL = 0.5
+
+# Seconds between heartbeats of a running job (at most a quarter of
+# PROCESSING_JOB_STALE_SECONDS). Progress is only reported between stages,
+# so a long stage would otherwise look like a dead worker.
+HEARTBEAT_INTERVAL = 60.0
+
+
+def enqueue_processing(flight_case: FlightCase) -> ProcessingJob:
+    """
+    Queue processing of a flight case.
+
+    With settings.PROCESSING_ASYNC disabled the job is executed immediately,
+    for deployments that run no worker.
+
+    Returns:
+        The created ProcessingJob
+    """
+    with transaction.atomic():
+        job = ProcessingJob.objects.create(flight_case=flight_case)
+        flight_case.processing_state = ProcessingState.QUEUED
+        _update_flight_case(flight_case.pk, processing_state=ProcessingState.QUEUED)
+
+    if not settings.PROCESSING_ASYNC:
+        # A job requeued because points were appended while it ran goes again
+        while job.status == ProcessingState.QUEUED and claim_job(job.pk, 'inline'):
+            job = run_job(ProcessingJob.objects.get(pk=job.pk))
+        flight_case.refresh_from_db()
+
+    return job
+
+
+def _update_flight_case(flight_case_id: int, **fields) -> None:
+    """
+    Update flight case fields without a full save; updated_at is bumped and
+    cached responses dropped as save() would.
+    """
+    FlightCase.objects.filter(pk=flight_case_id).update(updated_at=timezone.now(), **fields)
+    response_cache.invalidate(flight_case_id)
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(job_id: int, worker: str) -> bool:
+    """Atomically move a queued job to running; False if someone else got it."""
+    claimed = ProcessingJob.objects.filter(
+        pk=job_id, status=ProcessingState.QUEUED
+    ).update(
+        status=ProcessingState.RUNNING,
+        started_at=timezone.now(),
+        updated_at=timezone.now(),
+        worker=worker,
+    )
+    return claimed == 1
+
+
+def claim_next_job(worker: str) -> Optional[ProcessingJob]:
+    """
+    Claim the oldest queued job.
+
+    Returns:
+        The claimed job, or None if the queue is empty
+    """
+    while True:
+        job_id = (ProcessingJob.objects
+                  .filter(status=ProcessingState.QUEUED)
+                  .order_by('created_at', 'id')
+                  .values_list('id', flat=True)
+                  .first())
+        if job_id is None:
+            return None
+        if claim_job(job_id, worker):
+            return ProcessingJob.objects.select_related('flight_case').get(pk=job_id)
+
+
+def run_job(job: ProcessingJob) -> ProcessingJob:
+    """
+    Execute a claimed job and record its outcome.
+
+    While it runs, a heartbeat thread keeps the job's updated_at fresh, so
+    requeue_stale_jobs only picks up jobs whose worker died. The outcome is
+    only written while the job is still claimed by this worker. If points
+    were appended to the flight case while it ran, nothing is stored and
+    the job goes back to the queue.
+
+    Returns:
+        The job with its final status
+    """
+    flight_case = job.flight_case
+    _update_flight_case(flight_case.pk, processing_state=ProcessingState.RUNNING)
+    last_write = [0.0]
+
+    def report(fraction: float, stage: str):
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_INTERVAL or fraction >= 1.0:
+            last_write[0] = now
+            ProcessingJob.objects.filter(pk=job.pk).update(
+                progress=fraction, stage=stage, updated_at=timezone.now()
+            )
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job.pk, job.worker, stop),
+        name=f'job-{job.pk}-heartbeat', daemon=True,
+    )
+    heartbeat.start()
+    stale = False
+    try:
+        success = process_flight_case(flight_case, progress=report)
+        error = None if success else flight_case.processing_error
+    except StaleResultsError as e:
+        logger.info("Requeueing job %s: %s", job.pk, e)
+        stale = True
+    except Exception as e:
+        logger.error("Processing job %s crashed: %s", job.pk, e, exc_info=True)
+        success, error = False, str(e)
+        _update_flight_case(
+            flight_case.pk, processing_state=ProcessingState.FAILED, processing_error=error
+        )
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if stale:
+        requeued = ProcessingJob.objects.filter(
+            pk=job.pk, worker=job.worker, status=ProcessingState.RUNNING
+        ).update(status=ProcessingState.QUEUED, worker='', progress=0.0, stage='',
+                 updated_at=timezone.now())
+        if requeued:
+            _update_flight_case(flight_case.pk, processing_state=ProcessingState.QUEUED)
+        job.refresh_from_db()
+        return job
+
+    # A failed job keeps the progress last reported
+    outcome = {'progress': 1.0} if success else {}
+    finished = ProcessingJob.objects.filter(
+        pk=job.pk, worker=job.worker, status=ProcessingState.RUNNING
+    ).update(
+        status=ProcessingState.DONE if success else ProcessingState.FAILED,
+        error=error,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+        **outcome,
+    )
+    if not finished:
+        logger.warning("Job %s was taken from worker %s before it finished; outcome not recorded",
+                       job.pk, job.worker)
+    job.refresh_from_db()
+    return job
+
+
+def touch_job(job_id: int, worker: str) -> bool:
+    """Bump updated_at of a job running on worker; False if it no longer is."""
+    return ProcessingJob.objects.filter(
+        pk=job_id, worker=worker, status=ProcessingState.RUNNING
+    ).update(updated_at=timezone.now()) == 1
+
+
+def _heartbeat(job_id: int, worker: str, stop: threading.Event) -> None:
+    """Heartbeat thread of run_job: touch the job until stop is set."""
+    interval = min(HEARTBEAT_INTERVAL, settings.PROCESSING_JOB_STALE_SECONDS / 4)
+    try:
+        while not stop.wait(interval):
+            try:
+                if not touch_job(job_id, worker):
+                    return
+            except Exception as e:
+                logger.warning("Heartbeat of job %s failed: %s", job_id, e)
+    finally:
+        # The thread's own database connection
+        connection.close()
+
+
+def requeue_stale_jobs(stale_after: float) -> int:
+    """
+    Return running jobs with no heartbeat for stale_after seconds to the queue.
+
+    Such jobs belong to a worker that died mid-run (run_job touches its job
+    every HEARTBEAT_INTERVAL seconds).
+
+    Returns:
+        Number of jobs requeued
+    """
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return ProcessingJob.objects.filter(
+        status=ProcessingState.RUNNING, updated_at__lt=cutoff
+    ).update(status=ProcessingState.QUEUED, worker='', updated_at=timezone.now())
+
+
+def run_worker(poll_interval: float = 1.0, max_jobs: Optional[int] = None,
+               stop_when_idle: bool = False) -> int:
+    """
+    Worker loop: claim and run jobs until stopped.
+
+    Args:
+        poll_interval: Seconds to sleep when the queue is empty
+        max_jobs: Stop after this many jobs (None for no limit)
+        stop_when_idle: Return as soon as the queue is empty
+
+    Returns:
+        Number of jobs executed
+    """
+    name = worker_name()
+    executed = 0
+
+    while max_jobs is None or executed < max_jobs:
+        job = claim_next_job(name)
+        if job is None:
+            if stop_when_idle:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("Worker %s running job %s (FlightCase #%s)", name, job.pk, job.flight_case_id)
+        job = run_job(job)
+        logger.info("Job %s finished: %s", job.pk, job.status)
+        executed += 1
+
+    return executed
@@ -0,0 +1,394 @@
+"""
+Appending points to processed trajectories (live flights).
+
+A live flight grows by a few points at a time. Reprocessing the whole
+file for every update costs O(all points), so append_points evaluates only
+the new tail:
+
+- speed of point i depends only on points i and i + 1, so the new points
+  plus the previous last point (whose speed was a repeat of the one before
+  it) are all that change;
+- deviation and limits depend on the point alone and are computed for the
+  new points against the stored corridor geometry;
+- mean speed, mean deviation, max speed and compliance come from running
+  sums kept on the FlightCase (speed_sum, deviation_sum, compliant_count,
+  point_count), and last_point keeps the values of the last point needed
+  for the next append;
+- violation intervals are extended or added from the same points
+  (violations.append_intervals), and the extent used to find map tiles
+  (tiles.py) grows to cover them.
+
+New points are stored as a TrajectoryChunk instead of rewriting the
+trajectory blob. Readers (FlightCase.trajectory_columns) merge the chunks
+behind the blob. To keep reads cheap, trailing chunks are merged once the
+newest run of chunks is at least as large as the part before it. This
+happens at most O(log n) times per point, and the blob itself is rewritten
+only once the appended points outnumber it, so appends stay amortized
+O(new points).
+
+Once an append commits, its points are also written to the trajectory
+file, so reprocessing gives the same points (and drops the chunks). A
+processing run that read the file before an append committed stores
+nothing (processing.store_results checks point_count under the same row
+lock append_points takes), and its job is queued again. The
+C++ validator does not run on appended points. Their compliance is the
+numpy engine's check, and a point counts as compliant when either check
+passed, as in the player and in processing's compliance percentage.
+
+Committed points are also pushed to the clients streaming the flight case
+(telemetry.py).
+"""
+import logging
+import math
+from typing import Dict, List
+
+import numpy as np
+from django.db import transaction
+
+from . import corridors, simplify, telemetry, tiles, vectorized, violations
+from .columnar import (
+    NULL,
+    STATE_SUFFIX,
+    TRAJECTORY_SCHEMA,
+    VALUE,
+    concat_columns,
+    decode_columns,
+    encode_columns,
+    points_to_columns,
+    read_header,
+)
+from .models import FlightCase, TrajectoryChunk
+from .parsers import parse_time, time_to_seconds
+from .spatial_index import CorridorIndex
+
+logger = logging.getLogger(__name__)
+
+# Most points accepted by one append request
+MAX_APPEND_POINTS = 10000
+
+# Values of the last point kept in FlightCase.last_point
+LAST_POINT_KEYS = (
+    'latitude', 'longitude', 'altitude', 'time_seconds', 'speed', 'deviation',
+    'allowed_deviation', 'allowed_speed', 'compliant', 'cpp_compliant',
+)
+
+
+class AppendError(ValueError):
+    """The points cannot be appended (bad input or unprocessed flight case)."""
+
+
+def append_points(flight_case: FlightCase, points: List[Dict]) -> Dict:
+    """
+    Evaluate points and append them after the last stored trajectory point.
+
+    Args:
+        flight_case: Processed FlightCase (blobs may be deferred)
+        points: Dicts with 'latitude', 'longitude', 'altitude' and 'time'
+            (hh:mm:ss[.ffffff], not earlier than the last stored point)
+
+    Returns:
+        Dict with the updated 'flight_case', 'start' (index of the first
+        new point), the evaluated new 'points' and their 'columns', and
+        'previous' (index, speed, compliant of the point before them)
+
+    Raises:
+        AppendError: If the points are invalid or the case is not processed
+    """
+    new = _parse_points(points)
+    k = len(new['latitude'])
+
+    with transaction.atomic():
+        flight_case = (
+            FlightCase.objects.select_for_update()
+            .defer('trajectory_blob', 'corridor_blob')
+            .get(pk=flight_case.pk)
+        )
+        if not flight_case.is_processed or flight_case.point_count == 0:
+            raise AppendError('Flight case has not been processed yet')
+        _ensure_aggregates(flight_case)
+
+        last = flight_case.last_point
+        if new['time_seconds'][0] < last['time_seconds']:
+            raise AppendError('Points must not be earlier than the last stored point')
+
+        # Speeds of the previous last point and the new points
+        speeds = vectorized.compute_speeds(
+            *(np.concatenate(([last[key]], new[key]))
+              for key in ('latitude', 'longitude', 'altitude', 'time_seconds'))
+        )
+        index = _corridor_index(flight_case)
+        deviation, nearest = index.nearest_segments(new['latitude'], new['longitude'], new['altitude'])
+        allowed_deviation, allowed_speed = index.limits_for(nearest)
+
+        start = flight_case.point_count
+        new_points = [
+            {
+                'latitude': lat, 'longitude': lon, 'altitude': alt,
+                'time': time_str, 'time_seconds': seconds, 'index': i,
+            }
+            for i, (lat, lon, alt, time_str, seconds) in enumerate(zip(
+                new['latitude'].tolist(), new['longitude'].tolist(), new['altitude'].tolist(),
+                new['time'], new['time_seconds'].tolist()
+            ), start)
+        ]
+        vectorized.apply_results(new_points, {
+            'speed': speeds[1:],
+            'deviation': deviation,
+            'nearest_segment': nearest,
+            'allowed_deviation': allowed_deviation,
+            'allowed_speed': allowed_speed,
+        })
+
+        previous_speed = float(speeds[0])
+        previous_compliant = bool(
+            last['allowed_deviation'] is not None and last['deviation'] is not None
+            and last['deviation'] <= last['allowed_deviation']
+            and previous_speed <= last['allowed_speed']
+        )
+
+        compliant = np.array([p['compliant'] for p in new_points])
+        columns = points_to_columns(new_points, TRAJECTORY_SCHEMA)
+        columns[simplify.TOLERANCE_COLUMN] = simplify.trajectory_tolerances(
+            new['latitude'], new['longitude'], compliant
+        )
+
+        # Running aggregates; only the previous last point changes among the old ones
+        was_compliant = bool(last['compliant'] or last['cpp_compliant'])
+        is_compliant = bool(previous_compliant or last['cpp_compliant'])
+        flight_case.point_count += k
+        flight_case.speed_sum += float(speeds[1:].sum()) + previous_speed - last['speed']
+        flight_case.deviation_sum += float(deviation.sum())
+        flight_case.compliant_count += int(compliant.sum()) + is_compliant - was_compliant
+        # The old speed of the previous last point repeated the speed of the
+        # point before it, so lowering it never lowers the maximum
+        flight_case.max_speed = max(flight_case.max_speed or 0.0, float(speeds.max()))
+        flight_case.mean_speed = flight_case.speed_sum / flight_case.point_count
+        flight_case.mean_deviation = flight_case.deviation_sum / flight_case.point_count
+        flight_case.compliance_percentage = (
+            flight_case.compliant_count / flight_case.point_count * 100
+        )
+        previous_point = dict(last, speed=previous_speed)
+        violations.append_intervals(
+            flight_case, start,
+            violations.point_columns([previous_point] + new_points),
+            np.concatenate(([is_compliant], compliant)),
+        )
+        flight_case.last_point = last_point_values(new_points[-1])
+        if flight_case.min_latitude is not None:
+            extent = tiles.extent_fields((new['latitude'], new['longitude']))
+            for field, combine in (('min_latitude', min), ('max_latitude', max),
+                                   ('min_longitude', min), ('max_longitude', max)):
+                setattr(flight_case, field, combine(getattr(flight_case, field), extent[field]))
+
+        chunk_rows = list(flight_case.trajectory_chunks.values_list('rows', flat=True))
+        base_rows = start - sum(chunk_rows)
+        TrajectoryChunk.objects.create(
+            flight_case=flight_case,
+            start=start,
+            rows=k,
+            blob=encode_columns(columns, k),
+            previous_speed=previous_speed,
+            previous_compliant=previous_compliant,
+        )
+        _compact(flight_case, base_rows, chunk_rows + [k])
+
+        flight_case.save()
+        flight_case.clear_column_cache()
+        # The file is what reprocessing reads, so it only gets committed points
+        transaction.on_commit(lambda: _append_to_file(flight_case, new_points))
+
+        result = {
+            'flight_case': flight_case,
+            'start': start,
+            'points': new_points,
+            'columns': columns,
+            'previous': {'index': start - 1, 'speed': previous_speed, 'compliant': previous_compliant},
+        }
+        transaction.on_commit(lambda: telemetry.publish_append(result))
+
+    return result
+
+
+def combined_columns(flight_case: FlightCase, blob) -> Dict[str, np.ndarray]:
+    """
+    Trajectory columns of the blob followed by every appended chunk.
+    """
+    parts = [(decode_columns(blob), read_header(blob)[1], None, None)]
+    chunks = flight_case.trajectory_chunks.order_by('start').values_list(
+        'blob', 'rows', 'previous_speed', 'previous_compliant'
+    )
+    for chunk_blob, rows, previous_speed, previous_compliant in chunks:
+        parts.append((decode_columns(chunk_blob), rows, previous_speed, previous_compliant))
+    return _merge(parts)
+
+
+def last_point_values(point: Dict) -> Dict:
+    """FlightCase.last_point for a point dict (JSON-safe: non-finite values are None)."""
+    values = {}
+    for key in LAST_POINT_KEYS:
+        value = point.get(key)
+        if isinstance(value, float) and not math.isfinite(value):
+            value = None
+        values[key] = value
+    values['compliant'] = bool(values['compliant'])
+    values['cpp_compliant'] = bool(values['cpp_compliant'])
+    return values
+
+
+def _parse_points(points) -> Dict:
+    if not isinstance(points, list) or not points:
+        raise AppendError("'points' must be a non-empty list")
+    if len(points) > MAX_APPEND_POINTS:
+        raise AppendError(f"At most {MAX_APPEND_POINTS} points can be appended at once")
+
+    columns = {key: [] for key in ('latitude', 'longitude', 'altitude', 'time', 'time_seconds')}
+    for i, point in enumerate(points):
+        try:
+            for key in ('latitude', 'longitude', 'altitude'):
+                value = float(point[key])
+                if not math.isfinite(value):
+                    raise ValueError(f"{key} must be finite")
+                columns[key].append(value)
+            time_str = str(point['time'])
+            columns['time_seconds'].append(time_to_seconds(parse_time(time_str)))
+            columns['time'].append(time_str)
+        except (KeyError, TypeError) as e:
+            raise AppendError(f"Point {i}: expected latitude, longitude, altitude and time ({e})")
+        except ValueError as e:
+            raise AppendError(f"Point {i}: {e}")
+
+    result = {key: np.array(values, dtype=np.float64) for key, values in columns.items()
+              if key != 'time'}
+    result['time'] = columns['time']
+    if (np.diff(result['time_seconds']) < 0).any():
+        raise AppendError('Points must be sorted by time')
+    return result
+
+
+def _ensure_aggregates(flight_case: FlightCase) -> None:
+    """Fill the running aggregates of cases processed before they existed (one full pass)."""
+    if None not in (flight_case.point_count, flight_case.speed_sum, flight_case.deviation_sum,
+                    flight_case.compliant_count, flight_case.last_point):
+        return
+    from .playback import compliance_mask
+
+    columns = flight_case.trajectory_columns()
+    rows = len(columns['latitude'])
+    if not rows:
+        raise AppendError('Flight case has not been processed yet')
+    speed = columns.get('speed', np.zeros(rows))
+    deviation = columns.get('deviation', np.zeros(rows))
+    flight_case.point_count = rows
+    flight_case.speed_sum = float(speed.sum())
+    flight_case.deviation_sum = float(deviation.sum())
+    flight_case.compliant_count = int(compliance_mask(columns).sum())
+
+    last = {}
+    for key in LAST_POINT_KEYS:
+        values = columns.get(key)
+        state = columns.get(key + STATE_SUFFIX)
+        if values is None or (state is not None and state[-1] != VALUE):
+            last[key] = None
+        else:
+            last[key] = values[-1].item()
+    flight_case.last_point = last_point_values(last)
+
+
+def _corridor_index(flight_case: FlightCase):
+    if flight_case.corridor_id is not None:
+        return corridors.load(flight_case.corridor_id).index
+    columns = flight_case.corridor_columns()
+    return CorridorIndex(vectorized.CorridorGeometry(
+        columns['latitude'], columns['longitude'], columns['altitude'],
+        columns['allowed_deviation'], columns['allowed_speed'],
+    ))
+
+
+def _merge(parts) -> Dict[str, np.ndarray]:
+    """
+    Concatenate (columns, rows, previous_speed, previous_compliant) parts,
+    applying each part's values for the row before it. The first part's
+    previous values belong to a row outside the merge and are ignored.
+    """
+    from .playback import PREFIX_COLUMN, compliance_mask, compliant_prefix
+
+    merged = concat_columns([(columns, rows) for columns, rows, _, _ in parts], TRAJECTORY_SCHEMA)
+    offset = 0
+    for i, (_, rows, previous_speed, previous_compliant) in enumerate(parts):
+        if i and previous_speed is not None:
+            _set_value(merged, 'speed', offset - 1, previous_speed)
+            _set_value(merged, 'compliant', offset - 1, previous_compliant)
+        offset += rows
+    if PREFIX_COLUMN in merged:
+        # Only the blob stores the running count; chunks extend it here
+        merged[PREFIX_COLUMN] = compliant_prefix(compliance_mask(merged))
+    return merged
+
+
+def _set_value(columns, name, row, value) -> None:
+    columns[name][row] = value
+    state = columns.get(name + STATE_SUFFIX)
+    if state is not None:
+        state[row] = VALUE if value is not None else NULL
+
+
+def _compact(flight_case: FlightCase, base_rows: int, sizes: List[int]) -> None:
+    """
+    Merge the newest chunks while they outgrow the part before them.
+
+    Args:
+        base_rows: Points in the trajectory blob
+        sizes: Rows of every chunk, oldest first (including the new one)
+    """
+    sizes = [base_rows] + sizes
+    first = len(sizes) - 1
+    merged_rows = sizes[first]
+    while first > 0 and sizes[first - 1] <= merged_rows:
+        first -= 1
+        merged_rows += sizes[first]
+    if first == len(sizes) - 1:
+        return
+
+    chunks = list(flight_case.trajectory_chunks.order_by('start'))
+    if first == 0:
+        # The appended points outnumber the blob: fold everything into it
+        blob = FlightCase.objects.values_list('trajectory_blob', flat=True).get(pk=flight_case.pk)
+        parts = [(decode_columns(blob), base_rows, None, None)]
+        merge = chunks
+    else:
+        parts = []
+        merge = chunks[first - 1:]
+
+    parts += [
+        (decode_columns(c.blob), c.rows, c.previous_speed, c.previous_compliant) for c in merge
+    ]
+    merged = _merge(parts)
+    TrajectoryChunk.objects.filter(pk__in=[c.pk for c in merge]).delete()
+
+    if first == 0:
+        flight_case.trajectory_blob = encode_columns(merged, merged_rows)
+    else:
+        TrajectoryChunk.objects.create(
+            flight_case=flight_case,
+            start=merge[0].start,
+            rows=merged_rows,
+            blob=encode_columns(merged, merged_rows),
+            previous_speed=merge[0].previous_speed,
+            previous_compliant=merge[0].previous_compliant,
+        )
+    logger.debug("Merged %d trajectory parts of flight case %s", len(parts), flight_case.pk)
+
+
+def _append_to_file(flight_case: FlightCase, points: List[Dict]) -> None:
+    """Add the points to the trajectory file, in its own format."""
+    path = flight_case.trajectory_file.path
+    lines = ''.join(
+        f"{p['latitude']!r} {p['longitude']!r} {p['altitude']!r} {p['time']}\n" for p in points
+    )
+    with open(path, 'rb+') as f:
+        f.seek(0, 2)
+        if f.tell():
+            f.seek(-1, 2)
+            if f.read(1) != b'\n':
+                lines = '\n' + lines
+        f.write(lines.encode('utf-8'))
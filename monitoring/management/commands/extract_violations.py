@@ -0,0 +1,60 @@
+"""
+Fill the violation interval table from stored trajectories.
+
+For flight cases processed before intervals were stored: the intervals
+come from the stored point columns (no reprocessing), and replace any
+stored ones. Cases are read in id order, chunk by chunk.
+
+Usage:
+    python manage.py extract_violations
+    python manage.py extract_violations --ids 4 8 15 --chunk-size 50
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Extract the violation intervals of processed flight cases from their stored points'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int, help='Only these flight cases')
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Only cases without any stored interval'
+        )
+        parser.add_argument('--chunk-size', type=int, default=100, help='Cases per transaction')
+
+    def handle(self, *args, **options):
+        from django.db import transaction
+
+        from monitoring import violations
+        from monitoring.models import FlightCase
+
+        queryset = FlightCase.objects.filter(is_processed=True, trajectory_blob__isnull=False)
+        if options['ids']:
+            queryset = queryset.filter(id__in=options['ids'])
+        if options['missing']:
+            queryset = queryset.filter(violation_intervals__isnull=True)
+        ids = list(queryset.order_by('id').values_list('id', flat=True).distinct())
+
+        started = time.monotonic()
+        intervals_total = 0
+        chunk_size = max(options['chunk_size'], 1)
+        for first in range(0, len(ids), chunk_size):
+            chunk = ids[first:first + chunk_size]
+            extracted = []
+            for flight_case in FlightCase.objects.filter(id__in=chunk).defer('corridor_blob'):
+                columns = flight_case.trajectory_columns(
+                    list(violations.VALUE_COLUMNS) + ['compliant', 'cpp_compliant']
+                )
+                extracted.append((flight_case.pk, violations.extract_stored(columns)))
+            with transaction.atomic():
+                violations.store(extracted)
+            intervals_total += sum(len(intervals) for _, intervals in extracted)
+            self.stdout.write(f"{first + len(chunk)}/{len(ids)} cases")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Extracted {intervals_total} interval(s) of {len(ids)} case(s) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,86 @@
+"""
+Run the processing job worker pool.
+
+Usage:
+    python manage.py process_jobs --workers 2
+"""
+import logging
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(poll_interval, stop_when_idle):
+    """Entry point of a worker process."""
+    import django
+    django.setup()
+
+    from monitoring.jobs import run_worker
+
+    # Let the parent handle Ctrl+C; it terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(poll_interval=poll_interval, stop_when_idle=stop_when_idle)
+
+
+class Command(BaseCommand):
+    help = 'Execute queued flight case processing jobs with a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.PROCESSING_WORKERS,
+            help='Number of worker processes (default: PROCESSING_WORKERS)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds between queue polls when idle'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when the queue is empty instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        from monitoring.jobs import requeue_stale_jobs, run_worker
+
+        requeued = requeue_stale_jobs(settings.PROCESSING_JOB_STALE_SECONDS)
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        stop_when_idle = options['once']
+
+        if workers == 1:
+            self.stdout.write("Processing worker started (1 process)")
+            executed = run_worker(poll_interval=poll_interval, stop_when_idle=stop_when_idle)
+            self.stdout.write(f"Worker stopped after {executed} job(s)")
+            return
+
+        # Children must not share the parent's DB connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_worker_main,
+                args=(poll_interval, stop_when_idle),
+                name=f"process_jobs-{i}",
+            )
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Processing worker pool started ({workers} processes)")
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping workers...")
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
@@ -0,0 +1,183 @@
+"""
+Profile the processing of one flight case, or of a corridor/trajectory
+file pair, without saving anything.
+
+The case is computed as process_flight_case would compute it: with its
+shared corridor loaded from the database, or with the corridor parsed from
+the file. No result is stored. Geometry runs in-process
+(GEOMETRY_WORKERS=1), so that all of the work is profiled. Written to
+--output-dir:
+
+- summary.json: per stage wall/CPU seconds, tracemalloc peak and net
+  bytes, top allocation sites, top functions; call counters of the hot
+  geometry functions; point and segment counts and the resulting metrics
+- stacks.collapsed: sampled stacks rooted at the stage names, for
+  flamegraph.pl, speedscope or inferno
+- profile.prof: all stage profiles merged (pstats, snakeviz, gprof2dot)
+
+Usage:
+    python manage.py profile_flight_case 42
+    python manage.py profile_flight_case --corridor c.txt --trajectory t.txt --engine python
+    python manage.py profile_flight_case 42 --no-memory --clock wall --output-dir /tmp/prof
+"""
+import json
+import os
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+
+class Command(BaseCommand):
+    help = 'Profile processing of a flight case or file pair (CPU, memory, stacks); saves nothing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('flight_case', nargs='?', type=int, help='FlightCase id')
+        parser.add_argument('--corridor', help='Corridor file (instead of a flight case)')
+        parser.add_argument('--trajectory', help='Trajectory file (instead of a flight case)')
+        parser.add_argument(
+            '--engine', choices=['numpy', 'python'],
+            help='Geometry engine (default: GEOMETRY_ENGINE)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            help='Directory for the reports (default: profiles/<case or file>-<time>)'
+        )
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Allocation sites and functions listed per stage'
+        )
+        parser.add_argument(
+            '--no-memory', action='store_true',
+            help='Skip tracemalloc (much faster; no memory figures)'
+        )
+        parser.add_argument(
+            '--sample-interval', type=float, default=0.001,
+            help='Seconds between stack samples'
+        )
+        parser.add_argument(
+            '--clock', choices=['cpu', 'wall'], default='cpu',
+            help='Sample on CPU time, or on wall time to include waiting'
+        )
+
+    def handle(self, *args, **options):
+        from monitoring.models import FlightCase
+        from monitoring.profiling import ProfilingTimer, StackSampler
+
+        if options['flight_case'] is not None:
+            if options['corridor'] or options['trajectory']:
+                raise CommandError('Give a flight case id or --corridor/--trajectory, not both')
+            try:
+                flight_case = FlightCase.objects.defer('corridor_blob', 'trajectory_blob').get(
+                    pk=options['flight_case']
+                )
+            except FlightCase.DoesNotExist:
+                raise CommandError(f"Flight case {options['flight_case']} does not exist")
+            corridor_path = flight_case.corridor_file.path
+            trajectory_path = flight_case.trajectory_file.path
+            target = {'flight_case': flight_case.pk}
+            label = f"flight_case_{flight_case.pk}"
+        elif options['corridor'] and options['trajectory']:
+            flight_case = None
+            corridor_path, trajectory_path = options['corridor'], options['trajectory']
+            target = {'corridor': corridor_path, 'trajectory': trajectory_path}
+            label = os.path.splitext(os.path.basename(trajectory_path))[0]
+        else:
+            raise CommandError('Give a flight case id, or both --corridor and --trajectory')
+        for path in (corridor_path, trajectory_path):
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist')
+
+        output_dir = options['output_dir'] or os.path.join(
+            'profiles', f"{label}-{time.strftime('%Y%m%d-%H%M%S')}"
+        )
+        os.makedirs(output_dir, exist_ok=True)
+
+        sampler = None
+        if StackSampler.available():
+            sampler = StackSampler(profiled_run.__code__, options['sample_interval'],
+                                   options['clock'])
+        else:
+            self.stderr.write('Stack sampling needs signal.setitimer; no collapsed stacks')
+        timer = ProfilingTimer(memory=not options['no_memory'], sampler=sampler,
+                               top=options['top'])
+        engine = options['engine'] or settings.GEOMETRY_ENGINE
+
+        self.stdout.write(f"Profiling {target} with the {engine} engine...")
+        # A dry run: nothing is saved, and nothing is counted in the metrics
+        with override_settings(GEOMETRY_ENGINE=engine, GEOMETRY_WORKERS=1,
+                               METRICS_ENABLED=False):
+            if timer.memory:
+                tracemalloc.start()
+            if sampler is not None:
+                sampler.start()
+            try:
+                results = profiled_run(flight_case, corridor_path, trajectory_path, timer)
+            except Exception as e:
+                raise CommandError(f'Processing failed: {e}')
+            finally:
+                if sampler is not None:
+                    sampler.stop()
+                if timer.memory:
+                    tracemalloc.stop()
+
+        summary = {
+            'target': target,
+            'engine': engine,
+            'memory': timer.memory,
+            'sample_interval': options['sample_interval'] if sampler else None,
+            'clock': options['clock'] if sampler else None,
+            'samples': sum(sampler.stacks.values()) if sampler else 0,
+            'results': {
+                field: results[field]
+                for field in ('point_count', 'mean_speed', 'max_speed', 'mean_deviation',
+                              'compliance_percentage', 'compliant_count')
+            },
+            **timer.summary_dict(),
+        }
+        with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        if sampler is not None:
+            with open(os.path.join(output_dir, 'stacks.collapsed'), 'w') as f:
+                f.write(sampler.collapsed())
+        timer.combined_stats().dump_stats(os.path.join(output_dir, 'profile.prof'))
+
+        self._report(summary)
+        self.stdout.write(self.style.SUCCESS(f"Reports written to {output_dir}"))
+
+    def _report(self, summary):
+        self.stdout.write(
+            f"{summary['points']} points, {summary['segments']} segments: "
+            f"{summary['wall']:.3f}s wall, {summary['cpu']:.3f}s CPU (profiled)"
+        )
+        for name, entry in summary['stages'].items():
+            line = f"  {name:18s} {entry['wall']:9.3f}s wall {entry['cpu']:9.3f}s CPU"
+            if 'peak_bytes' in entry:
+                line += (f" {entry['peak_bytes'] / 2**20:9.1f} MiB peak"
+                         f" {entry['net_bytes'] / 2**20:9.1f} MiB kept")
+            self.stdout.write(line)
+        for row in summary['hot_geometry_functions'][:5]:
+            self.stdout.write(
+                f"  {row['calls']:>10d} calls {row['own_seconds']:9.3f}s own  {row['function']}"
+            )
+
+
+def profiled_run(flight_case, corridor_path: str, trajectory_path: str, timer):
+    """
+    The profiled work: the stored corridor's load, if any, then
+    compute_flight_case. Root frame of the sampled stacks, so that every
+    stage is sampled.
+    """
+    from monitoring import corridors
+    from monitoring.processing import compute_flight_case
+
+    corridor = None
+    if flight_case is not None and flight_case.corridor_id is not None:
+        # As in process_flight_case: the stored geometry, parsed once
+        corridors.clear_cache()
+        with timer.stage('load_corridor'):
+            corridor = corridors.load(flight_case.corridor_id)
+    return compute_flight_case(corridor_path, trajectory_path, corridor=corridor, timer=timer)
+
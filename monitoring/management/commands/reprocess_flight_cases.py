@@ -0,0 +1,327 @@
+"""
+Reprocess stored flight cases in parallel, with resumable progress.
+
+Cases are read in id order, chunk by chunk, and computed by a pool of
+worker processes (processing.compute_flight_case, no DB access in the
+workers). Each chunk is written with one bulk_update, after which the
+highest finished id is saved to the checkpoint file, so an interrupted run
+continues with --resume instead of starting over. Cases that got points
+appended (live.append_points) while they were computed are not written
+but queued for processing again.
+
+Usage:
+    python manage.py reprocess_flight_cases --workers 8
+    python manage.py reprocess_flight_cases --failed --created-after 2024-01-01
+    python manage.py reprocess_flight_cases --id-from 1000 --id-to 2000 --resume
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+DEFAULT_CHECKPOINT = 'reprocess_checkpoint.json'
+
+
+def _init_worker():
+    """Set up Django in a spawned worker; geometry stays in-process there."""
+    import django
+    django.setup()
+    settings.GEOMETRY_WORKERS = 1
+
+
+def _compute(case_id, corridor_path, trajectory_path, corridor_blobs=None):
+    """
+    Worker task.
+
+    Args:
+        corridor_blobs: Stored shared corridor (corridors.load_blobs
+            arguments), or None to parse corridor_path
+
+    Returns:
+        Tuple (case_id, results, elapsed seconds); results come from
+        compute_flight_case, or failure_results if it raised
+    """
+    from monitoring import corridors
+    from monitoring.processing import compute_flight_case, failure_results
+
+    start = time.perf_counter()
+    try:
+        corridor = corridors.load_blobs(*corridor_blobs) if corridor_blobs else None
+        results = compute_flight_case(corridor_path, trajectory_path, corridor=corridor)
+    except Exception as e:
+        results = failure_results(e)
+    return case_id, results, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Reprocess selected flight cases with a process pool (resumable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help='Only these flight case ids')
+        parser.add_argument('--id-from', type=int, help='Smallest id to reprocess')
+        parser.add_argument('--id-to', type=int, help='Largest id to reprocess')
+        parser.add_argument('--created-after', help='Only cases created on or after this date')
+        parser.add_argument('--created-before', help='Only cases created on or before this date')
+        parser.add_argument(
+            '--failed', action='store_true',
+            help='Only cases whose last processing failed'
+        )
+        parser.add_argument(
+            '--missing-compliance', action='store_true',
+            help='Only processed cases without a compliance percentage'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.PROCESSING_WORKERS,
+            help='Worker processes (default: PROCESSING_WORKERS)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Cases read, computed and written per batch'
+        )
+        parser.add_argument(
+            '--checkpoint', default=DEFAULT_CHECKPOINT,
+            help=f'Progress file (default: {DEFAULT_CHECKPOINT})'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue after the last id recorded in the checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        from monitoring.models import FlightCase
+
+        queryset = self._select(FlightCase.objects.all(), options)
+        selection = self._selection(options)
+        checkpoint_path = options['checkpoint']
+
+        last_id, done, failed = 0, 0, 0
+        if options['resume']:
+            checkpoint = self._load_checkpoint(checkpoint_path)
+            if checkpoint.get('selection') != selection:
+                raise CommandError(
+                    f"{checkpoint_path} was written for a different selection; "
+                    "run without --resume to start over"
+                )
+            last_id, done, failed = checkpoint['last_id'], checkpoint['done'], checkpoint['failed']
+            self.stdout.write(f"Resuming after id {last_id} ({done} done, {failed} failed)")
+
+        remaining = queryset.filter(id__gt=last_id)
+        total = remaining.count()
+        self.stdout.write(f"{total} flight case(s) to reprocess")
+        if not total:
+            return
+
+        workers = max(1, options['workers'])
+        chunk_size = max(1, options['chunk_size'])
+
+        # Spawned workers start clean: no inherited DB connections or threads
+        started = time.monotonic()
+        processed = 0
+
+        with ProcessPoolExecutor(workers, mp_context=get_context('spawn'),
+                                 initializer=_init_worker) as pool:
+            pending = self._submit(pool, remaining, last_id, chunk_size)
+            while pending:
+                chunk_last_id, futures, point_counts = pending
+                # Keep the pool busy with the next chunk while this one finishes
+                pending = self._submit(pool, remaining, chunk_last_id, chunk_size)
+
+                results = [future.result() for future in futures]
+                chunk_failed, stale = self._store(FlightCase, results, point_counts)
+                self._requeue(FlightCase, stale)
+
+                processed += len(results)
+                done += len(results) - chunk_failed - len(stale)
+                failed += chunk_failed
+                self._save_checkpoint(checkpoint_path, {
+                    'selection': selection,
+                    'last_id': chunk_last_id,
+                    'done': done,
+                    'failed': failed,
+                })
+                self._report(processed, total, started, results)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reprocessed {processed} case(s) in {time.monotonic() - started:.1f}s "
+            f"({done} done, {failed} failed in total)"
+        ))
+        os.remove(checkpoint_path)
+
+    def _select(self, queryset, options):
+        if options['ids']:
+            queryset = queryset.filter(id__in=options['ids'])
+        if options['id_from'] is not None:
+            queryset = queryset.filter(id__gte=options['id_from'])
+        if options['id_to'] is not None:
+            queryset = queryset.filter(id__lte=options['id_to'])
+        for option, lookup in (('created_after', 'gte'), ('created_before', 'lte')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f"--{option.replace('_', '-')} must be a YYYY-MM-DD date")
+                queryset = queryset.filter(**{f'created_at__date__{lookup}': day})
+        if options['failed']:
+            from monitoring.models import ProcessingState
+            queryset = queryset.filter(
+                Q(processing_state=ProcessingState.FAILED) | Q(processing_error__isnull=False)
+            )
+        if options['missing_compliance']:
+            queryset = queryset.filter(is_processed=True, compliance_percentage__isnull=True)
+        return queryset
+
+    @staticmethod
+    def _selection(options):
+        """The options that define which cases are reprocessed."""
+        keys = ('ids', 'id_from', 'id_to', 'created_after', 'created_before',
+                'failed', 'missing_compliance')
+        return {key: options[key] for key in keys}
+
+    @staticmethod
+    def _submit(pool, queryset, after_id, chunk_size):
+        """
+        Submit the next chunk of cases after after_id.
+
+        Returns:
+            Tuple (last id of the chunk, futures, point_count of each case
+            before its files are read), or None when done
+        """
+        from monitoring.models import Corridor
+
+        rows = list(
+            queryset.filter(id__gt=after_id)
+            .order_by('id')
+            .values_list('id', 'corridor_file', 'trajectory_file', 'corridor_id',
+                         'point_count')[:chunk_size]
+        )
+        if not rows:
+            return None
+
+        # Shared corridors are read once per chunk; workers cache them by hash
+        corridor_blobs = {
+            row[0]: row[1:]
+            for row in Corridor.objects.filter(id__in={row[3] for row in rows}).values_list(
+                'id', 'content_hash', 'points_blob', 'geometry_blob', 'geometry_version'
+            )
+        }
+        storage_path = _storage_path()
+        futures = [
+            pool.submit(_compute, case_id, storage_path(corridor_file), storage_path(trajectory),
+                        corridor_blobs.get(corridor_id))
+            for case_id, corridor_file, trajectory, corridor_id, _ in rows
+        ]
+        return rows[-1][0], futures, {row[0]: row[4] for row in rows}
+
+    @staticmethod
+    def _store(model, results, point_counts):
+        """
+        Write one chunk of results with bulk_update.
+
+        Successful results replace the appended chunks too, so they are
+        written with the rows locked as live.append_points locks them, and
+        only for cases whose point_count is still the one in point_counts.
+
+        Returns:
+            Tuple (number of failed cases, ids of cases that got points
+            appended while they were computed and were not written)
+        """
+        from monitoring import response_cache, tiles, violations
+        from monitoring.models import TrajectoryChunk
+        from monitoring.processing import RESULT_FIELDS
+
+        now = timezone.now()
+        cases = []
+        failed = 0
+        for case_id, values, _ in results:
+            case = model(pk=case_id, updated_at=now)
+            for field, value in values.items():
+                if field != violations.RESULTS_KEY:
+                    setattr(case, field, value)
+            cases.append(case)
+            failed += not values['is_processed']
+
+        # Failures keep their stored data; only the status fields are written
+        failures = [case for case in cases if not case.is_processed]
+        successes = [case for case in cases if case.is_processed]
+        with transaction.atomic():
+            current = dict(
+                model.objects.select_for_update()
+                .filter(pk__in=[case.pk for case in successes])
+                .values_list('pk', 'point_count')
+            )
+            stale = [case.pk for case in successes if current[case.pk] != point_counts[case.pk]]
+            successes = [case for case in successes if case.pk not in stale]
+            if successes:
+                model.objects.bulk_update(successes, list(RESULT_FIELDS) + ['updated_at'])
+                # Appended points are part of the trajectory files just reprocessed
+                TrajectoryChunk.objects.filter(flight_case__in=successes).delete()
+                violations.store(
+                    (case_id, values.get(violations.RESULTS_KEY))
+                    for case_id, values, _ in results if case_id not in stale
+                )
+        if failures:
+            model.objects.bulk_update(
+                failures, ['processing_error', 'is_processed', 'processing_state', 'updated_at']
+            )
+        # bulk_update bypasses save(), which would drop cached responses and tiles
+        for case in cases:
+            response_cache.invalidate(case.pk)
+            tiles.invalidate(case.pk)
+        return failed, stale
+
+    def _requeue(self, model, ids):
+        """Queue processing of cases whose results were not written."""
+        from monitoring.jobs import enqueue_processing
+
+        for flight_case in model.objects.filter(pk__in=ids):
+            job = enqueue_processing(flight_case)
+            self.stdout.write(
+                f"Flight case {flight_case.pk} got points while it was computed; "
+                f"queued as job {job.pk}"
+            )
+
+    def _report(self, processed, total, started, results):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0.0
+        eta = (total - processed) / rate if rate else 0.0
+        compute = sum(seconds for _, _, seconds in results) / len(results)
+        self.stdout.write(
+            f"{processed}/{total} ({100 * processed / total:.1f}%) "
+            f"{rate:.2f} cases/s, {compute:.2f}s compute per case, ETA {_duration(eta)}"
+        )
+
+    @staticmethod
+    def _load_checkpoint(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No checkpoint at {path}")
+        except ValueError as e:
+            raise CommandError(f"Invalid checkpoint {path}: {e}")
+
+    @staticmethod
+    def _save_checkpoint(path, data):
+        # Written to a temporary file and renamed, so a crash never leaves half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+def _storage_path():
+    from django.core.files.storage import default_storage
+    return default_storage.path
+
+
+def _duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,419 @@
+"""
+Prometheus metrics, aggregated over all server and worker processes.
+
+Every process (gunicorn workers, process_jobs workers, the bulk upload
+pool) records its samples in its own memory-mapped file,
+settings.METRICS_DIR/<pid>-<random>.db. GET /metrics reads and adds up the
+files of all processes and renders them in the Prometheus text format, so
+a scrape sees the same totals whichever worker answers it.
+
+Recording a sample is a dict lookup and a store into the mapping under a
+thread lock: no system call and no lock shared between processes, since
+each file has a single writer. Only counters and histograms are offered,
+because they can simply be added up across processes.
+
+A process holds an exclusive flock on its file while it lives. A scrape
+adds the files it can lock, whose processes have exited, to ARCHIVE_NAME
+and removes them, so totals do not go backwards when a worker restarts
+and the directory keeps one file per running process (plus the archive).
+Clear METRICS_DIR on deploy to start from zero. Without fcntl (Windows)
+files of exited processes are kept instead.
+
+File layout: an 8-byte count of the bytes in use, then entries of a 4-byte
+key length, the key (JSON [sample name, label pairs]) padded to 8 bytes,
+and the float64 value.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds (the Prometheus client defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_USED = struct.Struct('<Q')
+_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+# Samples of exited processes, and the lock serializing scrapes
+ARCHIVE_NAME = 'archive.db'
+_LOCK_NAME = 'merge.lock'
+
+_lock = threading.Lock()
+_file = None
+_registry = {}
+
+
+class _ProcessFile:
+    """The metrics file written by this process."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # A fresh name: a file left by an exited process with the same pid
+        # may not have been archived yet
+        name = f'{os.getpid()}-{os.urandom(4).hex()}'
+        self.path = os.path.join(directory, f'{name}.db')
+        partial = os.path.join(directory, f'{name}.new')
+        self._f = open(partial, 'w+b')
+        self._f.truncate(_INITIAL_SIZE)
+        if fcntl is not None:
+            fcntl.flock(self._f.fileno(), fcntl.LOCK_EX)
+        self._map = mmap.mmap(self._f.fileno(), _INITIAL_SIZE)
+        _USED.pack_into(self._map, 0, _USED.size)
+        # Visible to scrapes only once locked, so it is never taken for an
+        # exited process's file
+        os.rename(partial, self.path)
+        self._offsets = {}
+
+    def add(self, key: str, amount: float) -> None:
+        """Add to a value (lock held by the caller)."""
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        _VALUE.pack_into(self._map, offset, _VALUE.unpack_from(self._map, offset)[0] + amount)
+
+    def _append(self, key: str) -> int:
+        encoded = key.encode('utf-8')
+        padded = (_LENGTH.size + len(encoded) + 7) // 8 * 8
+        used = _USED.unpack_from(self._map, 0)[0]
+        if used + padded + _VALUE.size > len(self._map):
+            self._map.resize(max(2 * len(self._map), used + padded + _VALUE.size))
+        _LENGTH.pack_into(self._map, used, len(encoded))
+        self._map[used + _LENGTH.size:used + _LENGTH.size + len(encoded)] = encoded
+        offset = used + padded
+        _VALUE.pack_into(self._map, offset, 0.0)
+        # Published last, so that readers never see a partial entry
+        _USED.pack_into(self._map, 0, offset + _VALUE.size)
+        self._offsets[key] = offset
+        return offset
+
+    def close(self) -> None:
+        self._map.close()
+        self._f.close()
+
+
+def _entries(data) -> Iterator[Tuple[str, int, float]]:
+    """(key, value offset, value) of every entry in a metrics file's bytes."""
+    if len(data) < _USED.size:
+        return
+    used = min(_USED.unpack_from(data, 0)[0], len(data))
+    position = _USED.size
+    while position + _LENGTH.size <= used:
+        length = _LENGTH.unpack_from(data, position)[0]
+        offset = position + (_LENGTH.size + length + 7) // 8 * 8
+        if offset + _VALUE.size > used:
+            break
+        key = bytes(data[position + _LENGTH.size:position + _LENGTH.size + length]).decode('utf-8')
+        yield key, offset, _VALUE.unpack_from(data, offset)[0]
+        position = offset + _VALUE.size
+
+
+def _process_file() -> _ProcessFile:
+    """This process's file in the current METRICS_DIR (lock held by the caller)."""
+    global _file
+    if _file is None or _file.directory != settings.METRICS_DIR:
+        if _file is not None:
+            _file.close()
+        _file = _ProcessFile(settings.METRICS_DIR)
+    return _file
+
+
+def _forget_file() -> None:
+    # A forked child writes its own file, not the parent's
+    global _file, _lock
+    _file = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_file)
+
+
+def _record(updates: Sequence[Tuple[str, float]]) -> None:
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        process_file = _process_file()
+        for key, amount in updates:
+            process_file.add(key, amount)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        _registry[name] = self
+
+    def _label_values(self, labels: Dict) -> Tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} takes the labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _key(self, sample: str, values: Tuple, extra: Tuple = ()) -> str:
+        return json.dumps([sample, [*zip(self.labelnames, values), *extra]])
+
+
+class Counter(_Metric):
+    """Monotonic total; name it with a _total suffix."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        values = self._label_values(labels)
+        key = self._keys.get(values)
+        if key is None:
+            key = self._keys[values] = self._key(self.name, values)
+        _record(((key, amount),))
+
+
+class Histogram(_Metric):
+    """Observations counted into buckets (upper bounds), plus their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != float('inf'))) + (float('inf'),)
+
+    def observe(self, value: float, **labels) -> None:
+        values = self._label_values(labels)
+        keys = self._keys.get(values)
+        if keys is None:
+            keys = self._keys[values] = (
+                [self._key(f'{self.name}_bucket', values, (('le', _format(bound)),))
+                 for bound in self.buckets],
+                self._key(f'{self.name}_sum', values),
+                self._key(f'{self.name}_count', values),
+            )
+        buckets, sum_key, count_key = keys
+        _record(((buckets[bisect_left(self.buckets, value)], 1.0), (sum_key, value), (count_key, 1.0)))
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall seconds spent in the block, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+def collect(directory: Optional[str] = None) -> Dict[Tuple[str, Tuple], float]:
+    """
+    Samples of all processes, added up. Files of exited processes are moved
+    into the archive first.
+
+    Returns:
+        Dict of (sample name, label pairs) to value
+    """
+    directory = directory or settings.METRICS_DIR
+    if not os.path.isdir(directory):
+        return {}
+    if fcntl is None:
+        return _read_files(directory)
+    with open(os.path.join(directory, _LOCK_NAME), 'a+b') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        _archive_exited(directory)
+        return _read_files(directory)
+
+
+def _read_files(directory: str) -> Dict[Tuple[str, Tuple], float]:
+    totals = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.db'):
+            continue
+        try:
+            with open(os.path.join(directory, name), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue
+        for key, _, value in _entries(data):
+            sample, pairs = json.loads(key)
+            sample_key = (sample, tuple(tuple(pair) for pair in pairs))
+            totals[sample_key] = totals.get(sample_key, 0.0) + value
+    return totals
+
+
+def _archive_exited(directory: str) -> None:
+    """Add the files of exited processes to the archive and remove them (scrape lock held)."""
+    values = {}
+    exited = []
+    for name in os.listdir(directory):
+        if not name.endswith('.db') or name == ARCHIVE_NAME:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Its process is running (this one's included: the lock is
+                # held by another open file)
+                continue
+            for key, _, value in _entries(f.read()):
+                values[key] = values.get(key, 0.0) + value
+        exited.append(path)
+    if not exited:
+        return
+
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    try:
+        with open(archive, 'rb') as f:
+            for key, _, value in _entries(f.read()):
+                values[key] = values.get(key, 0.0) + value
+    except FileNotFoundError:
+        pass
+    partial = f'{archive}.new'
+    with open(partial, 'wb') as f:
+        f.write(_encode(values))
+    os.replace(partial, archive)
+    for path in exited:
+        os.remove(path)
+
+
+def _encode(values: Dict[str, float]) -> bytes:
+    """A metrics file holding the given values."""
+    body = bytearray()
+    for key, value in values.items():
+        encoded = key.encode('utf-8')
+        padded = (_LENGTH.size + len(encoded) + 7) // 8 * 8
+        entry = bytearray(padded + _VALUE.size)
+        _LENGTH.pack_into(entry, 0, len(encoded))
+        entry[_LENGTH.size:_LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(entry, padded, value)
+        body += entry
+    return _USED.pack(_USED.size + len(body)) + bytes(body)
+
+
+def render(directory: Optional[str] = None) -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    by_metric = {}
+    for (sample, pairs), value in collect(directory).items():
+        for name in (sample, sample.rsplit('_', 1)[0]):
+            if name in _registry:
+                by_metric.setdefault(name, []).append((sample, pairs, value))
+                break
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        lines.append(f'# HELP {name} {_escape_help(metric.documentation)}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        samples = by_metric.get(name, [])
+        if metric.kind == 'histogram':
+            lines.extend(_histogram_lines(metric, samples))
+        else:
+            lines.extend(f'{sample}{_labels(pairs)} {_format(value)}'
+                         for sample, pairs, value in sorted(samples))
+    return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(metric: Histogram, samples: List) -> List[str]:
+    """Cumulative buckets, sum and count per label set (buckets are stored apart)."""
+    series = {}
+    for sample, pairs, value in samples:
+        if sample.endswith('_bucket'):
+            labels, le = pairs[:-1], float(pairs[-1][1])
+            series.setdefault(labels, {}).setdefault('buckets', {})[le] = value
+        else:
+            series.setdefault(pairs, {})[sample[len(metric.name) + 1:]] = value
+    lines = []
+    for labels, entry in sorted(series.items()):
+        cumulative = 0.0
+        for bound in metric.buckets:
+            cumulative += entry.get('buckets', {}).get(bound, 0.0)
+            lines.append(f'{metric.name}_bucket{_labels(labels + (("le", _format(bound)),))} '
+                         f'{_format(cumulative)}')
+        lines.append(f'{metric.name}_sum{_labels(labels)} {_format(entry.get("sum", 0.0))}')
+        lines.append(f'{metric.name}_count{_labels(labels)} {_format(entry.get("count", 0.0))}')
+    return lines
+
+
+def _labels(pairs: Tuple) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer() and abs(value) < 2 ** 53:
+        return str(int(value)) + '.0'
+    return repr(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def status_class(code: int) -> str:
+    """'2xx', '4xx', ...: the status label, kept to a handful of values."""
+    return f'{code // 100}xx'
+
+
+# Metrics recorded by the application
+
+PROCESSING_SECONDS = Histogram(
+    'fofis_processing_seconds',
+    'Wall seconds of process_flight_case runs, final save included',
+    ('outcome',),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+PROCESSING_POINTS_PER_SECOND = Histogram(
+    'fofis_processing_points_per_second',
+    'Trajectory points per wall second of successful process_flight_case runs',
+    buckets=(1e3, 2.5e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6),
+)
+PROCESSED_POINTS = Counter(
+    'fofis_processed_points_total',
+    'Trajectory points processed by successful process_flight_case runs',
+)
+CPP_VALIDATOR_SECONDS = Histogram(
+    'fofis_cpp_validator_seconds',
+    'Wall seconds of C++ validator calls (one per processed trajectory)',
+    ('mode',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+CPP_VALIDATOR_FAILURES = Counter(
+    'fofis_cpp_validator_failures_total',
+    'C++ validator calls that failed to start, raised, or left points unvalidated',
+    ('mode', 'reason'),
+)
+UPLOAD_BYTES = Histogram(
+    'fofis_upload_bytes',
+    'Sizes of uploaded corridor, trajectory and archive files',
+    ('file',),
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9),
+)
+REQUEST_SECONDS = Histogram(
+    'fofis_http_request_seconds',
+    'Latency of flight case API requests by viewset action, rendering included',
+    ('action', 'method', 'status'),
+)
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_existing_states(apps, schema_editor):
+    """Rows processed before the job queue existed are done or failed."""
+    FlightCase = apps.get_model('monitoring', 'FlightCase')
+    FlightCase.objects.filter(is_processed=True).update(processing_state='done')
+    FlightCase.objects.filter(is_processed=False, processing_error__isnull=False).update(
+        processing_state='failed'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_flightcase_compliance_percentage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightcase',
+            name='processing_state',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', help_text='State of the latest processing run', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='ProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=16)),
+                ('progress', models.FloatField(default=0.0, help_text='Fraction of the processing completed (0-1)')),
+                ('stage', models.CharField(blank=True, default='', help_text='Processing stage currently running', max_length=32)),
+                ('error', models.TextField(blank=True, help_text='Error message if the job failed', null=True)),
+                ('worker', models.CharField(blank=True, default='', help_text='Worker that claimed the job (host:pid)', max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('flight_case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='monitoring.flightcase')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.RunPython(set_existing_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,211 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+import json
+import struct
+import zlib
+
+import numpy as np
+from django.db import migrations, models
+
+
+# Version 1 of the columnar blob format (monitoring/columnar.py), copied so
+# that later changes to the app code do not change what this migration
+# writes or reads.
+
+MAGIC = b'FCOL'
+SCHEMA_VERSION = 1
+HEADER = struct.Struct('<4sHIH')
+ENTRY = struct.Struct('<QQ')
+VALUE, NULL, ABSENT = 0, 1, 2
+STATE_SUFFIX = '#state'
+EXTRA_COLUMN = '_extra'
+STRING = 'str'
+
+TRAJECTORY_SCHEMA = (
+    ('latitude', '<f8'),
+    ('longitude', '<f8'),
+    ('altitude', '<f8'),
+    ('time', STRING),
+    ('time_seconds', '<f8'),
+    ('speed', '<f8'),
+    ('deviation', '<f8'),
+    ('nearest_segment', '<i4'),
+    ('allowed_deviation', '<f8'),
+    ('allowed_speed', '<f8'),
+    ('compliant', '|b1'),
+    ('cpp_deviation', '<f8'),
+    ('cpp_speed_violation', '<f8'),
+    ('cpp_compliant', '|b1'),
+    ('cpp_error', STRING),
+)
+
+CORRIDOR_SCHEMA = (
+    ('longitude', '<f8'),
+    ('latitude', '<f8'),
+    ('altitude', '<f8'),
+    ('allowed_deviation', '<f8'),
+    ('allowed_speed', '<f8'),
+)
+
+
+def fill_value(dtype):
+    if dtype == STRING:
+        return ''
+    kind = np.dtype(dtype).kind
+    if kind == 'f':
+        return np.nan
+    if kind == 'b':
+        return False
+    return -1
+
+
+def encode_points(points, schema):
+    """Point dicts as a version 1 blob (columnar.encode_points)."""
+    rows = len(points)
+    columns = {}
+    known = {name for name, _ in schema} | {'index'}
+    for name, dtype in schema:
+        state = np.fromiter(
+            (VALUE if p.get(name) is not None else (NULL if name in p else ABSENT) for p in points),
+            dtype=np.int8, count=rows
+        )
+        if rows and (state == ABSENT).all():
+            continue
+        values = [p.get(name) for p in points]
+        if state.any():
+            fill = fill_value(dtype)
+            values = [fill if v is None else v for v in values]
+        columns[name] = values if dtype == STRING else np.array(values, dtype=dtype).reshape(rows)
+        if state.any():
+            columns[name + STATE_SUFFIX] = state
+    extra = [{k: v for k, v in p.items() if k not in known} for p in points]
+    if any(extra):
+        columns[EXTRA_COLUMN] = [json.dumps(e) if e else '' for e in extra]
+
+    entries = []
+    payloads = []
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            array = np.ascontiguousarray(values)
+            dtype = array.dtype.str
+            raw = array.view(np.uint8).reshape(rows, array.dtype.itemsize).T.tobytes()
+        else:
+            dtype = STRING
+            encoded = [str(v).encode('utf-8') for v in values]
+            lengths = np.fromiter(map(len, encoded), dtype='<u4', count=rows)
+            raw = lengths.tobytes() + b''.join(encoded)
+        entries.append((name.encode('utf-8'), dtype.encode('ascii')))
+        payloads.append(zlib.compress(raw, 6))
+
+    header = [HEADER.pack(MAGIC, SCHEMA_VERSION, rows, len(entries))]
+    offset = HEADER.size + sum(2 + len(name) + len(dtype) + ENTRY.size for name, dtype in entries)
+    for (name, dtype), payload in zip(entries, payloads):
+        header.append(struct.pack('<B', len(name)) + name)
+        header.append(struct.pack('<B', len(dtype)) + dtype)
+        header.append(ENTRY.pack(offset, len(payload)))
+        offset += len(payload)
+    return b''.join(header + payloads)
+
+
+def decode_points(blob, schema):
+    """Point dicts of a version 1 blob (columnar.decode_points)."""
+    blob = memoryview(blob)
+    magic, version, rows, count = HEADER.unpack_from(blob, 0)
+    if magic != MAGIC or version > SCHEMA_VERSION:
+        raise ValueError(f"Unsupported columnar blob (version {version})")
+    position = HEADER.size
+    columns = {}
+    for _ in range(count):
+        size = blob[position]
+        name = bytes(blob[position + 1:position + 1 + size]).decode('utf-8')
+        position += 1 + size
+        size = blob[position]
+        dtype = bytes(blob[position + 1:position + 1 + size]).decode('ascii')
+        position += 1 + size
+        offset, length = ENTRY.unpack_from(blob, position)
+        position += ENTRY.size
+        raw = zlib.decompress(blob[offset:offset + length])
+        if dtype == STRING:
+            lengths = np.frombuffer(raw, dtype='<u4', count=rows)
+            data = raw[4 * rows:]
+            ends = np.cumsum(lengths).tolist()
+            starts = [0] + ends[:-1]
+            columns[name] = [data[s:e].decode('utf-8') for s, e in zip(starts, ends)]
+        else:
+            itemsize = np.dtype(dtype).itemsize
+            shuffled = np.frombuffer(raw, dtype=np.uint8).reshape(itemsize, rows)
+            columns[name] = shuffled.T.copy().view(dtype).reshape(rows).tolist()
+
+    points = [{} for _ in range(rows)]
+    for name, _ in schema:
+        if name not in columns:
+            continue
+        state = columns.get(name + STATE_SUFFIX)
+        if state is None:
+            for point, value in zip(points, columns[name]):
+                point[name] = value
+        else:
+            for point, value, code in zip(points, columns[name], state):
+                if code == VALUE:
+                    point[name] = value
+                elif code == NULL:
+                    point[name] = None
+    for i, point in enumerate(points):
+        point['index'] = i
+    if EXTRA_COLUMN in columns:
+        for point, extra in zip(points, columns[EXTRA_COLUMN]):
+            if extra:
+                point.update(json.loads(extra))
+    return points
+
+
+def json_to_blobs(apps, schema_editor):
+    """Encode existing JSON point lists as columnar blobs."""
+    FlightCase = apps.get_model('monitoring', 'FlightCase')
+    rows = FlightCase.objects.only('id', 'corridor_data', 'trajectory_data')
+    for flight_case in rows.iterator(chunk_size=50):
+        if flight_case.corridor_data is not None:
+            flight_case.corridor_blob = encode_points(flight_case.corridor_data, CORRIDOR_SCHEMA)
+        if flight_case.trajectory_data is not None:
+            flight_case.trajectory_blob = encode_points(flight_case.trajectory_data, TRAJECTORY_SCHEMA)
+        flight_case.save(update_fields=['corridor_blob', 'trajectory_blob'])
+
+
+def blobs_to_json(apps, schema_editor):
+    FlightCase = apps.get_model('monitoring', 'FlightCase')
+    rows = FlightCase.objects.only('id', 'corridor_blob', 'trajectory_blob')
+    for flight_case in rows.iterator(chunk_size=50):
+        if flight_case.corridor_blob is not None:
+            flight_case.corridor_data = decode_points(flight_case.corridor_blob, CORRIDOR_SCHEMA)
+        if flight_case.trajectory_blob is not None:
+            flight_case.trajectory_data = decode_points(flight_case.trajectory_blob, TRAJECTORY_SCHEMA)
+        flight_case.save(update_fields=['corridor_data', 'trajectory_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0003_processing_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightcase',
+            name='corridor_blob',
+            field=models.BinaryField(blank=True, help_text='Parsed corridor points (columnar blob)', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='trajectory_blob',
+            field=models.BinaryField(blank=True, help_text='Parsed trajectory points with computed speeds (columnar blob)', null=True),
+        ),
+        migrations.RunPython(json_to_blobs, blobs_to_json),
+        migrations.RemoveField(
+            model_name='flightcase',
+            name='corridor_data',
+        ),
+        migrations.RemoveField(
+            model_name='flightcase',
+            name='trajectory_data',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0004_columnar_point_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flightcase',
+            index=models.Index(fields=['created_at', 'id'], name='flightcase_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightcase',
+            index=models.Index(fields=['compliance_percentage', 'id'], name='flightcase_compliance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightcase',
+            index=models.Index(fields=['is_processed', 'created_at', 'id'], name='flightcase_processed_idx'),
+        ),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:13
+
+import hashlib
+import struct
+import zlib
+
+import numpy as np
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Corridor file parsing, content hashing and the version 1 columnar blob
+# format (monitoring/parsers.py, corridors.py, columnar.py), copied so that
+# later changes to the app code do not change what this migration writes.
+# Geometry is not precomputed here: corridors.load_blobs rebuilds it for a
+# corridor whose geometry_version is 0.
+
+CORRIDOR_COLUMNS = ('longitude', 'latitude', 'altitude', 'allowed_deviation', 'allowed_speed')
+
+MAGIC = b'FCOL'
+SCHEMA_VERSION = 1
+HEADER = struct.Struct('<4sHIH')
+ENTRY = struct.Struct('<QQ')
+
+
+def parse_corridor_columns(file_path):
+    """Float64 columns of a corridor file (parsers.parse_corridor_columns)."""
+    rows = []
+    with open(file_path, 'r') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split()
+            if len(parts) != len(CORRIDOR_COLUMNS):
+                raise ValueError(f"Line {line_num}: Expected 5 values, got {len(parts)}")
+            try:
+                rows.append([float(part) for part in parts])
+            except ValueError as e:
+                raise ValueError(f"Line {line_num}: Invalid number format - {e}")
+    if not rows:
+        raise ValueError("Corridor file is empty or contains no valid data")
+    values = np.array(rows, dtype=np.float64)
+    return {key: values[:, i].copy() for i, key in enumerate(CORRIDOR_COLUMNS)}
+
+
+def content_hash(columns):
+    """SHA-256 of parsed corridor columns (corridors.content_hash)."""
+    digest = hashlib.sha256()
+    for key in CORRIDOR_COLUMNS:
+        digest.update(np.ascontiguousarray(columns[key], dtype='<f8').tobytes())
+    return digest.hexdigest()
+
+
+def encode_points(columns):
+    """
+    Corridor columns as a version 1 blob, without the map tolerance column
+    (readers compute tolerances when it is missing).
+    """
+    rows = len(columns['latitude'])
+    entries = []
+    payloads = []
+    for name in CORRIDOR_COLUMNS:
+        array = np.ascontiguousarray(columns[name], dtype='<f8')
+        raw = array.view(np.uint8).reshape(rows, array.dtype.itemsize).T.tobytes()
+        entries.append((name.encode('utf-8'), array.dtype.str.encode('ascii')))
+        payloads.append(zlib.compress(raw, 6))
+
+    header = [HEADER.pack(MAGIC, SCHEMA_VERSION, rows, len(entries))]
+    offset = HEADER.size + sum(2 + len(name) + len(dtype) + ENTRY.size for name, dtype in entries)
+    for (name, dtype), payload in zip(entries, payloads):
+        header.append(struct.pack('<B', len(name)) + name)
+        header.append(struct.pack('<B', len(dtype)) + dtype)
+        header.append(ENTRY.pack(offset, len(payload)))
+        offset += len(payload)
+    return b''.join(header + payloads)
+
+
+def link_corridors(apps, schema_editor):
+    """
+    Create a Corridor per distinct corridor and link existing flight cases.
+
+    Duplicate corridor files are left in storage; only new uploads are
+    deduplicated. Cases whose corridor file is missing or does not parse
+    stay unlinked. Geometry is built the first time each corridor is loaded.
+    """
+    Corridor = apps.get_model('monitoring', 'Corridor')
+    FlightCase = apps.get_model('monitoring', 'FlightCase')
+    ids_by_hash = {}
+    rows = FlightCase.objects.only('id', 'corridor_file').order_by('id')
+    for flight_case in rows.iterator(chunk_size=200):
+        try:
+            columns = parse_corridor_columns(flight_case.corridor_file.path)
+        except (OSError, ValueError):
+            continue
+        digest = content_hash(columns)
+        if digest not in ids_by_hash:
+            ids_by_hash[digest] = Corridor.objects.create(
+                content_hash=digest,
+                file=flight_case.corridor_file.name,
+                point_count=len(columns['latitude']),
+                points_blob=encode_points(columns),
+                geometry_blob=None,
+                geometry_version=0,
+            ).id
+        FlightCase.objects.filter(pk=flight_case.pk).update(corridor_id=ids_by_hash[digest])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0005_flight_case_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Corridor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the parsed corridor columns', max_length=64, unique=True)),
+                ('file', models.FileField(help_text='Corridor file as first uploaded', upload_to='corridors/')),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('points_blob', models.BinaryField(help_text='Parsed corridor points with map tolerances (columnar blob)')),
+                ('geometry_blob', models.BinaryField(blank=True, help_text='Per-segment geometry and bounding boxes (columnar blob)', null=True)),
+                ('geometry_version', models.PositiveSmallIntegerField(default=0, help_text='corridors.GEOMETRY_VERSION that wrote geometry_blob')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='corridor',
+            field=models.ForeignKey(blank=True, help_text='Shared corridor (set at upload; None if the corridor file did not parse)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flight_cases', to='monitoring.corridor'),
+        ),
+        migrations.RunPython(link_corridors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0006_shared_corridors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightcase',
+            name='compliant_count',
+            field=models.PositiveIntegerField(blank=True, help_text='Points marked compliant by the Python or C++ check', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='deviation_sum',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='last_point',
+            field=models.JSONField(blank=True, help_text='Values of the last trajectory point needed to append after it', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='point_count',
+            field=models.PositiveIntegerField(blank=True, help_text='Number of trajectory points, including appended ones', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='speed_sum',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TrajectoryChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.PositiveIntegerField(help_text='Index of the first point in the chunk')),
+                ('rows', models.PositiveIntegerField()),
+                ('blob', models.BinaryField(help_text='Appended points (columnar blob)')),
+                ('previous_speed', models.FloatField(blank=True, null=True)),
+                ('previous_compliant', models.BooleanField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('flight_case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trajectory_chunks', to='monitoring.flightcase')),
+            ],
+            options={
+                'ordering': ['flight_case', 'start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trajectorychunk',
+            constraint=models.UniqueConstraint(fields=('flight_case', 'start'), name='trajectorychunk_start_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0007_live_trajectory_append'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowFlightCase',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'slowest flight case',
+                'verbose_name_plural': 'slowest flight cases',
+                'ordering': ['-processing_seconds'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('monitoring.flightcase',),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='processing_seconds',
+            field=models.FloatField(blank=True, db_index=True, help_text='Wall time of the latest processing run (seconds)', null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='processing_stats',
+            field=models.JSONField(blank=True, help_text='Wall/CPU seconds per stage and point/segment counts of the latest run', null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0008_processing_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViolationInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_index', models.PositiveIntegerField(help_text='Index of the first violating point')),
+                ('end_index', models.PositiveIntegerField(help_text='Index of the last violating point')),
+                ('start_time_seconds', models.FloatField(help_text='Time of the first point (seconds since midnight)')),
+                ('end_time_seconds', models.FloatField(help_text='Time of the last point (seconds since midnight)')),
+                ('duration_seconds', models.FloatField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('deviation', 'Deviation'), ('speed', 'Speed'), ('both', 'Deviation and speed')], max_length=16)),
+                ('deviation_excess', models.FloatField(blank=True, help_text='Largest deviation beyond the allowed one (meters)', null=True)),
+                ('speed_excess', models.FloatField(blank=True, help_text='Largest speed beyond the allowed one (km/h)', null=True)),
+                ('severity', models.FloatField(blank=True, help_text='Largest excess relative to its limit (0.5 = 50% over)', null=True)),
+                ('flight_case', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='violation_intervals', to='monitoring.flightcase')),
+            ],
+            options={
+                'ordering': ['flight_case', 'start_index'],
+                'indexes': [models.Index(fields=['flight_case', 'start_index'], name='violation_case_idx'), models.Index(fields=['severity', 'id'], name='violation_severity_idx'), models.Index(fields=['kind', 'severity', 'id'], name='violation_kind_idx'), models.Index(fields=['start_time_seconds', 'id'], name='violation_start_idx'), models.Index(fields=['duration_seconds', 'id'], name='violation_duration_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0009_violation_intervals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flightcase',
+            name='max_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='max_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='min_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flightcase',
+            name='min_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='flightcase',
+            index=models.Index(fields=['min_longitude', 'max_longitude', 'min_latitude', 'max_latitude'], name='flightcase_extent_idx'),
+        ),
+    ]
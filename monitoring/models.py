@@ -5,6 +5,65 @@ from django.db import models
 from django.core.validators import FileExtensionValidator
 import json
 
+import numpy as np
+
+from . import response_cache
+from .columnar import (
+    CORRIDOR_SCHEMA,
+    TRAJECTORY_SCHEMA,
+    columns_to_points,
+    decode_columns,
+    decode_points,
+    encode_points,
+    read_header,
+)
+
+
+class ProcessingState(models.TextChoices):
+    """Lifecycle of a processing run (shared by FlightCase and ProcessingJob)."""
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+
+class Corridor(models.Model):
+    """
+    A corridor shared by every flight case that flies it, identified by the
+    hash of its parsed points. Geometry is precomputed at ingestion (see
+    corridors.py).
+    """
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text='SHA-256 of the parsed corridor columns'
+    )
+    file = models.FileField(
+        upload_to='corridors/',
+        help_text='Corridor file as first uploaded'
+    )
+    point_count = models.PositiveIntegerField(default=0)
+    points_blob = models.BinaryField(
+        help_text='Parsed corridor points with map tolerances (columnar blob)'
+    )
+    geometry_blob = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='Per-segment geometry and bounding boxes (columnar blob)'
+    )
+    geometry_version = models.PositiveSmallIntegerField(
+        default=0,
+        help_text='corridors.GEOMETRY_VERSION that wrote geometry_blob'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"Corridor #{self.id} ({self.point_count} points, {self.content_hash[:12]})"
+
 
 class FlightCase(models.Model):
     """
@@ -22,6 +81,14 @@ class FlightCase(models.Model):
         validators=[FileExtensionValidator(allowed_extensions=['txt'])],
         help_text='Aircraft trajectory file (latitude, longitude, altitude, time)'
     )
+    corridor = models.ForeignKey(
+        Corridor,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='flight_cases',
+        help_text='Shared corridor (set at upload; None if the corridor file did not parse)'
+    )
     
     # Computed metrics
     mean_deviation = models.FloatField(
@@ -45,18 +112,46 @@ class FlightCase(models.Model):
         help_text='Percentage of trajectory points within corridor constraints (calculated by C++)'
     )
     
-    # Parsed data stored as JSON for quick retrieval
-    corridor_data = models.JSONField(
+    # Parsed data stored as compressed columnar blobs (see columnar.py);
+    # use corridor_data/trajectory_data or the *_columns() accessors
+    corridor_blob = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='Parsed corridor points (columnar blob)'
+    )
+    trajectory_blob = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='Parsed trajectory points with computed speeds (columnar blob)'
+    )
+    
+    # Running aggregates, so appended points (live.py) update the metrics
+    # without revisiting earlier points
+    point_count = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Number of trajectory points, including appended ones'
+    )
+    speed_sum = models.FloatField(null=True, blank=True)
+    deviation_sum = models.FloatField(null=True, blank=True)
+    compliant_count = models.PositiveIntegerField(
         null=True,
         blank=True,
-        help_text='Parsed corridor points'
+        help_text='Points marked compliant by the Python or C++ check'
     )
-    trajectory_data = models.JSONField(
+    last_point = models.JSONField(
         null=True,
         blank=True,
-        help_text='Parsed trajectory points with computed speeds'
+        help_text='Values of the last trajectory point needed to append after it'
     )
     
+    # Extent of the trajectory and corridor points, to find the flight
+    # cases drawn on a map tile without their blobs (see tiles.py)
+    min_latitude = models.FloatField(null=True, blank=True)
+    max_latitude = models.FloatField(null=True, blank=True)
+    min_longitude = models.FloatField(null=True, blank=True)
+    max_longitude = models.FloatField(null=True, blank=True)
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -71,25 +166,180 @@ class FlightCase(models.Model):
         blank=True,
         help_text='Error message if processing failed'
     )
+    processing_state = models.CharField(
+        max_length=16,
+        choices=ProcessingState.choices,
+        default=ProcessingState.QUEUED,
+        help_text='State of the latest processing run'
+    )
+    processing_stats = models.JSONField(
+        null=True,
+        blank=True,
+        help_text='Wall/CPU seconds per stage and point/segment counts of the latest run'
+    )
+    processing_seconds = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text='Wall time of the latest processing run (seconds)'
+    )
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination and filters of the list endpoint
+            models.Index(fields=['created_at', 'id'], name='flightcase_created_idx'),
+            models.Index(fields=['compliance_percentage', 'id'], name='flightcase_compliance_idx'),
+            models.Index(fields=['is_processed', 'created_at', 'id'], name='flightcase_processed_idx'),
+            models.Index(fields=['min_longitude', 'max_longitude', 'min_latitude', 'max_latitude'],
+                         name='flightcase_extent_idx'),
+        ]
     
     def __str__(self):
         return f"FlightCase #{self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
     
+    def save(self, *args, **kwargs):
+        from . import tiles
+        
+        super().save(*args, **kwargs)
+        # Cached API bodies and map tiles of this case are out of date
+        response_cache.invalidate(self.pk)
+        tiles.invalidate(self.pk)
+    
+    def delete(self, *args, **kwargs):
+        from . import tiles
+        
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        response_cache.invalidate(pk)
+        tiles.invalidate(pk)
+        return result
+    
+    @property
+    def corridor_data(self):
+        """Parsed corridor points as a list of dicts (decodes every column)."""
+        if self.corridor_blob is None:
+            return None
+        return decode_points(self.corridor_blob, CORRIDOR_SCHEMA)
+    
+    @corridor_data.setter
+    def corridor_data(self, points):
+        self.set_corridor_data(points)
+    
+    @property
+    def trajectory_data(self):
+        """Parsed trajectory points as a list of dicts (decodes every column)."""
+        if self.trajectory_blob is None:
+            return None
+        columns = self.trajectory_columns()
+        return columns_to_points(columns, TRAJECTORY_SCHEMA, len(columns['latitude']))
+    
+    @trajectory_data.setter
+    def trajectory_data(self, points):
+        self.set_trajectory_data(points)
+    
+    def set_corridor_data(self, points, extra_columns=None):
+        """
+        Store corridor points, plus optional derived per-point columns
+        (e.g. 'lod_tolerance') readable through corridor_columns().
+        """
+        self.corridor_blob = (
+            None if points is None else encode_points(points, CORRIDOR_SCHEMA, extra_columns)
+        )
+    
+    def set_trajectory_data(self, points, extra_columns=None):
+        """
+        Store trajectory points; see set_corridor_data.
+        
+        Appended chunks are not removed here (processing.store_results does),
+        and the running aggregates are reset until the next processing run.
+        """
+        self.trajectory_blob = (
+            None if points is None else encode_points(points, TRAJECTORY_SCHEMA, extra_columns)
+        )
+        self.point_count = None if points is None else len(points)
+        self.speed_sum = self.deviation_sum = self.compliant_count = self.last_point = None
+    
+    def corridor_columns(self, names=None):
+        """
+        Decode corridor columns lazily.
+        
+        Args:
+            names: Column names to return (all stored columns if omitted)
+        
+        Returns:
+            Dict of column name -> read-only array; empty if there is no data
+        """
+        return self._columns('corridor_blob', names)
+    
+    def trajectory_columns(self, names=None):
+        """
+        Decode trajectory columns lazily; see corridor_columns.
+        """
+        return self._columns('trajectory_blob', names)
+    
+    @property
+    def trajectory_point_count(self):
+        """Number of stored trajectory points (reads at most the blob header)."""
+        if self.point_count is not None:
+            return self.point_count
+        if self.trajectory_blob is None:
+            return 0
+        return read_header(self.trajectory_blob)[1]
+    
+    def _columns(self, field, names):
+        blob = getattr(self, field)
+        if blob is None:
+            return {}
+        
+        # Decoded columns are cached until the blob is replaced
+        cache = self.__dict__.setdefault('_column_cache', {})
+        cached_blob, decoded = cache.get(field, (None, None))
+        if cached_blob is not blob:
+            decoded = {}
+            cache[field] = (blob, decoded)
+        
+        if field == 'trajectory_blob' and self._has_chunks(blob):
+            # Appended points: every column is merged in one pass
+            if not decoded:
+                from .live import combined_columns
+                for name, values in combined_columns(self, blob).items():
+                    values.flags.writeable = False
+                    decoded[name] = values
+            if names is None:
+                names = list(decoded)
+        
+        if names is None:
+            names = list(read_header(blob)[2])
+        missing = [name for name in names if name not in decoded]
+        if missing:
+            for name, values in decode_columns(blob, missing).items():
+                values.flags.writeable = False
+                decoded[name] = values
+        
+        return {name: decoded[name] for name in names if name in decoded}
+    
+    def _has_chunks(self, blob):
+        """Whether points were appended after blob (see live.py)."""
+        return self.point_count is not None and self.point_count > read_header(blob)[1]
+    
+    def clear_column_cache(self):
+        self.__dict__.pop('_column_cache', None)
+    
     @property
     def trajectory_start_time(self):
         """Get the first timestamp from trajectory data."""
-        if self.trajectory_data and len(self.trajectory_data) > 0:
-            return self.trajectory_data[0].get('time')
+        times = self.trajectory_columns(['time']).get('time')
+        if times is not None and len(times) > 0:
+            return times[0]
         return None
     
     @property
     def trajectory_end_time(self):
         """Get the last timestamp from trajectory data."""
-        if self.trajectory_data and len(self.trajectory_data) > 0:
-            return self.trajectory_data[-1].get('time')
+        times = self.trajectory_columns(['time']).get('time')
+        if times is not None and len(times) > 0:
+            return times[-1]
         return None
     
     def calculate_compliance_python(self):
@@ -98,18 +348,172 @@ class FlightCase(models.Model):
         Returns percentage of points where deviation <= allowed_deviation.
         This is a fallback if C++ calculation is not available.
         """
-        if not self.trajectory_data or not self.corridor_data:
+        if not self.trajectory_point_count or self.corridor_blob is None:
             return None
         
-        compliant_count = 0
-        total_count = len(self.trajectory_data)
+        columns = self.trajectory_columns(
+            ['deviation', 'allowed_deviation', 'speed', 'allowed_speed']
+        )
+        if 'deviation' not in columns or 'allowed_deviation' not in columns:
+            return 0.0
         
-        for point in self.trajectory_data:
-            if point.get('deviation') is not None and point.get('allowed_deviation') is not None:
-                if point['deviation'] <= point['allowed_deviation'] and point.get('speed', 0) <= point.get('allowed_speed', float('inf')):
-                    compliant_count += 1
+        total_count = self.trajectory_point_count
+        speed = columns.get('speed', np.zeros(total_count))
+        allowed_speed = columns.get('allowed_speed', np.full(total_count, np.inf))
         
-        if total_count > 0:
-            return (compliant_count / total_count) * 100
-        return None
+        # Missing limits are stored as NaN, which compares False
+        compliant_count = np.count_nonzero(
+            (columns['deviation'] <= columns['allowed_deviation']) &
+            (speed <= allowed_speed)
+        )
+        
+        return (compliant_count / total_count) * 100
+
 
+class SlowFlightCase(FlightCase):
+    """
+    Flight cases by processing time, for the admin's slowest cases view.
+    """
+    class Meta:
+        proxy = True
+        ordering = ['-processing_seconds']
+        verbose_name = 'slowest flight case'
+        verbose_name_plural = 'slowest flight cases'
+
+
+class TrajectoryChunk(models.Model):
+    """
+    Trajectory points appended to a processed FlightCase (see live.py).
+    
+    Rows start..start + rows - 1 of the trajectory, as a columnar blob. A
+    chunk also carries the new speed and compliance of the point before it,
+    which change once that point is no longer the last one.
+    """
+    flight_case = models.ForeignKey(
+        FlightCase,
+        on_delete=models.CASCADE,
+        related_name='trajectory_chunks'
+    )
+    start = models.PositiveIntegerField(help_text='Index of the first point in the chunk')
+    rows = models.PositiveIntegerField()
+    blob = models.BinaryField(help_text='Appended points (columnar blob)')
+    previous_speed = models.FloatField(null=True, blank=True)
+    previous_compliant = models.BooleanField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['flight_case', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['flight_case', 'start'], name='trajectorychunk_start_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"TrajectoryChunk of FlightCase #{self.flight_case_id} [{self.start}:{self.start + self.rows}]"
+
+
+class ViolationKind(models.TextChoices):
+    """Limits exceeded during a violation interval."""
+    DEVIATION = 'deviation', 'Deviation'
+    SPEED = 'speed', 'Speed'
+    BOTH = 'both', 'Deviation and speed'
+
+
+class ViolationInterval(models.Model):
+    """
+    A run of consecutive non-compliant trajectory points (see violations.py).
+    
+    Written with the processing results and extended by appends, so
+    violations can be searched across flight cases without the point blobs.
+    """
+    flight_case = models.ForeignKey(
+        FlightCase,
+        on_delete=models.CASCADE,
+        related_name='violation_intervals'
+    )
+    start_index = models.PositiveIntegerField(help_text='Index of the first violating point')
+    end_index = models.PositiveIntegerField(help_text='Index of the last violating point')
+    start_time_seconds = models.FloatField(help_text='Time of the first point (seconds since midnight)')
+    end_time_seconds = models.FloatField(help_text='Time of the last point (seconds since midnight)')
+    duration_seconds = models.FloatField()
+    point_count = models.PositiveIntegerField()
+    kind = models.CharField(max_length=16, choices=ViolationKind.choices)
+    deviation_excess = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Largest deviation beyond the allowed one (meters)'
+    )
+    speed_excess = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Largest speed beyond the allowed one (km/h)'
+    )
+    severity = models.FloatField(
+        null=True,
+        blank=True,
+        help_text='Largest excess relative to its limit (0.5 = 50% over)'
+    )
+    
+    class Meta:
+        ordering = ['flight_case', 'start_index']
+        indexes = [
+            # Per case listing, and the cursor orderings of the search
+            models.Index(fields=['flight_case', 'start_index'], name='violation_case_idx'),
+            models.Index(fields=['severity', 'id'], name='violation_severity_idx'),
+            models.Index(fields=['kind', 'severity', 'id'], name='violation_kind_idx'),
+            models.Index(fields=['start_time_seconds', 'id'], name='violation_start_idx'),
+            models.Index(fields=['duration_seconds', 'id'], name='violation_duration_idx'),
+        ]
+    
+    def __str__(self):
+        return (f"{self.get_kind_display()} violation of FlightCase #{self.flight_case_id} "
+                f"[{self.start_index}:{self.end_index + 1}]")
+
+
+class ProcessingJob(models.Model):
+    """
+    A queued run of process_flight_case, executed by the process_jobs worker.
+    """
+    flight_case = models.ForeignKey(
+        FlightCase,
+        on_delete=models.CASCADE,
+        related_name='jobs'
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=ProcessingState.choices,
+        default=ProcessingState.QUEUED,
+        db_index=True
+    )
+    progress = models.FloatField(
+        default=0.0,
+        help_text='Fraction of the processing completed (0-1)'
+    )
+    stage = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text='Processing stage currently running'
+    )
+    error = models.TextField(
+        null=True,
+        blank=True,
+        help_text='Error message if the job failed'
+    )
+    worker = models.CharField(
+        max_length=128,
+        blank=True,
+        default='',
+        help_text='Worker that claimed the job (host:pid)'
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+    
+    def __str__(self):
+        return f"ProcessingJob #{self.id} ({self.status}) for FlightCase #{self.flight_case_id}"
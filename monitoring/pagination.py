@@ -0,0 +1,125 @@
+"""
+Keyset (cursor) pagination for the flight case list and the violation search.
+
+Pages are selected with a WHERE on the ordering column and the id of the
+last row sent, so every page costs one index range scan however deep into
+the list it is, and rows inserted meanwhile do not shift later pages.
+Nulls (compliance percentages, severities) sort last in both directions.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class FlightCaseCursorPagination(BasePagination):
+    """
+    Query parameters:
+    - ordering: created_at or compliance_percentage, '-' prefix for
+      descending (default -created_at); ties are ordered by id
+    - page_size: rows per page (default 50, at most 500)
+    - cursor: 'next' link of the previous page
+    """
+    ordering_fields = ('created_at', 'compliance_percentage')
+    default_ordering = '-created_at'
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        params = request.query_params
+
+        ordering = params.get('ordering', self.default_ordering)
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields:
+            raise ValidationError({'ordering': f"Must be one of {', '.join(self.ordering_fields)}"})
+        descending = ordering.startswith('-')
+        self.ordering = ordering
+
+        try:
+            page_size = int(params.get('page_size', self.page_size))
+        except ValueError:
+            raise ValidationError({'page_size': 'Must be an integer'})
+        page_size = min(max(page_size, 1), self.max_page_size)
+
+        if descending:
+            order = [F(field).desc(nulls_last=True), F('id').desc()]
+        else:
+            order = [F(field).asc(nulls_last=True), F('id').asc()]
+        queryset = queryset.order_by(*order)
+
+        if params.get('cursor'):
+            value, last_id = self._decode_cursor(params['cursor'], field)
+            queryset = queryset.filter(self._after(field, value, last_id, descending))
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.last = rows[-1] if rows else None
+        self.field = field
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        value = getattr(self.last, self.field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, 'ordering', self.ordering)
+        return replace_query_param(url, 'cursor', self._encode_cursor(value, self.last.pk))
+
+    @staticmethod
+    def _after(field, value, last_id, descending) -> Q:
+        """Rows after (value, last_id) in the page ordering."""
+        if value is None:
+            # Already inside the trailing nulls
+            id_after = Q(id__lt=last_id) if descending else Q(id__gt=last_id)
+            return Q(**{f'{field}__isnull': True}) & id_after
+        beyond = f'{field}__lt' if descending else f'{field}__gt'
+        id_after = Q(id__lt=last_id) if descending else Q(id__gt=last_id)
+        return (
+            Q(**{beyond: value})
+            | (Q(**{field: value}) & id_after)
+            | Q(**{f'{field}__isnull': True})
+        )
+
+    @staticmethod
+    def _encode_cursor(value, last_id) -> str:
+        payload = json.dumps({'v': value, 'id': last_id}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor, field):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value, last_id = payload['v'], int(payload['id'])
+            if value is not None:
+                value = datetime.fromisoformat(value) if field == 'created_at' else float(value)
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
+        return value, last_id
+
+
+class ViolationIntervalCursorPagination(FlightCaseCursorPagination):
+    """
+    Keyset pagination of the violation search; query parameters as for
+    flight cases, ordering by severity (default -severity),
+    start_time_seconds or duration_seconds.
+    """
+    ordering_fields = ('severity', 'start_time_seconds', 'duration_seconds')
+    default_ordering = '-severity'
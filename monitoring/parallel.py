@@ -0,0 +1,195 @@
+"""
+Multi-core evaluation of long trajectories.
+
+The nearest-segment search is split into contiguous chunks of trajectory
+points and evaluated in a process pool. The corridor and trajectory
+coordinates are copied once into a shared memory block; tasks only carry the
+block name and a (start, stop) range, so nothing large is pickled per task.
+Each worker builds the CorridorIndex once per block and reuses it for every
+chunk of that job.
+
+Chunks are merged back in trajectory order and speeds, limits and
+compliance are computed on the merged arrays, so results (and any
+aggregates derived from them) are identical to vectorized.evaluate_trajectory
+whatever the worker count.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from .spatial_index import CorridorIndex
+from .vectorized import CorridorGeometry, compute_speeds, evaluate_trajectory
+
+logger = logging.getLogger(__name__)
+
+# Trajectories shorter than this are evaluated serially by default
+PARALLEL_MIN_POINTS = 100_000
+
+# Smallest chunk worth a task, and chunks queued per worker for load balancing
+MIN_CHUNK_POINTS = 10_000
+CHUNKS_PER_WORKER = 4
+
+CORRIDOR_COLUMNS = ('latitude', 'longitude', 'altitude', 'allowed_deviation', 'allowed_speed')
+TRAJECTORY_COLUMNS = ('latitude', 'longitude', 'altitude')
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+# Worker side: shared block name -> (SharedMemory, CorridorIndex)
+_attached: Dict[str, tuple] = {}
+
+
+def evaluate_trajectory_parallel(
+    columns: Dict[str, np.ndarray],
+    corridor: CorridorGeometry,
+    workers: Optional[int] = None,
+    min_points: int = PARALLEL_MIN_POINTS,
+    index: Optional[CorridorIndex] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Parallel version of vectorized.evaluate_trajectory.
+
+    Falls back to serial evaluation for short trajectories, a single
+    worker, or if the process pool breaks.
+
+    Args:
+        columns: Trajectory columns as returned by trajectory_arrays
+        corridor: Precomputed CorridorGeometry
+        workers: Number of worker processes (defaults to the CPU count)
+        min_points: Trajectories with fewer points are evaluated serially
+        index: CorridorIndex of corridor for serial evaluation (built if omitted)
+
+    Returns:
+        Dict of result arrays, as vectorized.evaluate_trajectory
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    n = len(columns['latitude'])
+
+    if workers > 1 and n >= max(min_points, 2 * MIN_CHUNK_POINTS) and corridor.segment_count:
+        try:
+            return _evaluate_in_pool(columns, corridor, workers)
+        except BrokenProcessPool as e:
+            logger.warning("Geometry worker pool failed (%s), evaluating serially", e)
+            shutdown_pool()
+
+    if index is None:
+        index = CorridorIndex(corridor)
+    return evaluate_trajectory(columns, index)
+
+
+def _evaluate_in_pool(columns, corridor: CorridorGeometry, workers: int):
+    lat = columns['latitude']
+    lon = columns['longitude']
+    alt = columns['altitude']
+    n = len(lat)
+    m = corridor.point_count
+
+    chunk = max(MIN_CHUNK_POINTS, -(-n // (workers * CHUNKS_PER_WORKER)))
+    ranges = [(start, min(start + chunk, n)) for start in range(0, n, chunk)]
+
+    shm = shared_memory.SharedMemory(create=True, size=8 * (5 * m + 3 * n))
+    try:
+        block = np.ndarray(5 * m + 3 * n, dtype=np.float64, buffer=shm.buf)
+        for i, key in enumerate(CORRIDOR_COLUMNS):
+            block[i * m:(i + 1) * m] = getattr(corridor, key)
+        for i, values in enumerate((lat, lon, alt)):
+            block[5 * m + i * n:5 * m + (i + 1) * n] = values
+        del block
+
+        pool = _get_pool(workers)
+        futures = [
+            pool.submit(_evaluate_chunk, shm.name, m, n, start, stop)
+            for start, stop in ranges
+        ]
+        # Collect in submission order so the merge is deterministic
+        parts = [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    deviation = np.concatenate([part[0] for part in parts])
+    nearest = np.concatenate([part[1] for part in parts])
+
+    speed = compute_speeds(lat, lon, alt, columns['time_seconds'])
+    allowed_deviation, allowed_speed = corridor.limits_for(nearest)
+    compliant = (deviation <= allowed_deviation) & (speed <= allowed_speed)
+
+    return {
+        'speed': speed,
+        'deviation': deviation,
+        'nearest_segment': nearest,
+        'allowed_deviation': allowed_deviation,
+        'allowed_speed': allowed_speed,
+        'compliant': compliant,
+    }
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide pool, recreated when the worker count changes."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown_pool()
+        # spawn: safe to start from threaded servers and job workers
+        _pool = ProcessPoolExecutor(max_workers=workers,
+                                    mp_context=multiprocessing.get_context('spawn'))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the worker pool, if one was started."""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool, _pool_workers = None, 0
+
+
+atexit.register(shutdown_pool)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block owned by the parent without tracking it here."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: stop the resource tracker from unlinking it at exit
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _evaluate_chunk(name: str, corridor_points: int, trajectory_points: int,
+                    start: int, stop: int):
+    """Worker task: nearest segments for trajectory points [start, stop)."""
+    state = _attached.get(name)
+    if state is None:
+        # A new job: release the previous job's block
+        for old_shm, _ in _attached.values():
+            old_shm.close()
+        _attached.clear()
+
+        shm = _attach(name)
+        m = corridor_points
+        block = np.ndarray(5 * m, dtype=np.float64, buffer=shm.buf)
+        # Copy the corridor out so the block can be closed independently
+        corridor = CorridorGeometry(*(block[i * m:(i + 1) * m].copy() for i in range(5)))
+        del block
+        state = _attached[name] = (shm, CorridorIndex(corridor))
+
+    shm, index = state
+    m, n = corridor_points, trajectory_points
+    block = np.ndarray(5 * m + 3 * n, dtype=np.float64, buffer=shm.buf)
+    lat, lon, alt = (
+        block[5 * m + i * n + start:5 * m + i * n + stop].copy() for i in range(3)
+    )
+    del block
+
+    return index.nearest_segments(lat, lon, alt)
@@ -2,9 +2,18 @@
 File parsers for corridor and trajectory files.
 """
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, time
 
+import numpy as np
+
+
+# Corridor file columns, in file order
+CORRIDOR_COLUMNS = ('longitude', 'latitude', 'altitude', 'allowed_deviation', 'allowed_speed')
+
+# Trajectory file columns, in file order
+TRAJECTORY_COLUMNS = ('latitude', 'longitude', 'altitude', 'time')
+
 
 def parse_corridor_file(file_path: str) -> List[Dict]:
     """
@@ -18,6 +27,64 @@ def parse_corridor_file(file_path: str) -> List[Dict]:
     Returns:
         List of dictionaries with corridor point data
     """
+    return corridor_points_from_columns(parse_corridor_columns(file_path))
+
+
+def corridor_points_from_columns(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """
+    Build corridor point dicts from parse_corridor_columns output.
+    """
+    rows = zip(*(columns[key].tolist() for key in CORRIDOR_COLUMNS))
+    
+    return [
+        {
+            'longitude': lon,
+            'latitude': lat,
+            'altitude': alt,
+            'allowed_deviation': allowed_dev,
+            'allowed_speed': allowed_spd,
+            'index': i
+        }
+        for i, (lon, lat, alt, allowed_dev, allowed_spd) in enumerate(rows)
+    ]
+
+
+def parse_corridor_columns(file_path: str) -> Dict[str, np.ndarray]:
+    """
+    Parse a corridor file into float64 columns in one pass.
+    
+    Args:
+        file_path: Path to corridor file
+    
+    Returns:
+        Dict with 'longitude', 'latitude', 'altitude', 'allowed_deviation'
+        and 'allowed_speed' arrays
+    
+    Raises:
+        ValueError: With the same line-numbered message as the line parser
+    """
+    try:
+        tokens = _read_columns(file_path, len(CORRIDOR_COLUMNS))
+        if tokens:
+            return {
+                key: _to_float(values)
+                for key, values in zip(CORRIDOR_COLUMNS, tokens)
+            }
+    except ValueError:
+        pass
+    
+    # Malformed input: the line parser reports the offending line
+    points = _parse_corridor_lines(file_path)
+    return {
+        key: np.array([p[key] for p in points], dtype=np.float64)
+        for key in CORRIDOR_COLUMNS
+    }
+
+
+def _parse_corridor_lines(file_path: str) -> List[Dict]:
+    """
+    Line-by-line corridor parser, used to locate errors.
+    """
     corridor_points = []
     
     with open(file_path, 'r') as f:
@@ -96,6 +163,173 @@ def parse_trajectory_file(file_path: str) -> List[Dict]:
     Returns:
         List of dictionaries with trajectory point data
     """
+    return trajectory_points_from_columns(parse_trajectory_columns(file_path))
+
+
+def trajectory_points_from_columns(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """
+    Build trajectory point dicts from parse_trajectory_columns output.
+    """
+    rows = zip(
+        columns['latitude'].tolist(),
+        columns['longitude'].tolist(),
+        columns['altitude'].tolist(),
+        columns['time'].tolist(),
+        columns['time_seconds'].tolist(),
+    )
+    
+    return [
+        {
+            'latitude': lat,
+            'longitude': lon,
+            'altitude': alt,
+            'time': time_str,
+            'time_seconds': seconds,
+            'index': i
+        }
+        for i, (lat, lon, alt, time_str, seconds) in enumerate(rows)
+    ]
+
+
+def parse_trajectory_columns(file_path: str) -> Dict[str, np.ndarray]:
+    """
+    Parse a trajectory file into columns in one pass.
+    
+    The file is read as bytes and split into token columns; numbers are
+    converted a column at a time and hh:mm:ss[.ffffff] times are decoded
+    with array arithmetic. Times in any other form parse_time accepts (e.g.
+    single-digit fields) go through parse_time.
+    
+    Args:
+        file_path: Path to trajectory file
+    
+    Returns:
+        Dict with float64 'latitude', 'longitude', 'altitude' and
+        'time_seconds' arrays, and the original 'time' strings
+    
+    Raises:
+        ValueError: With the same line-numbered messages as the line parser,
+            including the sort-order check
+    """
+    columns = None
+    try:
+        tokens = _read_columns(file_path, len(TRAJECTORY_COLUMNS))
+        if tokens:
+            columns = {
+                key: _to_float(values)
+                for key, values in zip(TRAJECTORY_COLUMNS[:3], tokens)
+            }
+            times = np.array(tokens[3], dtype=bytes)
+            columns['time'] = times.astype(str)
+            columns['time_seconds'] = _times_to_seconds(times)
+    except (ValueError, UnicodeDecodeError):
+        columns = None
+    
+    if columns is None:
+        # Malformed input: the line parser reports the offending line
+        points = _parse_trajectory_lines(file_path)
+        columns = {
+            key: np.array([p[key] for p in points], dtype=np.float64)
+            for key in ('latitude', 'longitude', 'altitude', 'time_seconds')
+        }
+        columns['time'] = np.array([p['time'] for p in points], dtype=str)
+    
+    # Verify points are sorted by time
+    unsorted = np.flatnonzero(np.diff(columns['time_seconds']) < 0)
+    if len(unsorted):
+        i = int(unsorted[0]) + 1
+        raise ValueError(f"Trajectory points are not sorted by time (line {i+1})")
+    
+    return columns
+
+
+def _read_columns(file_path: str, width: int) -> Optional[List[Tuple[bytes, ...]]]:
+    """
+    Split the data lines of a file into columns of byte-string tokens.
+    
+    Blank lines and '#' comments are skipped, as in the line parsers.
+    
+    Returns:
+        width tuples of tokens (empty list for no data), or None if any
+        line has a different number of values
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    
+    # NumPy byte strings drop trailing NULs; leave such files to the line parser
+    if b'\x00' in data:
+        return None
+    
+    rows = [
+        line.split() for line in map(bytes.strip, data.splitlines())
+        if line and not line.startswith(b'#')
+    ]
+    if any(len(row) != width for row in rows):
+        return None
+    
+    return list(zip(*rows))
+
+
+def _to_float(tokens: Tuple[bytes, ...]) -> np.ndarray:
+    """Convert tokens with float(), exactly as the line parsers do."""
+    return np.fromiter(map(float, tokens), dtype=np.float64, count=len(tokens))
+
+
+def _times_to_seconds(times: np.ndarray) -> np.ndarray:
+    """
+    Seconds since midnight for an array of hh:mm:ss[.ffffff] byte strings.
+    
+    Raises:
+        ValueError: If a time is rejected by parse_time
+    """
+    n = len(times)
+    width = max(times.dtype.itemsize, 15)
+    chars = np.zeros((n, width), dtype=np.uint8)
+    raw = times.view(np.uint8).reshape(n, times.dtype.itemsize)
+    chars[:, :raw.shape[1]] = raw
+    length = np.count_nonzero(chars, axis=1)
+    
+    digits = chars.astype(np.int64) - ord('0')
+    is_digit = (digits >= 0) & (digits <= 9)
+    
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 3] * 10 + digits[:, 4]
+    seconds = digits[:, 6] * 10 + digits[:, 7]
+    
+    fast = (
+        is_digit[:, [0, 1, 3, 4, 6, 7]].all(axis=1) &
+        (chars[:, 2] == ord(':')) & (chars[:, 5] == ord(':')) &
+        (hours < 24) & (minutes < 60) & (seconds < 60)
+    )
+    
+    # Optional fraction: '.' then 1-6 digits, right-padded to microseconds
+    has_fraction = length > 8
+    fraction_positions = np.arange(9, 15)
+    in_fraction = fraction_positions[None, :] < length[:, None]
+    fast &= (length == 8) | (
+        (length >= 10) & (length <= 15) & (chars[:, 8] == ord('.')) &
+        (is_digit[:, 9:15] | ~in_fraction).all(axis=1)
+    )
+    scale = 10 ** (14 - fraction_positions)
+    microseconds = np.where(
+        has_fraction,
+        (np.where(in_fraction, digits[:, 9:15], 0) * scale).sum(axis=1),
+        0
+    )
+    
+    # Same operations as time_to_seconds, so values are bit-identical
+    result = (hours * 3600 + minutes * 60 + seconds) + microseconds / 1000000
+    
+    for i in np.flatnonzero(~fast).tolist():
+        result[i] = time_to_seconds(parse_time(times[i].decode()))
+    
+    return result
+
+
+def _parse_trajectory_lines(file_path: str) -> List[Dict]:
+    """
+    Line-by-line trajectory parser, used to locate errors.
+    """
     trajectory_points = []
     
     with open(file_path, 'r') as f:
@@ -126,11 +360,6 @@ def parse_trajectory_file(file_path: str) -> List[Dict]:
     if not trajectory_points:
         raise ValueError("Trajectory file is empty or contains no valid data")
     
-    # Verify points are sorted by time
-    for i in range(1, len(trajectory_points)):
-        if trajectory_points[i]['time_seconds'] < trajectory_points[i-1]['time_seconds']:
-            raise ValueError(f"Trajectory points are not sorted by time (line {i+1})")
-    
     return trajectory_points
 
 
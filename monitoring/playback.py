@@ -0,0 +1,225 @@
+"""
+Windowed access to stored trajectories for playback.
+
+Trajectory points are sorted by time (the parser rejects anything else), so
+the time_seconds column is itself the time index: a time range maps to an
+index range with two binary searches. Processing also stores the running
+count of compliant points (PREFIX_COLUMN), so the compliance of any index
+or time range is a difference of two prefix values: O(log n) by time,
+O(1) by index. Decoded columns are kept in a small per-process LRU keyed
+by flight case and updated_at, so paging through a flight decodes its
+blob once instead of once per page.
+"""
+import base64
+import binascii
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .columnar import TRAJECTORY_SCHEMA, columns_to_points
+from .models import FlightCase
+from .renderers import point_table
+
+# Points per page when the client does not ask, and the most it may ask for
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+# Flight cases whose decoded columns are kept per process
+CACHE_SIZE = 4
+
+# Extra trajectory column: compliant points among points 0..i (inclusive)
+PREFIX_COLUMN = 'compliant_prefix'
+
+_cache: 'OrderedDict[Tuple[int, str], Dict[str, np.ndarray]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class StaleCursorError(ValueError):
+    """The cursor was issued before the flight case was reprocessed."""
+
+
+def data_version(flight_case: FlightCase) -> str:
+    """Changes whenever the stored data may have changed."""
+    return flight_case.updated_at.isoformat()
+
+
+def trajectory_columns(flight_case: FlightCase) -> Dict[str, np.ndarray]:
+    """
+    All decoded trajectory columns of a flight case, through the LRU.
+
+    The trajectory blob is only read from the database on a cache miss, so
+    flight_case may be loaded with the blob deferred. Blobs stored before
+    PREFIX_COLUMN existed get it computed here, once per cache entry.
+    """
+    key = (flight_case.pk, data_version(flight_case))
+    with _cache_lock:
+        columns = _cache.get(key)
+        if columns is not None:
+            _cache.move_to_end(key)
+            return columns
+
+    columns = flight_case.trajectory_columns()
+    if PREFIX_COLUMN not in columns:
+        columns = {**columns, PREFIX_COLUMN: compliant_prefix(compliance_mask(columns))}
+
+    with _cache_lock:
+        # Drop older versions of the same flight case first
+        for stale in [k for k in _cache if k[0] == flight_case.pk]:
+            del _cache[stale]
+        _cache[key] = columns
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return columns
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def time_range(time_seconds: np.ndarray, start: Optional[float],
+               end: Optional[float]) -> Tuple[int, int]:
+    """
+    Index range [lo, hi) of the points with start <= time_seconds <= end.
+
+    Either bound may be None for an open range. O(log n).
+    """
+    lo = 0 if start is None else int(np.searchsorted(time_seconds, start, side='left'))
+    hi = len(time_seconds) if end is None else int(np.searchsorted(time_seconds, end, side='right'))
+    return lo, max(lo, hi)
+
+
+def compliance_at(columns: Dict[str, np.ndarray], at: float,
+                  window: Optional[float] = None) -> Dict:
+    """
+    Compliance of the points flown by time `at`, and of those flown in the
+    `window` seconds before it (at - window < time <= at). O(log n).
+
+    Args:
+        columns: Trajectory columns (from trajectory_columns)
+        at: Time in seconds since midnight
+        window: Length of the rolling window in seconds, or None
+
+    Returns:
+        Dict with the time, the number of points and compliant points, and
+        their percentage (None without points); under 'window' the same for
+        the rolling window
+    """
+    time_seconds = columns['time_seconds']
+    prefix = columns[PREFIX_COLUMN]
+    stop = int(np.searchsorted(time_seconds, at, side='right'))
+    compliant = _prefix(prefix, stop)
+    result = {'at': at, **_compliance(stop, compliant)}
+    if window is not None:
+        lo = min(int(np.searchsorted(time_seconds, at - window, side='right')), stop)
+        result['window'] = {
+            'seconds': window,
+            'from_index': lo,
+            **_compliance(stop - lo, compliant - _prefix(prefix, lo)),
+        }
+    return result
+
+
+def compliant_prefix(compliant) -> np.ndarray:
+    """PREFIX_COLUMN for a per-point compliance mask."""
+    return np.cumsum(np.asarray(compliant, dtype=bool), dtype=np.int32)
+
+
+def _prefix(prefix: np.ndarray, stop: int) -> int:
+    """Compliant points among the first `stop` points."""
+    return int(prefix[stop - 1]) if stop else 0
+
+
+def _compliance(points: int, compliant: int) -> Dict:
+    return {
+        'points': points,
+        'compliant': compliant,
+        'percentage': compliant / points * 100 if points else None,
+    }
+
+
+def encode_cursor(next_index: int, stop: int, version: str) -> str:
+    payload = json.dumps({'i': next_index, 'e': stop, 'v': version}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, version: str) -> Tuple[int, int]:
+    """
+    Returns:
+        (next_index, stop) encoded in the cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+        StaleCursorError: If the data changed since the cursor was issued
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        next_index, stop, cursor_version = int(payload['i']), int(payload['e']), payload['v']
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_version != version:
+        raise StaleCursorError("Flight case data changed; restart from the first page")
+    return next_index, stop
+
+
+def trajectory_window(flight_case: FlightCase, lo: int, hi: Optional[int],
+                      page_size: int, as_table: bool = False) -> Dict:
+    """
+    One page of trajectory points from the index range [lo, hi).
+
+    Args:
+        flight_case: FlightCase (trajectory blob may be deferred)
+        lo, hi: Index range requested, clipped to the stored points
+            (hi=None for all points from lo)
+        page_size: Maximum number of points returned
+        as_table: Return the points as a renderers.PointTable of columns
+            instead of point dicts (for the compact renderers)
+
+    Returns:
+        Dict with the page of point dicts, its index range, the number of
+        compliant points before it, and next_cursor (None on the last page).
+        Tables also carry PREFIX_COLUMN, the running compliant count.
+    """
+    columns = trajectory_columns(flight_case)
+    time_seconds = columns['time_seconds']
+    total = len(time_seconds)
+
+    lo = min(max(lo, 0), total)
+    hi = total if hi is None else min(max(hi, lo), total)
+    stop = min(hi, lo + page_size)
+
+    page = {name: values[lo:stop] for name, values in columns.items()}
+    if as_table:
+        points = point_table(page, TRAJECTORY_SCHEMA, stop - lo, start=lo)
+        points.columns[PREFIX_COLUMN] = page[PREFIX_COLUMN]
+    else:
+        points = columns_to_points(page, TRAJECTORY_SCHEMA, stop - lo, start=lo)
+
+    version = data_version(flight_case)
+    return {
+        'flight_case': flight_case.pk,
+        'total_points': total,
+        'start_time_seconds': float(time_seconds[0]) if total else None,
+        'end_time_seconds': float(time_seconds[-1]) if total else None,
+        'from_index': lo,
+        'to_index': stop,
+        'compliant_before': _prefix(columns[PREFIX_COLUMN], lo),
+        'points': points,
+        'next_cursor': encode_cursor(stop, hi, version) if stop < hi else None,
+    }
+
+
+def compliance_mask(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Per point, whether the player counts it compliant (C++ or Python result).
+    """
+    rows = len(next(iter(columns.values()))) if columns else 0
+    compliant = np.zeros(rows, dtype=bool)
+    for name in ('compliant', 'cpp_compliant'):
+        if name in columns:
+            compliant |= columns[name]
+    return compliant
@@ -2,94 +2,388 @@
 File processing and analysis logic.
 """
 import os
+import logging
 import subprocess
 import json
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from django.conf import settings
-from .parsers import parse_corridor_file, parse_trajectory_file
-from .geometry import (
-    compute_trajectory_speeds,
-    compute_deviations,
+from django.db import transaction
+import numpy as np
+from .cpp_validator import (
+    CppValidatorProcess,
+    CppValidatorError,
+    load_validator_library,
+    validate_points,
+)
+from .parsers import (
+    parse_corridor_file,
+    parse_trajectory_columns,
+    trajectory_points_from_columns,
+)
+from . import corridors, geometry, live, metrics, playback, simplify, tiles, vectorized, violations
+from .timing import StageTimer
+from .columnar import CORRIDOR_SCHEMA, TRAJECTORY_SCHEMA, encode_points
+from .parallel import evaluate_trajectory_parallel
+from .models import ProcessingState
+
+logger = logging.getLogger(__name__)
+
+# Bump when process_flight_case stores different results for the same input;
+# it is part of the ETag of cached flight case responses
+PROCESSING_VERSION = 2
+
+# FlightCase fields written by a successful processing run
+RESULT_FIELDS = (
+    'corridor_blob', 'trajectory_blob', 'mean_speed', 'max_speed', 'mean_deviation',
+    'compliance_percentage', 'is_processed', 'processing_error', 'processing_state',
+    'point_count', 'speed_sum', 'deviation_sum', 'compliant_count', 'last_point',
+    'processing_stats', 'processing_seconds',
+    'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude',
 )
 
 
-def process_flight_case(flight_case) -> bool:
+class StaleResultsError(Exception):
+    """Points were appended to the flight case while its files were processed."""
+
+
+def process_flight_case(
+    flight_case,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> bool:
     """
     Process a FlightCase: parse files, compute metrics, run C++ validation.
     
+    Per-stage timings (see timing.py), including the final save, are
+    stored in processing_stats and logged, and the run is recorded in the
+    processing metrics (see metrics.py).
+    
     Args:
         flight_case: FlightCase model instance
+        progress: Optional callback receiving (fraction_done, stage_name)
     
     Returns:
         True if processing succeeded, False otherwise
+    
+    Raises:
+        StaleResultsError: If points were appended meanwhile (nothing is
+            stored; processing again reads them from the trajectory file)
     """
+    if progress is None:
+        progress = _no_progress
+    timer = StageTimer()
+    # Appends committed from here on may be missing from what is read below
+    point_count = type(flight_case).objects.values_list('point_count', flat=True).get(
+        pk=flight_case.pk
+    )
+    
     try:
-        # Parse corridor file
-        corridor_path = flight_case.corridor_file.path
-        corridor_points = parse_corridor_file(corridor_path)
-        
-        # Parse trajectory file
-        trajectory_path = flight_case.trajectory_file.path
-        trajectory_points = parse_trajectory_file(trajectory_path)
-        
-        # Compute speeds
-        trajectory_points = compute_trajectory_speeds(trajectory_points)
-        
-        # Compute deviations from corridor
-        trajectory_points = compute_deviations(trajectory_points, corridor_points)
+        # Shared corridors come with their geometry precomputed
+        corridor = None
+        if flight_case.corridor_id is not None:
+            with timer.stage('load_corridor'):
+                corridor = corridors.load(flight_case.corridor_id)
+        results = compute_flight_case(
+            flight_case.corridor_file.path,
+            flight_case.trajectory_file.path,
+            progress,
+            corridor=corridor,
+            timer=timer
+        )
+        progress(0.9, 'saving')
+        with timer.stage('save'):
+            store_results(flight_case, results, point_count)
+        store_timings(flight_case, timer)
+        record_metrics(timer, success=True)
+        progress(1.0, 'done')
+        return True
         
-        # Run C++ validator (optional, for additional validation)
-        if settings.CPP_VALIDATOR_PATH.exists():
+    except StaleResultsError:
+        raise
+    except Exception as e:
+        results = failure_results(e)
+        results.update(timer.fields())
+        store_results(flight_case, results, point_count)
+        record_metrics(timer, success=False)
+        logger.info("Processing flight case %s failed after %s: %s",
+                    flight_case.pk, timer.summary(), e)
+        return False
+
+
+def compute_flight_case(
+    corridor_path: str,
+    trajectory_path: str,
+    progress: Optional[Callable[[float, str], None]] = None,
+    corridor: Optional[corridors.LoadedCorridor] = None,
+    timer: Optional[StageTimer] = None
+) -> Dict:
+    """
+    Compute the processing results for a corridor and a trajectory file.
+    
+    Touches no database, so it can run in a worker process; store_results
+    writes the result to a FlightCase.
+    
+    Args:
+        corridor_path: Path of the corridor file
+        trajectory_path: Path of the trajectory file
+        progress: Optional callback receiving (fraction_done, stage_name)
+        corridor: Loaded shared corridor; corridor_path is not read if given
+        timer: StageTimer to record the stages in (a new one if omitted)
+    
+    Returns:
+        Dict of FlightCase field values (RESULT_FIELDS), with the timings
+        recorded so far as processing_stats, and the violation intervals
+        under violations.RESULTS_KEY
+    
+    Raises:
+        Exception: Any parsing or processing error
+    """
+    if progress is None:
+        progress = _no_progress
+    if timer is None:
+        timer = StageTimer()
+    
+    progress(0.0, 'parsing')
+    
+    if corridor is None:
+        # Parse corridor file
+        with timer.stage('parse_corridor'):
+            corridor_points = parse_corridor_file(corridor_path)
+            corridor_geometry = vectorized.CorridorGeometry.from_points(corridor_points)
+        corridor_index = None
+    else:
+        corridor_points = corridor.points
+        corridor_geometry = corridor.geometry
+        corridor_index = corridor.index
+    
+    # Parse trajectory file
+    with timer.stage('parse_trajectory'):
+        trajectory_columns = parse_trajectory_columns(trajectory_path)
+        trajectory_points = trajectory_points_from_columns(trajectory_columns)
+    timer.counts.update(
+        points=len(trajectory_points),
+        segments=max(len(corridor_points) - 1, 0),
+        engine=settings.GEOMETRY_ENGINE,
+    )
+    
+    progress(0.2, 'geometry')
+    
+    if settings.GEOMETRY_ENGINE == 'python':
+        # Reference implementation (one Python call per point/segment pair)
+        with timer.stage('speeds'):
+            trajectory_points = geometry.compute_trajectory_speeds(trajectory_points)
+        with timer.stage('deviations'):
+            trajectory_points = geometry.compute_deviations(trajectory_points, corridor_points)
+    else:
+        # Evaluate the whole track in arrays; long tracks are split
+        # across settings.GEOMETRY_WORKERS processes. Speeds and the
+        # deviation search are one pass, timed as one stage.
+        with timer.stage('geometry'):
+            results = evaluate_trajectory_parallel(
+                trajectory_columns,
+                corridor_geometry,
+                workers=settings.GEOMETRY_WORKERS,
+                min_points=settings.PARALLEL_MIN_POINTS,
+                index=corridor_index,
+            )
+            vectorized.apply_results(trajectory_points, results)
+    
+    progress(0.6, 'cpp_validation')
+    
+    # Run C++ validator (optional, for additional validation):
+    # in-process shared library if built, otherwise the executable
+    with timer.stage('cpp_validation'):
+        cpp_library = load_validator_library(settings.CPP_VALIDATOR_LIBRARY_PATH)
+        if cpp_library is not None:
+            timer.counts['cpp'] = 'library'
+            trajectory_points = run_cpp_library_validation(
+                trajectory_points,
+                corridor_points,
+                cpp_library
+            )
+        elif settings.CPP_VALIDATOR_PATH.exists():
+            timer.counts['cpp'] = 'executable'
             trajectory_points = run_cpp_validation(
                 trajectory_points,
                 corridor_points,
                 settings.CPP_VALIDATOR_PATH
             )
-        
-        # Calculate aggregate metrics
-        speeds = [p['speed'] for p in trajectory_points if 'speed' in p]
-        deviations = [p['deviation'] for p in trajectory_points if 'deviation' in p]
-        
-        mean_speed = sum(speeds) / len(speeds) if speeds else 0.0
-        max_speed = max(speeds) if speeds else 0.0
-        mean_deviation = sum(deviations) / len(deviations) if deviations else 0.0
-        
-        # Calculate compliance percentage
-        # Use C++ results if available, otherwise use Python calculation
-        cpp_compliant_count = sum(1 for p in trajectory_points if p.get('cpp_compliant', False))
-        
-        if cpp_compliant_count > 0:
-            # Use C++ calculated compliance
-            compliance_percentage = (cpp_compliant_count / len(trajectory_points)) * 100
         else:
-            # Fallback to Python calculation
-            compliant_count = sum(
-                1 for p in trajectory_points 
-                if p.get('deviation') is not None 
-                and p.get('allowed_deviation') is not None
-                and p['deviation'] <= p['allowed_deviation']
-                and p.get('speed', 0) <= p.get('allowed_speed', float('inf'))
+            timer.counts['cpp'] = None
+    
+    progress(0.8, 'aggregates')
+    
+    with timer.stage('aggregates'):
+        aggregates = _aggregates(trajectory_points)
+    
+    progress(0.85, 'simplify')
+    
+    # Compliance as the player counts it (either check passed)
+    compliant = np.fromiter(
+        (bool(p.get('compliant') or p.get('cpp_compliant')) for p in trajectory_points),
+        dtype=bool, count=len(trajectory_points)
+    )
+    
+    with timer.stage('violations'):
+        violation_intervals = violations.extract(
+            violations.point_columns(trajectory_points), compliant
+        )
+    timer.counts['violations'] = len(violation_intervals)
+    
+    # Per-point drop tolerances for the zoom-dependent map geometry
+    with timer.stage('simplify'):
+        trajectory_lod = simplify.trajectory_tolerances(
+            trajectory_columns['latitude'],
+            trajectory_columns['longitude'],
+            compliant,
+        )
+        if corridor is None:
+            corridor_lod = simplify.corridor_tolerances(*(
+                [p[name] for p in corridor_points]
+                for name in ('latitude', 'longitude', 'allowed_deviation', 'allowed_speed')
+            ))
+    
+    with timer.stage('encode'):
+        if corridor is None:
+            corridor_blob = encode_points(
+                corridor_points, CORRIDOR_SCHEMA, {simplify.TOLERANCE_COLUMN: corridor_lod}
             )
-            compliance_percentage = (compliant_count / len(trajectory_points)) * 100 if len(trajectory_points) > 0 else 0.0
-        
-        # Store results
-        flight_case.corridor_data = corridor_points
-        flight_case.trajectory_data = trajectory_points
-        flight_case.mean_speed = mean_speed
-        flight_case.max_speed = max_speed
-        flight_case.mean_deviation = mean_deviation
-        flight_case.compliance_percentage = compliance_percentage
-        flight_case.is_processed = True
-        flight_case.processing_error = None
-        flight_case.save()
-        
-        return True
-        
-    except Exception as e:
-        flight_case.processing_error = str(e)
-        flight_case.is_processed = False
+        else:
+            # Same points and tolerances, already encoded at ingestion
+            corridor_blob = corridor.points_blob
+        # The running compliant count makes playback compliance O(1) per frame
+        trajectory_blob = encode_points(trajectory_points, TRAJECTORY_SCHEMA, {
+            simplify.TOLERANCE_COLUMN: trajectory_lod,
+            playback.PREFIX_COLUMN: playback.compliant_prefix(compliant),
+        })
+    
+    return {
+        'corridor_blob': corridor_blob,
+        'trajectory_blob': trajectory_blob,
+        **aggregates,
+        'last_point': live.last_point_values(trajectory_points[-1]) if trajectory_points else None,
+        # Finds the case's map tiles without its blobs
+        **tiles.extent_fields(
+            (trajectory_columns['latitude'], trajectory_columns['longitude']),
+            ([p['latitude'] for p in corridor_points], [p['longitude'] for p in corridor_points]),
+        ),
+        'is_processed': True,
+        'processing_error': None,
+        'processing_state': ProcessingState.DONE,
+        violations.RESULTS_KEY: violation_intervals,
+        **timer.fields(),
+    }
+
+
+def _aggregates(trajectory_points: List[Dict]) -> Dict:
+    """
+    Flight case metrics and the running sums live.py appends to.
+    
+    A point is compliant when the Python or the C++ check passed, as in the
+    player, the compliance endpoint and the violation intervals. Appended
+    points only get the Python check, so one definition keeps the
+    percentage steady across appends.
+    """
+    # Calculate aggregate metrics
+    speeds = [p['speed'] for p in trajectory_points if 'speed' in p]
+    deviations = [p['deviation'] for p in trajectory_points if 'deviation' in p]
+    
+    mean_speed = sum(speeds) / len(speeds) if speeds else 0.0
+    max_speed = max(speeds) if speeds else 0.0
+    mean_deviation = sum(deviations) / len(deviations) if deviations else 0.0
+    
+    compliant_count = sum(
+        1 for p in trajectory_points if p.get('compliant') or p.get('cpp_compliant')
+    )
+    compliance_percentage = (
+        compliant_count / len(trajectory_points) * 100 if trajectory_points else 0.0
+    )
+    
+    return {
+        'mean_speed': mean_speed,
+        'max_speed': max_speed,
+        'mean_deviation': mean_deviation,
+        'compliance_percentage': compliance_percentage,
+        # Running aggregates for appending points (live.py)
+        'point_count': len(trajectory_points),
+        'speed_sum': sum(speeds),
+        'deviation_sum': sum(deviations),
+        'compliant_count': compliant_count,
+    }
+
+
+def failure_results(error: Exception) -> Dict:
+    """Field values recording a failed processing run (stored data is kept)."""
+    return {
+        'processing_error': str(error),
+        'is_processed': False,
+        'processing_state': ProcessingState.FAILED,
+    }
+
+
+def store_results(flight_case, results: Dict, point_count: Optional[int]) -> None:
+    """
+    Write compute_flight_case (or failure_results) output to a FlightCase and save it.
+    
+    A new trajectory replaces the appended chunks (live.py) as well, so it
+    is only stored while the row is locked as append_points locks it, and
+    only if no points were appended since the trajectory file was read.
+    
+    Args:
+        flight_case: FlightCase the results were computed for
+        results: Field values to store
+        point_count: FlightCase.point_count before the trajectory file was read
+    
+    Raises:
+        StaleResultsError: If the case has a different point_count now
+    """
+    with transaction.atomic():
+        if 'trajectory_blob' in results:
+            current = (type(flight_case).objects.select_for_update()
+                       .values_list('point_count', flat=True).get(pk=flight_case.pk))
+            if current != point_count:
+                raise StaleResultsError(
+                    f"Points were appended to flight case {flight_case.pk} while it was "
+                    f"processed ({point_count} before, {current} now)"
+                )
+            # Appended points up to point_count are in the trajectory file and now in the blob
+            flight_case.trajectory_chunks.all().delete()
+        for field, value in results.items():
+            if field != violations.RESULTS_KEY:
+                setattr(flight_case, field, value)
         flight_case.save()
-        return False
+        violations.store([(flight_case.pk, results.get(violations.RESULTS_KEY))])
+
+
+def store_timings(flight_case, timer: StageTimer) -> None:
+    """
+    Store the final timings of a processing run (save stage included) and log them.
+    
+    Written with an UPDATE after store_results, whose save() is itself timed;
+    updated_at is left alone since no result changed.
+    """
+    fields = timer.fields()
+    for field, value in fields.items():
+        setattr(flight_case, field, value)
+    type(flight_case).objects.filter(pk=flight_case.pk).update(**fields)
+    
+    level = logging.WARNING if timer.wall >= settings.PROCESSING_SLOW_SECONDS else logging.INFO
+    logger.log(level, "Processed flight case %s (%s points, %s segments) in %s",
+               flight_case.pk, timer.counts.get('points'), timer.counts.get('segments'),
+               timer.summary())
+
+
+def record_metrics(timer: StageTimer, success: bool) -> None:
+    """Record a processing run's duration and throughput in the metrics."""
+    metrics.PROCESSING_SECONDS.observe(timer.wall, outcome='done' if success else 'failed')
+    points = timer.counts.get('points')
+    if success and points:
+        metrics.PROCESSED_POINTS.inc(points)
+        if timer.wall > 0:
+            metrics.PROCESSING_POINTS_PER_SECOND.observe(points / timer.wall)
+
+
+def _no_progress(fraction: float, stage: str) -> None:
+    pass
 
 
 def run_cpp_validation(
@@ -100,11 +394,13 @@ def run_cpp_validation(
     """
     Run C++ validator for each trajectory point.
     
-    The C++ program is called with:
-    - Corridor segment parameters
-    - Trajectory point parameters
+    A single `trajectory_validator --stream` process is started for the
+    job: it receives the corridor once and then the trajectory points in
+    batches of settings.CPP_VALIDATOR_BATCH_SIZE, each batch bounded by
+    settings.CPP_VALIDATOR_TIMEOUT seconds. Executables built before
+    streaming mode existed are driven one subprocess per point instead.
     
-    And returns validation metrics that are added to trajectory points.
+    Validation metrics are added to trajectory points.
     
     Args:
         trajectory_points: List of trajectory points
@@ -117,6 +413,122 @@ def run_cpp_validation(
     if not os.path.exists(cpp_executable_path):
         return trajectory_points
     
+    timeout = settings.CPP_VALIDATOR_TIMEOUT
+    
+    # Only points with a valid nearest segment are validated
+    selected = [
+        i for i, p in enumerate(trajectory_points)
+        if 0 <= p.get('nearest_segment', 0) < len(corridor_points) - 1
+    ]
+    if not selected:
+        return trajectory_points
+    
+    with metrics.CPP_VALIDATOR_SECONDS.time(mode='executable'):
+        try:
+            validator = CppValidatorProcess(cpp_executable_path, corridor_points, timeout)
+        except OSError as e:
+            metrics.CPP_VALIDATOR_FAILURES.inc(mode='executable', reason='start')
+            logger.warning("C++ validator cannot be started: %s", e)
+            return trajectory_points
+        except CppValidatorError as e:
+            logger.info("C++ validator has no streaming mode (%s), validating per point", e)
+            return _run_cpp_validation_per_point(
+                trajectory_points, corridor_points, cpp_executable_path
+            )
+        
+        records = [
+            (
+                trajectory_points[i]['latitude'],
+                trajectory_points[i]['longitude'],
+                trajectory_points[i]['altitude'],
+                trajectory_points[i].get('speed', 0),
+                trajectory_points[i].get('nearest_segment', 0),
+            )
+            for i in selected
+        ]
+        try:
+            results = validate_points(
+                cpp_executable_path, corridor_points, records,
+                batch_size=settings.CPP_VALIDATOR_BATCH_SIZE,
+                timeout=timeout,
+                validator=validator,
+            )
+        except Exception:
+            metrics.CPP_VALIDATOR_FAILURES.inc(mode='executable', reason='error')
+            raise
+    
+    failed = False
+    for i, result in zip(selected, results):
+        if isinstance(result, str):
+            trajectory_points[i]['cpp_error'] = result
+            failed = True
+        else:
+            (trajectory_points[i]['cpp_deviation'],
+             trajectory_points[i]['cpp_speed_violation'],
+             trajectory_points[i]['cpp_compliant']) = result
+    if failed:
+        metrics.CPP_VALIDATOR_FAILURES.inc(mode='executable', reason='points')
+    
+    return trajectory_points
+
+
+def run_cpp_library_validation(
+    trajectory_points: List[Dict],
+    corridor_points: List[Dict],
+    library
+) -> List[Dict]:
+    """
+    Run the C++ validator in-process through libtrajectory_validator.
+    
+    All points are validated in one call over contiguous arrays; results
+    use the same keys as run_cpp_validation.
+    
+    Args:
+        trajectory_points: List of trajectory points
+        corridor_points: List of corridor points
+        library: Loaded CppValidatorLibrary
+    
+    Returns:
+        Updated trajectory points with C++ validation results
+    """
+    trajectory = np.array(
+        [(p['latitude'], p['longitude'], p['altitude'], p.get('speed', 0))
+         for p in trajectory_points],
+        dtype=np.float64
+    ).reshape(-1, 4)
+    segments = np.array([p.get('nearest_segment', 0) for p in trajectory_points], dtype=np.int64)
+    corridor = np.array(
+        [(p['latitude'], p['longitude'], p['altitude'],
+          p['allowed_deviation'], p['allowed_speed'])
+         for p in corridor_points],
+        dtype=np.float64
+    ).reshape(-1, 5)
+    
+    with metrics.CPP_VALIDATOR_SECONDS.time(mode='library'):
+        try:
+            deviation, speed_violation, compliant = library.validate(trajectory, segments, corridor)
+        except Exception:
+            metrics.CPP_VALIDATOR_FAILURES.inc(mode='library', reason='error')
+            raise
+    
+    rows = zip(trajectory_points, deviation.tolist(), speed_violation.tolist(), compliant.tolist())
+    for point, dev, violation, ok in rows:
+        if ok >= 0:
+            point['cpp_deviation'] = dev
+            point['cpp_speed_violation'] = violation
+            point['cpp_compliant'] = ok == 1
+    
+    return trajectory_points
+
+
+def _run_cpp_validation_per_point(
+    trajectory_points: List[Dict],
+    corridor_points: List[Dict],
+    cpp_executable_path: str
+) -> List[Dict]:
+    """
+    Legacy path: one validator subprocess per trajectory point.
+    """
     for i, traj_point in enumerate(trajectory_points):
         try:
             # Find the nearest corridor segment
@@ -168,7 +580,7 @@ def run_cpp_validation(
                         trajectory_points[i]['cpp_speed_violation'] = float(parts[1])
                         trajectory_points[i]['cpp_compliant'] = int(parts[2]) == 1
             
-        except (subprocess.TimeoutExpired, subprocess.SubprocessError, ValueError) as e:
+        except (subprocess.TimeoutExpired, subprocess.SubprocessError, OSError, ValueError) as e:
             # If C++ validation fails, continue with Python calculations
             trajectory_points[i]['cpp_error'] = str(e)
             continue
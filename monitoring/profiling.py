@@ -0,0 +1,232 @@
+"""
+Offline profiling of the processing pipeline (profile_flight_case command).
+
+ProfilingTimer is a StageTimer (timing.py), so compute_flight_case reports
+its stages to it unchanged. Besides wall and CPU time it collects, per
+stage:
+
+- a cProfile profile, from which the hot functions of the geometry
+  modules are counted (calls, own time, cumulative time);
+- the tracemalloc peak, the memory still held at the end of the stage and
+  the allocation sites holding most of it;
+- stack samples taken by StackSampler, rooted at the stage name, for
+  flamegraphs in the collapsed-stack format ("frame;frame;frame count").
+
+The collectors slow processing down (tracemalloc by several times), so the
+stage times of a profiled run are only comparable with each other.
+"""
+import cProfile
+import os
+import pstats
+import signal
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .timing import StageTimer
+
+# Modules whose functions are reported as hot geometry functions
+GEOMETRY_MODULES = ('geometry.py', 'vectorized.py', 'spatial_index.py', 'parallel.py')
+
+# Files whose allocation sites are left out: the profilers themselves.
+# Sites are dropped after compare_to() has grouped the traces by line;
+# Snapshot.filter_traces() over every trace is far slower.
+_IGNORED_ALLOCATION_FILES = frozenset((
+    tracemalloc.__file__,
+    '<frozen importlib._bootstrap>',
+    '<frozen importlib._bootstrap_external>',
+    __file__,
+))
+
+
+class StackSampler:
+    """
+    Samples the Python stack on a timer signal and counts collapsed stacks.
+
+    Stacks are cut at the frame running the root function and prefixed with
+    the current label (the stage). Frames are named path:qualified_name,
+    with paths relative to the project. Only works in the main thread of a
+    Unix process.
+    """
+
+    def __init__(self, root_code, interval: float = 0.001, clock: str = 'cpu'):
+        """
+        Args:
+            root_code: Code object of the outermost function to keep
+            interval: Seconds between samples
+            clock: 'cpu' (ITIMER_PROF, CPU time only) or 'wall' (ITIMER_REAL,
+                also samples while waiting, e.g. on the C++ validator)
+        """
+        self.root_code = root_code
+        self.interval = interval
+        self.timer, self.signal = (
+            (signal.ITIMER_PROF, signal.SIGPROF) if clock == 'cpu'
+            else (signal.ITIMER_REAL, signal.SIGALRM)
+        )
+        self.label = None
+        self.stacks = Counter()
+        self._names = {}
+        self._previous = None
+
+    @staticmethod
+    def available() -> bool:
+        return hasattr(signal, 'setitimer')
+
+    def start(self) -> None:
+        self._previous = signal.signal(self.signal, self._sample)
+        signal.setitimer(self.timer, self.interval, self.interval)
+
+    def stop(self) -> None:
+        signal.setitimer(self.timer, 0, 0)
+        signal.signal(self.signal, self._previous or signal.SIG_DFL)
+
+    def _sample(self, signum, frame) -> None:
+        if self.label is None:
+            return
+        frames = []
+        while frame is not None:
+            frames.append(self._name(frame.f_code))
+            if frame.f_code is self.root_code:
+                break
+            frame = frame.f_back
+        else:
+            # Not below the root function (e.g. the profiler's own code)
+            return
+        frames.append(self.label)
+        self.stacks[';'.join(reversed(frames))] += 1
+
+    def _name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = f"{_short_path(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+            self._names[code] = name
+        return name
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one "frame;...;frame count" line each (flamegraph.pl input)."""
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class ProfilingTimer(StageTimer):
+    """
+    StageTimer that also profiles each stage (see the module docstring).
+
+    Usage:
+        timer = ProfilingTimer(memory=True, sampler=sampler)
+        results = compute_flight_case(..., timer=timer)
+        summary = timer.summary_dict()
+    """
+
+    def __init__(self, memory: bool = True, sampler: Optional[StackSampler] = None,
+                 top: int = 10):
+        super().__init__()
+        self.memory = memory
+        self.sampler = sampler
+        self.top = top
+        self.profiles = {}
+        self.memory_stats = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        if self.memory:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            start_bytes = tracemalloc.get_traced_memory()[0]
+        if self.sampler is not None:
+            self.sampler.label = name
+        try:
+            with super().stage(name):
+                profile.enable()
+                try:
+                    yield
+                finally:
+                    profile.disable()
+        finally:
+            if self.sampler is not None:
+                self.sampler.label = None
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                sites = [
+                    stat for stat in tracemalloc.take_snapshot().compare_to(before, 'lineno')
+                    if stat.size_diff > 0
+                    and stat.traceback[0].filename not in _IGNORED_ALLOCATION_FILES
+                ]
+                self.memory_stats[name] = {
+                    'peak_bytes': peak - start_bytes,
+                    'net_bytes': current - start_bytes,
+                    'top_allocations': [
+                        {
+                            'site': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                            'size_bytes': stat.size_diff,
+                            'count': stat.count_diff,
+                        }
+                        for stat in sites[:self.top]
+                    ],
+                }
+
+    def stats_for(self, name: str) -> pstats.Stats:
+        return pstats.Stats(self.profiles[name])
+
+    def combined_stats(self) -> Optional[pstats.Stats]:
+        """All stage profiles in one pstats.Stats (None if no stage ran)."""
+        profiles = list(self.profiles.values())
+        if not profiles:
+            return None
+        combined = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            combined.add(profile)
+        return combined
+
+    def summary_dict(self) -> Dict:
+        """
+        JSON-serializable summary: timings, counts, memory, top and hot
+        geometry functions per stage, and hot geometry functions overall.
+        """
+        summary = self.stats()
+        for name, entry in summary['stages'].items():
+            entry.update(self.memory_stats.get(name, {}))
+            entry['top_functions'] = _functions(self.stats_for(name), self.top)
+        combined = self.combined_stats()
+        summary['hot_geometry_functions'] = (
+            _functions(combined, None, GEOMETRY_MODULES) if combined else []
+        )
+        if self.memory:
+            summary['peak_bytes'] = max(
+                (entry['peak_bytes'] for entry in self.memory_stats.values()), default=0
+            )
+        return summary
+
+
+def _functions(stats: pstats.Stats, limit: Optional[int],
+               modules: Optional[tuple] = None) -> List[Dict]:
+    """Functions by own time: calls, own and cumulative seconds."""
+    rows = []
+    for (filename, lineno, function), (primitive, calls, own, cumulative, _) in stats.stats.items():
+        if modules is not None and not (
+            filename.endswith(modules) and _short_path(filename).startswith('monitoring/')
+        ):
+            continue
+        rows.append({
+            'function': f"{_short_path(filename)}:{lineno}:{function}",
+            'calls': calls,
+            'primitive_calls': primitive,
+            'own_seconds': own,
+            'cumulative_seconds': cumulative,
+        })
+    rows.sort(key=lambda row: row['own_seconds'], reverse=True)
+    return rows if limit is None else rows[:limit]
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to the project, or from the package directory for libraries."""
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    marker = os.sep + 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return filename
@@ -0,0 +1,206 @@
+"""
+Compact renderers for responses that carry point lists.
+
+Point lists (corridor and trajectory points) make up nearly all of a
+flight case payload. As plain JSON every point repeats every key name and
+every float is printed at full precision. The renderers here send each
+point list as a table of columns instead:
+
+    application/vnd.fofis.columnar+json  (?format=columnar)
+        Columnar JSON. Floats are quantized to integers (see QUANTIZATION),
+        and smooth columns are delta-encoded, so most values are small
+        integers that gzip/brotli compress well.
+
+    application/octet-stream  (?format=bin)
+        Little-endian typed arrays that a browser wraps in Float64Array etc.
+        without copying (metric columns in FLOAT32_COLUMNS are narrowed to
+        float32; coordinates and times stay float64):
+
+            magic b'FCWB', header length (uint32), JSON header (space padded)
+            column data, each column aligned to 8 bytes
+
+        The header holds the non-point fields of the response and, per
+        table, rows, start index and {name: dtype, offset} per column, the
+        offset counting from the start of the column data (string columns
+        are included in the header as lists).
+
+In both formats a table replaces its point list under the same key, and
+the 'index' of point i is start + i. Values that were None or absent are
+listed under 'missing' (JSON) or have a '<name>#state' int8 column
+(binary; 0 = value, 1 = None, 2 = absent). Views can hand the renderers a
+PointTable built from decoded blob columns, skipping the point dicts.
+"""
+import json
+import struct
+from collections import namedtuple
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+from .columnar import (
+    CORRIDOR_SCHEMA,
+    EXTRA_COLUMN,
+    STATE_SUFFIX,
+    TRAJECTORY_SCHEMA,
+    VALUE,
+    points_to_columns,
+)
+
+# Column -> (scale, delta-encoded); values are sent as round(value * scale)
+QUANTIZATION = {
+    'latitude': (1e6, True),      # ~0.1 m
+    'longitude': (1e6, True),
+    'altitude': (10, True),       # 0.1 m
+    'time_seconds': (1000, True),  # 1 ms
+}
+DEFAULT_QUANTIZATION = (100, False)
+
+# Sent as float32 in the binary format (coordinates and times stay float64)
+FLOAT32_COLUMNS = (
+    'altitude', 'speed', 'deviation', 'allowed_deviation', 'allowed_speed',
+    'cpp_deviation', 'cpp_speed_violation',
+)
+
+BINARY_MAGIC = b'FCWB'
+_ALIGNMENT = 8
+
+PointTable = namedtuple('PointTable', 'columns rows start')
+
+
+def point_table(columns, schema, rows, start=0) -> PointTable:
+    """
+    PointTable of the schema columns (with their state and extra columns)
+    among decoded or sliced blob columns.
+    """
+    names = {column.name for column in schema}
+    names.update(name + STATE_SUFFIX for name in list(names))
+    names.add(EXTRA_COLUMN)
+    return PointTable({k: v for k, v in columns.items() if k in names}, rows, start)
+
+
+def _as_table(value):
+    """PointTable for a point list (or PointTable), None for anything else."""
+    if isinstance(value, PointTable):
+        return value
+    if not (isinstance(value, list) and value and isinstance(value[0], dict)
+            and 'latitude' in value[0] and 'longitude' in value[0]):
+        return None
+    schema = TRAJECTORY_SCHEMA if 'time' in value[0] else CORRIDOR_SCHEMA
+    start = value[0].get('index', 0)
+    return PointTable(points_to_columns(value, schema), len(value), start)
+
+
+def _split(data):
+    """Separate the point tables of a response from its other fields."""
+    if not isinstance(data, dict):
+        return data, {}
+    fields, tables = {}, {}
+    for key, value in data.items():
+        table = _as_table(value)
+        if table is None:
+            fields[key] = value
+        else:
+            tables[key] = table
+    return fields, tables
+
+
+def _states(table: PointTable):
+    return {
+        name[:-len(STATE_SUFFIX)]: state
+        for name, state in table.columns.items() if name.endswith(STATE_SUFFIX)
+    }
+
+
+def encode_json_table(table: PointTable) -> dict:
+    """Columnar JSON form of one point table."""
+    states = _states(table)
+    columns = {}
+
+    for name, values in table.columns.items():
+        if name.endswith(STATE_SUFFIX):
+            continue
+        column = {}
+        state = states.get(name)
+        present = None if state is None else state == VALUE
+
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+            scale, delta = QUANTIZATION.get(name, DEFAULT_QUANTIZATION)
+            if present is None:
+                present = np.isfinite(values)
+            quantized = np.zeros(len(values), dtype=np.int64)
+            quantized[present] = np.round(values[present] * scale)
+            if delta and len(quantized):
+                # Missing values repeat the previous one (zero delta)
+                last = np.maximum.accumulate(np.where(present, np.arange(len(values)), 0))
+                quantized = quantized[last]
+                quantized = np.diff(quantized, prepend=0)
+            column.update(scale=scale, delta=delta)
+            values = quantized
+        elif isinstance(values, np.ndarray) and values.dtype.kind == 'b':
+            values = values.astype(np.uint8)
+
+        column['values'] = values.tolist() if isinstance(values, np.ndarray) else list(values)
+        if present is not None and not present.all():
+            column['missing'] = np.flatnonzero(~present).tolist()
+        columns[name] = column
+
+    return {'rows': table.rows, 'start': table.start, 'columns': columns}
+
+
+def encode_binary(data) -> bytes:
+    """Typed-array form of a response (see module docstring)."""
+    fields, tables = _split(data)
+    header_tables = {}
+    arrays = []
+    offset = 0
+
+    for key, table in tables.items():
+        columns = {}
+        for name, values in table.columns.items():
+            if not isinstance(values, np.ndarray) or values.dtype.kind in 'OUS':
+                columns[name] = {'dtype': 'str', 'values': [str(v) for v in values]}
+                continue
+            dtype = '<f4' if name in FLOAT32_COLUMNS else values.dtype.newbyteorder('<')
+            array = values.astype(dtype, copy=False)
+            if array.dtype.kind == 'b':
+                array = array.view(np.uint8)
+            raw = np.ascontiguousarray(array).tobytes()
+            columns[name] = {'dtype': array.dtype.str.lstrip('<|'), 'offset': offset}
+            arrays.append(raw + b'\0' * (-len(raw) % _ALIGNMENT))
+            offset += len(arrays[-1])
+        header_tables[key] = {'rows': table.rows, 'start': table.start, 'columns': columns}
+
+    header = json.dumps({'fields': fields, 'tables': header_tables},
+                        cls=encoders.JSONEncoder, separators=(',', ':')).encode('utf-8')
+    # Pad the header with spaces so the column data starts 8-byte aligned
+    header += b' ' * (-(8 + len(header)) % _ALIGNMENT)
+    return b''.join([BINARY_MAGIC, struct.pack('<I', len(header)), header] + arrays)
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """Point lists as quantized, delta-encoded columns."""
+    media_type = 'application/vnd.fofis.columnar+json'
+    format = 'columnar'
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        fields, tables = _split(data)
+        if tables:
+            fields.update({key: encode_json_table(table) for key, table in tables.items()})
+            data = fields
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class TypedArrayRenderer(BaseRenderer):
+    """Point lists as little-endian typed arrays."""
+    media_type = 'application/octet-stream'
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return encode_binary(data)
@@ -0,0 +1,108 @@
+"""
+Size-bounded cache of serialized flight case responses.
+
+Bodies are stored in the Django cache (settings.RESPONSE_CACHE_ALIAS). An
+index entry in the same cache records, least recently used first, each
+body's flight case and size, so the total stays under
+settings.RESPONSE_CACHE_MAX_BYTES and all bodies of a flight case can be
+dropped when it changes. With a cache shared between processes, concurrent
+index updates may lose an entry; such bodies still expire after
+settings.RESPONSE_CACHE_TIMEOUT.
+
+Keys include the response ETag, which changes with updated_at, so a stale
+body is never served even before invalidate() runs.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = 'fofis:response:'
+INDEX_KEY = KEY_PREFIX + 'index'
+
+_lock = threading.Lock()
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag (quoted) from the parts identifying a representation."""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _key(etag: str) -> str:
+    return KEY_PREFIX + etag.strip('"')
+
+
+def _load_index(cache) -> 'OrderedDict[str, Tuple[int, int]]':
+    return cache.get(INDEX_KEY) or OrderedDict()
+
+
+def get(etag: str) -> Optional[Tuple[bytes, str]]:
+    """
+    Cached body for an ETag.
+
+    Returns:
+        Tuple (body, content_type), or None on a miss
+    """
+    cache = _cache()
+    key = _key(etag)
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    with _lock:
+        index = _load_index(cache)
+        if key in index and next(reversed(index)) != key:
+            index.move_to_end(key)
+            cache.set(INDEX_KEY, index, None)
+    return entry
+
+
+def put(etag: str, flight_case_id: int, body: bytes, content_type: str) -> None:
+    """Store a body, evicting least recently used bodies over the size bound."""
+    size = len(body)
+    if size > settings.RESPONSE_CACHE_MAX_BYTES:
+        return
+
+    cache = _cache()
+    key = _key(etag)
+    with _lock:
+        index = _load_index(cache)
+        index.pop(key, None)
+        total = sum(entry_size for _, entry_size in index.values())
+        while index and total + size > settings.RESPONSE_CACHE_MAX_BYTES:
+            evicted, (_, evicted_size) = index.popitem(last=False)
+            cache.delete(evicted)
+            total -= evicted_size
+        index[key] = (flight_case_id, size)
+        cache.set(key, (body, content_type), settings.RESPONSE_CACHE_TIMEOUT)
+        cache.set(INDEX_KEY, index, None)
+
+
+def invalidate(flight_case_id: int) -> None:
+    """Drop every cached body of a flight case."""
+    cache = _cache()
+    with _lock:
+        index = _load_index(cache)
+        stale = [key for key, (pk, _) in index.items() if pk == flight_case_id]
+        if not stale:
+            return
+        for key in stale:
+            del index[key]
+        cache.delete_many(stale)
+        cache.set(INDEX_KEY, index, None)
+
+
+def clear() -> None:
+    """Drop every cached body."""
+    cache = _cache()
+    with _lock:
+        cache.delete_many(list(_load_index(cache)))
+        cache.delete(INDEX_KEY)
@@ -2,13 +2,15 @@
 DRF Serializers for API endpoints.
 """
 from rest_framework import serializers
-from .models import FlightCase
+from .models import FlightCase, ProcessingJob, ViolationInterval
 
 
 class FlightCaseSerializer(serializers.ModelSerializer):
     """
     Serializer for FlightCase model.
     """
+    corridor_data = serializers.ReadOnlyField()
+    trajectory_data = serializers.ReadOnlyField()
     trajectory_start_time = serializers.ReadOnlyField()
     trajectory_end_time = serializers.ReadOnlyField()
     
@@ -18,6 +20,7 @@ class FlightCaseSerializer(serializers.ModelSerializer):
             'id',
             'corridor_file',
             'trajectory_file',
+            'corridor',
             'mean_deviation',
             'mean_speed',
             'max_speed',
@@ -30,16 +33,17 @@ class FlightCaseSerializer(serializers.ModelSerializer):
             'trajectory_start_time',
             'trajectory_end_time',
             'compliance_percentage',
+            'processing_state',
         ]
         read_only_fields = [
+            'corridor',
             'mean_deviation',
             'mean_speed',
             'max_speed',
             'compliance_percentage',
-            'corridor_data',
-            'trajectory_data',
             'is_processed',
             'processing_error',
+            'processing_state',
             'created_at',
             'updated_at',
         ]
@@ -68,7 +72,52 @@ class FlightCaseListSerializer(serializers.ModelSerializer):
             'max_speed',
             'is_processed',
             'processing_error',
+            'processing_state',
             'created_at',
             'compliance_percentage',
         ]
 
+
+class ProcessingJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for processing job status.
+    """
+    
+    class Meta:
+        model = ProcessingJob
+        fields = [
+            'id',
+            'flight_case',
+            'status',
+            'progress',
+            'stage',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
+
+
+class ViolationIntervalSerializer(serializers.ModelSerializer):
+    """
+    Serializer for violation intervals (read only).
+    """
+    
+    class Meta:
+        model = ViolationInterval
+        fields = [
+            'id',
+            'flight_case',
+            'kind',
+            'start_index',
+            'end_index',
+            'start_time_seconds',
+            'end_time_seconds',
+            'duration_seconds',
+            'point_count',
+            'deviation_excess',
+            'speed_excess',
+            'severity',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,288 @@
+"""
+Multi-resolution line simplification for map rendering.
+
+Douglas-Peucker is run once per line to full depth (down to MIN_TOLERANCE),
+recording for every vertex the tolerance at which it would be dropped: its
+distance from the chord it splits, capped by its parent's value so the
+values decrease down the recursion. The simplification at any tolerance is
+then just the vertices whose value is >= that tolerance, and the N most
+important vertices form a valid simplification too. So a single stored
+float per point serves every zoom level.
+
+Vertices that must survive every simplification (line endpoints, the first
+and last point of each violation run, corridor vertices where the limits
+change) are given values above any geometric tolerance, longer runs first.
+
+All ranges of one recursion level are processed together in flat arrays,
+so the cost is a few NumPy passes per level rather than one per range.
+"""
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+from . import playback
+
+# Finest tolerance computed (meters); vertices below it are never needed
+MIN_TOLERANCE = 2.0
+
+# Forced vertices rank above this value (meters; larger than any real deviation)
+FORCED_BASE = 1e9
+
+# Default and hard upper bound on vertices returned per line
+DEFAULT_MAX_VERTICES = 2000
+MAX_VERTICES = 20000
+
+# Stored per-point column holding the drop tolerance
+TOLERANCE_COLUMN = 'lod_tolerance'
+
+# Ground meters per pixel at zoom 0 on the equator (256 px Web Mercator tiles)
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def project(latitude, longitude):
+    """
+    Local equirectangular projection to meters, around the mean latitude.
+
+    Good to well under a percent over a flight's extent, which is all a
+    rendering tolerance needs.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    if len(latitude) == 0:
+        return latitude, longitude
+    scale = math.radians(1.0) * 6371000.0
+    cos_lat = math.cos(math.radians(float(latitude.mean())))
+    return longitude * scale * cos_lat, latitude * scale
+
+
+def dp_tolerances(x, y, min_tolerance: float = MIN_TOLERANCE) -> np.ndarray:
+    """
+    Douglas-Peucker drop tolerance of every vertex of a line.
+
+    Args:
+        x, y: Projected coordinates (meters)
+        min_tolerance: Recursion stops on chords whose farthest vertex is closer
+
+    Returns:
+        float64 array: inf for the endpoints, the (monotone) split distance
+        for split vertices, 0 for vertices below min_tolerance
+    """
+    n = len(x)
+    tolerance = np.zeros(n)
+    if n == 0:
+        return tolerance
+    tolerance[0] = tolerance[-1] = np.inf
+
+    start = np.array([0], dtype=np.int64)
+    end = np.array([n - 1], dtype=np.int64)
+    parent = np.array([np.inf])
+
+    while len(start):
+        interior = end - start - 1
+        keep = interior > 0
+        start, end, parent, interior = start[keep], end[keep], parent[keep], interior[keep]
+        if not len(start):
+            break
+
+        # Flat list of (range, vertex) pairs for every range of this level
+        offsets = np.concatenate(([0], np.cumsum(interior)[:-1]))
+        owner = np.repeat(np.arange(len(start)), interior)
+        vertex = start[owner] + 1 + (np.arange(len(owner)) - offsets[owner])
+
+        distance = _segment_distance(x[vertex], y[vertex],
+                                     x[start[owner]], y[start[owner]],
+                                     x[end[owner]], y[end[owner]])
+
+        farthest = np.maximum.reduceat(distance, offsets)
+        # First vertex reaching the maximum in each range
+        hits = np.flatnonzero(distance == farthest[owner])
+        _, first = np.unique(owner[hits], return_index=True)
+        split = vertex[hits[first]]
+
+        significant = farthest >= min_tolerance
+        split_tolerance = np.minimum(farthest, parent)[significant]
+        split = split[significant]
+        tolerance[split] = split_tolerance
+
+        start, end = start[significant], end[significant]
+        start, end, parent = (
+            np.concatenate((start, split)),
+            np.concatenate((split, end)),
+            np.concatenate((split_tolerance, split_tolerance)),
+        )
+
+    return tolerance
+
+
+def _segment_distance(px, py, ax, ay, bx, by) -> np.ndarray:
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = np.where(length_sq > 0,
+                 ((px - ax) * dx + (py - ay) * dy) / np.where(length_sq > 0, length_sq, 1.0),
+                 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def run_boundaries(flags):
+    """
+    First and last index of every run of True values.
+
+    Returns:
+        Tuple of (boundary indices, length of the run each belongs to)
+    """
+    flags = np.asarray(flags, dtype=bool)
+    padded = np.concatenate(([False], flags, [False])).astype(np.int8)
+    change = np.diff(padded)
+    starts = np.flatnonzero(change == 1)
+    ends = np.flatnonzero(change == -1) - 1
+    lengths = ends - starts + 1
+    return np.concatenate((starts, ends)), np.concatenate((lengths, lengths))
+
+
+def trajectory_tolerances(latitude, longitude, compliant) -> np.ndarray:
+    """
+    Drop tolerance per trajectory point; violation run boundaries are kept.
+
+    Args:
+        latitude, longitude: Point coordinates (degrees)
+        compliant: Boolean compliance per point
+
+    Returns:
+        Tolerance per point (meters; FORCED_BASE and above for forced points)
+    """
+    x, y = project(latitude, longitude)
+    tolerance = dp_tolerances(x, y)
+
+    boundaries, lengths = run_boundaries(~np.asarray(compliant, dtype=bool))
+    _force(tolerance, boundaries, lengths)
+    return tolerance
+
+
+def corridor_tolerances(latitude, longitude, allowed_deviation, allowed_speed) -> np.ndarray:
+    """
+    Drop tolerance per corridor vertex; vertices where the allowed deviation
+    or speed changes are kept.
+    """
+    x, y = project(latitude, longitude)
+    tolerance = dp_tolerances(x, y)
+
+    if len(tolerance) > 1:
+        changed = np.flatnonzero(
+            (np.diff(allowed_deviation) != 0) | (np.diff(allowed_speed) != 0)
+        )
+        # Both vertices around a change in the limits
+        boundaries = np.concatenate((changed, changed + 1))
+        _force(tolerance, boundaries, np.ones(len(boundaries)))
+    return tolerance
+
+
+def _force(tolerance: np.ndarray, indices, priority) -> None:
+    if len(indices):
+        forced = FORCED_BASE + np.asarray(priority, dtype=np.float64)
+        np.maximum.at(tolerance, indices, forced)
+
+
+def zoom_tolerance(zoom: float, latitude: float) -> float:
+    """Ground size of one screen pixel (meters) at a Web Mercator zoom level."""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2.0 ** zoom)
+
+
+def select_vertices(tolerances: np.ndarray, tolerance: float,
+                    max_vertices: int = DEFAULT_MAX_VERTICES):
+    """
+    Vertices of the simplification at a tolerance, capped to max_vertices.
+
+    When more vertices qualify, the max_vertices most important ones are
+    kept instead, i.e. the tolerance is raised.
+
+    Returns:
+        Tuple of (sorted vertex indices, effective tolerance)
+    """
+    selected = np.flatnonzero(tolerances >= tolerance)
+    if len(selected) <= max_vertices:
+        return selected, tolerance
+
+    top = np.argpartition(tolerances, -max_vertices)[-max_vertices:]
+    geometric = tolerances[top]
+    geometric = geometric[geometric < FORCED_BASE]
+    effective = float(geometric.min()) if len(geometric) else FORCED_BASE
+    return np.sort(top), max(effective, tolerance)
+
+
+def segment_flags(indices: np.ndarray, flags: Optional[np.ndarray]) -> np.ndarray:
+    """
+    For each simplified segment [indices[j], indices[j+1]], whether any
+    original point in it has the flag set (O(k) with a prefix sum).
+    """
+    if flags is None or len(indices) < 2:
+        return np.zeros(max(len(indices) - 1, 0), dtype=bool)
+    counts = np.concatenate(([0], np.cumsum(flags)))
+    return (counts[indices[1:] + 1] - counts[indices[:-1]]) > 0
+
+
+def simplified_geometry(flight_case, zoom: Optional[float] = None,
+                        tolerance: Optional[float] = None,
+                        max_vertices: int = DEFAULT_MAX_VERTICES) -> Dict:
+    """
+    Simplified trajectory and corridor of a processed flight case.
+
+    Args:
+        flight_case: FlightCase (point blobs may be deferred)
+        zoom: Map zoom level, converted to a one-pixel tolerance
+        tolerance: Tolerance in meters (overrides zoom); with neither, only
+            max_vertices limits the detail
+        max_vertices: Vertex budget per line
+
+    Returns:
+        Dict with the effective tolerance per line, the point totals, and
+        per line the kept vertices; trajectory segments carry a violation
+        flag that is True if any original point in them is non-compliant
+    """
+    columns = playback.trajectory_columns(flight_case)
+    latitude = columns.get('latitude', np.empty(0))
+    longitude = columns.get('longitude', np.empty(0))
+    compliant = playback.compliance_mask(columns)
+
+    if tolerance is None:
+        tolerance = 0.0
+        if zoom is not None and len(latitude):
+            tolerance = zoom_tolerance(zoom, float(latitude.mean()))
+
+    tolerances = columns.get(TOLERANCE_COLUMN)
+    if tolerances is None:
+        # Processed before tolerances were stored
+        tolerances = trajectory_tolerances(latitude, longitude, compliant)
+    indices, trajectory_tolerance = select_vertices(tolerances, tolerance, max_vertices)
+
+    corridor = flight_case.corridor_columns()
+    corridor_total = len(corridor.get('latitude', ()))
+    corridor_tolerance_values = corridor.get(TOLERANCE_COLUMN)
+    if corridor_tolerance_values is None:
+        corridor_tolerance_values = corridor_tolerances(*(
+            corridor.get(name, np.empty(0))
+            for name in ('latitude', 'longitude', 'allowed_deviation', 'allowed_speed')
+        ))
+    corridor_indices, corridor_tolerance = select_vertices(
+        corridor_tolerance_values, tolerance, max_vertices
+    )
+
+    return {
+        'flight_case': flight_case.pk,
+        'tolerance': trajectory_tolerance,
+        'corridor_tolerance': corridor_tolerance,
+        'total_points': len(latitude),
+        'corridor_total_points': corridor_total,
+        'trajectory': {
+            'index': indices.tolist(),
+            'latitude': latitude[indices].tolist(),
+            'longitude': longitude[indices].tolist(),
+            'violation': segment_flags(indices, ~compliant).tolist(),
+        },
+        'corridor': {
+            name: corridor[name][corridor_indices].tolist()
+            for name in ('latitude', 'longitude', 'allowed_deviation', 'allowed_speed')
+            if name in corridor
+        },
+    }
@@ -0,0 +1,272 @@
+"""
+Uniform lat/lon grid index over corridor segments.
+
+Each segment is registered in every grid cell touched by its bounding box
+(padded by its allowed deviation). A nearest-segment query evaluates the
+segments of the query point's cell first and then grows the search window
+ring by ring. It stops once the best distance found is strictly smaller than
+a lower bound on the distance to anything outside the window. Results are
+therefore the same as the brute-force scan in CorridorGeometry: same
+distance, and the lowest segment index on ties.
+"""
+import math
+
+import numpy as np
+
+from .geometry import EARTH_RADIUS
+from .vectorized import CorridorGeometry
+
+
+# Below this many segments a full scan is cheaper than the grid
+MIN_INDEXED_SEGMENTS = 32
+
+# Upper bound on the number of grid cells
+MAX_CELLS = 1 << 20
+
+# Meters per degree of latitude
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180.0
+
+# Points still unresolved after this many rings are finished with a full scan
+MAX_RINGS = 6
+
+# Lower bounds are shrunk by this factor to absorb floating point rounding
+BOUND_SAFETY = 1.0 - 1e-9
+
+
+BOUNDS_COLUMNS = ('lat_min', 'lat_max', 'lon_min', 'lon_max')
+
+
+def segment_bounds(corridor: CorridorGeometry):
+    """
+    Bounding box of every segment, padded by its allowed deviation.
+
+    Returns:
+        Dict of BOUNDS_COLUMNS arrays (degrees), one row per segment
+    """
+    lat_a, lat_b = corridor.latitude[:-1], corridor.latitude[1:]
+    lon_a, lon_b = corridor.longitude[:-1], corridor.longitude[1:]
+
+    # Pad bounding boxes by the allowed deviation (meters -> degrees)
+    pad_lat = corridor.seg_allowed_deviation / METERS_PER_DEGREE
+    max_abs_lat = np.maximum(np.abs(lat_a), np.abs(lat_b)) + pad_lat
+    cos_max = np.maximum(np.cos(np.radians(np.minimum(max_abs_lat, 89.0))), 1e-3)
+    pad_lon = pad_lat / cos_max
+
+    return {
+        'lat_min': np.minimum(lat_a, lat_b) - pad_lat - 1e-9,
+        'lat_max': np.maximum(lat_a, lat_b) + pad_lat + 1e-9,
+        'lon_min': np.minimum(lon_a, lon_b) - pad_lon - 1e-9,
+        'lon_max': np.maximum(lon_a, lon_b) + pad_lon + 1e-9,
+    }
+
+
+class CorridorIndex:
+    """
+    Grid index answering nearest-segment queries for a CorridorGeometry.
+
+    Exposes the same nearest_segments/limits_for interface as
+    CorridorGeometry so it can be passed wherever a corridor is expected.
+    """
+
+    def __init__(self, corridor: CorridorGeometry, cell_size: float = None, bounds=None):
+        """
+        Args:
+            corridor: Precomputed corridor geometry
+            cell_size: Grid cell size in degrees (derived from segment sizes if omitted)
+            bounds: Optional segment_bounds(corridor), e.g. loaded from storage
+        """
+        self.corridor = corridor
+        self.enabled = corridor.segment_count >= MIN_INDEXED_SEGMENTS
+
+        if self.enabled:
+            self._build(cell_size, bounds)
+
+    @property
+    def segment_count(self) -> int:
+        return self.corridor.segment_count
+
+    def limits_for(self, segment_indices):
+        return self.corridor.limits_for(segment_indices)
+
+    def _build(self, cell_size, bounds):
+        corridor = self.corridor
+        if bounds is None:
+            bounds = segment_bounds(corridor)
+        self.lat_min, self.lat_max = bounds['lat_min'], bounds['lat_max']
+        self.lon_min, self.lon_max = bounds['lon_min'], bounds['lon_max']
+
+        self.origin_lat = float(self.lat_min.min())
+        self.origin_lon = float(self.lon_min.min())
+        extent_lat = float(self.lat_max.max()) - self.origin_lat
+        extent_lon = float(self.lon_max.max()) - self.origin_lon
+
+        # Longitude bounds below assume no wrap-around at the antimeridian
+        if extent_lon >= 180.0:
+            self.enabled = False
+            return
+
+        if cell_size is None:
+            sizes = np.maximum(self.lat_max - self.lat_min, self.lon_max - self.lon_min)
+            cell_size = float(np.median(sizes))
+        cell_size = max(cell_size, max(extent_lat, extent_lon) / 4096, 1e-7)
+        while (math.ceil(extent_lat / cell_size + 1e-9) *
+               math.ceil(extent_lon / cell_size + 1e-9)) > MAX_CELLS:
+            cell_size *= 2
+
+        self.cell_size = cell_size
+        self.ny = max(1, math.ceil(extent_lat / cell_size + 1e-9))
+        self.nx = max(1, math.ceil(extent_lon / cell_size + 1e-9))
+
+        # cos(latitude) is smallest at the grid edge farthest from the equator
+        top = self.origin_lat + self.ny * cell_size
+        self.cos_min = max(0.0, min(math.cos(math.radians(self.origin_lat)),
+                                    math.cos(math.radians(top))))
+
+        iy0 = self._cell_y(self.lat_min)
+        iy1 = self._cell_y(self.lat_max)
+        ix0 = self._cell_x(self.lon_min)
+        ix1 = self._cell_x(self.lon_max)
+
+        # Expand each segment into the cells covered by its bounding box
+        spans_y = iy1 - iy0 + 1
+        spans_x = ix1 - ix0 + 1
+        counts = spans_y * spans_x
+        seg = np.repeat(np.arange(corridor.segment_count), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cy = np.repeat(iy0, counts) + offset // np.repeat(spans_x, counts)
+        cx = np.repeat(ix0, counts) + offset % np.repeat(spans_x, counts)
+        cell = cy * self.nx + cx
+
+        # CSR layout: segments of cell c are cell_segments[cell_start[c]:cell_start[c + 1]]
+        order = np.lexsort((seg, cell))
+        self.cell_segments = seg[order]
+        self.cell_start = np.searchsorted(cell[order], np.arange(self.nx * self.ny + 1))
+
+    def _cell_y(self, lat):
+        iy = np.floor((lat - self.origin_lat) / self.cell_size).astype(np.int64)
+        return np.clip(iy, 0, self.ny - 1)
+
+    def _cell_x(self, lon):
+        ix = np.floor((lon - self.origin_lon) / self.cell_size).astype(np.int64)
+        return np.clip(ix, 0, self.nx - 1)
+
+    def _ring_offsets(self, ring):
+        """Cell offsets (dx, dy) at Chebyshev distance `ring` from a cell."""
+        if ring == 0:
+            return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+        side = np.arange(-ring, ring + 1)
+        inner = np.arange(-ring + 1, ring)
+        dx = np.concatenate([side, side, np.full(len(inner), -ring), np.full(len(inner), ring)])
+        dy = np.concatenate([np.full(len(side), -ring), np.full(len(side), ring), inner, inner])
+        return dx, dy
+
+    def _lower_bound(self, lat, lon, x0, x1, y0, y1):
+        """
+        Lower bound (meters) on the distance from each point to any segment
+        outside its cell window [x0, x1] x [y0, y1] (per-point arrays).
+        """
+        lat_lo = self.origin_lat + y0 * self.cell_size
+        lat_hi = self.origin_lat + (y1 + 1) * self.cell_size
+        lon_lo = self.origin_lon + x0 * self.cell_size
+        lon_hi = self.origin_lon + (x1 + 1) * self.cell_size
+
+        # Sides touching the grid border have no cells beyond them
+        gap_lat = np.minimum(
+            np.where(y0 > 0, np.maximum(lat - lat_lo, 0.0), np.inf),
+            np.where(y1 < self.ny - 1, np.maximum(lat_hi - lat, 0.0), np.inf),
+        )
+        gap_lon = np.minimum(
+            np.where(x0 > 0, np.maximum(lon - lon_lo, 0.0), np.inf),
+            np.where(x1 < self.nx - 1, np.maximum(lon_hi - lon, 0.0), np.inf),
+        )
+
+        # Great-circle distance is at least the meridian arc |dlat| and, with
+        # a = sin^2(dlat/2) + cos(lat1)cos(lat2)sin^2(dlon/2), at least the
+        # longitude term alone.
+        bound_lat = EARTH_RADIUS * np.radians(gap_lat)
+        cos_p = np.maximum(np.cos(np.radians(lat)), 0.0)
+        half = np.radians(np.minimum(gap_lon, 180.0)) / 2
+        a = np.minimum(cos_p * self.cos_min * np.sin(half) ** 2, 1.0)
+        bound_lon = np.where(np.isinf(gap_lon), np.inf,
+                             2 * EARTH_RADIUS * np.arcsin(np.sqrt(a)))
+
+        return np.minimum(bound_lat, bound_lon) * BOUND_SAFETY
+
+    def nearest_segments(self, lat, lon, alt):
+        """
+        Nearest corridor segment for every point, using the grid.
+
+        All unresolved points advance one ring at a time together; each ring
+        is evaluated as one flat batch of (point, candidate segment) pairs.
+        Points not resolved within MAX_RINGS rings fall back to a full scan.
+
+        Args:
+            lat, lon, alt: 1-D arrays of trajectory point coordinates
+
+        Returns:
+            Tuple of (distance, segment_index) arrays, identical to
+            CorridorGeometry.nearest_segments
+        """
+        if not self.enabled:
+            return self.corridor.nearest_segments(lat, lon, alt)
+
+        n = len(lat)
+        distances = np.full(n, np.inf)
+        indices = np.full(n, -1, dtype=np.int64)
+
+        px = self._cell_x(lon)
+        py = self._cell_y(lat)
+        active = np.arange(n)
+
+        for ring in range(min(max(self.nx, self.ny), MAX_RINGS) + 1):
+            if not len(active):
+                break
+
+            # Cells on this ring around each active point, inside the grid
+            dx, dy = self._ring_offsets(ring)
+            cx = px[active][:, None] + dx
+            cy = py[active][:, None] + dy
+            inside = (cx >= 0) & (cx < self.nx) & (cy >= 0) & (cy < self.ny)
+            owner = np.broadcast_to(active[:, None], cx.shape)[inside]
+            cell = cy[inside] * self.nx + cx[inside]
+
+            # Expand (point, cell) into (point, segment) pairs
+            starts = self.cell_start[cell]
+            counts = self.cell_start[cell + 1] - starts
+            total = int(counts.sum())
+            if total:
+                owner = np.repeat(owner, counts)
+                offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                segment = self.cell_segments[np.repeat(starts, counts) + offset]
+
+                dist = self.corridor.pair_distances(lat[owner], lon[owner], alt[owner], segment)
+
+                # Pairs are grouped by point (row-major expansion), so reduce
+                # each run: smallest distance, then lowest segment on ties
+                run_start = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+                point = owner[run_start]
+                best = np.minimum.reduceat(dist, run_start)
+                tied = dist == np.repeat(best, np.diff(np.r_[run_start, total]))
+                best_idx = np.minimum.reduceat(
+                    np.where(tied, segment, self.corridor.segment_count), run_start
+                )
+
+                current = distances[point]
+                better = (best < current) | ((best == current) & (best_idx < indices[point]))
+                distances[point[better]] = best[better]
+                indices[point[better]] = best_idx[better]
+
+            bound = self._lower_bound(
+                lat[active], lon[active],
+                np.maximum(px[active] - ring, 0), np.minimum(px[active] + ring, self.nx - 1),
+                np.maximum(py[active] - ring, 0), np.minimum(py[active] + ring, self.ny - 1),
+            )
+            active = active[~(distances[active] < bound)]
+
+        # Far-away points: the window would have to grow too much
+        if len(active):
+            distances[active], indices[active] = self.corridor.nearest_segments(
+                lat[active], lon[active], alt[active]
+            )
+
+        return distances, indices
@@ -0,0 +1,282 @@
+"""
+Live telemetry push (Server-Sent Events).
+
+Points appended to a flight case (live.append_points) are published here
+once their transaction commits. Every client streaming
+GET /api/flight-cases/{id}/stream/ receives them with deviation and
+compliance, without polling.
+
+Fan-out is built so a slow client cannot stall ingestion:
+
+- each event is encoded once per publish, not once per subscriber;
+- publish never waits. It hands the event to every subscriber's event
+  loop with one call_soon_threadsafe per loop (not per subscriber), so an
+  append request pays O(1) loop wake-ups however many clients listen;
+- every subscriber has a bounded queue (TELEMETRY_QUEUE_SIZE events).
+  When a client does not read fast enough the oldest queued event is
+  dropped. The client is then sent a 'dropped' event and refetches the gap
+  with trajectory_window; its socket buffer never grows without bound.
+
+The broker lives in the process. Subscribers only see points appended
+through the same server process, so live streaming needs a single ASGI
+process (see the README).
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from django.conf import settings
+
+# Scope key of the asyncio.Event set by watch_disconnect
+DISCONNECTED_KEY = 'fofis.disconnected'
+
+# Point columns carried by 'points' events
+EVENT_COLUMNS = (
+    'latitude', 'longitude', 'altitude', 'time_seconds', 'speed', 'deviation',
+    'allowed_deviation', 'allowed_speed', 'compliant',
+)
+
+
+class Subscription:
+    """
+    One streaming client: a bounded queue of encoded events on the
+    client's event loop.
+    """
+
+    def __init__(self, flight_case_id: int, maxsize: int):
+        self.flight_case_id = flight_case_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, event: bytes) -> None:
+        """Queue an event, dropping the oldest one when full (loop thread only)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> list:
+        """
+        Queued events, waiting up to timeout seconds for the first one.
+
+        Returns:
+            Every event queued so far (empty list on timeout)
+        """
+        try:
+            events = [await asyncio.wait_for(self.queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    def take_dropped(self) -> int:
+        """Events dropped since the last call."""
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class Broker:
+    """
+    Subscribers by flight case id; safe to publish from any thread.
+
+    One broker per process, and only live.append_points calls in the same
+    process publish to it. The web server must therefore run a single
+    process (Procfile and render.yaml pin gunicorn to --workers 1, the
+    uvicorn worker serves many streams concurrently); with more, a stream
+    would miss every point appended through another process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self.count = 0
+
+    def subscribe(self, flight_case_id: int) -> Subscription:
+        """Register a subscriber on the running event loop."""
+        subscription = Subscription(flight_case_id, settings.TELEMETRY_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[flight_case_id].add(subscription)
+            self.count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.flight_case_id)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.flight_case_id]
+            self.count -= 1
+
+    def has_capacity(self) -> bool:
+        return self.count < settings.TELEMETRY_MAX_SUBSCRIBERS
+
+    def publish(self, flight_case_id: int, event: str, data: Dict, event_id=None) -> int:
+        """
+        Send an event to every subscriber of a flight case without waiting.
+
+        Args:
+            flight_case_id: FlightCase id
+            event: SSE event name
+            data: JSON-serializable payload
+            event_id: SSE id (clients send the last one back on reconnect)
+
+        Returns:
+            Number of subscribers the event was handed to
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(flight_case_id, ()))
+        if not subscribers:
+            return 0
+
+        encoded = encode_event(event, data, event_id)
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, group, encoded)
+            except RuntimeError:
+                # The loop has shut down; its subscribers are gone
+                pass
+        return len(subscribers)
+
+
+broker = Broker()
+
+
+def _deliver(subscriptions, encoded: bytes) -> None:
+    for subscription in subscriptions:
+        subscription.put(encoded)
+
+
+def encode_event(event: str, data: Dict, event_id=None) -> bytes:
+    """One SSE frame: optional id, event name and a single-line JSON data field."""
+    frame = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), allow_nan=False)}\n\n"
+    if event_id is not None:
+        frame = f"id: {event_id}\n" + frame
+    return frame.encode('utf-8')
+
+
+def publish_append(result: Dict) -> int:
+    """
+    Publish the points of a live.append_points result as a 'points' event.
+
+    The event id is the index of the last new point, so a reconnecting
+    client tells the stream where it stopped.
+    """
+    flight_case = result['flight_case']
+    points = result['points']
+    rows = len(points)
+    data = {
+        'flight_case': flight_case.id,
+        'start': result['start'],
+        'point_count': flight_case.point_count,
+        'previous': result['previous'],
+        'points': {
+            'rows': rows,
+            'columns': {
+                name: [json_value(point.get(name)) for point in points]
+                for name in EVENT_COLUMNS
+            },
+        },
+        'mean_speed': json_value(flight_case.mean_speed),
+        'max_speed': json_value(flight_case.max_speed),
+        'mean_deviation': json_value(flight_case.mean_deviation),
+        'compliance_percentage': json_value(flight_case.compliance_percentage),
+        'published_at': time.time(),
+    }
+    return broker.publish(flight_case.id, 'points', data, event_id=result['start'] + rows - 1)
+
+
+async def event_stream(flight_case_id: int, hello: Dict, scope: Optional[Dict] = None,
+                       last_event_id: Optional[int] = None):
+    """
+    Body of a stream response: a 'hello' event, then published events,
+    with comment heartbeats while idle.
+
+    Ends when the client disconnects (noticed at the next heartbeat when the
+    server runs behind watch_disconnect) or after TELEMETRY_STREAM_SECONDS;
+    EventSource clients reconnect by themselves after the retry delay.
+
+    Args:
+        flight_case_id: FlightCase id
+        hello: Payload of the first event (current point count and aggregates)
+        scope: ASGI scope of the request
+        last_event_id: Last-Event-ID sent by a reconnecting client
+    """
+    disconnected = (scope or {}).get(DISCONNECTED_KEY)
+    heartbeat = settings.TELEMETRY_HEARTBEAT_SECONDS
+    deadline = time.monotonic() + settings.TELEMETRY_STREAM_SECONDS
+    subscription = broker.subscribe(flight_case_id)
+    try:
+        yield f"retry: {settings.TELEMETRY_RETRY_MS}\n".encode() + encode_event('hello', hello)
+        point_count = hello['point_count']
+        if last_event_id is not None and last_event_id < point_count - 1:
+            # Points appended while the client was away
+            yield encode_event('resync', {'from': last_event_id + 1, 'point_count': point_count})
+
+        while time.monotonic() < deadline:
+            events = await subscription.get(heartbeat)
+            if disconnected is not None and disconnected.is_set():
+                break
+            dropped = subscription.take_dropped()
+            if dropped:
+                events.insert(0, encode_event('dropped', {'dropped': dropped}))
+            yield b''.join(events) if events else b': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def watch_disconnect(app):
+    """
+    ASGI middleware that records client disconnects in the scope.
+
+    Django 4.2 stops reading the ASGI receive channel once the request body
+    is in, so a streaming view never learns that its client went away.
+    After the body has been read this wrapper keeps listening and sets
+    scope[DISCONNECTED_KEY] (an asyncio.Event) on http.disconnect.
+    """
+    async def wrapper(scope, receive, send):
+        if scope['type'] != 'http':
+            return await app(scope, receive, send)
+
+        disconnected = asyncio.Event()
+        scope = dict(scope, **{DISCONNECTED_KEY: disconnected})
+        watcher = None
+
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        async def receive_body():
+            nonlocal watcher
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+            elif not message.get('more_body', False):
+                watcher = asyncio.ensure_future(watch())
+            return message
+
+        try:
+            await app(scope, receive_body, send)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    return wrapper
+
+
+def json_value(value):
+    """JSON-safe number: non-finite floats become None."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
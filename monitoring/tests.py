@@ -3,16 +3,147 @@ Tests for the monitoring application.
 """
 from django.test import TestCase, Client
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import FlightCase
-from .parsers import parse_corridor_file, parse_trajectory_file, parse_time
+from .models import (
+    Corridor, FlightCase, ProcessingJob, ProcessingState, SlowFlightCase, ViolationInterval,
+)
+from .jobs import claim_next_job, requeue_stale_jobs, run_job, run_worker, touch_job
+from .parsers import (
+    parse_corridor_columns,
+    parse_corridor_file,
+    parse_time,
+    parse_trajectory_columns,
+    parse_trajectory_file,
+    time_to_seconds,
+)
 from .geometry import (
     haversine_distance,
     distance_3d,
     point_to_segment_distance_3d,
     calculate_speed,
 )
+from . import (
+    bulk, columnar, corridors, geometry, jobs, live, metrics, parallel, playback, processing, renderers,
+    response_cache, simplify, telemetry, tiles, timing, vectorized, violations,
+)
+from .spatial_index import CorridorIndex
+from .cpp_validator import CppValidatorProcess, load_validator_library, validate_points
+from .processing import (
+    run_cpp_validation,
+    run_cpp_library_validation,
+    _run_cpp_validation_per_point,
+)
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.cache import has_vary_header
+from django.db import connection, transaction
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from datetime import datetime, timedelta
+from pathlib import Path
+import numpy as np
+import asyncio
+import copy
+import io
+import json
 import os
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
 import tempfile
+import threading
+import unittest
+import zipfile
+
+
+_module_directory = None
+_module_override = None
+_module_environ = None
+
+
+def setUpModule():
+    # Uploads and processing runs write media files, and every request
+    # records metrics; keep both out of the project's media/ and METRICS_DIR.
+    # Spawned pool workers read them from the environment.
+    global _module_directory, _module_override, _module_environ
+    _module_directory = tempfile.mkdtemp()
+    paths = {
+        'MEDIA_ROOT': os.path.join(_module_directory, 'media'),
+        'METRICS_DIR': os.path.join(_module_directory, 'metrics'),
+    }
+    _module_override = override_settings(**paths)
+    _module_override.enable()
+    _module_environ = {name: os.environ.get(name) for name in paths}
+    os.environ.update(paths)
+
+
+def tearDownModule():
+    for name, value in _module_environ.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    _module_override.disable()
+    shutil.rmtree(_module_directory)
+
+
+class UploadTestMixin:
+    """Run each test against a temporary MEDIA_ROOT and upload through the API.
+    
+    Subclasses override CORRIDOR and TRAJECTORY for their default upload, and
+    temporary_settings() for further settings under self.directory.
+    """
+    
+    CORRIDOR = b"10.0 50.0 1000.0 500.0 300.0\n11.0 51.0 1200.0 500.0 320.0"
+    TRAJECTORY = b"50.0 10.0 1000.0 13:00:00\n50.5 10.5 1100.0 13:10:00\n"
+    
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+        self.directory = tempfile.mkdtemp()
+        self.media_root = os.path.join(self.directory, 'media')
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, **self.temporary_settings()
+        )
+        self.settings_override.enable()
+        corridors.clear_cache()
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.directory)
+        corridors.clear_cache()
+        super().tearDown()
+    
+    def temporary_settings(self):
+        return {}
+    
+    def upload(self, corridor=None, trajectory=None):
+        """
+        Upload a corridor and a trajectory file.
+        
+        Args:
+            corridor: File content as bytes or str; defaults to CORRIDOR
+            trajectory: File content as bytes or str; defaults to TRAJECTORY
+            
+        Returns:
+            The response of the upload endpoint
+        """
+        files = {}
+        for field, content in (('corridor', corridor or self.CORRIDOR),
+                               ('trajectory', trajectory or self.TRAJECTORY)):
+            if isinstance(content, str):
+                content = content.encode()
+            files[f'{field}_file'] = SimpleUploadedFile(f"{field}.txt", content)
+        return self.client.post('/api/flight-cases/', files)
+    
+    def upload_case(self, corridor=None, trajectory=None):
+        """Upload like upload() and return the created flight case."""
+        response = self.upload(corridor, trajectory)
+        self.assertEqual(response.status_code, 202)
+        return FlightCase.objects.get(pk=response.json()['id'])
 
 
 class ParserTests(TestCase):
@@ -61,6 +192,42 @@ class ParserTests(TestCase):
             self.assertEqual(points[0]['time'], '13:00:00')
         finally:
             os.unlink(temp_path)
+    
+    def _trajectory_file(self, text):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            f.write(text)
+        self.addCleanup(os.unlink, f.name)
+        return f.name
+    
+    def test_trajectory_columns_match_time_parser(self):
+        """Bulk time decoding agrees with parse_time for every accepted form."""
+        times = ['00:00:00', '01:02:03.000001', '01:02:03.5', '9:5:7', '23:59:59.999999']
+        path = self._trajectory_file(
+            "# comment\n\n" +
+            "".join(f"50.{i} 10.{i} {i}e2 {t}\r\n" for i, t in enumerate(times))
+        )
+        
+        columns = parse_trajectory_columns(path)
+        
+        expected = [time_to_seconds(parse_time(t)) for t in times]
+        self.assertEqual(columns['time_seconds'].tolist(), expected)
+        self.assertEqual(columns['time'].tolist(), times)
+        self.assertEqual(columns['altitude'].tolist(), [0.0, 100.0, 200.0, 300.0, 400.0])
+        self.assertEqual(parse_trajectory_file(path)[3]['time_seconds'], expected[3])
+    
+    def test_trajectory_errors_keep_line_numbers(self):
+        """Malformed files report the same line-numbered errors."""
+        cases = [
+            ("50 10 1000 13:00:00\n\n50 10 13:00:01\n", "Line 3: Expected 4 values, got 3"),
+            ("50 10 1000 13:00:00\n50 x 1000 13:00:01\n", "Line 2: Invalid data"),
+            ("50 10 1000 13:00:00\n50 10 1000 24:00:01\n", "Line 2: Invalid data - Invalid time format"),
+            ("50 10 1000 13:00:05\n50 10 1000 13:00:01\n", "not sorted by time (line 2)"),
+            ("# only a comment\n", "empty or contains no valid data"),
+        ]
+        for text, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(ValueError, message):
+                    parse_trajectory_columns(self._trajectory_file(text))
 
 
 class GeometryTests(TestCase):
@@ -112,6 +279,248 @@ class GeometryTests(TestCase):
         self.assertGreater(speed, 0)
 
 
+class VectorizedGeometryTests(TestCase):
+    """Test the NumPy engine against the reference Python implementation."""
+    
+    def setUp(self):
+        rng = random.Random(42)
+        self.corridor = [
+            {
+                'longitude': 10.0 + i * 0.05 + rng.uniform(-0.01, 0.01),
+                'latitude': 50.0 + i * 0.03 + rng.uniform(-0.01, 0.01),
+                'altitude': 1000.0 + rng.uniform(-200, 200),
+                'allowed_deviation': rng.uniform(300, 800),
+                'allowed_speed': rng.uniform(250, 350),
+                'index': i,
+            }
+            for i in range(40)
+        ]
+        # Include a zero-length segment
+        self.corridor.insert(10, dict(self.corridor[9]))
+        self.trajectory = [
+            {
+                'latitude': 50.0 + i * 0.006 + rng.uniform(-0.01, 0.01),
+                'longitude': 10.0 + i * 0.01 + rng.uniform(-0.01, 0.01),
+                'altitude': 1000.0 + rng.uniform(-300, 300),
+                'time_seconds': 46800.0 + i * 10 + (0 if i % 17 else -10),
+                'index': i,
+            }
+            for i in range(200)
+        ]
+    
+    def test_matches_python_engine(self):
+        """Speeds, deviations and compliance match within tolerance."""
+        expected = geometry.compute_deviations(
+            geometry.compute_trajectory_speeds(copy.deepcopy(self.trajectory)),
+            self.corridor
+        )
+        actual = vectorized.compute_deviations(
+            vectorized.compute_trajectory_speeds(copy.deepcopy(self.trajectory)),
+            self.corridor
+        )
+        
+        for exp, act in zip(expected, actual):
+            self.assertAlmostEqual(exp['speed'], act['speed'], delta=vectorized.RESULT_TOLERANCE)
+            self.assertAlmostEqual(exp['deviation'], act['deviation'], delta=vectorized.RESULT_TOLERANCE)
+            self.assertEqual(exp['nearest_segment'], act['nearest_segment'])
+            self.assertEqual(exp['allowed_deviation'], act['allowed_deviation'])
+            self.assertEqual(exp['compliant'], act['compliant'])
+    
+    def test_single_point_corridor(self):
+        """A one-point corridor measures distance to that point."""
+        corridor = self.corridor[:1]
+        expected = geometry.compute_deviations(copy.deepcopy(self.trajectory[:5]), corridor)
+        actual = vectorized.compute_deviations(copy.deepcopy(self.trajectory[:5]), corridor)
+        
+        for exp, act in zip(expected, actual):
+            self.assertAlmostEqual(exp['deviation'], act['deviation'], delta=vectorized.RESULT_TOLERANCE)
+            self.assertEqual(act['nearest_segment'], 0)
+            self.assertEqual(exp['allowed_speed'], act['allowed_speed'])
+
+
+class SpatialIndexTests(TestCase):
+    """Test the corridor grid index against the full scan."""
+    
+    def test_index_matches_full_scan(self):
+        """Indexed lookup returns the same segment and distance."""
+        rng = np.random.default_rng(7)
+        size = 300
+        t = np.linspace(0, 1, size)
+        corridor = vectorized.CorridorGeometry(
+            50.0 + 2 * t + 0.05 * np.sin(t * 40),
+            10.0 + 3 * t,
+            1000.0 + rng.uniform(-100, 100, size),
+            rng.uniform(300, 800, size),
+            np.full(size, 300.0),
+        )
+        index = CorridorIndex(corridor)
+        self.assertTrue(index.enabled)
+        
+        s = rng.uniform(0, 1, 2000)
+        lat = 50.0 + 2 * s + rng.normal(0, 0.02, 2000)
+        lon = 10.0 + 3 * s + rng.normal(0, 0.02, 2000)
+        alt = 1000.0 + rng.normal(0, 300, 2000)
+        # Points far outside the grid and exactly on corridor vertices
+        lat[:20] += rng.uniform(-5, 5, 20)
+        lon[:20] += rng.uniform(-5, 5, 20)
+        lat[20:30] = corridor.latitude[100:110]
+        lon[20:30] = corridor.longitude[100:110]
+        alt[20:30] = corridor.altitude[100:110]
+        
+        expected_dist, expected_idx = corridor.nearest_segments(lat, lon, alt)
+        actual_dist, actual_idx = index.nearest_segments(lat, lon, alt)
+        
+        np.testing.assert_array_equal(expected_idx, actual_idx)
+        np.testing.assert_array_equal(expected_dist, actual_dist)
+    
+    def test_short_corridor_uses_full_scan(self):
+        """Small corridors skip the grid."""
+        corridor = vectorized.CorridorGeometry(
+            [50.0, 50.1, 50.2], [10.0, 10.1, 10.2], [1000.0] * 3, [500.0] * 3, [300.0] * 3
+        )
+        self.assertFalse(CorridorIndex(corridor).enabled)
+
+
+class ParallelGeometryTests(TestCase):
+    """Test chunked multi-process evaluation against the serial engine."""
+    
+    def _corridor(self, size=200):
+        t = np.linspace(0, 1, size)
+        return vectorized.CorridorGeometry(
+            50.0 + t, 10.0 + 2 * t, np.full(size, 1000.0),
+            np.full(size, 500.0), np.full(size, 300.0)
+        )
+    
+    def _columns(self, n):
+        rng = np.random.default_rng(11)
+        s = np.sort(rng.uniform(0, 1, n))
+        return {
+            'latitude': 50.0 + s + rng.normal(0, 0.005, n),
+            'longitude': 10.0 + 2 * s + rng.normal(0, 0.005, n),
+            'altitude': 1000.0 + rng.normal(0, 100, n),
+            'time_seconds': np.arange(n, dtype=np.float64),
+        }
+    
+    def test_parallel_matches_serial(self):
+        """Chunks are merged in order and match the serial result exactly."""
+        corridor = self._corridor()
+        columns = self._columns(2 * parallel.MIN_CHUNK_POINTS + 123)
+        
+        expected = vectorized.evaluate_trajectory(columns, corridor)
+        try:
+            actual = parallel.evaluate_trajectory_parallel(columns, corridor, workers=2, min_points=0)
+            self.assertIsNotNone(parallel._pool)
+        finally:
+            parallel.shutdown_pool()
+        
+        for key, values in expected.items():
+            np.testing.assert_array_equal(values, actual[key], err_msg=key)
+    
+    def test_short_trajectory_runs_serially(self):
+        """No pool is started below the size threshold."""
+        corridor = self._corridor()
+        columns = self._columns(500)
+        
+        result = parallel.evaluate_trajectory_parallel(columns, corridor, workers=4)
+        
+        self.assertIsNone(parallel._pool)
+        np.testing.assert_array_equal(
+            result['nearest_segment'],
+            vectorized.evaluate_trajectory(columns, corridor)['nearest_segment']
+        )
+
+
+@unittest.skipUnless(shutil.which('g++'), 'g++ is required to build the C++ validator')
+class CppValidatorTests(TestCase):
+    """Test the streaming C++ validator driver."""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.build_dir = tempfile.mkdtemp()
+        cls.executable = os.path.join(cls.build_dir, 'trajectory_validator')
+        cls.library = os.path.join(cls.build_dir, 'libtrajectory_validator.so')
+        source = str(settings.BASE_DIR / 'cpp' / 'trajectory_validator.cpp')
+        subprocess.run(['g++', '-std=c++11', '-O2', '-o', cls.executable, source, '-lm'],
+                       check=True)
+        subprocess.run(['g++', '-std=c++11', '-O2', '-DTRAJECTORY_VALIDATOR_LIBRARY',
+                        '-shared', '-fPIC', '-o', cls.library, source, '-lm'],
+                       check=True)
+    
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.build_dir)
+        super().tearDownClass()
+    
+    def setUp(self):
+        self.corridor = [
+            {'latitude': 50.0 + i * 0.1, 'longitude': 10.0 + i * 0.1, 'altitude': 1000.0,
+             'allowed_deviation': 500.0, 'allowed_speed': 300.0}
+            for i in range(5)
+        ]
+        self.trajectory = [
+            {'latitude': 50.0 + i * 0.02, 'longitude': 10.0 + i * 0.021, 'altitude': 1100.0,
+             'speed': 250.0 + i * 5, 'nearest_segment': min(i // 5, 3)}
+            for i in range(20)
+        ]
+    
+    def test_stream_matches_per_point(self):
+        """Streaming mode gives the same results as one process per point."""
+        expected = _run_cpp_validation_per_point(
+            copy.deepcopy(self.trajectory), self.corridor, self.executable
+        )
+        with override_settings(CPP_VALIDATOR_BATCH_SIZE=7):
+            actual = run_cpp_validation(copy.deepcopy(self.trajectory), self.corridor, self.executable)
+        
+        for exp, act in zip(expected, actual):
+            self.assertEqual(exp['cpp_deviation'], act['cpp_deviation'])
+            self.assertEqual(exp['cpp_speed_violation'], act['cpp_speed_violation'])
+            self.assertEqual(exp['cpp_compliant'], act['cpp_compliant'])
+    
+    def test_library_matches_executable(self):
+        """The shared library agrees with the executable (which prints 2 decimals)."""
+        trajectory = copy.deepcopy(self.trajectory)
+        trajectory[0]['nearest_segment'] = 7  # out of range: left unvalidated
+        
+        expected = _run_cpp_validation_per_point(copy.deepcopy(trajectory), self.corridor, self.executable)
+        library = load_validator_library(self.library)
+        self.assertIsNotNone(library)
+        actual = run_cpp_library_validation(copy.deepcopy(trajectory), self.corridor, library)
+        
+        self.assertNotIn('cpp_deviation', actual[0])
+        for exp, act in zip(expected[1:], actual[1:]):
+            self.assertAlmostEqual(exp['cpp_deviation'], act['cpp_deviation'], delta=0.005)
+            self.assertAlmostEqual(exp['cpp_speed_violation'], act['cpp_speed_violation'], delta=0.005)
+            self.assertEqual(exp['cpp_compliant'], act['cpp_compliant'])
+    
+    def test_missing_library(self):
+        """A missing library is reported as unavailable."""
+        self.assertIsNone(load_validator_library(os.path.join(self.build_dir, 'missing.so')))
+    
+    def test_bad_record_reports_error(self):
+        """An out-of-range segment is reported for that record only."""
+        with CppValidatorProcess(self.executable, self.corridor, timeout=5) as validator:
+            results = validator.validate_batch([
+                (50.0, 10.0, 1000.0, 250.0, 0),
+                (50.0, 10.0, 1000.0, 250.0, 99),
+            ])
+        self.assertEqual(len(results[0]), 3)
+        self.assertIn('out of range', results[1])
+    
+    def test_batch_timeout(self):
+        """A stuck validator fails only its batch, with an error per record."""
+        script = os.path.join(self.build_dir, 'stuck_validator')
+        with open(script, 'w') as f:
+            f.write(f"#!{sys.executable}\nimport time\nprint('READY 4', flush=True)\ntime.sleep(30)\n")
+        os.chmod(script, 0o755)
+        
+        records = [(50.0, 10.0, 1000.0, 250.0, 0)] * 3
+        results = validate_points(script, self.corridor, records, batch_size=2, timeout=0.2)
+        
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all('timed out' in r for r in results))
+
+
 class FlightCaseModelTests(TestCase):
     """Test FlightCase model."""
     
@@ -137,6 +546,62 @@ class FlightCaseModelTests(TestCase):
         self.assertIsNone(fc.mean_speed)
 
 
+class ColumnarStorageTests(TestCase):
+    """Test the columnar point blobs."""
+    
+    def _points(self):
+        points = []
+        for i in range(4):
+            point = {
+                'latitude': 50.0 + i / 3, 'longitude': 10.0, 'altitude': 1000.0,
+                'time': f'13:00:0{i}', 'time_seconds': 46800.0 + i, 'index': i,
+                'speed': 420.5, 'deviation': 12.25, 'nearest_segment': i,
+                'allowed_deviation': 500.0, 'allowed_speed': 300.0, 'compliant': i % 2 == 0,
+            }
+            points.append(point)
+        points[1].update(allowed_deviation=None, allowed_speed=None)
+        points[2].update(cpp_deviation=12.0, cpp_speed_violation=0.0, cpp_compliant=True)
+        points[3].update(cpp_error='Validator timed out', note={'source': 'test'})
+        return points
+    
+    def test_round_trip_preserves_points(self):
+        """None values, absent keys and unknown keys survive encoding."""
+        points = self._points()
+        blob = columnar.encode_points(points, columnar.TRAJECTORY_SCHEMA)
+        
+        self.assertEqual(columnar.decode_points(blob, columnar.TRAJECTORY_SCHEMA), points)
+        self.assertEqual(columnar.read_header(blob)[:2], (columnar.SCHEMA_VERSION, 4))
+        
+        columns = columnar.decode_columns(blob, ['latitude', 'cpp_compliant', 'missing'])
+        self.assertEqual(set(columns), {'latitude', 'cpp_compliant'})
+        self.assertEqual(columns['latitude'].dtype, np.float64)
+        self.assertEqual(columns['cpp_compliant'].tolist(), [False, False, True, False])
+    
+    def test_rejects_unknown_format(self):
+        """Blobs from a newer schema version are refused."""
+        blob = bytearray(columnar.encode_points(self._points(), columnar.TRAJECTORY_SCHEMA))
+        blob[4] = columnar.SCHEMA_VERSION + 1
+        with self.assertRaises(columnar.ColumnarFormatError):
+            columnar.decode_points(bytes(blob), columnar.TRAJECTORY_SCHEMA)
+    
+    def test_model_lazy_columns(self):
+        """The model decodes only requested columns and round-trips through the DB."""
+        fc = FlightCase.objects.create()
+        fc.trajectory_data = self._points()
+        fc.save()
+        
+        fc = FlightCase.objects.get(pk=fc.pk)
+        self.assertEqual(fc.trajectory_point_count, 4)
+        self.assertEqual(fc.trajectory_start_time, '13:00:00')
+        self.assertEqual(fc.trajectory_end_time, '13:00:03')
+        self.assertEqual(set(fc._column_cache['trajectory_blob'][1]), {'time'})
+        
+        speed = fc.trajectory_columns(['speed'])['speed']
+        self.assertFalse(speed.flags.writeable)
+        self.assertEqual(fc.trajectory_data, self._points())
+        self.assertIsNone(fc.corridor_data)
+
+
 class APITests(TestCase):
     """Test API endpoints."""
     
@@ -158,3 +623,1611 @@ class APITests(TestCase):
         response = self.client.get('/')
         self.assertEqual(response.status_code, 200)
 
+
+class FlightCaseListTests(TestCase):
+    """Test the paginated, filterable flight case list."""
+    
+    def setUp(self):
+        compliance = [95.0, None, 50.0, 95.0, 80.0, None, 10.0]
+        self.cases = []
+        for i, value in enumerate(compliance):
+            fc = FlightCase.objects.create(
+                is_processed=value is not None, compliance_percentage=value
+            )
+            FlightCase.objects.filter(pk=fc.pk).update(
+                created_at=timezone.make_aware(datetime(2024, 1, 1 + i))
+            )
+            self.cases.append(fc.pk)
+    
+    def _all_pages(self, params):
+        ids, pages = [], 0
+        url = '/api/flight-cases/'
+        while url:
+            response = self.client.get(url, params if pages == 0 else None)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(row['id'] for row in data['results'])
+            url = data['next']
+            pages += 1
+        return ids, pages
+    
+    def test_cursor_pages_in_order(self):
+        """Following next returns every case once, nulls last."""
+        ids, pages = self._all_pages({'page_size': 2})
+        self.assertEqual(ids, self.cases[::-1])
+        self.assertEqual(pages, 4)
+        
+        ids, _ = self._all_pages({'page_size': 2, 'ordering': '-compliance_percentage'})
+        c = self.cases
+        self.assertEqual(ids, [c[3], c[0], c[4], c[2], c[6], c[5], c[1]])
+        ids, _ = self._all_pages({'page_size': 3, 'ordering': 'compliance_percentage'})
+        self.assertEqual(ids, [c[6], c[2], c[4], c[0], c[3], c[1], c[5]])
+    
+    def test_filters(self):
+        """Filters combine and invalid values are rejected."""
+        ids, _ = self._all_pages({'compliance_min': 50, 'compliance_max': 90})
+        self.assertEqual(sorted(ids), sorted([self.cases[2], self.cases[4]]))
+        ids, _ = self._all_pages({'is_processed': 'false'})
+        self.assertEqual(sorted(ids), sorted([self.cases[1], self.cases[5]]))
+        ids, _ = self._all_pages({'created_after': '2024-01-03', 'created_before': '2024-01-04'})
+        self.assertEqual(sorted(ids), sorted([self.cases[2], self.cases[3]]))
+        
+        for params in ({'compliance_min': 'high'}, {'created_after': 'yesterday'},
+                       {'ordering': 'mean_speed'}, {'cursor': 'garbage'}):
+            self.assertEqual(self.client.get('/api/flight-cases/', params).status_code, 400)
+    
+    def test_list_reads_summary_columns_only(self):
+        """The list query never selects the point blobs."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/flight-cases/')
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('compliance_percentage', sql)
+        self.assertNotIn('trajectory_blob', sql)
+        self.assertNotIn('corridor_blob', sql)
+
+
+class TrajectoryWindowTests(TestCase):
+    """Test the paginated playback endpoint."""
+    
+    def setUp(self):
+        playback.clear_cache()
+        self.points = [
+            {
+                'latitude': 50.0 + i * 0.01, 'longitude': 10.0, 'altitude': 1000.0,
+                'time': f'13:{i // 60:02d}:{i % 60:02d}', 'time_seconds': 46800.0 + i,
+                'index': i, 'speed': 400.0, 'deviation': 10.0, 'nearest_segment': 0,
+                'allowed_deviation': 500.0, 'allowed_speed': 300.0, 'compliant': i % 3 == 0,
+            }
+            for i in range(250)
+        ]
+        self.fc = FlightCase.objects.create(is_processed=True)
+        self.fc.trajectory_data = self.points
+        self.fc.corridor_data = [
+            {'longitude': 10.0, 'latitude': 50.0, 'altitude': 1000.0,
+             'allowed_deviation': 500.0, 'allowed_speed': 300.0, 'index': 0},
+        ]
+        self.fc.save()
+        self.url = f'/api/flight-cases/{self.fc.id}/trajectory_window/'
+    
+    def test_time_range(self):
+        """start/end select the points inside the time range."""
+        response = self.client.get(self.url, {'start': 46810.5, 'end': 46820, 'corridor': '1'})
+        data = response.json()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((data['from_index'], data['to_index']), (11, 21))
+        self.assertEqual(data['points'], self.points[11:21])
+        self.assertEqual(data['compliant_before'], 4)
+        self.assertEqual(data['total_points'], 250)
+        self.assertEqual(len(data['corridor']), 1)
+        self.assertIsNone(data['next_cursor'])
+    
+    def test_cursor_pages_through_range(self):
+        """Following next_cursor returns every point once, in order."""
+        params = {'from_index': 5, 'to_index': 230, 'page_size': 100}
+        received = []
+        pages = 0
+        while True:
+            data = self.client.get(self.url, params).json()
+            self.assertNotIn('corridor', data)
+            received.extend(data['points'])
+            pages += 1
+            if not data['next_cursor']:
+                break
+            params = {'cursor': data['next_cursor'], 'page_size': 100}
+        
+        self.assertEqual(pages, 3)
+        self.assertEqual(received, self.points[5:230])
+    
+    def test_stale_and_invalid_cursor(self):
+        """Cursors are refused after reprocessing or when malformed."""
+        cursor = self.client.get(self.url, {'page_size': 10}).json()['next_cursor']
+        self.fc.save()
+        
+        self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 409)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'noon'}).status_code, 400)
+    
+    def test_compliance_by_time_and_window(self):
+        """Compliance up to a time and over a rolling window, from the running count."""
+        url = f'/api/flight-cases/{self.fc.id}/compliance/'
+        data = self.client.get(url, {'at': 46829.5, 'window': 10}).json()
+        
+        # Points 0..29 flown, every third compliant; the window holds 20..29
+        self.assertEqual((data['points'], data['compliant']), (30, 10))
+        self.assertAlmostEqual(data['percentage'], 100 / 3)
+        self.assertEqual(data['window']['from_index'], 20)
+        self.assertEqual((data['window']['points'], data['window']['compliant']), (10, 3))
+        
+        before = self.client.get(url, {'at': 0}).json()
+        self.assertEqual(before['points'], 0)
+        self.assertIsNone(before['percentage'])
+        self.assertNotIn('window', before)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'at': 46829, 'window': 0}).status_code, 400)
+    
+    def test_compliance_rejects_non_finite_values(self):
+        """NaN and infinite times or windows are bad requests, not server errors."""
+        url = f'/api/flight-cases/{self.fc.id}/compliance/'
+        for params in ({'at': 'nan'}, {'at': 'inf'}, {'at': '-inf'},
+                       {'at': 46829, 'window': 'inf'}, {'at': 46829, 'window': 'nan'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+    
+    def test_pages_carry_running_count(self):
+        """Column pages carry the running compliant count (computed for older blobs)."""
+        data = self.client.get(self.url, {'from_index': 10, 'to_index': 15, 'format': 'columnar'}).json()
+        values = data['points']['columns'][playback.PREFIX_COLUMN]['values']
+        expected = np.cumsum([p['compliant'] for p in self.points])[10:15].tolist()
+        self.assertEqual(values, expected)
+        self.assertEqual(data['compliant_before'], expected[0] - self.points[10]['compliant'])
+
+
+class WireFormatTests(TestCase):
+    """Test the compact renderers and content negotiation."""
+    
+    def setUp(self):
+        playback.clear_cache()
+        self.points = [
+            {
+                'latitude': 50.0 + i * 1e-4, 'longitude': 10.0 - i * 1e-4, 'altitude': 1000.0 + i,
+                'time': '13:00:00', 'time_seconds': 46800.0 + i * 0.5, 'index': i,
+                'speed': 400.25, 'deviation': 12.5, 'nearest_segment': 0,
+                'allowed_deviation': 500.0, 'allowed_speed': 300.0, 'compliant': i % 2 == 0,
+                **({'cpp_compliant': True} if i % 4 == 0 else {}),
+            }
+            for i in range(40)
+        ]
+        self.fc = FlightCase.objects.create(is_processed=True)
+        self.fc.trajectory_data = self.points
+        self.fc.corridor_data = [
+            {'longitude': 10.0, 'latitude': 50.0, 'altitude': 1000.0,
+             'allowed_deviation': 500.0, 'allowed_speed': 300.0, 'index': 0},
+        ]
+        self.fc.save()
+        self.url = f'/api/flight-cases/{self.fc.id}/trajectory_window/'
+    
+    def _decode_binary(self, body):
+        self.assertEqual(body[:4], renderers.BINARY_MAGIC)
+        length = int.from_bytes(body[4:8], 'little')
+        header = json.loads(body[8:8 + length])
+        data = header['fields']
+        for key, table in header['tables'].items():
+            columns = {}
+            for name, column in table['columns'].items():
+                if column['dtype'] == 'str':
+                    columns[name] = column['values']
+                else:
+                    offset = 8 + length + column['offset']
+                    self.assertEqual(offset % 8, 0)
+                    columns[name] = np.frombuffer(body, '<' + column['dtype'],
+                                                  table['rows'], offset)
+            data[key] = (table['start'], columns)
+        return data
+    
+    def test_columnar_json_within_quantization(self):
+        """Quantized, delta-encoded columns decode to the original values."""
+        response = self.client.get(self.url, {'from_index': 10, 'format': 'columnar'})
+        self.assertEqual(response['Content-Type'], renderers.ColumnarJSONRenderer.media_type)
+        table = response.json()['points']
+        
+        self.assertEqual((table['rows'], table['start']), (30, 10))
+        columns = table['columns']
+        latitude = np.cumsum(columns['latitude']['values']) / columns['latitude']['scale']
+        np.testing.assert_allclose(latitude, [p['latitude'] for p in self.points[10:]], atol=1e-6)
+        speed = np.array(columns['speed']['values']) / columns['speed']['scale']
+        np.testing.assert_allclose(speed, 400.25)
+        self.assertEqual(columns['compliant']['values'], [int(p['compliant']) for p in self.points[10:]])
+        self.assertEqual(columns['cpp_compliant']['missing'],
+                         [i for i in range(30) if (i + 10) % 4])
+    
+    def test_binary_typed_arrays(self):
+        """Accept: application/octet-stream returns aligned typed arrays."""
+        response = self.client.get(self.url, {'corridor': '1'},
+                                   HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        data = self._decode_binary(response.content)
+        
+        self.assertEqual(data['total_points'], 40)
+        start, columns = data['points']
+        self.assertEqual(start, 0)
+        np.testing.assert_array_equal(columns['time_seconds'],
+                                      [p['time_seconds'] for p in self.points])
+        np.testing.assert_array_equal(columns['latitude'], [p['latitude'] for p in self.points])
+        self.assertEqual(columns['speed'].dtype, np.dtype('<f4'))
+        self.assertEqual(columns['cpp_compliant#state'].tolist(),
+                         [0 if i % 4 == 0 else columnar.ABSENT for i in range(40)])
+        self.assertEqual(data['corridor'][1]['allowed_speed'].tolist(), [300.0])
+    
+    def test_default_stays_json(self):
+        """Without negotiation the responses still carry point dicts."""
+        data = self.client.get(f'/api/flight-cases/{self.fc.id}/trajectory_data/').json()
+        self.assertEqual(data['trajectory'], self.points)
+        
+        detail = self.client.get(f'/api/flight-cases/{self.fc.id}/?format=columnar').json()
+        self.assertEqual(detail['trajectory_data']['rows'], 40)
+        self.assertEqual(detail['id'], self.fc.id)
+
+
+class ResponseCacheTests(TestCase):
+    """Test ETags, conditional requests and the cached response bodies."""
+    
+    def setUp(self):
+        response_cache.clear()
+        self.fc = FlightCase.objects.create(is_processed=True, mean_speed=400.0)
+        self.fc.trajectory_data = [
+            {'latitude': 50.0, 'longitude': 10.0, 'altitude': 1000.0, 'time': '13:00:00',
+             'time_seconds': 46800.0 + i, 'index': i, 'speed': 400.0}
+            for i in range(3)
+        ]
+        self.fc.corridor_data = []
+        self.fc.save()
+        self.url = f'/api/flight-cases/{self.fc.id}/trajectory_data/'
+    
+    def test_etag_and_conditional_requests(self):
+        """Repeated GETs hit the cache; conditional GETs get 304."""
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        
+        self.assertEqual((first.status_code, first['X-Cache']), (200, 'MISS'))
+        self.assertEqual((second.status_code, second['X-Cache']), (200, 'HIT'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(len(second.json()['trajectory']), 3)
+        
+        self.assertTrue(has_vary_header(first, 'Accept'))
+        
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        self.assertTrue(has_vary_header(not_modified, 'Accept'))
+        
+        # The date of the JSON body does not validate another representation
+        compact = self.client.get(self.url, {'format': 'columnar'})
+        self.assertNotEqual(compact['ETag'], first['ETag'])
+        since = self.client.get(self.url, HTTP_ACCEPT=renderers.ColumnarJSONRenderer.media_type,
+                                HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(since.status_code, 200)
+        self.assertEqual(since['Content-Type'], renderers.ColumnarJSONRenderer.media_type)
+    
+    def test_save_invalidates(self):
+        """Saving the case drops its bodies and changes the ETag."""
+        detail_url = f'/api/flight-cases/{self.fc.id}/'
+        before = self.client.get(detail_url)
+        self.assertEqual(before.json()['mean_speed'], 400.0)
+        
+        self.fc.mean_speed = 500.0
+        self.fc.save()
+        
+        after = self.client.get(detail_url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual((after.status_code, after['X-Cache']), (200, 'MISS'))
+        self.assertEqual(after.json()['mean_speed'], 500.0)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+    
+    @override_settings(RESPONSE_CACHE_MAX_BYTES=250)
+    def test_size_bounded_lru(self):
+        """The least recently used bodies are evicted first."""
+        for name in ('a', 'b', 'c'):
+            response_cache.put(f'"{name}"', 1, name.encode() * 100, 'text/plain')
+        self.assertIsNone(response_cache.get('"a"'))
+        
+        response_cache.get('"b"')
+        response_cache.put('"d"', 2, b'd' * 100, 'text/plain')
+        self.assertIsNone(response_cache.get('"c"'))
+        self.assertEqual(response_cache.get('"b"'), (b'b' * 100, 'text/plain'))
+        
+        response_cache.invalidate(1)
+        self.assertIsNone(response_cache.get('"b"'))
+        self.assertIsNotNone(response_cache.get('"d"'))
+
+
+class SimplifyTests(TestCase):
+    """Test level-of-detail simplification and the geometry endpoint."""
+    
+    def _douglas_peucker(self, x, y, first, last, tolerance, kept):
+        """Textbook recursive Douglas-Peucker (reference)."""
+        if last - first < 2:
+            return
+        distance = simplify._segment_distance(
+            x[first + 1:last], y[first + 1:last], x[first], y[first], x[last], y[last]
+        )
+        split = first + 1 + int(np.argmax(distance))
+        if distance.max() >= tolerance:
+            kept.add(split)
+            self._douglas_peucker(x, y, first, split, tolerance, kept)
+            self._douglas_peucker(x, y, split, last, tolerance, kept)
+    
+    def test_tolerances_match_recursive_douglas_peucker(self):
+        """Thresholding the stored tolerances gives the DP result at that tolerance."""
+        rng = np.random.default_rng(3)
+        x = np.cumsum(rng.normal(0, 50, 500))
+        y = np.cumsum(rng.normal(0, 50, 500))
+        tolerances = simplify.dp_tolerances(x, y)
+        
+        for tolerance in (5.0, 40.0, 200.0, 1000.0):
+            kept = {0, len(x) - 1}
+            self._douglas_peucker(x, y, 0, len(x) - 1, tolerance, kept)
+            self.assertEqual(set(np.flatnonzero(tolerances >= tolerance).tolist()), kept)
+    
+    def test_violation_boundaries_survive_vertex_budget(self):
+        """Run boundaries are kept even when the budget forces a coarser line."""
+        latitude = 50.0 + np.linspace(0, 1, 1000)
+        longitude = 10.0 + np.sin(np.arange(1000)) * 1e-3
+        compliant = np.ones(1000, dtype=bool)
+        compliant[400:420] = False
+        
+        tolerances = simplify.trajectory_tolerances(latitude, longitude, compliant)
+        indices, effective = simplify.select_vertices(tolerances, 0.0, max_vertices=20)
+        
+        self.assertEqual(len(indices), 20)
+        self.assertTrue({0, 400, 419, 999} <= set(indices.tolist()))
+        self.assertGreater(effective, 0.0)
+        flags = simplify.segment_flags(indices, ~compliant)
+        # Flagged segments are exactly those touching the run 400..419
+        flagged = np.flatnonzero(flags)
+        self.assertEqual(indices[flagged[0] + 1], 400)
+        self.assertEqual(indices[flagged[-1]], 419)
+        self.assertEqual(len(flagged), flagged[-1] - flagged[0] + 1)
+    
+    def test_geometry_endpoint(self):
+        """The endpoint stays within max_vertices and flags violating segments."""
+        playback.clear_cache()
+        points = [
+            {'latitude': 50.0 + i * 1e-3, 'longitude': 10.0 + (i % 7) * 1e-4,
+             'altitude': 1000.0, 'time': '13:00:00', 'time_seconds': 46800.0 + i,
+             'index': i, 'compliant': not 100 <= i < 150}
+            for i in range(600)
+        ]
+        fc = FlightCase.objects.create(is_processed=True)
+        fc.trajectory_data = points
+        fc.corridor_data = [
+            {'longitude': 10.0, 'latitude': 50.0 + i * 0.1, 'altitude': 1000.0,
+             'allowed_deviation': 500.0, 'allowed_speed': 300.0 + (i > 2) * 100, 'index': i}
+            for i in range(6)
+        ]
+        fc.save()
+        url = f'/api/flight-cases/{fc.id}/geometry/'
+        
+        data = self.client.get(url, {'max_vertices': 50}).json()
+        trajectory = data['trajectory']
+        self.assertEqual(data['total_points'], 600)
+        self.assertLessEqual(len(trajectory['index']), 50)
+        self.assertIn(100, trajectory['index'])
+        self.assertIn(149, trajectory['index'])
+        self.assertEqual(len(trajectory['violation']), len(trajectory['index']) - 1)
+        self.assertTrue(any(trajectory['violation']))
+        
+        # Straight corridor: endpoints plus the two vertices around the speed change
+        corridor = self.client.get(url, {'tolerance': 1.0}).json()['corridor']
+        self.assertEqual(len(corridor['latitude']), 4)
+        self.assertEqual(corridor['allowed_speed'], [300.0, 300.0, 400.0, 400.0])
+        
+        coarse = self.client.get(url, {'zoom': 4}).json()
+        fine = self.client.get(url, {'zoom': 18}).json()
+        self.assertLess(len(coarse['trajectory']['index']), len(fine['trajectory']['index']))
+        self.assertEqual(self.client.get(url, {'zoom': 'near'}).status_code, 400)
+
+
+@override_settings(PROCESSING_ASYNC=True)
+class ProcessingJobTests(UploadTestMixin, TestCase):
+    """Test the asynchronous processing job queue."""
+    
+    def test_upload_returns_queued_job(self):
+        """Upload returns 202 and the worker completes the job."""
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertEqual(data['job']['status'], ProcessingState.QUEUED)
+        self.assertEqual(data['processing_state'], ProcessingState.QUEUED)
+        self.assertFalse(data['is_processed'])
+        
+        self.assertEqual(run_worker(stop_when_idle=True), 1)
+        
+        job = self.client.get(f"/api/jobs/{data['job_id']}/").json()
+        self.assertEqual(job['status'], ProcessingState.DONE)
+        self.assertEqual(job['progress'], 1.0)
+        flight_case = FlightCase.objects.get(pk=data['id'])
+        self.assertTrue(flight_case.is_processed)
+        self.assertEqual(flight_case.processing_state, ProcessingState.DONE)
+    
+    def test_failed_job_reports_error(self):
+        """Processing errors end up on the job and the flight case."""
+        data = self.upload(trajectory=b"50.0 10.0 1000.0 not-a-time\n").json()
+        run_worker(stop_when_idle=True)
+        
+        job = ProcessingJob.objects.get(pk=data['job_id'])
+        self.assertEqual(job.status, ProcessingState.FAILED)
+        self.assertIn('Invalid', job.error)
+        self.assertEqual(job.flight_case.processing_state, ProcessingState.FAILED)
+    
+    @override_settings(PROCESSING_ASYNC=False)
+    def test_inline_processing(self):
+        """Without a worker, jobs run inside the request."""
+        data = self.upload().json()
+        self.assertEqual(data['job']['status'], ProcessingState.DONE)
+        self.assertTrue(data['is_processed'])
+    
+    def test_heartbeat_keeps_job_claimed(self):
+        """A running job touched by its worker is not requeued as stale."""
+        self.upload()
+        job = claim_next_job('worker-a')
+        ProcessingJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=120)
+        )
+        self.assertTrue(touch_job(job.pk, 'worker-a'))
+        self.assertFalse(touch_job(job.pk, 'worker-b'))
+        self.assertEqual(requeue_stale_jobs(60), 0)
+        self.assertEqual(ProcessingJob.objects.get(pk=job.pk).status, ProcessingState.RUNNING)
+    
+    def test_requeued_job_keeps_new_owner(self):
+        """A worker whose job was requeued and claimed again does not record its outcome."""
+        self.upload()
+        stale = claim_next_job('worker-a')
+        self.assertEqual(requeue_stale_jobs(-1), 1)
+        claimed = claim_next_job('worker-b')
+        self.assertEqual(claimed.pk, stale.pk)
+        
+        job = run_job(stale)
+        self.assertEqual((job.status, job.worker), (ProcessingState.RUNNING, 'worker-b'))
+        self.assertIsNone(job.finished_at)
+    
+    def test_job_requeued_after_append(self):
+        """A run that missed appended points returns its job to the queue; inline runs go again."""
+        runs = []
+        process_flight_case = jobs.process_flight_case
+        
+        def process_once_stale(flight_case, progress=None):
+            runs.append(flight_case.pk)
+            if len(runs) % 2:
+                raise processing.StaleResultsError('Points were appended')
+            return process_flight_case(flight_case, progress=progress)
+        
+        jobs.process_flight_case = process_once_stale
+        try:
+            data = self.upload().json()
+            job = run_job(claim_next_job('worker-a'))
+            self.assertEqual((job.status, job.worker, job.progress),
+                             (ProcessingState.QUEUED, '', 0.0))
+            self.assertEqual(FlightCase.objects.get(pk=data['id']).processing_state,
+                             ProcessingState.QUEUED)
+            self.assertEqual(run_worker(stop_when_idle=True), 1)
+            self.assertEqual(ProcessingJob.objects.get(pk=job.pk).status, ProcessingState.DONE)
+            
+            with override_settings(PROCESSING_ASYNC=False):
+                data = self.upload().json()
+            self.assertEqual(len(runs), 4)
+            self.assertEqual(data['job']['status'], ProcessingState.DONE)
+        finally:
+            jobs.process_flight_case = process_flight_case
+
+
+class ReprocessCommandTests(UploadTestMixin, TestCase):
+    """Test the reprocess_flight_cases management command."""
+    
+    def setUp(self):
+        super().setUp()
+        self.checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        
+        self.cases = []
+        for trajectory in (
+            b"50.0 10.0 1000.0 13:00:00\n50.5 10.5 1100.0 13:10:00",
+            b"50.0 10.0 1000.0 not-a-time\n",
+            b"50.1 10.1 1000.0 13:00:00\n50.4 10.4 1100.0 13:10:00",
+        ):
+            self.cases.append(FlightCase.objects.create(
+                corridor_file=SimpleUploadedFile("corridor.txt", self.CORRIDOR),
+                trajectory_file=SimpleUploadedFile("trajectory.txt", trajectory),
+            ))
+    
+    def reprocess(self, *args):
+        output = io.StringIO()
+        call_command(
+            'reprocess_flight_cases', *args,
+            '--workers', '1', '--checkpoint', self.checkpoint, stdout=output
+        )
+        return output.getvalue()
+    
+    def test_reprocess_in_chunks(self):
+        """Every selected case is computed and written; failures are recorded."""
+        output = self.reprocess('--chunk-size', '2')
+        self.assertIn('3/3', output)
+        
+        first, broken, last = (FlightCase.objects.get(pk=case.pk) for case in self.cases)
+        for case in (first, last):
+            self.assertTrue(case.is_processed)
+            self.assertEqual(case.processing_state, ProcessingState.DONE)
+            self.assertEqual(len(case.trajectory_data), 2)
+            self.assertIsNotNone(case.compliance_percentage)
+            self.assertEqual(
+                case.violation_intervals.count(),
+                len(violations.extract_stored(case.trajectory_columns()))
+            )
+        self.assertEqual(broken.processing_state, ProcessingState.FAILED)
+        self.assertIn('Invalid', broken.processing_error)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        
+        # The failure is selectable on its own
+        self.assertIn('1 flight case(s)', self.reprocess('--failed'))
+    
+    def test_resume_from_checkpoint(self):
+        """--resume skips the ids finished before the interruption."""
+        with open(self.checkpoint, 'w') as f:
+            json.dump({
+                'selection': {
+                    'ids': None, 'id_from': None, 'id_to': None, 'created_after': None,
+                    'created_before': None, 'failed': False, 'missing_compliance': False,
+                },
+                'last_id': self.cases[1].pk, 'done': 1, 'failed': 1,
+            }, f)
+        self.reprocess('--resume')
+        
+        states = [FlightCase.objects.get(pk=case.pk).is_processed for case in self.cases]
+        self.assertEqual(states, [False, False, True])
+        
+        # A checkpoint for another selection is refused
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'selection': {}, 'last_id': 0, 'done': 0, 'failed': 0}, f)
+        with self.assertRaises(CommandError):
+            self.reprocess('--resume')
+    
+    def test_case_appended_meanwhile_requeued(self):
+        """Results of a case that got points while it was computed are not written."""
+        from .management.commands.reprocess_flight_cases import Command, _compute
+        
+        case = self.cases[0]
+        result = _compute(case.pk, case.corridor_file.path, case.trajectory_file.path)
+        self.assertEqual(Command._store(FlightCase, [result], {case.pk: 5}), (0, [case.pk]))
+        self.assertFalse(FlightCase.objects.get(pk=case.pk).is_processed)
+        
+        output = io.StringIO()
+        with override_settings(PROCESSING_ASYNC=True):
+            Command(stdout=output)._requeue(FlightCase, [case.pk])
+        self.assertIn(f"Flight case {case.pk} got points", output.getvalue())
+        self.assertEqual(ProcessingJob.objects.get(flight_case=case).status, ProcessingState.QUEUED)
+
+
+@override_settings(PROCESSING_ASYNC=False)
+class SharedCorridorTests(UploadTestMixin, TestCase):
+    """Test content-hashed corridors and their stored geometry."""
+    
+    CORRIDOR = b"10.0 50.0 1000.0 500.0 300.0\n10.5 50.4 1100.0 500.0 310.0\n11.0 51.0 1200.0 400.0 320.0"
+    TRAJECTORY = b"50.0 10.0 1000.0 13:00:00\n50.3 10.4 1080.0 13:05:00\n50.9 10.9 1190.0 13:10:00"
+    
+    def test_uploads_share_one_corridor(self):
+        """The same corridor, formatted differently, is stored once."""
+        first = self.upload_case()
+        second = self.upload_case(self.CORRIDOR.replace(b" ", b"  ").replace(b"\n", b"\r\n") + b"\n")
+        
+        self.assertEqual(Corridor.objects.count(), 1)
+        self.assertEqual(first.corridor_id, second.corridor_id)
+        self.assertEqual(second.corridor_file.name, first.corridor_file.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'corridors')),
+                         [os.path.basename(first.corridor_file.name)])
+        self.assertTrue(second.is_processed)
+        self.assertEqual(second.corridor_blob, first.corridor_blob)
+        
+        self.upload_case(self.CORRIDOR.replace(b"400.0", b"450.0"))
+        self.assertEqual(Corridor.objects.count(), 2)
+    
+    def test_stored_geometry_matches_recomputed(self):
+        """Loaded geometry is bit-identical to deriving it from the file."""
+        corridor_path = os.path.join(self.directory, 'corridor.txt')
+        trajectory_path = os.path.join(self.directory, 'trajectory.txt')
+        with open(corridor_path, 'wb') as f:
+            f.write(self.CORRIDOR)
+        with open(trajectory_path, 'wb') as f:
+            f.write(self.TRAJECTORY)
+        
+        columns = parse_corridor_columns(corridor_path)
+        points_blob, geometry_blob = corridors.build_blobs(columns)
+        loaded = corridors.load_blobs(
+            corridors.content_hash(columns), points_blob, geometry_blob, corridors.GEOMETRY_VERSION
+        )
+        fresh = vectorized.CorridorGeometry.from_points(parse_corridor_file(corridor_path))
+        for name, values in fresh.derived_columns().items():
+            np.testing.assert_array_equal(getattr(loaded.geometry, name), values)
+        
+        from_file = processing.compute_flight_case(corridor_path, trajectory_path)
+        from_corridor = processing.compute_flight_case(
+            corridor_path, trajectory_path, corridor=loaded
+        )
+        for results in (from_file, from_corridor):
+            # Timings differ from run to run
+            del results['processing_stats'], results['processing_seconds']
+        self.assertEqual(from_corridor, from_file)
+        
+        # Geometry written by another version is rebuilt from the points
+        stale = corridors.load_blobs('stale', points_blob, geometry_blob, 0)
+        np.testing.assert_array_equal(stale.geometry.ab_length_sq, fresh.ab_length_sq)
+        
+        # Long enough for the grid index, which is built from the stored bounds
+        t = np.linspace(0, 1, 80)
+        columns = {
+            'longitude': 10 + t, 'latitude': 50 + 0.3 * np.sin(6 * t), 'altitude': 1000 + 200 * t,
+            'allowed_deviation': np.full(80, 500.0), 'allowed_speed': np.full(80, 300.0),
+        }
+        points_blob, geometry_blob = corridors.build_blobs(columns)
+        loaded = corridors.load_blobs('long', points_blob, geometry_blob, corridors.GEOMETRY_VERSION)
+        fresh = CorridorIndex(vectorized.CorridorGeometry(
+            columns['latitude'], columns['longitude'], columns['altitude'],
+            columns['allowed_deviation'], columns['allowed_speed'],
+        ))
+        self.assertTrue(loaded.index.enabled)
+        np.testing.assert_array_equal(loaded.index.cell_segments, fresh.cell_segments)
+        np.testing.assert_array_equal(loaded.index.cell_start, fresh.cell_start)
+    
+    def test_unparseable_corridor_is_not_shared(self):
+        """Bad corridor files are not ingested and fail in processing as before."""
+        flight_case = self.upload_case(b"10.0 50.0 not-a-number 500.0 300.0\n")
+        self.assertIsNone(flight_case.corridor_id)
+        self.assertEqual(Corridor.objects.count(), 0)
+        self.assertEqual(flight_case.processing_state, ProcessingState.FAILED)
+
+
+# Appended points skip the C++ validator, so full processing must skip it too
+# for the two to match, whether or not cpp/ has been built
+@override_settings(
+    PROCESSING_ASYNC=False,
+    CPP_VALIDATOR_PATH=Path('/nonexistent/trajectory_validator'),
+    CPP_VALIDATOR_LIBRARY_PATH=Path('/nonexistent/libtrajectory_validator.so'),
+)
+class LiveAppendTests(UploadTestMixin, TestCase):
+    """Test appending points to processed trajectories."""
+    
+    CORRIDOR = b"10.0 50.0 1000.0 500.0 300.0\n10.5 50.4 1100.0 500.0 310.0\n11.0 51.0 1200.0 400.0 320.0"
+    
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(5)
+        n = 60
+        t = np.linspace(0, 1, n)
+        self.points = [
+            {
+                'latitude': float(50 + 0.3 * t[i] + rng.normal(0, 0.001)),
+                'longitude': float(10 + 0.3 * t[i] + rng.normal(0, 0.001)),
+                'altitude': float(1000 + 200 * t[i] + rng.normal(0, 200)),
+                'time': f"13:{i // 6:02d}:{i % 6 * 10:02d}",
+            }
+            for i in range(n)
+        ]
+    
+    def upload_points(self, points):
+        return self.upload_case(trajectory=''.join(
+            f"{p['latitude']!r} {p['longitude']!r} {p['altitude']!r} {p['time']}\n" for p in points
+        ))
+    
+    def append(self, flight_case, points):
+        return self.client.post(
+            f'/api/flight-cases/{flight_case.pk}/append/', {'points': points},
+            content_type='application/json'
+        )
+    
+    def test_appends_match_full_processing(self):
+        """Appending in pieces gives the points and metrics of processing everything."""
+        full = self.upload_points(self.points)
+        live_case = self.upload_points(self.points[:10])
+        
+        position = 10
+        for size in (1, 1, 3, 2, 8, 1, 1, 1, 12, 20):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.append(live_case, self.points[position:position + size])
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual(data['start'], position)
+            self.assertEqual([p['index'] for p in data['points']],
+                             list(range(position, position + size)))
+            position += size
+            # Merged chunks stay few
+            self.assertLessEqual(live_case.trajectory_chunks.count(), 4)
+        self.assertEqual(position, len(self.points))
+        
+        live_case.refresh_from_db()
+        full.refresh_from_db()
+        self.assertEqual(live_case.trajectory_point_count, len(self.points))
+        self.assertTrue(0 < full.compliance_percentage < 100)
+        self.assertEqual(live_case.trajectory_data, full.trajectory_data)
+        for field in ('mean_speed', 'max_speed', 'mean_deviation', 'compliance_percentage'):
+            self.assertAlmostEqual(getattr(live_case, field), getattr(full, field), places=6)
+        
+        # The stored running compliant count covers the appended points
+        self.assertEqual(
+            live_case.trajectory_columns()[playback.PREFIX_COLUMN].tolist(),
+            np.cumsum(playback.compliance_mask(full.trajectory_columns())).tolist()
+        )
+        self.assertIn(playback.PREFIX_COLUMN, full.trajectory_columns())
+        
+        # Violation intervals were joined across the appends
+        fields = ['start_index', 'end_index', 'start_time_seconds', 'end_time_seconds',
+                  'point_count', 'kind', 'deviation_excess', 'speed_excess', 'severity']
+        self.assertTrue(full.violation_intervals.exists())
+        self.assertEqual(list(live_case.violation_intervals.values(*fields)),
+                         list(full.violation_intervals.values(*fields)))
+        
+        # The trajectory file has every point; reprocessing drops the chunks
+        processing.process_flight_case(live_case)
+        self.assertEqual(live_case.trajectory_chunks.count(), 0)
+        live_case = FlightCase.objects.get(pk=live_case.pk)
+        self.assertEqual(live_case.trajectory_data, full.trajectory_data)
+        
+        # Playback windows see appended points
+        window = self.client.get(
+            f'/api/flight-cases/{live_case.pk}/trajectory_window/', {'page_size': 100}
+        ).json()
+        self.assertEqual(len(window['points']), len(self.points))
+    
+    def test_append_during_processing_kept(self):
+        """Results that miss points appended while they were computed are not stored."""
+        live_case = self.upload_points(self.points[:10])
+        
+        def progress(fraction, stage):
+            if stage == 'saving':
+                self.assertEqual(self.append(live_case, self.points[10:15]).status_code, 200)
+        
+        with self.assertRaises(processing.StaleResultsError):
+            processing.process_flight_case(live_case, progress)
+        live_case = FlightCase.objects.get(pk=live_case.pk)
+        self.assertEqual(live_case.point_count, 15)
+        self.assertEqual(live_case.trajectory_chunks.count(), 1)
+        self.assertEqual(len(live_case.trajectory_data), 15)
+    
+    def test_append_updates_previous_point(self):
+        """The old last point gets a real speed once a point follows it."""
+        live_case = self.upload_points(self.points[:5])
+        before = live_case.trajectory_data[-1]
+        data = self.append(live_case, self.points[5:6]).json()
+        
+        self.assertEqual(data['previous']['index'], 4)
+        live_case = FlightCase.objects.get(pk=live_case.pk)
+        after = live_case.trajectory_data
+        self.assertEqual(after[4]['speed'], data['previous']['speed'])
+        self.assertNotEqual(after[4]['speed'], before['speed'])
+        self.assertEqual(after[5]['speed'], after[4]['speed'])
+    
+    def test_invalid_appends(self):
+        """Bad points and unprocessed cases are rejected with 400."""
+        live_case = self.upload_points(self.points[:5])
+        self.assertEqual(self.append(live_case, self.points[2:3]).status_code, 400)
+        self.assertEqual(self.append(live_case, []).status_code, 400)
+        self.assertEqual(
+            self.append(live_case, [{'latitude': 50.0, 'longitude': 10.0, 'time': '14:00:00'}]).status_code,
+            400
+        )
+        
+        FlightCase.objects.filter(pk=live_case.pk).update(is_processed=False)
+        self.assertEqual(self.append(live_case, self.points[5:6]).status_code, 400)
+    
+    def test_rolled_back_append_leaves_file(self):
+        """The trajectory file only gets points of committed appends."""
+        live_case = self.upload_points(self.points[:5])
+        with open(live_case.trajectory_file.path, 'rb') as f:
+            before = f.read()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    live.append_points(live_case, self.points[5:8])
+                    raise RuntimeError('rolled back')
+        with open(live_case.trajectory_file.path, 'rb') as f:
+            self.assertEqual(f.read(), before)
+        self.assertEqual(FlightCase.objects.get(pk=live_case.pk).trajectory_point_count, 5)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            live.append_points(live_case, self.points[5:8])
+        self.assertEqual(len(parse_trajectory_file(live_case.trajectory_file.path)), 8)
+    
+    def test_compliance_definition(self):
+        """Processing and appends count a point compliant when either check passed."""
+        points = [
+            {'speed': 100.0, 'deviation': 10.0, 'compliant': compliant, 'cpp_compliant': cpp}
+            for compliant, cpp in ((True, False), (False, True), (False, False), (True, True))
+        ]
+        aggregates = processing._aggregates(points)
+        self.assertEqual(aggregates['compliant_count'], 3)
+        self.assertEqual(aggregates['compliance_percentage'], 75.0)
+
+
+@override_settings(
+    PROCESSING_ASYNC=False, TELEMETRY_HEARTBEAT_SECONDS=0.05, TELEMETRY_STREAM_SECONDS=0.5
+)
+class LiveTelemetryTests(UploadTestMixin, TestCase):
+    """Test the live stream of appended points."""
+    
+    CORRIDOR = LiveAppendTests.CORRIDOR
+    upload_points = LiveAppendTests.upload_points
+    
+    def setUp(self):
+        super().setUp()
+        self.points = [
+            {'latitude': 50 + 0.005 * i, 'longitude': 10 + 0.005 * i, 'altitude': 1000.0,
+             'time': f"13:00:{i * 2:02d}"}
+            for i in range(15)
+        ]
+    
+    def append_committed(self, flight_case, points):
+        with self.captureOnCommitCallbacks(execute=True):
+            return live.append_points(flight_case, points)
+    
+    @staticmethod
+    def parse_events(body):
+        events = []
+        for frame in body.decode().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in frame.split('\n') if ': ' in line)
+            if 'event' in fields:
+                events.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+        return events
+    
+    async def test_stream_delivers_appended_points(self):
+        """Subscribers get committed appends with deviation and compliance."""
+        flight_case = await sync_to_async(self.upload_points)(self.points[:10])
+        response = await self.async_client.get(f'/api/flight-cases/{flight_case.pk}/stream/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        
+        hello = self.parse_events(await anext(stream))
+        self.assertEqual(hello[0][0], 'hello')
+        self.assertEqual(hello[0][2]['point_count'], 10)
+        self.assertEqual(telemetry.broker.count, 1)
+        
+        await sync_to_async(self.append_committed)(flight_case, self.points[10:15])
+        body = b''
+        async for part in stream:
+            body += part
+        events = [e for e in self.parse_events(body) if e[0] == 'points']
+        self.assertEqual(len(events), 1)
+        _, event_id, data = events[0]
+        self.assertEqual(event_id, '14')
+        self.assertEqual(data['start'], 10)
+        self.assertEqual(data['point_count'], 15)
+        self.assertEqual(data['points']['rows'], 5)
+        stored = await sync_to_async(
+            lambda: FlightCase.objects.get(pk=flight_case.pk).trajectory_data[10:]
+        )()
+        for name in ('deviation', 'speed', 'compliant'):
+            self.assertEqual(data['points']['columns'][name], [p[name] for p in stored])
+        self.assertIn(b': keepalive', body)
+        # The stream ended after TELEMETRY_STREAM_SECONDS and unsubscribed
+        self.assertEqual(telemetry.broker.count, 0)
+    
+    async def test_reconnect_and_errors(self):
+        """Reconnecting clients are told about missed points; bad requests fail fast."""
+        flight_case = await sync_to_async(self.upload_points)(self.points[:10])
+        response = await self.async_client.get(
+            f'/api/flight-cases/{flight_case.pk}/stream/', headers={'Last-Event-ID': '5'}
+        )
+        body = b''
+        async for part in response.streaming_content:
+            body += part
+        events = self.parse_events(body)
+        self.assertEqual([e[0] for e in events], ['hello', 'resync'])
+        self.assertEqual(events[1][2], {'from': 6, 'point_count': 10})
+        
+        response = await self.async_client.get('/api/flight-cases/999999/stream/')
+        self.assertEqual(response.status_code, 404)
+        # WSGI workers cannot hold streams open
+        response = await sync_to_async(self.client.get)(f'/api/flight-cases/{flight_case.pk}/stream/')
+        self.assertEqual(response.status_code, 501)
+    
+    async def test_slow_subscriber_drops_oldest(self):
+        """Publishing never waits; a full queue drops its oldest events."""
+        with self.settings(TELEMETRY_QUEUE_SIZE=3):
+            slow = telemetry.broker.subscribe(7)
+            other = telemetry.broker.subscribe(8)
+        try:
+            publisher = threading.Thread(target=lambda: [
+                telemetry.broker.publish(7, 'points', {'n': n}, event_id=n) for n in range(5)
+            ])
+            publisher.start()
+            publisher.join()
+            events = await slow.get(1.0)
+            self.assertEqual([self.parse_events(e)[0][2]['n'] for e in events], [2, 3, 4])
+            self.assertEqual(slow.take_dropped(), 2)
+            self.assertEqual(await other.get(0.01), [])
+        finally:
+            telemetry.broker.unsubscribe(slow)
+            telemetry.broker.unsubscribe(other)
+        self.assertEqual(telemetry.broker.count, 0)
+    
+    async def test_watch_disconnect(self):
+        """The ASGI wrapper flags a disconnect that arrives after the body."""
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False},
+                    {'type': 'http.disconnect'}]
+        
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.Event().wait()
+        
+        async def app(scope, receive, send):
+            await receive()
+            await asyncio.wait_for(scope[telemetry.DISCONNECTED_KEY].wait(), 1.0)
+        
+        await telemetry.watch_disconnect(app)({'type': 'http'}, receive, None)
+
+
+@override_settings(PROCESSING_ASYNC=False)
+class BulkUploadTests(UploadTestMixin, TestCase):
+    """Test uploading many trajectories against one corridor."""
+    
+    CORRIDOR = SharedCorridorTests.CORRIDOR
+    
+    def setUp(self):
+        super().setUp()
+        self.trajectories = {
+            f"track{i}.txt": ''.join(
+                f"{50 + 0.05 * j + 0.01 * i!r} {10 + 0.05 * j!r} {1000.0 + 10 * j} 13:{j:02d}:{i:02d}\n"
+                for j in range(12)
+            ).encode()
+            for i in range(6)
+        }
+    
+    def files(self, names):
+        return [SimpleUploadedFile(name, self.trajectories[name]) for name in names]
+    
+    def test_list_and_archives(self):
+        """Trajectory lists, zip and tar archives give one processed case per file."""
+        zipped = io.BytesIO()
+        with zipfile.ZipFile(zipped, 'w') as archive:
+            archive.writestr('day/track2.txt', self.trajectories['track2.txt'])
+            archive.writestr('__MACOSX/day/._track2.txt', b'junk')
+            archive.writestr('broken.txt', b'not a trajectory')
+        response = self.client.post('/api/flight-cases/bulk/', {
+            'corridor_file': SimpleUploadedFile('corridor.txt', self.CORRIDOR),
+            'trajectory_files': self.files(['track0.txt', 'track1.txt']),
+            'archive': SimpleUploadedFile('batch.zip', zipped.getvalue()),
+        })
+        self.assertEqual(response.status_code, 201)
+        manifest = response.json()
+        self.assertEqual((manifest['files'], manifest['processed'], manifest['failed']), (4, 3, 1))
+        self.assertEqual([r['file'] for r in manifest['results']],
+                         ['track0.txt', 'track1.txt', 'day/track2.txt', 'broken.txt'])
+        self.assertEqual(manifest['results'][3]['status'], ProcessingState.FAILED)
+        self.assertTrue(manifest['results'][3]['error'])
+        
+        # Same results as a single upload of the file
+        single_case = self.upload_case(trajectory=self.trajectories['track1.txt'])
+        bulk_case = FlightCase.objects.get(pk=manifest['results'][1]['id'])
+        self.assertEqual(Corridor.objects.count(), 1)
+        self.assertEqual(bulk_case.corridor_id, single_case.corridor_id)
+        self.assertEqual(bulk_case.processing_state, ProcessingState.DONE)
+        self.assertEqual(bulk_case.trajectory_data, single_case.trajectory_data)
+        for field in ('mean_speed', 'mean_deviation', 'compliance_percentage', 'point_count'):
+            self.assertEqual(getattr(bulk_case, field), getattr(single_case, field))
+            self.assertEqual(manifest['results'][1][field], getattr(single_case, field))
+        fields = ['start_index', 'end_index', 'kind', 'severity']
+        self.assertEqual(list(bulk_case.violation_intervals.values(*fields)),
+                         list(single_case.violation_intervals.values(*fields)))
+        
+        tarred = io.BytesIO()
+        with tarfile.open(fileobj=tarred, mode='w:gz') as archive:
+            for name in ('track3.txt', 'track4.txt'):
+                info = tarfile.TarInfo(f'./{name}')
+                info.size = len(self.trajectories[name])
+                archive.addfile(info, io.BytesIO(self.trajectories[name]))
+        response = self.client.post('/api/flight-cases/bulk/', {
+            'corridor_file': SimpleUploadedFile('corridor.txt', self.CORRIDOR),
+            'archive': SimpleUploadedFile('batch.tar.gz', tarred.getvalue()),
+        })
+        self.assertEqual(response.json()['processed'], 2)
+        self.assertEqual(Corridor.objects.count(), 1)
+    
+    @override_settings(BULK_UPLOAD_FILES_PER_WORKER=1)
+    def test_worker_pool(self):
+        """Evaluating in worker processes gives the in-process results."""
+        names = sorted(self.trajectories)
+        corridor = SimpleUploadedFile('corridor.txt', self.CORRIDOR)
+        pooled = bulk.bulk_upload(corridor, [(f.name, f) for f in self.files(names)], workers=2)
+        corridor = SimpleUploadedFile('corridor.txt', self.CORRIDOR)
+        inline = bulk.bulk_upload(corridor, [(f.name, f) for f in self.files(names)], workers=1)
+        
+        self.assertEqual(pooled['processed'], len(names))
+        for a, b in zip(pooled['results'], inline['results']):
+            self.assertEqual(
+                FlightCase.objects.get(pk=a['id']).trajectory_data,
+                FlightCase.objects.get(pk=b['id']).trajectory_data,
+            )
+    
+    def test_invalid_uploads(self):
+        """Bad corridors, missing files and unknown archives are rejected with 400."""
+        def post(**data):
+            return self.client.post('/api/flight-cases/bulk/', data).status_code
+        
+        self.assertEqual(post(trajectory_files=self.files(['track0.txt'])), 400)
+        self.assertEqual(post(corridor_file=SimpleUploadedFile('corridor.txt', self.CORRIDOR)), 400)
+        self.assertEqual(post(corridor_file=SimpleUploadedFile('corridor.txt', b'bad'),
+                              trajectory_files=self.files(['track0.txt'])), 400)
+        self.assertEqual(post(corridor_file=SimpleUploadedFile('corridor.txt', self.CORRIDOR),
+                              archive=SimpleUploadedFile('batch.rar', b'Rar!')), 400)
+        self.assertEqual(FlightCase.objects.count(), 0)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'corridors')))
+
+
+@override_settings(PROCESSING_ASYNC=False, SERVER_TIMING=True)
+class ProcessingTimingTests(UploadTestMixin, TestCase):
+    """Test per-stage processing timings and the Server-Timing header."""
+    
+    def test_stats_stored_and_logged(self):
+        """Each stage, the save included, is stored with the point and segment counts."""
+        with self.assertLogs('monitoring.processing', 'INFO') as logs:
+            response = self.upload()
+        flight_case = FlightCase.objects.get(pk=response.json()['id'])
+        stats = flight_case.processing_stats
+        
+        self.assertEqual(stats['points'], 2)
+        self.assertEqual(stats['segments'], 1)
+        for stage in ('load_corridor', 'parse_trajectory', 'geometry', 'cpp_validation',
+                      'aggregates', 'simplify', 'encode', 'save'):
+            self.assertGreaterEqual(stats['stages'][stage]['wall'], 0.0)
+            self.assertGreaterEqual(stats['stages'][stage]['cpu'], 0.0)
+        self.assertAlmostEqual(flight_case.processing_seconds,
+                               sum(entry['wall'] for entry in stats['stages'].values()))
+        self.assertTrue(any(f'Processed flight case {flight_case.pk}' in line and 'save' in line
+                            for line in logs.output))
+    
+    def test_failed_run_keeps_timings(self):
+        """Failures record the stages that ran."""
+        flight_case = self.upload_case(trajectory=b"50.0 10.0 1000.0 soon\n")
+        self.assertEqual(flight_case.processing_state, ProcessingState.FAILED)
+        self.assertIn('parse_trajectory', flight_case.processing_stats['stages'])
+    
+    @override_settings(GEOMETRY_ENGINE='python')
+    def test_python_engine_stages(self):
+        """The reference engine times speeds and the deviation search apart."""
+        flight_case = self.upload_case()
+        stages = flight_case.processing_stats['stages']
+        self.assertIn('speeds', stages)
+        self.assertIn('deviations', stages)
+        self.assertNotIn('geometry', stages)
+    
+    def test_server_timing_header(self):
+        """Detail responses carry the processing stages; all responses carry the total."""
+        response = self.upload()
+        self.assertIn('processing-parse_trajectory;dur=', response['Server-Timing'])
+        url = f"/api/flight-cases/{response.json()['id']}/"
+        
+        for _ in range(2):  # cache miss, then hit
+            header = self.client.get(url)['Server-Timing']
+            self.assertIn('processing-save;dur=', header)
+            self.assertRegex(header, r'total;dur=[0-9.]+$')
+        self.assertIn('db;dur=', self.client.get('/api/flight-cases/')['Server-Timing'])
+        
+        with override_settings(SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/api/flight-cases/'))
+    
+    async def test_server_timing_header_async(self):
+        """Under ASGI the SQL run by the sync views is timed as well."""
+        await sync_to_async(self.upload)()
+        response = await self.async_client.get('/api/flight-cases/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[0-9.]+;desc="\d+ queries", total;dur=')
+    
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_slowest_cases_admin(self):
+        """The admin lists timed cases slowest first and sorts by stage."""
+        ids = [self.upload().json()['id'] for _ in range(3)]
+        FlightCase.objects.filter(pk=ids[1]).update(processing_seconds=100.0)
+        FlightCase.objects.create(corridor_file='corridors/x.txt', trajectory_file='trajectories/x.txt')
+        self.assertEqual(SlowFlightCase.objects.first().pk, ids[1])
+        
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'pw'))
+        response = self.client.get('/admin/monitoring/slowflightcase/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([case.pk for case in response.context['cl'].result_list][0], ids[1])
+        self.assertEqual(response.context['cl'].result_count, 3)
+        
+        # Sorting by a stage column (its index in list_display)
+        response = self.client.get('/admin/monitoring/slowflightcase/', {'o': '6'})
+        self.assertEqual(response.status_code, 200)
+        walls = [case.geometry_seconds for case in response.context['cl'].result_list]
+        self.assertEqual(walls, sorted(walls))
+    
+    def test_stage_timer(self):
+        """Repeated stages add up; summary lists stages in order."""
+        timer = timing.StageTimer()
+        for _ in range(2):
+            with timer.stage('a'):
+                pass
+        with timer.stage('b'):
+            pass
+        timer.counts['points'] = 7
+        stats = timer.stats()
+        self.assertEqual(list(stats['stages']), ['a', 'b'])
+        self.assertEqual(stats['points'], 7)
+        self.assertIn('a ', timer.summary())
+        self.assertEqual(timing.server_timing(None), '')
+        self.assertTrue(timing.server_timing(stats).startswith('processing;dur='))
+
+
+class ProfileCommandTests(UploadTestMixin, TestCase):
+    """Test the profile_flight_case command."""
+    
+    CORRIDOR = (b"10.0 50.0 1000.0 500.0 300.0\n10.5 50.5 1100.0 500.0 300.0\n"
+                b"11.0 51.0 1200.0 500.0 320.0\n")
+    TRAJECTORY = ''.join(
+        f"{50.0 + i / 30:.6f} {10.0 + i / 30:.6f} 1000.0 13:{i:02d}:00\n" for i in range(30)
+    ).encode()
+    
+    def setUp(self):
+        super().setUp()
+        self.corridor = os.path.join(self.directory, 'corridor.txt')
+        self.trajectory = os.path.join(self.directory, 'trajectory.txt')
+        with open(self.corridor, 'wb') as f:
+            f.write(self.CORRIDOR)
+        with open(self.trajectory, 'wb') as f:
+            f.write(self.TRAJECTORY)
+    
+    def profile(self, *args):
+        output_dir = os.path.join(self.directory, 'profile')
+        call_command('profile_flight_case', *args, '--output-dir', output_dir,
+                     stdout=io.StringIO(), stderr=io.StringIO())
+        with open(os.path.join(output_dir, 'summary.json')) as f:
+            return output_dir, json.load(f)
+    
+    def test_file_pair_reports(self):
+        """A file pair is profiled per stage; all three reports are written."""
+        output_dir, summary = self.profile(
+            '--corridor', self.corridor, '--trajectory', self.trajectory, '--engine', 'python'
+        )
+        self.assertEqual(summary['points'], 30)
+        self.assertEqual(summary['results']['point_count'], 30)
+        for stage in ('parse_trajectory', 'speeds', 'deviations', 'encode'):
+            self.assertIn('top_functions', summary['stages'][stage])
+            self.assertGreaterEqual(summary['stages'][stage]['peak_bytes'], 0)
+        self.assertTrue(summary['stages']['parse_trajectory']['top_allocations'])
+        
+        # Every point searches the corridor once
+        calls = {row['function'].rsplit(':', 1)[1]: row['calls']
+                 for row in summary['hot_geometry_functions']}
+        self.assertEqual(calls['find_nearest_corridor_segment'], 30)
+        
+        import pstats
+        self.assertTrue(pstats.Stats(os.path.join(output_dir, 'profile.prof')).stats)
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'stacks.collapsed')))
+    
+    def test_flight_case_left_unchanged(self):
+        """Profiling a stored case saves nothing."""
+        flight_case = self.upload_case()
+        FlightCase.objects.filter(pk=flight_case.pk).update(compliance_percentage=None)
+        
+        _, summary = self.profile(str(flight_case.pk), '--no-memory')
+        self.assertIn('load_corridor', summary['stages'])
+        self.assertNotIn('peak_bytes', summary['stages']['encode'])
+        self.assertIsNone(FlightCase.objects.get(pk=flight_case.pk).compliance_percentage)
+    
+    def test_corridor_load_sampled(self):
+        """Samples taken while the stored corridor loads are kept, under their stage."""
+        from .management.commands.profile_flight_case import profiled_run
+        from .profiling import ProfilingTimer, StackSampler
+        
+        flight_case = self.upload_case()
+        sampler = StackSampler(profiled_run.__code__)
+        load = corridors.load
+        
+        def sampled_load(corridor_id):
+            sampler._sample(None, sys._getframe())
+            return load(corridor_id)
+        
+        corridors.load = sampled_load
+        try:
+            profiled_run(flight_case, self.corridor, self.trajectory,
+                         ProfilingTimer(memory=False, sampler=sampler))
+        finally:
+            corridors.load = load
+        stack, = sampler.stacks
+        self.assertTrue(stack.startswith('load_corridor;'))
+        self.assertIn(':profiled_run;', stack)
+    
+    def test_bad_arguments(self):
+        """A missing case, or a case together with files, is refused."""
+        with self.assertRaises(CommandError):
+            self.profile('999999')
+        with self.assertRaises(CommandError):
+            self.profile('1', '--corridor', self.corridor, '--trajectory', self.trajectory)
+        with self.assertRaises(CommandError):
+            self.profile('--corridor', self.corridor)
+
+
+@override_settings(PROCESSING_ASYNC=False, METRICS_ENABLED=True)
+class MetricsTests(UploadTestMixin, TestCase):
+    """Test the metrics store and the /metrics endpoint."""
+    
+    def temporary_settings(self):
+        return {'METRICS_DIR': os.path.join(self.directory, 'metrics')}
+    
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+    
+    def test_upload_recorded(self):
+        """An upload records its file sizes, the processing run and the request latency."""
+        self.upload_case()
+        self.client.get('/api/flight-cases/')
+        text = self.scrape()
+        
+        self.assertIn('fofis_upload_bytes_count{file="trajectory"} 1.0', text)
+        self.assertIn('fofis_upload_bytes_sum{file="trajectory"} 52.0', text)
+        self.assertIn('fofis_upload_bytes_bucket{file="corridor",le="1000.0"} 1.0', text)
+        self.assertIn('fofis_processing_seconds_count{outcome="done"} 1.0', text)
+        self.assertIn('fofis_processed_points_total 2.0', text)
+        self.assertIn('fofis_processing_points_per_second_count 1.0', text)
+        self.assertIn(
+            'fofis_http_request_seconds_count{action="create",method="POST",status="2xx"} 1.0', text
+        )
+        self.assertIn(
+            'fofis_http_request_seconds_bucket{action="list",method="GET",status="2xx",le="+Inf"} 1.0',
+            text
+        )
+    
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_processes_added_up(self):
+        """Samples of a forked process land in its own file and are added to the parent's."""
+        metrics.PROCESSED_POINTS.inc(5)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metrics.PROCESSED_POINTS.inc(7)
+                metrics.CPP_VALIDATOR_SECONDS.observe(0.02, mode='library')
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        
+        self.assertEqual(len(os.listdir(settings.METRICS_DIR)), 2)
+        text = metrics.render()
+        self.assertIn('fofis_processed_points_total 12.0', text)
+        self.assertIn('fofis_cpp_validator_seconds_bucket{mode="library",le="0.01"} 0.0', text)
+        self.assertIn('fofis_cpp_validator_seconds_bucket{mode="library",le="0.025"} 1.0', text)
+        self.assertIn('fofis_cpp_validator_seconds_count{mode="library"} 1.0', text)
+    
+    @unittest.skipUnless(hasattr(os, 'fork') and metrics.fcntl is not None, 'needs os.fork and fcntl')
+    def test_exited_processes_archived(self):
+        """Files of exited processes are folded into the archive; running ones are kept."""
+        metrics.PROCESSED_POINTS.inc(5)
+        for amount, total in ((7, '12.0'), (11, '23.0')):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    metrics.PROCESSED_POINTS.inc(amount)
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            self.assertIn(f'fofis_processed_points_total {total}', metrics.render())
+        
+        own = os.path.basename(metrics._file.path)
+        self.assertEqual(sorted(name for name in os.listdir(settings.METRICS_DIR)
+                                if name.endswith('.db')),
+                         sorted([own, metrics.ARCHIVE_NAME]))
+        metrics.PROCESSED_POINTS.inc(1)
+        self.assertIn('fofis_processed_points_total 24.0', metrics.render())
+    
+    def test_file_grows(self):
+        """Label sets beyond the initial mapping are kept."""
+        for i in range(2000):
+            metrics.CPP_VALIDATOR_FAILURES.inc(i, mode=f'mode{i}', reason='start')
+        with open(metrics._file.path, 'rb') as f:
+            self.assertEqual(len(list(metrics._entries(f.read()))), 2000)
+        self.assertIn('fofis_cpp_validator_failures_total{mode="mode1999",reason="start"} 1999.0',
+                      metrics.render())
+        with self.assertRaises(ValueError):
+            metrics.CPP_VALIDATOR_FAILURES.inc(mode='library')
+    
+    def test_disabled_and_token(self):
+        """Disabled metrics record nothing and 404; a set token is required."""
+        with override_settings(METRICS_ENABLED=False):
+            metrics.PROCESSED_POINTS.inc(1)
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertFalse(os.path.exists(settings.METRICS_DIR))
+        
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertIn('# TYPE fofis_processing_seconds histogram',
+                          self.scrape(HTTP_AUTHORIZATION='Bearer secret'))
+
+
+@override_settings(PROCESSING_ASYNC=False)
+class ViolationIntervalTests(UploadTestMixin, TestCase):
+    """Test violation interval extraction, storage and the violation endpoints."""
+    
+    def upload_track(self, altitudes, step=30):
+        """A track along the corridor (~170 km/h level) with a point every step seconds."""
+        return self.upload_case(trajectory=''.join(
+            f"{50 + 0.0035 * i * step / 10} {10 + 0.0035 * i * step / 10} {altitude} "
+            f"13:{i * step // 60:02d}:{i * step % 60:02d}\n"
+            for i, altitude in enumerate(altitudes)
+        ))
+    
+    def test_extract(self):
+        """Runs of violating points become intervals with their kind and peaks."""
+        n = 10
+        columns = {
+            'time_seconds': np.arange(n) * 5.0,
+            'deviation': np.array([0, 600, 700, 0, 0, 0, 550, 0, 0, 0], dtype=float),
+            'allowed_deviation': np.full(n, 500.0),
+            'speed': np.array([100, 100, 400, 100, 350, 100, 100, 100, 100, 100], dtype=float),
+            'allowed_speed': np.full(n, 300.0),
+        }
+        columns['allowed_deviation'][9] = np.nan
+        compliant = np.array([True, False, False, True, False, True, False, True, True, False])
+        
+        intervals = violations.extract(columns, compliant, offset=100)
+        
+        self.assertEqual([(i['start_index'], i['end_index']) for i in intervals],
+                         [(101, 102), (104, 104), (106, 106), (109, 109)])
+        self.assertEqual([i['kind'] for i in intervals], ['both', 'speed', 'deviation', 'deviation'])
+        first = intervals[0]
+        self.assertEqual((first['start_time_seconds'], first['end_time_seconds']), (5.0, 10.0))
+        self.assertEqual((first['duration_seconds'], first['point_count']), (5.0, 2))
+        self.assertEqual((first['deviation_excess'], first['speed_excess']), (200.0, 100.0))
+        self.assertAlmostEqual(first['severity'], 0.4)
+        self.assertIsNone(intervals[1]['deviation_excess'])
+        self.assertAlmostEqual(intervals[1]['severity'], 50 / 300)
+        # No corridor limits: a deviation without excess
+        self.assertEqual(
+            [intervals[3][key] for key in ('deviation_excess', 'speed_excess', 'severity')],
+            [None, None, None]
+        )
+        self.assertEqual(violations.extract(columns, np.ones(n, dtype=bool)), [])
+    
+    def test_processing_stores_intervals(self):
+        """Processing stores the intervals of the stored points; reprocessing replaces them."""
+        altitudes = [1000.0] * 5 + [2000.0] * 3 + [1000.0] * 4 + [2200.0] * 2 + [1000.0] * 2
+        flight_case = self.upload_track(altitudes)
+        
+        stored = list(flight_case.violation_intervals.values(
+            'start_index', 'end_index', 'kind', 'point_count'
+        ))
+        self.assertEqual(stored, [
+            {'start_index': 5, 'end_index': 7, 'kind': 'deviation', 'point_count': 3},
+            {'start_index': 12, 'end_index': 13, 'kind': 'deviation', 'point_count': 2},
+        ])
+        self.assertEqual(
+            [(i['start_index'], i['end_index']) for i in violations.extract_stored(
+                flight_case.trajectory_columns()
+            )],
+            [(5, 7), (12, 13)]
+        )
+        self.assertEqual(flight_case.processing_stats['violations'], 2)
+        
+        processing.process_flight_case(flight_case)
+        self.assertEqual(flight_case.violation_intervals.count(), 2)
+        
+        # The backfill command gives the same intervals from the stored points
+        ViolationInterval.objects.all().delete()
+        call_command('extract_violations', '--missing', stdout=io.StringIO())
+        self.assertEqual(
+            list(flight_case.violation_intervals.values('start_index', 'end_index', 'kind',
+                                                        'point_count')),
+            stored
+        )
+    
+    def test_case_endpoint(self):
+        """The per case list is read without the point blobs and takes the filters."""
+        flight_case = self.upload_track([1000.0] * 3 + [2000.0] * 2 + [1000.0] * 3 + [1700.0] + [1000.0])
+        url = f'/api/flight-cases/{flight_case.pk}/violations/'
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('trajectory_blob' in q['sql'] for q in queries.captured_queries))
+        results = response.json()['results']
+        self.assertEqual([(r['start_index'], r['end_index']) for r in results], [(3, 4), (8, 8)])
+        self.assertAlmostEqual(results[0]['deviation_excess'], 500.0, delta=20)
+        
+        results = self.client.get(url, {'min_severity': 0.7}).json()['results']
+        self.assertEqual([r['start_index'] for r in results], [3])
+        self.assertEqual(self.client.get(url, {'kind': 'speed'}).json()['results'], [])
+    
+    def test_search(self):
+        """The search filters by kind, time range, severity and duration, and pages by cursor."""
+        fast = self.upload_track([1000.0] * 4 + [2000.0] * 2 + [1000.0] * 4, step=4)
+        slow = self.upload_track([1000.0] * 2 + [1800.0] * 3 + [1000.0] * 5)
+        self.assertEqual(fast.violation_intervals.get().kind, 'both')
+        self.assertEqual(slow.violation_intervals.get().kind, 'deviation')
+        
+        def search(**params):
+            response = self.client.get('/api/violations/', params)
+            self.assertEqual(response.status_code, 200)
+            return [(r['flight_case'], r['kind']) for r in response.json()['results']]
+        
+        self.assertEqual(search(), [(fast.pk, 'both'), (slow.pk, 'deviation')])
+        self.assertEqual(search(kind='deviation,speed'), [(slow.pk, 'deviation')])
+        self.assertEqual(search(flight_case=fast.pk), [(fast.pk, 'both')])
+        self.assertEqual(search(min_duration=15), [(slow.pk, 'deviation')])
+        # fast violates from 13:00:12 to 13:00:20 (climbing too fast from
+        # the point before), slow from 13:01:00 to 13:02:00
+        self.assertEqual(search(start='13:00:21', end='13:05:00'), [(slow.pk, 'deviation')])
+        self.assertEqual(search(start=0, end=46819), [(fast.pk, 'both')])
+        self.assertEqual(search(ordering='start_time_seconds'), [(fast.pk, 'both'), (slow.pk, 'deviation')])
+        
+        first = self.client.get('/api/violations/', {'page_size': 1}).json()
+        self.assertEqual(len(first['results']), 1)
+        second = self.client.get(first['next']).json()
+        self.assertEqual([r['flight_case'] for r in first['results'] + second['results']],
+                         [fast.pk, slow.pk])
+        self.assertIsNone(second['next'])
+        
+        for params in ({'kind': 'altitude'}, {'start': 'noon'}, {'min_severity': 'high'},
+                       {'flight_case': 'x'}, {'ordering': 'kind'}):
+            self.assertEqual(self.client.get('/api/violations/', params).status_code, 400)
+        
+        interval = fast.violation_intervals.get()
+        self.assertEqual(self.client.get(f'/api/violations/{interval.pk}/').json()['id'], interval.pk)
+        
+        fast.delete()
+        self.assertEqual(search(), [(slow.pk, 'deviation')])
+
+
+@override_settings(PROCESSING_ASYNC=False)
+class TileTests(UploadTestMixin, TestCase):
+    """Test the map tile endpoint and its disk cache."""
+    
+    def temporary_settings(self):
+        return {'TILE_CACHE_DIR': os.path.join(self.directory, 'tiles')}
+    
+    def upload_track(self, offset=0.0, points=400):
+        """A track along its corridor, 2 km off it for points 150-199."""
+        corridor = (f"{10 + offset} {50 + offset} 1000.0 500.0 300.0\n"
+                    f"{11 + offset} {51 + offset} 1200.0 500.0 320.0")
+        lines = []
+        for i in range(points):
+            f = i / (points - 1)
+            excursion = 0.03 if 150 <= i < 200 else 0.0
+            seconds = 13 * 3600 + i * 30
+            lines.append(f"{50 + f + offset} {10 + f - excursion + offset} {1000 + 200 * f} "
+                         f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}\n")
+        return self.upload_case(corridor, ''.join(lines))
+    
+    @staticmethod
+    def tile_of(latitude, longitude, z):
+        n = 2 ** z
+        y = float(tiles._mercator_y(np.array([latitude]))[0])
+        return z, int((longitude + 180) / 360 * n), int(y * n)
+    
+    def get_tile(self, tile, **params):
+        z, x, y = tile
+        response = self.client.get(f'/api/tiles/{z}/{x}/{y}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def test_tile_lines(self):
+        """Lines are clipped to the tile, simplified for its zoom, and violations flagged."""
+        flight_case = self.upload_track()
+        self.assertEqual(
+            (flight_case.min_latitude, flight_case.max_latitude, flight_case.min_longitude,
+             flight_case.max_longitude),
+            (50.0, 51.0, 10.0, 11.0)
+        )
+        
+        # The excursion, close up: compliant and violating parts of the track
+        tile = self.tile_of(50.5, 10.5, 11)
+        response = self.get_tile(tile)
+        self.assertEqual(response['Content-Type'], tiles.GEOJSON_CONTENT_TYPE)
+        data = json.loads(response.content)
+        self.assertEqual((data['flight_cases'], data['truncated']), ([flight_case.pk], False))
+        trajectory = [f for f in data['features'] if f['properties']['layer'] == 'trajectory']
+        self.assertEqual({f['properties']['violation'] for f in trajectory}, {True, False})
+        self.assertEqual([f['properties'] for f in data['features'] if f not in trajectory],
+                         [{'flight_case': flight_case.pk, 'layer': 'corridor'}])
+        west, south, east, north = tiles.tile_bounds(*tile, buffer=tiles.BUFFER)
+        for feature in data['features']:
+            self.assertEqual(feature['geometry']['type'], 'LineString')
+            for longitude, latitude in feature['geometry']['coordinates']:
+                self.assertTrue(west - 1e-4 <= longitude <= east + 1e-4)
+                self.assertTrue(south - 1e-4 <= latitude <= north + 1e-4)
+        
+        # Zoomed out, the whole track is a handful of vertices
+        data = json.loads(self.get_tile(self.tile_of(50.5, 10.5, 5)).content)
+        vertices = sum(len(f['geometry']['coordinates']) for f in data['features'])
+        self.assertLess(vertices, 20)
+        
+        # Far away: no case, no cache entry
+        data = json.loads(self.get_tile(self.tile_of(-30.0, 140.0, 8)).content)
+        self.assertEqual((data['features'], data['flight_cases']), ([], []))
+        self.assertEqual(
+            len(os.listdir(os.path.join(settings.TILE_CACHE_DIR, str(flight_case.pk)))), 1
+        )
+    
+    def test_binary_matches_geojson(self):
+        """The binary encoding has the same features, in tile units."""
+        flight_case = self.upload_track()
+        tile = self.tile_of(50.5, 10.5, 11)
+        geojson = json.loads(self.get_tile(tile).content)
+        body = self.get_tile(tile, format='bin').content
+        
+        self.assertEqual(body[:4], tiles.BINARY_MAGIC)
+        header_length = int.from_bytes(body[4:8], 'little')
+        header = json.loads(body[8:8 + header_length])
+        self.assertEqual((8 + header_length) % 8, 0)
+        coordinates = np.frombuffer(body[8 + header_length:], dtype='<i2').reshape(-1, 2)
+        self.assertEqual(header['extent'], tiles.EXTENT)
+        self.assertEqual([f['vertices'] for f in header['features']],
+                         [len(f['geometry']['coordinates']) for f in geojson['features']])
+        self.assertEqual(len(coordinates), sum(f['vertices'] for f in header['features']))
+        self.assertTrue((coordinates >= -tiles.BUFFER).all())
+        self.assertTrue((coordinates <= tiles.EXTENT + tiles.BUFFER).all())
+        
+        accepted = self.client.get('/api/tiles/{}/{}/{}/'.format(*tile),
+                                   HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(accepted.content, body)
+    
+    def test_disk_cache_and_invalidation(self):
+        """Parts are built once per case version; reprocessing drops them."""
+        flight_case = self.upload_track()
+        tile = self.tile_of(50.5, 10.5, 11)
+        first = self.get_tile(tile)
+        
+        case_directory = os.path.join(settings.TILE_CACHE_DIR, str(flight_case.pk))
+        version, = os.listdir(case_directory)
+        part = os.path.join(case_directory, version, *map(str, tile[:2]), f'{tile[2]}.json')
+        modified = os.stat(part).st_mtime_ns
+        second = self.get_tile(tile)
+        self.assertEqual(os.stat(part).st_mtime_ns, modified)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(
+            self.client.get('/api/tiles/{}/{}/{}/'.format(*tile),
+                            HTTP_IF_NONE_MATCH=first['ETag']).status_code,
+            304
+        )
+        
+        processing.process_flight_case(flight_case)
+        self.assertFalse(os.path.exists(case_directory))
+        third = self.get_tile(tile)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+        self.assertEqual(third.content, first.content)
+        
+        # The reprocess command writes with bulk_update, not save()
+        self.assertTrue(os.path.isdir(case_directory))
+        call_command('reprocess_flight_cases', '--workers', '1', '--checkpoint',
+                     os.path.join(self.directory, 'checkpoint.json'), stdout=io.StringIO())
+        self.assertFalse(os.path.exists(case_directory))
+    
+    def test_many_cases(self):
+        """Cases are selected by extent or by id; a shared corridor is sent once."""
+        first = self.upload_track()
+        second = self.upload_track()
+        far = self.upload_track(offset=20.0)
+        self.assertEqual(first.corridor_id, second.corridor_id)
+        self.assertNotEqual(first.corridor_id, far.corridor_id)
+        # Processed before extents were stored
+        FlightCase.objects.filter(pk=second.pk).update(min_latitude=None, max_latitude=None,
+                                                       min_longitude=None, max_longitude=None)
+        
+        tile = self.tile_of(50.5, 10.5, 6)
+        data = json.loads(self.get_tile(tile).content)
+        self.assertEqual(data['flight_cases'], [second.pk, first.pk])
+        layers = [(f['properties']['flight_case'], f['properties']['layer']) for f in data['features']]
+        self.assertEqual(layers.count((second.pk, 'corridor')) + layers.count((first.pk, 'corridor')), 1)
+        self.assertIsNotNone(FlightCase.objects.get(pk=second.pk).min_latitude)
+        
+        data = json.loads(self.get_tile(tile, cases=f'{first.pk},{far.pk}').content)
+        self.assertEqual(data['flight_cases'], [first.pk])
+        
+        with override_settings(TILE_MAX_CASES=1):
+            data = json.loads(self.get_tile(tile).content)
+            self.assertEqual((data['flight_cases'], data['truncated']), ([second.pk], True))
+        
+        for url in ('/api/tiles/3/4/2/?cases=a', '/api/tiles/3/4/2/?format=png'):
+            self.assertEqual(self.client.get(url).status_code, 400)
+        for url in ('/api/tiles/3/8/0/', '/api/tiles/23/0/0/'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
@@ -0,0 +1,366 @@
+"""
+Map tiles of the trajectories and corridors of many flight cases.
+
+A wide-area view with many flights loaded should not cost every vertex of
+every flight. Tiles are addressed like the base map ({z}/{x}/{y}, Web
+Mercator, 256 px). A tile holds the lines of the flight cases whose extent
+(the min/max latitude/longitude fields) overlaps it, and each line is
+simplified to one pixel at z with the stored drop tolerances (simplify.py).
+The lines are clipped to the tile plus a margin of BUFFER. So a tile costs
+what its viewport shows, not what the dataset holds.
+
+Trajectory lines are split where the violation flag of their segments
+changes: a simplified segment is flagged if any original point in it is
+non-compliant, as in the geometry endpoint.
+
+Lines are kept as tile-local integer coordinates, EXTENT units per tile
+side. Each flight case's part of a tile is written to disk under
+settings.TILE_CACHE_DIR/<case>/<version>/z/x/y.json when first requested.
+The version changes whenever the case is saved, and saving or deleting the
+case also removes its directory (invalidate). A tile response joins the
+parts of its flight cases; a corridor shared by several of them is sent
+once. Two encodings:
+
+    application/geo+json (default)
+        FeatureCollection of LineStrings in longitude/latitude, rounded to
+        the tile's resolution; properties flight_case, layer ('trajectory'
+        or 'corridor') and violation (trajectory lines).
+
+    application/octet-stream (?format=bin)
+        magic b'FCWT', header length (uint32), JSON header (space padded)
+        with per feature flight_case, layer, violation and vertices; then
+        the vertices of every feature in order, as little-endian int16
+        x, y pairs in tile units (0..EXTENT, y down; the margin gives
+        values slightly outside).
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from . import playback, simplify
+
+# Bump when the tile contents change for the same data
+TILE_VERSION = 1
+
+# Tile side in pixels, and in the integer units of the stored lines
+TILE_SIZE = 256
+EXTENT = 4096
+
+# Lines are clipped this many units outside the tile, so that line joins
+# and widths at the tile edges are drawn as on the neighbouring tile
+BUFFER = 256
+
+# Deepest zoom served
+MAX_ZOOM = 22
+
+# Web Mercator latitude limit
+MAX_LATITUDE = 85.0511287798
+
+BINARY_MAGIC = b'FCWT'
+GEOJSON_CONTENT_TYPE = 'application/geo+json'
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z: int, x: int, y: int, buffer: int = 0) -> Tuple[float, float, float, float]:
+    """
+    (west, south, east, north) of a tile in degrees.
+
+    Args:
+        buffer: Margin in tile units added on every side
+    """
+    n = 2 ** z
+    margin = buffer / EXTENT
+    west = (x - margin) / n * 360.0 - 180.0
+    east = (x + 1 + margin) / n * 360.0 - 180.0
+    north = _latitude((y - margin) / n)
+    south = _latitude((y + 1 + margin) / n)
+    return west, south, east, north
+
+
+def extent_fields(*lines) -> Dict[str, Optional[float]]:
+    """
+    FlightCase extent fields covering (latitude, longitude) arrays.
+
+    Values are None if there is no point.
+    """
+    latitude = np.concatenate([np.asarray(lat, dtype=np.float64) for lat, _ in lines])
+    longitude = np.concatenate([np.asarray(lon, dtype=np.float64) for _, lon in lines])
+    if not len(latitude):
+        return dict.fromkeys(('min_latitude', 'max_latitude', 'min_longitude', 'max_longitude'))
+    return {
+        'min_latitude': float(np.nanmin(latitude)),
+        'max_latitude': float(np.nanmax(latitude)),
+        'min_longitude': float(np.nanmin(longitude)),
+        'max_longitude': float(np.nanmax(longitude)),
+    }
+
+
+def overlapping(queryset, z: int, x: int, y: int):
+    """
+    Flight cases of a queryset whose extent overlaps the tile (with its
+    margin). Cases without a stored extent are kept; their extent is
+    stored when their part of a tile is first built.
+    """
+    from django.db.models import Q
+
+    west, south, east, north = tile_bounds(z, x, y, BUFFER)
+    return queryset.filter(
+        Q(min_longitude__lte=east, max_longitude__gte=west,
+          min_latitude__lte=north, max_latitude__gte=south)
+        | Q(min_latitude__isnull=True)
+    )
+
+
+def case_tile(flight_case, z: int, x: int, y: int) -> Dict:
+    """
+    A flight case's part of a tile, from the disk cache or built now.
+
+    Args:
+        flight_case: Processed FlightCase (point blobs may be deferred)
+
+    Returns:
+        Dict with 'trajectory' and 'corridor' lists of lines, each line a
+        dict with flat int 'coordinates' [x0, y0, x1, y1, ...] and, for
+        trajectory lines, 'violation'
+    """
+    path = _cache_path(flight_case, z, x, y)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    part = build_case_tile(flight_case, z, x, y)
+    _write(path, part)
+    return part
+
+
+def build_case_tile(flight_case, z: int, x: int, y: int) -> Dict:
+    """A flight case's part of a tile, built from its stored columns."""
+    center_latitude = _latitude((y + 0.5) / 2 ** z)
+    tolerance = simplify.zoom_tolerance(z, center_latitude)
+
+    columns = flight_case.trajectory_columns(
+        ['latitude', 'longitude', 'compliant', 'cpp_compliant', simplify.TOLERANCE_COLUMN]
+    )
+    latitude = columns.get('latitude', np.empty(0))
+    longitude = columns.get('longitude', np.empty(0))
+    compliant = playback.compliance_mask(columns)
+    tolerances = columns.get(simplify.TOLERANCE_COLUMN)
+    if tolerances is None:
+        # Processed before tolerances were stored
+        tolerances = simplify.trajectory_tolerances(latitude, longitude, compliant)
+
+    corridor = flight_case.corridor_columns()
+    corridor_latitude = corridor.get('latitude', np.empty(0))
+    corridor_longitude = corridor.get('longitude', np.empty(0))
+    corridor_tolerances = corridor.get(simplify.TOLERANCE_COLUMN)
+    if corridor_tolerances is None:
+        corridor_tolerances = simplify.corridor_tolerances(*(
+            corridor.get(name, np.empty(0))
+            for name in ('latitude', 'longitude', 'allowed_deviation', 'allowed_speed')
+        ))
+
+    if flight_case.min_latitude is None and (len(latitude) or len(corridor_latitude)):
+        # Processed before extents were stored: keep it for the next tiles
+        fields = extent_fields((latitude, longitude), (corridor_latitude, corridor_longitude))
+        type(flight_case).objects.filter(pk=flight_case.pk).update(**fields)
+        for field, value in fields.items():
+            setattr(flight_case, field, value)
+
+    indices = np.flatnonzero(tolerances >= tolerance)
+    violation = simplify.segment_flags(indices, ~compliant)
+    corridor_indices = np.flatnonzero(corridor_tolerances >= tolerance)
+    return {
+        'trajectory': [
+            {'coordinates': coordinates, 'violation': flag}
+            for coordinates, flag in _clip_line(
+                latitude[indices], longitude[indices], violation, z, x, y
+            )
+        ],
+        'corridor': [
+            {'coordinates': coordinates}
+            for coordinates, _ in _clip_line(
+                corridor_latitude[corridor_indices], corridor_longitude[corridor_indices],
+                None, z, x, y
+            )
+        ],
+    }
+
+
+def tile_features(flight_cases: Sequence, z: int, x: int, y: int) -> List[Dict]:
+    """
+    Lines of a tile for several flight cases, corridors shared between them once.
+
+    Returns:
+        Dicts with flight_case, layer, violation (None for corridors) and
+        the flat int coordinates
+    """
+    features = []
+    corridors_seen = set()
+    for flight_case in flight_cases:
+        part = case_tile(flight_case, z, x, y)
+        for line in part['trajectory']:
+            features.append({'flight_case': flight_case.pk, 'layer': 'trajectory',
+                             'violation': line['violation'], 'coordinates': line['coordinates']})
+        if flight_case.corridor_id is not None:
+            if flight_case.corridor_id in corridors_seen:
+                continue
+            corridors_seen.add(flight_case.corridor_id)
+        for line in part['corridor']:
+            features.append({'flight_case': flight_case.pk, 'layer': 'corridor',
+                             'violation': None, 'coordinates': line['coordinates']})
+    return features
+
+
+def encode_geojson(features: List[Dict], z: int, x: int, y: int, fields: Dict) -> bytes:
+    """GeoJSON FeatureCollection body; fields are added as foreign members."""
+    # Enough decimals for 1/EXTENT of a tile at this zoom
+    decimals = max(0, math.ceil(math.log10(EXTENT * 2 ** z / 360.0)))
+    n = 2 ** z
+    geojson = []
+    for feature in features:
+        units = np.asarray(feature['coordinates'], dtype=np.float64).reshape(-1, 2)
+        longitude = (x + units[:, 0] / EXTENT) / n * 360.0 - 180.0
+        latitude = _latitude((y + units[:, 1] / EXTENT) / n)
+        properties = {'flight_case': feature['flight_case'], 'layer': feature['layer']}
+        if feature['violation'] is not None:
+            properties['violation'] = feature['violation']
+        geojson.append({
+            'type': 'Feature',
+            'geometry': {
+                'type': 'LineString',
+                'coordinates': np.column_stack((
+                    np.round(longitude, decimals), np.round(latitude, decimals)
+                )).tolist(),
+            },
+            'properties': properties,
+        })
+    collection = {'type': 'FeatureCollection', 'features': geojson, **fields}
+    return json.dumps(collection, separators=(',', ':')).encode('utf-8')
+
+
+def encode_binary(features: List[Dict], z: int, x: int, y: int, fields: Dict) -> bytes:
+    """Binary body (see the module docstring)."""
+    header = {
+        'z': z, 'x': x, 'y': y, 'extent': EXTENT,
+        'features': [
+            {'flight_case': f['flight_case'], 'layer': f['layer'], 'violation': f['violation'],
+             'vertices': len(f['coordinates']) // 2}
+            for f in features
+        ],
+        **fields,
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    # Vertex data starts 8-byte aligned
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % 8)
+    coordinates = np.fromiter(
+        (value for f in features for value in f['coordinates']), dtype='<i2'
+    )
+    return BINARY_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + coordinates.tobytes()
+
+
+def invalidate(flight_case_id) -> None:
+    """Remove every cached tile part of a flight case."""
+    if flight_case_id is None:
+        return
+    shutil.rmtree(os.path.join(settings.TILE_CACHE_DIR, str(flight_case_id)), ignore_errors=True)
+
+
+def _clip_line(latitude, longitude, flags, z: int, x: int, y: int):
+    """
+    Parts of a line inside the tile and its margin, in tile units.
+
+    Segments are clipped to the box (Liang-Barsky); consecutive segments
+    are joined while they stay inside and have the same flag.
+
+    Yields:
+        (flat int coordinates, flag) per part; flag is None without flags
+    """
+    if len(latitude) < 2:
+        return
+    n = 2 ** z
+    px = ((np.asarray(longitude) + 180.0) / 360.0 * n - x) * EXTENT
+    py = (_mercator_y(np.asarray(latitude)) * n - y) * EXTENT
+
+    x0, y0, x1, y1 = px[:-1], py[:-1], px[1:], py[1:]
+    dx, dy = x1 - x0, y1 - y0
+    t0 = np.zeros(len(dx))
+    t1 = np.ones(len(dx))
+    inside = np.ones(len(dx), dtype=bool)
+    low, high = -BUFFER, EXTENT + BUFFER
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x0 - low), (dx, high - x0), (-dy, y0 - low), (dy, high - y0)):
+            ratio = q / p
+            entering = p < 0
+            leaving = p > 0
+            t0 = np.where(entering, np.maximum(t0, ratio), t0)
+            t1 = np.where(leaving, np.minimum(t1, ratio), t1)
+            inside &= ~((p == 0) & (q < 0))
+    inside &= t0 <= t1
+
+    segments = np.flatnonzero(inside)
+    if not len(segments):
+        return
+    start_x, start_y = x0 + t0 * dx, y0 + t0 * dy
+    end_x, end_y = x0 + t1 * dx, y0 + t1 * dy
+
+    # A part continues while a segment ends at the vertex the next one starts at
+    joined = (np.diff(segments) == 1) & (t1[segments[:-1]] == 1) & (t0[segments[1:]] == 0)
+    if flags is not None:
+        joined &= flags[segments[:-1]] == flags[segments[1:]]
+    breaks = np.flatnonzero(~joined) + 1
+    for part in np.split(segments, breaks):
+        xs = np.concatenate(([start_x[part[0]]], end_x[part]))
+        ys = np.concatenate(([start_y[part[0]]], end_y[part]))
+        points = np.column_stack((np.round(xs), np.round(ys))).astype(np.int64)
+        # Vertices closer than a unit collapse into one
+        keep = np.concatenate(([True], (np.diff(points, axis=0) != 0).any(axis=1)))
+        points = points[keep]
+        if len(points) < 2:
+            continue
+        yield points.ravel().tolist(), (None if flags is None else bool(flags[part[0]]))
+
+
+def _mercator_y(latitude):
+    """Web Mercator y of latitudes, 0 at the top of the world, 1 at the bottom."""
+    latitude = np.radians(np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE))
+    return (1.0 - np.log(np.tan(latitude) + 1.0 / np.cos(latitude)) / math.pi) / 2.0
+
+
+def _latitude(mercator_y):
+    """Latitude of Web Mercator y (inverse of _mercator_y)."""
+    return np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * np.asarray(mercator_y)))))
+
+
+def _cache_path(flight_case, z: int, x: int, y: int) -> str:
+    version = hashlib.sha1(
+        f'{TILE_VERSION}:{playback.data_version(flight_case)}'.encode('utf-8')
+    ).hexdigest()[:16]
+    return os.path.join(settings.TILE_CACHE_DIR, str(flight_case.pk), version,
+                        str(z), str(x), f'{y}.json')
+
+
+def _write(path: str, part: Dict) -> None:
+    """Write a cache file atomically; a failed write only costs a rebuild."""
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(part, f, separators=(',', ':'))
+        os.replace(temporary, path)
+    except OSError:
+        pass
@@ -0,0 +1,175 @@
+"""
+Per-stage timings of processing runs and the Server-Timing header.
+
+compute_flight_case runs each stage (parsing, geometry, C++ validation,
+aggregates, simplification, encoding) under a StageTimer, which records
+wall and CPU seconds. The stats are stored on the FlightCase
+(processing_stats, processing_seconds), logged, and sent to browsers in
+the Server-Timing header of flight case responses.
+
+CPU time is that of the calling thread: work done by geometry worker
+processes or by the C++ validator executable shows as wall time only.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils.decorators import sync_and_async_middleware
+
+# Bump when the layout of processing_stats changes
+STATS_VERSION = 1
+
+
+class StageTimer:
+    """
+    Wall and CPU seconds per named stage, in the order the stages ran.
+
+    Usage:
+        timer = StageTimer()
+        with timer.stage('parse_trajectory'):
+            ...
+        timer.counts['points'] = n
+        stats = timer.stats()
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the block; a repeated name adds to the stage's totals."""
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+            entry['wall'] += time.perf_counter() - wall
+            entry['cpu'] += time.thread_time() - cpu
+
+    @property
+    def wall(self) -> float:
+        return sum(entry['wall'] for entry in self.stages.values())
+
+    @property
+    def cpu(self) -> float:
+        return sum(entry['cpu'] for entry in self.stages.values())
+
+    def stats(self) -> Dict:
+        """JSON-serializable summary, as stored in FlightCase.processing_stats."""
+        return {
+            'version': STATS_VERSION,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'stages': {name: dict(entry) for name, entry in self.stages.items()},
+            **self.counts,
+        }
+
+    def fields(self) -> Dict:
+        """FlightCase field values recording the timings."""
+        return {'processing_stats': self.stats(), 'processing_seconds': self.wall}
+
+    def summary(self) -> str:
+        """One line for the log: total, then each stage."""
+        stages = ', '.join(f"{name} {entry['wall']:.3f}s" for name, entry in self.stages.items())
+        return f"{self.wall:.3f}s wall, {self.cpu:.3f}s CPU ({stages})"
+
+
+def server_timing(stats: Optional[Dict], prefix: str = 'processing') -> str:
+    """
+    Server-Timing entries for stored processing stats (empty if there are none).
+
+    Each stage becomes "<prefix>-<stage>;dur=<ms>", plus "<prefix>" for the
+    total, so browser devtools show where the processing time went.
+    """
+    if not stats or 'stages' not in stats:
+        return ''
+    entries = [f'{prefix};dur={stats["wall"] * 1000:.1f};desc="{stats.get("points", 0)} points"']
+    entries.extend(
+        f'{prefix}-{name};dur={entry["wall"] * 1000:.1f}'
+        for name, entry in stats['stages'].items()
+    )
+    return ', '.join(entries)
+
+
+def add_server_timing(response, value: str) -> None:
+    """Append entries to the response's Server-Timing header."""
+    if not value:
+        return
+    existing = response.get('Server-Timing')
+    response['Server-Timing'] = f'{existing}, {value}' if existing else value
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """
+    Add "db" (SQL time and query count) and "total" entries to Server-Timing.
+
+    On the async path the query timer is installed on the connection of
+    the request's sync thread, where Django runs the sync views and
+    sync_to_async calls of the request. Streaming responses (the live event
+    stream) are left alone. Disabled with settings.SERVER_TIMING = False.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not settings.SERVER_TIMING:
+                return await get_response(request)
+            started = time.perf_counter()
+            db = _QueryTimer()
+            await sync_to_async(_add_wrapper)(db)
+            try:
+                response = await get_response(request)
+            finally:
+                await sync_to_async(_remove_wrapper)(db)
+            _finish(response, started, db)
+            return response
+    else:
+        def middleware(request):
+            if not settings.SERVER_TIMING:
+                return get_response(request)
+            started = time.perf_counter()
+            db = _QueryTimer()
+            with connection.execute_wrapper(db):
+                response = get_response(request)
+            _finish(response, started, db)
+            return response
+    return middleware
+
+
+class _QueryTimer:
+    """execute_wrapper that adds up the time spent in SQL queries."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _add_wrapper(db: _QueryTimer) -> None:
+    # Runs in the request's sync thread, whose connection the views use
+    connection.execute_wrappers.append(db)
+
+
+def _remove_wrapper(db: _QueryTimer) -> None:
+    connection.execute_wrappers.remove(db)
+
+
+def _finish(response, started: float, db: _QueryTimer) -> None:
+    if response.streaming:
+        return
+    entries = []
+    if db.count:
+        entries.append(f'db;dur={db.seconds * 1000:.1f};desc="{db.count} queries"')
+    entries.append(f'total;dur={(time.perf_counter() - started) * 1000:.1f}')
+    add_server_timing(response, ', '.join(entries))
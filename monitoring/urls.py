@@ -3,12 +3,22 @@ API URL configuration.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FlightCaseViewSet
+from .views import (
+    FlightCaseViewSet,
+    ProcessingJobViewSet,
+    ViolationIntervalViewSet,
+    flight_case_stream,
+    tile_view,
+)
 
 router = DefaultRouter()
 router.register(r'flight-cases', FlightCaseViewSet, basename='flightcase')
+router.register(r'jobs', ProcessingJobViewSet, basename='processingjob')
+router.register(r'violations', ViolationIntervalViewSet, basename='violationinterval')
 
 urlpatterns = [
+    path('flight-cases/<int:pk>/stream/', flight_case_stream, name='flightcase-stream'),
+    path('tiles/<int:z>/<int:x>/<int:y>/', tile_view, name='tile'),
     path('', include(router.urls)),
 ]
 
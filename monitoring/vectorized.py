@@ -0,0 +1,402 @@
+"""
+Vectorized (NumPy) geometry engine for whole-trajectory analysis.
+
+Mirrors the per-point functions in geometry.py, but evaluates all
+trajectory points against all corridor segments with batched array
+operations instead of a Python loop per (point, segment) pair.
+
+Results agree with geometry.py to within RESULT_TOLERANCE (absolute,
+meters for deviations and km/h for speeds). `nearest_segment` is
+identical except for exact ties between two segments, where rounding
+in the last bit may pick the other one of the tied pair.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from .geometry import EARTH_RADIUS
+
+
+# Maximum absolute difference from the pure-Python implementation
+RESULT_TOLERANCE = 1e-6
+
+# Upper bound on (trajectory point x corridor segment) pairs evaluated at
+# once; keeps temporary arrays around ~10 MB each on long trajectories.
+BLOCK_SIZE = 250_000
+
+
+def haversine_distance(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Array version of geometry.haversine_distance.
+
+    Args:
+        lat1, lon1: First point(s) (degrees), broadcastable arrays
+        lat2, lon2: Second point(s) (degrees), broadcastable arrays
+
+    Returns:
+        Distances in meters
+    """
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    delta_lat = np.radians(lat2 - lat1)
+    delta_lon = np.radians(lon2 - lon1)
+
+    a = (np.sin(delta_lat / 2) ** 2 +
+         np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2)
+    c = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    return EARTH_RADIUS * c
+
+
+def distance_3d(lat1, lon1, alt1, lat2, lon2, alt2) -> np.ndarray:
+    """
+    Array version of geometry.distance_3d.
+
+    Returns:
+        3D distances in meters
+    """
+    horizontal_dist = haversine_distance(lat1, lon1, lat2, lon2)
+    vertical_dist = np.abs(alt2 - alt1)
+
+    return np.sqrt(horizontal_dist ** 2 + vertical_dist ** 2)
+
+
+def trajectory_arrays(trajectory_points: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Convert parsed trajectory points to contiguous float64 columns.
+
+    Args:
+        trajectory_points: List of trajectory point dicts
+
+    Returns:
+        Dict with 'latitude', 'longitude', 'altitude', 'time_seconds' arrays
+    """
+    keys = ('latitude', 'longitude', 'altitude', 'time_seconds')
+    return {
+        key: np.fromiter((p[key] for p in trajectory_points),
+                         dtype=np.float64, count=len(trajectory_points))
+        for key in keys
+    }
+
+
+class CorridorGeometry:
+    """
+    Per-segment quantities derived from a corridor, computed once.
+
+    Segment i joins corridor points i and i + 1. Vectors are kept in
+    degrees/meters exactly as in geometry.point_to_segment_distance_3d.
+    """
+
+    # Per-segment arrays that from_points/__init__ derive from the points;
+    # derived_columns() exports them so they can be persisted and reused
+    DERIVED_COLUMNS = (
+        'ab_lat', 'ab_lon', 'ab_alt', 'cos_lat_sq', 'ab_length_sq', 'degenerate',
+        'seg_allowed_deviation', 'seg_allowed_speed',
+    )
+
+    def __init__(self, latitude, longitude, altitude,
+                 allowed_deviation, allowed_speed, derived=None):
+        """
+        Args:
+            latitude, longitude, altitude, allowed_deviation, allowed_speed:
+                Corridor point columns
+            derived: Optional output of derived_columns() for the same
+                points; skips recomputing the per-segment arrays
+        """
+        self.latitude = np.ascontiguousarray(latitude, dtype=np.float64)
+        self.longitude = np.ascontiguousarray(longitude, dtype=np.float64)
+        self.altitude = np.ascontiguousarray(altitude, dtype=np.float64)
+        self.allowed_deviation = np.ascontiguousarray(allowed_deviation, dtype=np.float64)
+        self.allowed_speed = np.ascontiguousarray(allowed_speed, dtype=np.float64)
+
+        # Segment start points and AB vectors
+        self.seg_lat = self.latitude[:-1]
+        self.seg_lon = self.longitude[:-1]
+        self.seg_alt = self.altitude[:-1]
+
+        if derived is not None:
+            for name in self.DERIVED_COLUMNS:
+                setattr(self, name, np.ascontiguousarray(derived[name]))
+            self.safe_length_sq = np.where(self.degenerate, 1.0, self.ab_length_sq)
+            return
+
+        self.ab_lat = np.diff(self.latitude)
+        self.ab_lon = np.diff(self.longitude)
+        self.ab_alt = np.diff(self.altitude)
+
+        # Longitude is scaled by cos(latitude) at the segment midpoint
+        cos_lat = np.cos(np.radians((self.latitude[:-1] + self.latitude[1:]) / 2))
+        self.cos_lat_sq = cos_lat * cos_lat
+
+        self.ab_length_sq = (self.ab_lat ** 2 +
+                             self.ab_lon ** 2 * self.cos_lat_sq +
+                             self.ab_alt ** 2 / EARTH_RADIUS / EARTH_RADIUS)
+
+        # Zero-length segments measure the distance to their start point
+        dist_ab = distance_3d(self.latitude[:-1], self.longitude[:-1], self.altitude[:-1],
+                              self.latitude[1:], self.longitude[1:], self.altitude[1:])
+        self.degenerate = (dist_ab < 1e-6) | (self.ab_length_sq < 1e-10)
+        self.safe_length_sq = np.where(self.degenerate, 1.0, self.ab_length_sq)
+
+        # Limits use the average of the two segment endpoints
+        self.seg_allowed_deviation = (self.allowed_deviation[:-1] + self.allowed_deviation[1:]) / 2
+        self.seg_allowed_speed = (self.allowed_speed[:-1] + self.allowed_speed[1:]) / 2
+
+    @classmethod
+    def from_points(cls, corridor_points: List[Dict]) -> 'CorridorGeometry':
+        """Build geometry from parsed corridor point dicts."""
+        columns = [
+            [p[key] for p in corridor_points]
+            for key in ('latitude', 'longitude', 'altitude',
+                        'allowed_deviation', 'allowed_speed')
+        ]
+        return cls(*columns)
+
+    def derived_columns(self) -> Dict[str, np.ndarray]:
+        """Per-segment arrays (DERIVED_COLUMNS), one row per segment."""
+        return {name: getattr(self, name) for name in self.DERIVED_COLUMNS}
+
+    @property
+    def point_count(self) -> int:
+        return len(self.latitude)
+
+    @property
+    def segment_count(self) -> int:
+        return max(len(self.latitude) - 1, 0)
+
+    def segment_distances(self, lat, lon, alt, segments=None) -> np.ndarray:
+        """
+        Distances from points to segments (array point_to_segment_distance_3d).
+
+        Args:
+            lat, lon, alt: 1-D arrays of trajectory point coordinates
+            segments: Optional index array restricting the segments evaluated
+
+        Returns:
+            Array of shape (len(lat), number of segments evaluated)
+        """
+        if segments is None:
+            segments = slice(None)
+        return self._distances(lat[:, None], lon[:, None], alt[:, None], segments)
+
+    def pair_distances(self, lat, lon, alt, segments) -> np.ndarray:
+        """
+        Distance from point k to segment segments[k], for equal-length arrays.
+        """
+        return self._distances(lat, lon, alt, segments)
+
+    def _distances(self, lat_p, lon_p, alt_p, segments) -> np.ndarray:
+        lat_a = self.seg_lat[segments]
+        lon_a = self.seg_lon[segments]
+        alt_a = self.seg_alt[segments]
+        ab_lat = self.ab_lat[segments]
+        ab_lon = self.ab_lon[segments]
+        ab_alt = self.ab_alt[segments]
+
+        dot_product = ((lat_p - lat_a) * ab_lat +
+                       (lon_p - lon_a) * (ab_lon * self.cos_lat_sq[segments]) +
+                       (alt_p - alt_a) * (ab_alt / EARTH_RADIUS / EARTH_RADIUS))
+
+        t = np.clip(dot_product / self.safe_length_sq[segments], 0.0, 1.0)
+        t = np.where(self.degenerate[segments], 0.0, t)
+
+        return distance_3d(lat_p, lon_p, alt_p,
+                           lat_a + t * ab_lat,
+                           lon_a + t * ab_lon,
+                           alt_a + t * ab_alt)
+
+    def nearest_segments(self, lat, lon, alt):
+        """
+        Nearest corridor segment for every point (array find_nearest_corridor_segment).
+
+        Args:
+            lat, lon, alt: 1-D arrays of trajectory point coordinates
+
+        Returns:
+            Tuple of (distance, segment_index) arrays
+        """
+        n = len(lat)
+        distances = np.full(n, np.inf)
+        indices = np.full(n, -1, dtype=np.int64)
+
+        if self.point_count == 0 or n == 0:
+            return distances, indices
+
+        if self.segment_count == 0:
+            distances[:] = distance_3d(lat, lon, alt,
+                                       self.latitude[0], self.longitude[0], self.altitude[0])
+            indices[:] = 0
+            return distances, indices
+
+        chunk = max(1, BLOCK_SIZE // self.segment_count)
+        for start in range(0, n, chunk):
+            stop = min(start + chunk, n)
+            block = self.segment_distances(lat[start:stop], lon[start:stop], alt[start:stop])
+            # argmin returns the first minimum, like the strict '<' scan
+            best = np.argmin(block, axis=1)
+            indices[start:stop] = best
+            distances[start:stop] = block[np.arange(stop - start), best]
+
+        return distances, indices
+
+    def limits_for(self, segment_indices):
+        """
+        Allowed deviation/speed for each nearest-segment index.
+
+        Returns:
+            Tuple of (allowed_deviation, allowed_speed) arrays; NaN where no segment
+        """
+        if self.segment_count == 0:
+            dev = np.full(len(segment_indices), np.nan)
+            spd = np.full(len(segment_indices), np.nan)
+            if self.point_count:
+                dev[segment_indices == 0] = self.allowed_deviation[0]
+                spd[segment_indices == 0] = self.allowed_speed[0]
+            return dev, spd
+
+        valid = segment_indices >= 0
+        safe = np.where(valid, segment_indices, 0)
+        dev = np.where(valid, self.seg_allowed_deviation[safe], np.nan)
+        spd = np.where(valid, self.seg_allowed_speed[safe], np.nan)
+        return dev, spd
+
+
+def compute_speeds(lat, lon, alt, time_seconds) -> np.ndarray:
+    """
+    Speed at each point from movement to the next point (km/h).
+
+    The last point repeats the previous speed; non-increasing timestamps
+    give 0, as in geometry.calculate_speed.
+    """
+    n = len(lat)
+    speeds = np.zeros(n)
+    if n < 2:
+        return speeds
+
+    distance = distance_3d(lat[:-1], lon[:-1], alt[:-1], lat[1:], lon[1:], alt[1:])
+    time_diff = np.diff(time_seconds)
+    moving = time_diff > 0
+    speeds[:-1][moving] = distance[moving] / time_diff[moving] * 3.6
+    speeds[-1] = speeds[-2]
+
+    return speeds
+
+
+def evaluate_trajectory(columns: Dict[str, np.ndarray],
+                        corridor: CorridorGeometry) -> Dict[str, np.ndarray]:
+    """
+    Compute speed, nearest segment, deviation and compliance for a whole track.
+
+    Args:
+        columns: Trajectory columns as returned by trajectory_arrays
+        corridor: Precomputed CorridorGeometry or CorridorIndex
+
+    Returns:
+        Dict of result arrays: 'speed', 'deviation', 'nearest_segment',
+        'allowed_deviation', 'allowed_speed', 'compliant'
+    """
+    lat = columns['latitude']
+    lon = columns['longitude']
+    alt = columns['altitude']
+
+    speed = compute_speeds(lat, lon, alt, columns['time_seconds'])
+    deviation, nearest = corridor.nearest_segments(lat, lon, alt)
+    allowed_deviation, allowed_speed = corridor.limits_for(nearest)
+
+    # NaN limits (no corridor) compare False, i.e. non-compliant
+    compliant = (deviation <= allowed_deviation) & (speed <= allowed_speed)
+
+    return {
+        'speed': speed,
+        'deviation': deviation,
+        'nearest_segment': nearest,
+        'allowed_deviation': allowed_deviation,
+        'allowed_speed': allowed_speed,
+        'compliant': compliant,
+    }
+
+
+def compute_trajectory_speeds(trajectory_points: List[Dict]) -> List[Dict]:
+    """
+    Drop-in replacement for geometry.compute_trajectory_speeds.
+    """
+    if not trajectory_points:
+        return trajectory_points
+
+    columns = trajectory_arrays(trajectory_points)
+    speeds = compute_speeds(columns['latitude'], columns['longitude'],
+                            columns['altitude'], columns['time_seconds'])
+
+    for point, speed in zip(trajectory_points, speeds.tolist()):
+        point['speed'] = speed
+
+    return trajectory_points
+
+
+def compute_deviations(
+    trajectory_points: List[Dict],
+    corridor_points: List[Dict],
+    corridor=None
+) -> List[Dict]:
+    """
+    Drop-in replacement for geometry.compute_deviations.
+
+    Args:
+        trajectory_points: List of trajectory points
+        corridor_points: List of corridor points
+        corridor: Optional prebuilt CorridorGeometry or CorridorIndex for
+            corridor_points, so callers can build it once and reuse it
+
+    Returns:
+        Updated trajectory points with deviation information
+    """
+    if not trajectory_points:
+        return trajectory_points
+
+    if corridor is None:
+        corridor = CorridorGeometry.from_points(corridor_points)
+    columns = trajectory_arrays(trajectory_points)
+    deviation, nearest = corridor.nearest_segments(
+        columns['latitude'], columns['longitude'], columns['altitude']
+    )
+    allowed_deviation, allowed_speed = corridor.limits_for(nearest)
+
+    apply_deviation_results(trajectory_points, deviation, nearest,
+                            allowed_deviation, allowed_speed)
+    return trajectory_points
+
+
+def apply_results(trajectory_points: List[Dict], results: Dict[str, np.ndarray]) -> None:
+    """
+    Write evaluate_trajectory results (speed and deviation) into point dicts.
+    """
+    for point, speed in zip(trajectory_points, results['speed'].tolist()):
+        point['speed'] = speed
+
+    apply_deviation_results(trajectory_points, results['deviation'], results['nearest_segment'],
+                            results['allowed_deviation'], results['allowed_speed'])
+
+
+def apply_deviation_results(trajectory_points: List[Dict], deviation, nearest,
+                            allowed_deviation, allowed_speed) -> None:
+    """
+    Write deviation results into point dicts using the geometry.py keys.
+    """
+    rows = zip(trajectory_points, deviation.tolist(), nearest.tolist(),
+               allowed_deviation.tolist(), allowed_speed.tolist())
+
+    for point, dev, segment_idx, allowed_dev, allowed_spd in rows:
+        point['deviation'] = dev
+        point['nearest_segment'] = segment_idx
+
+        if allowed_dev == allowed_dev:  # not NaN
+            point['allowed_deviation'] = allowed_dev
+            point['allowed_speed'] = allowed_spd
+            point['compliant'] = (
+                dev <= allowed_dev and
+                point.get('speed', 0) <= allowed_spd
+            )
+        else:
+            point['allowed_deviation'] = None
+            point['allowed_speed'] = None
+            point['compliant'] = False
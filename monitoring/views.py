@@ -2,18 +2,43 @@
 API views for the monitoring application.
 """
 import logging
+import math
+from datetime import datetime, time
+from time import perf_counter
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from .models import FlightCase
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+from .models import FlightCase, ProcessingJob, ViolationInterval, ViolationKind
 from .serializers import (
     FlightCaseSerializer,
     FlightCaseCreateSerializer,
     FlightCaseListSerializer,
+    ProcessingJobSerializer,
+    ViolationIntervalSerializer,
 )
-from .processing import process_flight_case
+from .columnar import CORRIDOR_SCHEMA, SCHEMA_VERSION, TRAJECTORY_SCHEMA
+from .jobs import enqueue_processing
+from .pagination import FlightCaseCursorPagination, ViolationIntervalCursorPagination
+from .parsers import parse_time, time_to_seconds
+from .processing import PROCESSING_VERSION
+from .renderers import ColumnarJSONRenderer, TypedArrayRenderer, point_table
+from .timing import add_server_timing, server_timing
+from . import bulk, corridors, live, metrics, playback, response_cache, simplify, telemetry, tiles
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +48,53 @@ class FlightCaseViewSet(viewsets.ModelViewSet):
     ViewSet for managing FlightCase objects.
     
     Endpoints:
-    - GET /api/flight-cases/ - List all flight cases
+    - GET /api/flight-cases/ - List flight cases (cursor-paginated, filterable)
     - POST /api/flight-cases/ - Create new flight case (upload files)
+    - POST /api/flight-cases/bulk/ - Many trajectories in one corridor (manifest)
     - GET /api/flight-cases/{id}/ - Get details of a flight case
     - DELETE /api/flight-cases/{id}/ - Delete a flight case
-    - POST /api/flight-cases/{id}/process/ - Trigger processing
+    - POST /api/flight-cases/{id}/process/ - Queue processing (202 + job)
+    - GET /api/flight-cases/{id}/trajectory_window/ - One page of playback points
+    - GET /api/flight-cases/{id}/compliance/ - Compliance by a time / rolling window
+    - GET /api/flight-cases/{id}/violations/ - Violation intervals of the case
+    - GET /api/flight-cases/{id}/geometry/ - Simplified lines for a zoom level
+    - POST /api/flight-cases/{id}/append/ - Append points to a live trajectory
+    - GET /api/flight-cases/{id}/stream/ - Live points as Server-Sent Events
+      (flight_case_stream below)
+    
+    Point lists can also be requested in a compact form with
+    Accept: application/vnd.fofis.columnar+json (?format=columnar) or
+    Accept: application/octet-stream (?format=bin); see renderers.py.
+    
+    The latency of every request is recorded per action in the metrics
+    (see metrics.py).
     """
     queryset = FlightCase.objects.all()
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
+        ColumnarJSONRenderer,
+        TypedArrayRenderer,
+    ]
+    pagination_class = FlightCaseCursorPagination
+    
+    def dispatch(self, request, *args, **kwargs):
+        started = perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        
+        def observe(response):
+            metrics.REQUEST_SECONDS.observe(
+                perf_counter() - started,
+                action=self.action or 'other',
+                method=request.method,
+                status=metrics.status_class(response.status_code),
+            )
+        
+        # Observed once rendered, so that serialization is included
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(observe)
+        else:
+            observe(response)
+        return response
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -39,15 +103,90 @@ class FlightCaseViewSet(viewsets.ModelViewSet):
             return FlightCaseListSerializer
         return FlightCaseSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Summary columns only; the point blobs are never read here
+            return self._filter_list(queryset.only(*FlightCaseListSerializer.Meta.fields))
+        if self.action in ('retrieve', 'trajectory_data', 'trajectory_window', 'compliance',
+                           'geometry', 'append', 'violations'):
+            # Point blobs are loaded lazily, only when not cached
+            queryset = queryset.defer('trajectory_blob', 'corridor_blob')
+        return queryset
+    
+    def _filter_list(self, queryset):
+        """
+        Apply the list filters:
+        - is_processed: true/false
+        - processing_state: queued, running, done or failed
+        - created_after, created_before: ISO date or datetime (inclusive)
+        - compliance_min, compliance_max: compliance percentage range (inclusive)
+        """
+        params = self.request.query_params
+        
+        if 'is_processed' in params:
+            value = params['is_processed'].lower()
+            if value not in ('true', 'false', '1', '0'):
+                raise ValidationError({'is_processed': 'Must be true or false'})
+            queryset = queryset.filter(is_processed=value in ('true', '1'))
+        
+        if 'processing_state' in params:
+            queryset = queryset.filter(processing_state=params['processing_state'])
+        
+        for param, lookup in (('created_after', 'gte'), ('created_before', 'lte')):
+            if param in params:
+                value = self._parse_datetime_param(param, end_of_day=lookup == 'lte')
+                queryset = queryset.filter(**{f'created_at__{lookup}': value})
+        
+        for param, lookup in (('compliance_min', 'gte'), ('compliance_max', 'lte')):
+            if param in params:
+                try:
+                    value = float(params[param])
+                except ValueError:
+                    raise ValidationError({param: 'Must be a number'})
+                queryset = queryset.filter(**{f'compliance_percentage__{lookup}': value})
+        
+        return queryset
+    
+    def _parse_datetime_param(self, param, end_of_day=False):
+        """Aware datetime from an ISO date or datetime query parameter."""
+        text = self.request.query_params[param]
+        try:
+            value = parse_datetime(text)
+            if value is None:
+                day = parse_date(text)
+                if day is None:
+                    raise ValueError
+                # A bare date covers the whole day
+                value = datetime.combine(day, time.max if end_of_day else time.min)
+        except ValueError:
+            raise ValidationError({param: 'Must be an ISO date or datetime'})
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+    
+    def retrieve(self, request, *args, **kwargs):
+        flight_case = self.get_object()
+        response = self._cached_response(
+            flight_case, lambda: self.get_serializer(flight_case).data
+        )
+        # Stages of the latest processing run, for browser devtools
+        add_server_timing(response, server_timing(flight_case.processing_stats))
+        return response
+    
     def create(self, request, *args, **kwargs):
         """
         Create a new FlightCase by uploading corridor and trajectory files.
-        Automatically triggers processing after creation.
+        Processing is queued; the response (202) carries the job to poll.
         """
         try:
             logger.info(f"Received file upload request. Files: {request.FILES.keys()}")
             logger.info(f"Request data keys: {request.data.keys()}")
             
+            for field in ('corridor_file', 'trajectory_file'):
+                if field in request.FILES:
+                    metrics.UPLOAD_BYTES.observe(request.FILES[field].size, file=field[:-5])
+            
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             
@@ -55,21 +194,17 @@ class FlightCaseViewSet(viewsets.ModelViewSet):
             logger.info("Saving flight case...")
             flight_case = serializer.save()
             logger.info(f"Flight case saved with ID: {flight_case.id}")
+            
+            # Link the shared corridor (reusing a known one) and precompute its geometry
+            corridors.ingest(flight_case)
             logger.info(f"Corridor file: {flight_case.corridor_file.name}")
             logger.info(f"Trajectory file: {flight_case.trajectory_file.name}")
             
-            # Automatically process the files
-            logger.info("Starting file processing...")
-            success = process_flight_case(flight_case)
-            logger.info(f"Processing result: {success}")
-            
-            # Return full details
-            response_serializer = FlightCaseSerializer(flight_case)
+            # Queue processing of the files
+            job = enqueue_processing(flight_case)
+            logger.info(f"Processing job {job.id} queued ({job.status})")
             
-            return Response(
-                response_serializer.data,
-                status=status.HTTP_201_CREATED
-            )
+            return self._job_response(flight_case, job)
         except Exception as e:
             logger.error(f"Error creating flight case: {str(e)}", exc_info=True)
             return Response(
@@ -80,27 +215,146 @@ class FlightCaseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create and process many flight cases flown in one corridor.
+        
+        Multipart fields: corridor_file, and the trajectories as repeated
+        trajectory_files and/or one zip/tar archive. Processing runs inside
+        the request (see bulk.py); the response (201) is a manifest with the
+        flight case and outcome of every trajectory file.
+        """
+        corridor_upload = request.FILES.get('corridor_file')
+        if corridor_upload is None:
+            return Response({'error': 'corridor_file is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        metrics.UPLOAD_BYTES.observe(corridor_upload.size, file='corridor')
+        for upload in request.FILES.getlist('trajectory_files'):
+            metrics.UPLOAD_BYTES.observe(upload.size, file='trajectory')
+        if 'archive' in request.FILES:
+            metrics.UPLOAD_BYTES.observe(request.FILES['archive'].size, file='archive')
+        try:
+            trajectories = [(f.name, f) for f in request.FILES.getlist('trajectory_files')]
+            if 'archive' in request.FILES:
+                trajectories += bulk.read_archive(request.FILES['archive'])
+            manifest = bulk.bulk_upload(corridor_upload, trajectories)
+        except bulk.BulkUploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(manifest, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
         """
-        Manually trigger processing for a flight case.
+        Manually trigger processing for a flight case (queued, returns 202).
+        """
+        flight_case = self.get_object()
+        job = enqueue_processing(flight_case)
+        return self._job_response(flight_case, job)
+    
+    def _job_response(self, flight_case, job):
+        """
+        202 response with the flight case and the job that processes it.
+        """
+        data = FlightCaseSerializer(flight_case).data
+        data['job_id'] = job.id
+        data['job'] = ProcessingJobSerializer(job).data
+        response = Response(
+            data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': f'/api/jobs/{job.id}/'}
+        )
+        if job.finished_at is not None:
+            # Processed inline (PROCESSING_ASYNC off): the stages ran in this request
+            add_server_timing(response, server_timing(flight_case.processing_stats))
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def trajectory_data(self, request, pk=None):
+        """
+        Get detailed trajectory data for playback.
         """
         flight_case = self.get_object()
-        success = process_flight_case(flight_case)
         
-        if success:
-            serializer = FlightCaseSerializer(flight_case)
-            return Response(serializer.data)
-        else:
+        if not flight_case.is_processed:
             return Response(
-                {'error': flight_case.processing_error},
+                {'error': 'Flight case has not been processed yet'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        return self._cached_response(flight_case, lambda: {
+            'corridor': self._points(flight_case, 'corridor'),
+            'trajectory': self._points(flight_case, 'trajectory'),
+            'start_time': flight_case.trajectory_start_time,
+            'end_time': flight_case.trajectory_end_time,
+            'mean_speed': flight_case.mean_speed,
+            'mean_deviation': flight_case.mean_deviation,
+        })
+    
+    def _cached_response(self, flight_case, build):
+        """
+        Response for data that only changes when the flight case is saved.
+        
+        The ETag covers the case version, the processing and storage format
+        versions, the action, the negotiated media type and the query string.
+        Requests with a matching If-None-Match are answered with 304. Last-Modified
+        is sent but If-Modified-Since is not honoured: a date cannot tell one
+        representation of the URL from another. Otherwise the rendered body
+        comes from response_cache, and build() is only called on a miss.
+        
+        Args:
+            flight_case: FlightCase (point blobs may be deferred)
+            build: Callable returning the response data
+        """
+        request = self.request
+        renderer = request.accepted_renderer
+        if isinstance(renderer, BrowsableAPIRenderer):
+            response = Response(build())
+            response['Vary'] = 'Accept'
+            return response
+        
+        etag = response_cache.make_etag(
+            flight_case.pk, playback.data_version(flight_case),
+            PROCESSING_VERSION, SCHEMA_VERSION, self.action,
+            request.accepted_media_type, sorted(request.query_params.lists()),
+        )
+        last_modified = int(flight_case.updated_at.timestamp())
+        
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            cached = response_cache.get(etag)
+            if cached is None:
+                body = renderer.render(build(), request.accepted_media_type,
+                                       self.get_renderer_context())
+                content_type = renderer.media_type
+                if renderer.charset:
+                    content_type += f'; charset={renderer.charset}'
+                response_cache.put(etag, flight_case.pk, body, content_type)
+                cache_status = 'MISS'
+            else:
+                body, content_type = cached
+                cache_status = 'HIT'
+            response = HttpResponse(body, content_type=content_type)
+            response['X-Cache'] = cache_status
+        
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Clients may keep the body but must revalidate it; the body depends on Accept
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept'
+        return response
     
     @action(detail=True, methods=['get'])
-    def trajectory_data(self, request, pk=None):
+    def trajectory_window(self, request, pk=None):
         """
-        Get detailed trajectory data for playback.
+        One page of trajectory points for streaming playback.
+        
+        Query parameters:
+        - start, end: time range in seconds since midnight (inclusive)
+        - from_index, to_index: index range [from_index, to_index)
+        - page_size: maximum points per page (default 1000)
+        - cursor: next_cursor from the previous page (overrides the range)
+        - corridor=1: also return the corridor points
         """
         flight_case = self.get_object()
         
@@ -110,14 +364,419 @@ class FlightCaseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        params = request.query_params
+        try:
+            page_size = int(params.get('page_size', playback.DEFAULT_PAGE_SIZE))
+            page_size = min(max(page_size, 1), playback.MAX_PAGE_SIZE)
+            
+            if params.get('cursor'):
+                lo, hi = playback.decode_cursor(params['cursor'], playback.data_version(flight_case))
+            elif 'start' in params or 'end' in params:
+                start = float(params['start']) if 'start' in params else None
+                end = float(params['end']) if 'end' in params else None
+                time_seconds = playback.trajectory_columns(flight_case)['time_seconds']
+                lo, hi = playback.time_range(time_seconds, start, end)
+            else:
+                lo = int(params.get('from_index', 0))
+                hi = int(params['to_index']) if 'to_index' in params else None
+        except playback.StaleCursorError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({'error': f'Invalid window parameters: {e}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        data = playback.trajectory_window(
+            flight_case, lo, hi, page_size, as_table=self._columnar_response()
+        )
+        if params.get('corridor') in ('1', 'true'):
+            data['corridor'] = self._points(flight_case, 'corridor')
+        return Response(data)
+    
+    @action(detail=True, methods=['get'])
+    def compliance(self, request, pk=None):
+        """
+        Compliance of the points flown by a time, and over a rolling window.
+        
+        Query parameters:
+        - at: time in seconds since midnight (required)
+        - window: rolling window length in seconds (optional)
+        
+        Answered from the stored running compliant count with binary
+        searches, so the cost does not grow with the trajectory.
+        """
+        flight_case = self.get_object()
+        
+        if not flight_case.is_processed:
+            return Response(
+                {'error': 'Flight case has not been processed yet'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        params = request.query_params
+        try:
+            at = float(params['at'])
+            window = float(params['window']) if 'window' in params else None
+            # Both are echoed back, and JSON has no NaN or infinity
+            if not math.isfinite(at):
+                raise ValueError('at must be finite')
+            if window is not None and not (math.isfinite(window) and window > 0):
+                raise ValueError('window must be positive and finite')
+        except KeyError:
+            return Response({'error': 'at is required'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return Response({'error': f'Invalid compliance parameters: {e}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        columns = playback.trajectory_columns(flight_case)
         return Response({
-            'corridor': flight_case.corridor_data,
-            'trajectory': flight_case.trajectory_data,
-            'start_time': flight_case.trajectory_start_time,
-            'end_time': flight_case.trajectory_end_time,
+            'flight_case': flight_case.pk,
+            **playback.compliance_at(columns, at, window),
+        })
+    
+    @action(detail=True, methods=['get'])
+    def violations(self, request, pk=None):
+        """
+        Violation intervals of the flight case, in trajectory order.
+        
+        Takes the filters of the violation search (ViolationIntervalViewSet)
+        except flight_case. Read from the indexed interval table; the point
+        blobs are not loaded.
+        """
+        flight_case = self.get_object()
+        intervals = filter_violations(
+            ViolationInterval.objects.filter(flight_case=flight_case), request.query_params
+        ).order_by('start_index')
+        return Response({
+            'flight_case': flight_case.pk,
+            'is_processed': flight_case.is_processed,
+            'results': ViolationIntervalSerializer(intervals, many=True).data,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def append(self, request, pk=None):
+        """
+        Append points to a processed trajectory (live flights).
+        
+        Body: {"points": [{"latitude", "longitude", "altitude", "time"}, ...]},
+        times not earlier than the last stored point. Only the new points are
+        evaluated; the response carries them, the updated speed/compliance of
+        the point before them, and the updated aggregates.
+        """
+        points = request.data.get('points') if hasattr(request.data, 'get') else request.data
+        try:
+            result = live.append_points(self.get_object(), points)
+        except live.AppendError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        flight_case = result['flight_case']
+        if self._columnar_response():
+            new_points = point_table(result['columns'], TRAJECTORY_SCHEMA,
+                                     len(result['points']), result['start'])
+        else:
+            new_points = result['points']
+        return Response({
+            'id': flight_case.id,
+            'start': result['start'],
+            'point_count': flight_case.point_count,
+            'previous': result['previous'],
+            'points': new_points,
             'mean_speed': flight_case.mean_speed,
+            'max_speed': flight_case.max_speed,
             'mean_deviation': flight_case.mean_deviation,
+            'compliance_percentage': flight_case.compliance_percentage,
         })
+    
+    def _columnar_response(self):
+        """Whether the negotiated renderer encodes point lists as columns."""
+        return getattr(self.request.accepted_renderer, 'columnar', False)
+    
+    def _points(self, flight_case, kind):
+        """
+        Stored corridor or trajectory points: point dicts for JSON, or the
+        decoded columns for the compact renderers (no per-point dicts).
+        """
+        if not self._columnar_response():
+            return getattr(flight_case, f'{kind}_data')
+        if kind == 'corridor':
+            columns, schema = flight_case.corridor_columns(), CORRIDOR_SCHEMA
+        else:
+            columns, schema = playback.trajectory_columns(flight_case), TRAJECTORY_SCHEMA
+        rows = len(next(iter(columns.values()))) if columns else 0
+        return point_table(columns, schema, rows)
+    
+    @action(detail=True, methods=['get'])
+    def geometry(self, request, pk=None):
+        """
+        Simplified trajectory and corridor lines for drawing the map.
+        
+        Query parameters:
+        - zoom: map zoom level; the tolerance is one screen pixel at it
+        - tolerance: simplification tolerance in meters (overrides zoom)
+        - max_vertices: vertex budget per line (default 2000, at most 20000)
+        """
+        flight_case = self.get_object()
+        
+        if not flight_case.is_processed:
+            return Response(
+                {'error': 'Flight case has not been processed yet'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        params = request.query_params
+        try:
+            zoom = float(params['zoom']) if 'zoom' in params else None
+            tolerance = float(params['tolerance']) if 'tolerance' in params else None
+            max_vertices = int(params.get('max_vertices', simplify.DEFAULT_MAX_VERTICES))
+            max_vertices = min(max(max_vertices, 2), simplify.MAX_VERTICES)
+        except ValueError as e:
+            return Response({'error': f'Invalid geometry parameters: {e}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(simplify.simplified_geometry(
+            flight_case, zoom=zoom, tolerance=tolerance, max_vertices=max_vertices
+        ))
+
+
+class ProcessingJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of processing jobs.
+    
+    Endpoints:
+    - GET /api/jobs/ - List jobs (filter with ?flight_case=<id>)
+    - GET /api/jobs/{id}/ - State, progress, stage and error of a job
+    """
+    serializer_class = ProcessingJobSerializer
+    
+    def get_queryset(self):
+        queryset = ProcessingJob.objects.all()
+        flight_case = self.request.query_params.get('flight_case')
+        if flight_case:
+            queryset = queryset.filter(flight_case_id=flight_case)
+        return queryset.order_by('-created_at', '-id')
+
+
+class ViolationIntervalViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Violation intervals across flight cases, from the indexed interval
+    table (no point blob is read).
+    
+    Endpoints:
+    - GET /api/violations/ - Search intervals (cursor-paginated)
+    - GET /api/violations/{id}/ - One interval
+    
+    Filters:
+    - flight_case: flight case id
+    - kind: deviation, speed or both; comma-separated for several
+    - start, end: intervals overlapping this time range (seconds since
+      midnight or hh:mm:ss)
+    - min_severity: largest relative excess at least this (0.5 = 50% over)
+    - min_duration: duration in seconds at least this
+    """
+    serializer_class = ViolationIntervalSerializer
+    pagination_class = ViolationIntervalCursorPagination
+    
+    def get_queryset(self):
+        queryset = ViolationInterval.objects.all()
+        if self.action == 'list':
+            queryset = filter_violations(queryset, self.request.query_params)
+            flight_case = self.request.query_params.get('flight_case')
+            if flight_case:
+                try:
+                    queryset = queryset.filter(flight_case_id=int(flight_case))
+                except ValueError:
+                    raise ValidationError({'flight_case': 'Must be an integer'})
+        return queryset
+
+
+def filter_violations(queryset, params):
+    """Apply the violation filters (see ViolationIntervalViewSet) to a queryset."""
+    if params.get('kind'):
+        kinds = params['kind'].split(',')
+        if not set(kinds) <= set(ViolationKind.values):
+            raise ValidationError({'kind': f"Must be {', '.join(ViolationKind.values)}"})
+        queryset = queryset.filter(kind__in=kinds)
+    
+    # Overlap with [start, end]. No interval is longer than the longest
+    # stored one, which bounds the index range scan on start_time_seconds
+    if params.get('start'):
+        start = _time_param(params, 'start')
+        longest = ViolationInterval.objects.aggregate(longest=Max('duration_seconds'))['longest']
+        queryset = queryset.filter(
+            end_time_seconds__gte=start, start_time_seconds__gte=start - (longest or 0.0)
+        )
+    if params.get('end'):
+        queryset = queryset.filter(start_time_seconds__lte=_time_param(params, 'end'))
+    
+    for param, field in (('min_severity', 'severity'), ('min_duration', 'duration_seconds')):
+        if params.get(param):
+            try:
+                value = float(params[param])
+            except ValueError:
+                raise ValidationError({param: 'Must be a number'})
+            queryset = queryset.filter(**{f'{field}__gte': value})
+    return queryset
+
+
+def _time_param(params, param):
+    """Seconds since midnight from a number or an hh:mm:ss[.ffffff] query parameter."""
+    text = params[param]
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return time_to_seconds(parse_time(text))
+    except ValueError:
+        raise ValidationError({param: 'Must be seconds since midnight or hh:mm:ss'})
+
+
+async def flight_case_stream(request, pk):
+    """
+    Live points of a flight case as Server-Sent Events.
+    
+    Events:
+    - hello: current point_count and aggregates, sent first
+    - points: appended points with deviation and compliance; the SSE id is
+      the index of the last point
+    - resync: points were appended since the client's Last-Event-ID
+    - dropped: events lost because the client read too slowly
+    
+    After resync or dropped the client fetches the missing points with
+    trajectory_window. Needs the ASGI server: a WSGI worker would wait for
+    the end of the endless body.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live streaming needs the ASGI server'}, status=501)
+    if not telemetry.broker.has_capacity():
+        return JsonResponse({'error': 'Too many live streams'}, status=503,
+                            headers={'Retry-After': '10'})
+    
+    hello = await sync_to_async(_stream_hello)(pk)
+    if hello is None:
+        return JsonResponse({'error': 'Flight case not found'}, status=404)
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+    
+    response = StreamingHttpResponse(
+        telemetry.event_stream(pk, hello, request.scope, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Disable proxy buffering (nginx) so events go out as they are published
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _stream_hello(pk):
+    """Payload of the first stream event, or None if the flight case does not exist."""
+    flight_case = FlightCase.objects.defer('trajectory_blob', 'corridor_blob').filter(pk=pk).first()
+    if flight_case is None:
+        return None
+    return {
+        'flight_case': flight_case.id,
+        'is_processed': flight_case.is_processed,
+        'point_count': flight_case.trajectory_point_count,
+        'last_point': flight_case.last_point,
+        'mean_speed': telemetry.json_value(flight_case.mean_speed),
+        'max_speed': telemetry.json_value(flight_case.max_speed),
+        'mean_deviation': telemetry.json_value(flight_case.mean_deviation),
+        'compliance_percentage': telemetry.json_value(flight_case.compliance_percentage),
+    }
+
+
+def tile_view(request, z, x, y):
+    """
+    GET /api/tiles/{z}/{x}/{y}/: trajectories and corridors on a map tile,
+    clipped and simplified for it, violation segments flagged (tiles.py).
+    
+    Query parameters:
+    - cases: comma-separated flight case ids (default: the processed cases
+      on the tile)
+    - format: geojson (default) or bin; Accept: application/octet-stream
+      also selects bin
+    
+    At most TILE_MAX_CASES flight cases are drawn, newest first; 'truncated'
+    tells whether some were left out. Answered with 304 while none of the
+    cases changed.
+    """
+    started = perf_counter()
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not tiles.valid_tile(z, x, y):
+        return JsonResponse({'error': 'No such tile'}, status=404)
+    
+    params = request.GET
+    queryset = FlightCase.objects.filter(is_processed=True).only(
+        'id', 'updated_at', 'corridor', 'min_latitude', 'max_latitude',
+        'min_longitude', 'max_longitude',
+    )
+    if params.get('cases'):
+        try:
+            ids = [int(value) for value in params['cases'].split(',')]
+        except ValueError:
+            return JsonResponse({'error': 'cases must be comma-separated ids'}, status=400)
+        if len(ids) > settings.TILE_MAX_CASES:
+            return JsonResponse({'error': f'At most {settings.TILE_MAX_CASES} cases per tile'},
+                                status=400)
+        queryset = queryset.filter(pk__in=ids)
+    flight_cases = list(
+        tiles.overlapping(queryset, z, x, y).order_by('-created_at', '-id')[:settings.TILE_MAX_CASES + 1]
+    )
+    truncated = len(flight_cases) > settings.TILE_MAX_CASES
+    flight_cases = flight_cases[:settings.TILE_MAX_CASES]
+    
+    format_param = params.get('format')
+    if format_param not in (None, 'geojson', 'bin'):
+        return JsonResponse({'error': 'format must be geojson or bin'}, status=400)
+    binary = format_param == 'bin' or (
+        format_param is None and tiles.BINARY_CONTENT_TYPE in request.headers.get('Accept', '')
+    )
+    
+    etag = response_cache.make_etag(
+        'tile', tiles.TILE_VERSION, z, x, y, binary,
+        [(case.pk, playback.data_version(case)) for case in flight_cases],
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        features = tiles.tile_features(flight_cases, z, x, y)
+        fields = {'flight_cases': [case.pk for case in flight_cases], 'truncated': truncated}
+        if binary:
+            response = HttpResponse(tiles.encode_binary(features, z, x, y, fields),
+                                    content_type=tiles.BINARY_CONTENT_TYPE)
+        else:
+            response = HttpResponse(tiles.encode_geojson(features, z, x, y, fields),
+                                    content_type=tiles.GEOJSON_CONTENT_TYPE)
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate it
+    response['Cache-Control'] = 'no-cache'
+    response['Vary'] = 'Accept'
+    metrics.REQUEST_SECONDS.observe(
+        perf_counter() - started, action='tile', method=request.method,
+        status=metrics.status_class(response.status_code),
+    )
+    return response
+
+
+def metrics_view(request):
+    """
+    GET /metrics: the metrics of all processes in the Prometheus text format.
+    
+    404 when METRICS_ENABLED is off; 401 without the bearer token when
+    METRICS_TOKEN is set.
+    """
+    if not settings.METRICS_ENABLED:
+        return HttpResponse(status=404)
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 
 def index_view(request):
@@ -0,0 +1,217 @@
+"""
+Violation intervals: runs of consecutive non-compliant trajectory points.
+
+compute_flight_case collapses the per-point results into intervals (first
+and last index and time, duration, kind and peak excess) and the writers
+of processing results store them as ViolationInterval rows, so violations
+can be listed and searched across flight cases from an indexed table
+without decoding any point blob.
+
+A point is violating when neither the Python nor the C++ check passed, as
+in the player. The kind of an interval says which limits were exceeded:
+deviation, speed or both. Points without corridor limits (no nearest
+segment) count as deviations with no excess.
+
+Appends (live.py) extend the last interval or add new ones from the new
+points alone, see append_intervals.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .models import ViolationInterval, ViolationKind
+
+# Key of the intervals in compute_flight_case results (not a FlightCase field)
+RESULTS_KEY = 'violations'
+
+# Point values the intervals are computed from
+VALUE_COLUMNS = ('time_seconds', 'deviation', 'allowed_deviation', 'speed', 'allowed_speed')
+
+
+def point_columns(points: List[Dict]) -> Dict[str, np.ndarray]:
+    """VALUE_COLUMNS of point dicts as float arrays (missing values are NaN)."""
+    columns = {}
+    for name in VALUE_COLUMNS:
+        columns[name] = np.fromiter(
+            (np.nan if p.get(name) is None else p[name] for p in points),
+            dtype=np.float64, count=len(points)
+        )
+    return columns
+
+
+def extract(columns: Dict[str, np.ndarray], compliant: np.ndarray, offset: int = 0) -> List[Dict]:
+    """
+    Collapse non-compliant points into intervals.
+
+    Args:
+        columns: VALUE_COLUMNS arrays (NaN where missing)
+        compliant: Per point, whether the player counts it compliant
+        offset: Trajectory index of the first row
+
+    Returns:
+        ViolationInterval field values per interval, in trajectory order
+    """
+    violating = ~np.asarray(compliant, dtype=bool)
+    edges = np.diff(np.concatenate(([0], violating.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    if not len(starts):
+        return []
+    ends = np.flatnonzero(edges == -1) - 1
+
+    deviation_excess, speed_excess, severity = _excess(columns, violating)
+    # Compliant rows are NaN, which fmax skips, so each run's segment of
+    # reduceat (up to the next run's start) only sees the run's own points
+    peaks = [np.fmax.reduceat(values, starts) for values in (deviation_excess, speed_excess, severity)]
+
+    times = columns['time_seconds']
+    intervals = []
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        deviation_peak, speed_peak, severity_peak = (_value(p[i]) for p in peaks)
+        intervals.append({
+            'start_index': start + offset,
+            'end_index': end + offset,
+            'start_time_seconds': float(times[start]),
+            'end_time_seconds': float(times[end]),
+            'duration_seconds': float(times[end] - times[start]),
+            'point_count': end - start + 1,
+            'kind': _kind(deviation_peak, speed_peak),
+            'deviation_excess': deviation_peak,
+            'speed_excess': speed_peak,
+            'severity': severity_peak,
+        })
+    return intervals
+
+
+def extract_stored(columns: Dict[str, np.ndarray], offset: int = 0) -> List[Dict]:
+    """
+    extract() for decoded trajectory columns (FlightCase.trajectory_columns),
+    which carry the compliance columns themselves.
+    """
+    from .playback import compliance_mask
+
+    values = {name: np.asarray(columns[name], dtype=np.float64) for name in VALUE_COLUMNS}
+    return extract(values, compliance_mask(columns), offset)
+
+
+def store(intervals_by_case: Iterable[Tuple[int, Optional[List[Dict]]]]) -> None:
+    """
+    Replace the stored intervals of flight cases.
+
+    Args:
+        intervals_by_case: (flight case id, intervals) pairs; cases whose
+            intervals are None keep their stored ones
+    """
+    intervals_by_case = [(pk, intervals) for pk, intervals in intervals_by_case
+                         if intervals is not None]
+    if not intervals_by_case:
+        return
+    ViolationInterval.objects.filter(
+        flight_case_id__in=[pk for pk, _ in intervals_by_case]
+    ).delete()
+    ViolationInterval.objects.bulk_create(
+        [
+            ViolationInterval(flight_case_id=pk, **interval)
+            for pk, intervals in intervals_by_case
+            for interval in intervals
+        ],
+        batch_size=1000,
+    )
+
+
+def append_intervals(flight_case, start: int, columns: Dict[str, np.ndarray],
+                     compliant: np.ndarray) -> None:
+    """
+    Update the stored intervals for points appended at index start.
+
+    Only the new points and the previous last point (whose speed and
+    compliance change) are evaluated. A run reaching the previous last
+    point is joined to the interval ending next to it.
+
+    Args:
+        flight_case: FlightCase the points are appended to (before the
+            chunk holding them is stored)
+        start: Index of the first new point
+        columns: VALUE_COLUMNS of the previous last point and the new points
+        compliant: Their compliance, with the previous point's new value
+    """
+    runs = extract(columns, compliant, offset=start - 1)
+    touching = (
+        ViolationInterval.objects.filter(flight_case=flight_case, end_index__gte=start - 2)
+        .order_by('-end_index').first()
+    )
+
+    if touching is not None and touching.end_index == start - 1 and compliant[0]:
+        # The previous last point no longer violates: the interval ends before it
+        if touching.point_count == 1:
+            touching.delete()
+        else:
+            _recompute(flight_case, touching)
+        touching = None
+
+    if touching is not None and runs and runs[0]['start_index'] == start - 1:
+        # The first run continues the interval. Its peaks keep the old speed
+        # of the previous last point, which repeated the speed of the point
+        # before it (already in the interval)
+        _join(touching, runs.pop(0))
+        touching.save()
+
+    ViolationInterval.objects.bulk_create(
+        [ViolationInterval(flight_case=flight_case, **interval) for interval in runs],
+        batch_size=1000,
+    )
+
+
+def _excess(columns, violating) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per point excess over the deviation and speed limits and the larger
+    relative excess; NaN where the point complies or has no such limit."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deviation_excess = columns['deviation'] - columns['allowed_deviation']
+        speed_excess = columns['speed'] - columns['allowed_speed']
+        deviation_excess[~(violating & (deviation_excess > 0))] = np.nan
+        speed_excess[~(violating & (speed_excess > 0))] = np.nan
+        severity = np.fmax(
+            np.where(columns['allowed_deviation'] > 0,
+                     deviation_excess / columns['allowed_deviation'], np.nan),
+            np.where(columns['allowed_speed'] > 0,
+                     speed_excess / columns['allowed_speed'], np.nan),
+        )
+    return deviation_excess, speed_excess, severity
+
+
+def _kind(deviation_peak: Optional[float], speed_peak: Optional[float]) -> str:
+    if deviation_peak is not None and speed_peak is not None:
+        return ViolationKind.BOTH
+    if speed_peak is not None:
+        return ViolationKind.SPEED
+    return ViolationKind.DEVIATION
+
+
+def _value(value) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _join(interval: ViolationInterval, run: Dict) -> None:
+    """Extend a stored interval with a run starting at its last point or right after it."""
+    overlap = interval.end_index - run['start_index'] + 1
+    interval.end_index = run['end_index']
+    interval.end_time_seconds = run['end_time_seconds']
+    interval.duration_seconds = interval.end_time_seconds - interval.start_time_seconds
+    interval.point_count += run['point_count'] - overlap
+    for field in ('deviation_excess', 'speed_excess', 'severity'):
+        values = [v for v in (getattr(interval, field), run[field]) if v is not None]
+        setattr(interval, field, max(values) if values else None)
+    interval.kind = _kind(interval.deviation_excess, interval.speed_excess)
+
+
+def _recompute(flight_case, interval: ViolationInterval) -> None:
+    """Shorten an interval by its last point, from the stored columns."""
+    rows = slice(interval.start_index, interval.end_index)
+    columns = flight_case.trajectory_columns(
+        list(VALUE_COLUMNS) + ['compliant', 'cpp_compliant']
+    )
+    shortened = extract_stored(
+        {name: values[rows] for name, values in columns.items()}, offset=interval.start_index
+    )
+    for field, value in shortened[0].items():
+        setattr(interval, field, value)
+    interval.save()
@@ -31,13 +31,10 @@ if [ ! -f "db.sqlite3" ]; then
     python manage.py migrate
 fi
 
-# Check if C++ validator is compiled
-if [ ! -f "cpp/trajectory_validator" ]; then
-    echo "⚙️  C++ валидатор не скомпилирован, компилирую..."
-    cd cpp
-    make
-    cd ..
-fi
+# Build the C++ validator (the binary is not committed; make only
+# rebuilds it when trajectory_validator.cpp has changed)
+echo "⚙️  Сборка C++ валидатора..."
+make -C cpp
 
 # Start server
 echo ""